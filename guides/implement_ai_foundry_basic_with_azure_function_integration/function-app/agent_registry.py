@@ -0,0 +1,142 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+"""
+Bounded in-memory registry of agents the function app chats with.
+
+Agents are cached by id in LRU order, with a name index so chat can address
+an agent by agent_name without scanning list_agents on every request.
+Entries older than the TTL are revalidated with a single get_agent call, so
+agents deleted or changed by another instance drop out within one TTL.
+Deleting an agent through the app invalidates its entry immediately.
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple, Any
+
+from azure.core.exceptions import ResourceNotFoundError
+from metrics import METRICS, MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+
+class AgentNotFound(LookupError):
+    """Raised when no agent matches the requested id or name"""
+
+
+class AgentRegistry:
+    """LRU cache of agent objects keyed by id, with TTL revalidation"""
+
+    def __init__(
+        self,
+        get_agent: Callable[[str], Any],
+        find_agent: Callable[[str], Optional[Any]],
+        max_size: int = 128,
+        ttl_seconds: float = 300.0,
+        metrics: MetricsRegistry = METRICS,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.get_agent = get_agent
+        self.find_agent = find_agent
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.metrics = metrics
+        self.clock = clock
+
+        # agent id -> (agent, validated_at); least recently used first
+        self._entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._names: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, agent_id: Optional[str] = None, agent_name: Optional[str] = None) -> Any:
+        """Resolve an agent by id, or by name when no id is given"""
+        if not agent_id and not agent_name:
+            raise ValueError("Provide 'agent_id' or 'agent_name'")
+
+        with self._lock:
+            cached_id = agent_id or self._names.get(agent_name)
+            entry = self._entries.get(cached_id) if cached_id else None
+            if entry:
+                self._entries.move_to_end(cached_id)
+
+        if entry:
+            agent, validated_at = entry
+            if self.clock() - validated_at < self.ttl_seconds:
+                self.metrics.counter("agent_registry.hits").inc()
+                return agent
+            agent = self._revalidate(cached_id)
+            if agent and (agent_id or agent.name == agent_name):
+                return agent
+            if agent_id:
+                raise AgentNotFound(f"Agent not found: {agent_id}")
+            # Renamed or deleted: look the name up again
+        else:
+            self.metrics.counter("agent_registry.misses").inc()
+
+        agent = self._fetch(agent_id) if agent_id else self.find_agent(agent_name)
+        if agent is None:
+            raise AgentNotFound(f"Agent not found: {agent_id or agent_name}")
+        self.put(agent)
+        return agent
+
+    def put(self, agent: Any) -> None:
+        """Cache an agent, evicting the least recently used beyond max_size"""
+        evicted = 0
+        with self._lock:
+            previous = self._entries.get(agent.id)
+            if previous and self._names.get(previous[0].name) == agent.id:
+                del self._names[previous[0].name]
+            self._entries[agent.id] = (agent, self.clock())
+            self._entries.move_to_end(agent.id)
+            if agent.name:
+                self._names[agent.name] = agent.id
+
+            while len(self._entries) > self.max_size:
+                _, (old, _) = self._entries.popitem(last=False)
+                if self._names.get(old.name) == old.id:
+                    del self._names[old.name]
+                evicted += 1
+            size = len(self._entries)
+
+        if evicted:
+            self.metrics.counter("agent_registry.evictions").inc(evicted)
+        self.metrics.gauge("agent_registry.size").set(size)
+
+    def invalidate(self, agent_id: str) -> bool:
+        """Drop an agent's entry; returns whether it was cached"""
+        with self._lock:
+            entry = self._entries.pop(agent_id, None)
+            if entry and self._names.get(entry[0].name) == agent_id:
+                del self._names[entry[0].name]
+            size = len(self._entries)
+        self.metrics.gauge("agent_registry.size").set(size)
+        return entry is not None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._names.clear()
+        self.metrics.gauge("agent_registry.size").set(0)
+
+    def _fetch(self, agent_id: str) -> Optional[Any]:
+        try:
+            return self.get_agent(agent_id)
+        except ResourceNotFoundError:
+            return None
+
+    def _revalidate(self, agent_id: str) -> Optional[Any]:
+        self.metrics.counter("agent_registry.revalidations").inc()
+        agent = self._fetch(agent_id)
+        if agent is None:
+            logger.info("Agent %s no longer exists, dropping it from the registry", agent_id)
+            self.invalidate(agent_id)
+            return None
+        self.put(agent)
+        return agent
@@ -0,0 +1,72 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+"""
+Bounded in-memory cache of recently downloaded agent files.
+
+Code interpreter artifacts (charts, CSVs) are typically fetched right after
+the run that produced them, sometimes more than once. The cache keeps their
+bytes and content type in LRU order within a total byte budget; files larger
+than the per-item limit are never cached, so one big download cannot evict
+everything else.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from metrics import METRICS, MetricsRegistry
+
+
+class CachedArtifact:
+    """File bytes plus the metadata needed to serve them"""
+
+    def __init__(self, content: bytes, content_type: str, filename: str):
+        self.content = content
+        self.content_type = content_type
+        self.filename = filename
+
+
+class ArtifactCache:
+    """LRU cache of file contents bounded by total bytes"""
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, max_item_bytes: int = 8 * 1024 * 1024,
+                 metrics: MetricsRegistry = METRICS):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self.metrics = metrics
+        self.size = 0
+        self._items: "OrderedDict[str, CachedArtifact]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, file_id: str) -> Optional[CachedArtifact]:
+        with self._lock:
+            artifact = self._items.get(file_id)
+            if artifact:
+                self._items.move_to_end(file_id)
+        self.metrics.counter("artifact_cache.hits" if artifact else "artifact_cache.misses").inc()
+        return artifact
+
+    def put(self, file_id: str, artifact: CachedArtifact) -> bool:
+        """Cache an artifact; returns False when it is too large to cache"""
+        if len(artifact.content) > min(self.max_item_bytes, self.max_bytes):
+            return False
+
+        with self._lock:
+            previous = self._items.pop(file_id, None)
+            if previous:
+                self.size -= len(previous.content)
+            self._items[file_id] = artifact
+            self.size += len(artifact.content)
+            while self.size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted.content)
+                self.metrics.counter("artifact_cache.evictions").inc()
+            size = self.size
+
+        self.metrics.gauge("artifact_cache.bytes").set(size)
+        return True
@@ -0,0 +1,227 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+"""
+Record and replay of SDK HTTP traffic for reproducible benchmarks.
+
+With SDK_CASSETTE set, the shared transport (http_transport.py) either
+records every request the SDK clients make, with its response and how long
+it took, or serves a recorded session back without a network:
+
+    SDK_CASSETTE=cassettes/chat.json SDK_CASSETTE_MODE=record   (live session)
+    SDK_CASSETTE=cassettes/chat.json SDK_CASSETTE_MODE=replay   (offline)
+
+Recording happens below the SDK pipeline, so the cassette has the real
+response shapes, pagination and run status sequences. Secrets are scrubbed
+before anything is written: the host becomes recorded.invalid, only a few
+harmless response headers are kept, SAS and key query parameters are
+redacted, and JSON fields named like keys, tokens or secrets are replaced.
+
+The cassette also keeps the scrubbed project endpoint; replay needs
+AI_FOUNDRY_ENDPOINT to have the same path, on any host.
+
+Replay matches requests by method and path (including the query string) and
+hands out the recorded responses for each in order, repeating the last one
+once they run out, so an extra status poll sees the final state. Each
+response is delayed by its recorded duration times SDK_CASSETTE_TIMING
+(1 for the original timing, 0 for none).
+"""
+
+import io
+import json
+import time
+import base64
+import threading
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from requests import PreparedRequest, Response
+from requests.adapters import BaseAdapter, HTTPAdapter
+from urllib3 import HTTPResponse
+
+CASSETTE_HOST = "https://recorded.invalid"
+REDACTED = "REDACTED"
+
+# Response headers worth replaying; everything else may identify the account
+KEPT_HEADERS = {"content-type", "content-disposition", "retry-after", "location"}
+
+SECRET_QUERY_PARAMS = {"sig", "se", "st", "sp", "skoid", "sktid", "code", "api-key", "key", "token"}
+SECRET_FIELD_SUFFIXES = ("key", "token", "secret", "password", "connectionstring",
+                         "connection_string")
+
+
+class CassetteMiss(Exception):
+    """Raised on replay for a request the cassette has no recording of"""
+
+
+def scrub_url(url: str) -> str:
+    """Path and query on the placeholder host, with secret query values redacted"""
+    parts = urlsplit(url)
+    query = [(name, REDACTED if name.lower() in SECRET_QUERY_PARAMS else value)
+             for name, value in parse_qsl(parts.query, keep_blank_values=True)]
+    return f"{CASSETTE_HOST}{parts.path}" + (f"?{urlencode(query)}" if query else "")
+
+
+def is_secret_field(name: str) -> bool:
+    """Fields like api_key, accessToken or client_secret; prompt_tokens is left alone"""
+    return name.lower().replace("-", "_").endswith(SECRET_FIELD_SUFFIXES)
+
+
+def scrub_json(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: REDACTED if is_secret_field(key) and isinstance(item, str)
+                else scrub_json(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [scrub_json(item) for item in value]
+    return value
+
+
+def encode_body(body: Optional[bytes], host: str) -> Dict[str, Any]:
+    """A JSON-safe, scrubbed form of a request or response body"""
+    if not body:
+        return {}
+    try:
+        text = body.decode("utf-8")
+    except UnicodeDecodeError:
+        return {"base64": base64.b64encode(body).decode("ascii")}
+    text = text.replace(host, CASSETTE_HOST) if host else text
+    try:
+        return {"json": scrub_json(json.loads(text))}
+    except ValueError:
+        return {"text": text}
+
+
+def decode_body(body: Dict[str, Any]) -> bytes:
+    if "json" in body:
+        return json.dumps(body["json"]).encode("utf-8")
+    if "text" in body:
+        return body["text"].encode("utf-8")
+    if "base64" in body:
+        return base64.b64decode(body["base64"])
+    return b""
+
+
+def match_key(method: str, url: str) -> Tuple[str, str]:
+    parts = urlsplit(scrub_url(url))
+    return method.upper(), parts.path + (f"?{parts.query}" if parts.query else "")
+
+
+class Cassette:
+    """Recorded request/response pairs with their durations"""
+
+    def __init__(self, path: str, interactions: Optional[List[Dict[str, Any]]] = None,
+                 timing: float = 1.0, endpoint: Optional[str] = None):
+        self.path = path
+        self.endpoint = scrub_url(endpoint) if endpoint else None
+        self.interactions = interactions or []
+        self.timing = timing
+        self._cursors: Dict[Tuple[str, str], int] = defaultdict(int)
+        self._lock = threading.Lock()
+        self._index: Optional[Dict[Tuple[str, str], List[Dict[str, Any]]]] = None
+
+    @classmethod
+    def load(cls, path: str, timing: float = 1.0) -> "Cassette":
+        with open(path, "r", encoding="utf-8") as f:
+            document = json.load(f)
+        return cls(path, document["interactions"], timing, document.get("endpoint"))
+
+    def __len__(self) -> int:
+        return len(self.interactions)
+
+    def record(self, request: PreparedRequest, response: Response, elapsed: float) -> None:
+        parts = urlsplit(request.url)
+        host = f"{parts.scheme}://{parts.netloc}"
+        body = request.body.encode("utf-8") if isinstance(request.body, str) else request.body
+        interaction = {
+            "request": {
+                "method": request.method,
+                "url": scrub_url(request.url),
+                "body": encode_body(body, host),
+            },
+            "response": {
+                "status": response.status_code,
+                "headers": {name: value for name, value in response.headers.items()
+                            if name.lower() in KEPT_HEADERS},
+                "body": encode_body(response.content, host),
+            },
+            "elapsed_seconds": round(elapsed, 6),
+        }
+        with self._lock:
+            self.interactions.append(interaction)
+
+    def save(self) -> None:
+        with self._lock:
+            document = {
+                "version": 1,
+                "recorded_at": datetime.now(timezone.utc).isoformat(),
+                "endpoint": self.endpoint,
+                "interactions": self.interactions,
+            }
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=1)
+
+    def play(self, method: str, url: str) -> Dict[str, Any]:
+        """The next recorded interaction for a request"""
+        key = match_key(method, url)
+        with self._lock:
+            if self._index is None:
+                self._index = defaultdict(list)
+                for interaction in self.interactions:
+                    request = interaction["request"]
+                    self._index[match_key(request["method"], request["url"])].append(interaction)
+            recorded = self._index.get(key)
+            if not recorded:
+                raise CassetteMiss(f"No recording of {key[0]} {key[1]} in {self.path}")
+            position = self._cursors[key]
+            self._cursors[key] = position + 1
+        return recorded[min(position, len(recorded) - 1)]
+
+    def rewind(self) -> None:
+        """Start handing out each request's recordings from the first again"""
+        with self._lock:
+            self._cursors.clear()
+
+
+class RecordingAdapter(BaseAdapter):
+    """Sends through the wrapped adapter and records each exchange"""
+
+    def __init__(self, inner: HTTPAdapter, cassette: Cassette):
+        super().__init__()
+        self.inner = inner
+        self.cassette = cassette
+
+    def send(self, request: PreparedRequest, **kwargs: Any) -> Response:
+        started = time.perf_counter()
+        response = self.inner.send(request, **kwargs)
+        response.content  # read streamed bodies so they can be recorded
+        self.cassette.record(request, response, time.perf_counter() - started)
+        return response
+
+    def close(self) -> None:
+        self.inner.close()
+
+
+class ReplayAdapter(HTTPAdapter):
+    """Serves recorded responses instead of opening connections"""
+
+    def __init__(self, cassette: Cassette):
+        super().__init__()
+        self.cassette = cassette
+
+    def send(self, request: PreparedRequest, **kwargs: Any) -> Response:
+        interaction = self.cassette.play(request.method, request.url)
+        if self.cassette.timing:
+            time.sleep(interaction["elapsed_seconds"] * self.cassette.timing)
+
+        recorded = interaction["response"]
+        raw = HTTPResponse(
+            body=io.BytesIO(decode_body(recorded["body"])),
+            headers=recorded["headers"],
+            status=recorded["status"],
+            preload_content=False,
+            decode_content=False,
+        )
+        return self.build_response(request, raw)
@@ -0,0 +1,203 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+"""
+Accept-Encoding negotiated compression for HTTP responses.
+
+gzip is always available; zstd and brotli are used when the zstandard or
+brotli packages are installed and the client accepts them. Bodies below
+COMPRESSION_MIN_BYTES are sent as-is, since the headers and CPU would cost
+more than the bytes saved. The level (1 fastest, 9 smallest) is set per
+route with COMPRESSION_LEVELS, for example "agent=6,health=1"; level 0
+turns compression off for a route.
+"""
+
+import os
+import gzip
+import time
+from typing import Callable, Dict, Optional
+
+import azure.functions as func
+
+from metrics import METRICS, MetricsRegistry
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+DEFAULT_MIN_BYTES = 1024
+DEFAULT_LEVEL = 5
+
+# Content types worth compressing; images and archives are already compressed
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "application/xml",
+                      "application/javascript", "image/svg+xml")
+
+
+def _gzip(data: bytes, level: int) -> bytes:
+    # mtime=0 keeps the output stable for identical bodies
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _zstd(data: bytes, level: int) -> bytes:
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+def _brotli(data: bytes, level: int) -> bytes:
+    return brotli.compress(data, quality=level)
+
+
+def available_encoders() -> Dict[str, Callable[[bytes, int], bytes]]:
+    """Encoders installed here, in server preference order"""
+    encoders = {}
+    if zstandard is not None:
+        encoders["zstd"] = _zstd
+    if brotli is not None:
+        encoders["br"] = _brotli
+    encoders["gzip"] = _gzip
+    return encoders
+
+
+ENCODERS = available_encoders()
+
+
+def negotiate(accept_encoding: Optional[str], encoders: Optional[Dict] = None) -> Optional[str]:
+    """
+    The encoding to use for an Accept-Encoding header, or None for identity.
+
+    Among the encodings the client accepts with the highest q-value, the
+    server's preference order (zstd, br, gzip) breaks ties.
+    """
+    encoders = ENCODERS if encoders is None else encoders
+    if not accept_encoding:
+        return None
+
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, *options = [part.strip() for part in item.split(";")]
+        weight = 1.0
+        for option in options:
+            key, _, value = option.partition("=")
+            if key.strip() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        if name:
+            weights[name.lower()] = weight
+
+    wildcard = weights.get("*", 0.0)
+    candidates = [(weights.get(name, wildcard), -rank, name)
+                  for rank, name in enumerate(encoders)]
+    weight, _, name = max(candidates)
+    return name if weight > 0 else None
+
+
+def etag_for_encoding(etag: str, encoding: str) -> str:
+    """A distinct ETag for an encoded representation, as '"<tag>-gzip"'"""
+    return f'{etag[:-1]}-{encoding}"' if etag.endswith('"') else etag
+
+
+def base_etag(etag: str) -> str:
+    """The ETag without its weak prefix or content-coding suffix"""
+    etag = etag.strip()
+    etag = etag[2:] if etag.startswith("W/") else etag
+    for encoding in ("zstd", "br", "gzip"):
+        if etag.endswith(f'-{encoding}"'):
+            return etag[:-len(encoding) - 2] + '"'
+    return etag
+
+
+def is_compressible(mimetype: Optional[str]) -> bool:
+    mimetype = (mimetype or "").split(";")[0].strip().lower()
+    return mimetype.startswith("text/") or mimetype in COMPRESSIBLE_TYPES
+
+
+def parse_levels(spec: str) -> Dict[str, int]:
+    """Per-route levels from comma-separated "route=level" entries"""
+    levels = {}
+    for entry in filter(None, (item.strip() for item in spec.split(","))):
+        route, _, level = entry.partition("=")
+        levels[route.strip()] = int(level)
+    return levels
+
+
+class CompressionPolicy:
+    """Minimum size and per-route level for compressing responses"""
+
+    def __init__(self, min_bytes: int = DEFAULT_MIN_BYTES, default_level: int = DEFAULT_LEVEL,
+                 levels: Optional[Dict[str, int]] = None,
+                 encoders: Optional[Dict[str, Callable[[bytes, int], bytes]]] = None,
+                 metrics: MetricsRegistry = METRICS):
+        self.min_bytes = min_bytes
+        self.default_level = default_level
+        self.levels = levels or {}
+        self.encoders = ENCODERS if encoders is None else encoders
+        self.metrics = metrics
+
+    @classmethod
+    def from_env(cls) -> "CompressionPolicy":
+        return cls(
+            min_bytes=int(os.getenv("COMPRESSION_MIN_BYTES", str(DEFAULT_MIN_BYTES))),
+            default_level=int(os.getenv("COMPRESSION_LEVEL", str(DEFAULT_LEVEL))),
+            levels=parse_levels(os.getenv("COMPRESSION_LEVELS", ""))
+        )
+
+    def level(self, route: str) -> int:
+        return max(0, min(9, self.levels.get(route, self.default_level)))
+
+    def varies(self, response: func.HttpResponse, route: str) -> bool:
+        """Whether the response's representation depends on Accept-Encoding"""
+        return bool(self.level(route)) and response.status_code not in (204, 304) \
+            and is_compressible(response.mimetype) and "Content-Encoding" not in response.headers
+
+    def encoding_for(self, response: func.HttpResponse, accept_encoding: Optional[str],
+                     route: str) -> Optional[str]:
+        """The content coding apply() would use for the response, or None to send it as is"""
+        if not self.varies(response, route):
+            return None
+        encoding = negotiate(accept_encoding, self.encoders)
+        if not encoding or len(response.get_body()) < self.min_bytes:
+            return None
+        return encoding
+
+    def apply(self, response: func.HttpResponse, accept_encoding: Optional[str],
+              route: str) -> func.HttpResponse:
+        """The response compressed for the client, or unchanged when not worth it"""
+        if not self.varies(response, route):
+            return response
+
+        # The body depends on Accept-Encoding even when this one is not compressed
+        response.headers["Vary"] = "Accept-Encoding"
+        encoding = self.encoding_for(response, accept_encoding, route)
+        if not encoding:
+            return response
+
+        level = self.level(route)
+        body = response.get_body()
+        # thread_time, not process_time: other requests' threads would count
+        started = time.thread_time()
+        compressed = self.encoders[encoding](body, level)
+        self.metrics.histogram(f"compression.{route}.cpu_ms").observe(
+            (time.thread_time() - started) * 1000)
+        self.metrics.counter(f"compression.{route}.bytes_in").inc(len(body))
+        self.metrics.counter(f"compression.{route}.bytes_out").inc(len(compressed))
+
+        headers = dict(response.headers)
+        headers["Content-Encoding"] = encoding
+        if "ETag" in headers:
+            headers["ETag"] = etag_for_encoding(headers["ETag"], encoding)
+        return func.HttpResponse(
+            compressed,
+            status_code=response.status_code,
+            headers=headers,
+            mimetype=response.mimetype,
+            charset=response.charset,
+        )
+
@@ -0,0 +1,92 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+"""
+Per-request deadline budget.
+
+Each invocation gets a Deadline from the X-Request-Deadline-Seconds header,
+capped by REQUEST_DEADLINE_SECONDS (default 230, the Azure Functions HTTP
+response limit). The active deadline is held in a context variable so every
+stage of a handler can check it without threading it through call
+signatures; DeadlineExceeded carries the progress made so far.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Mapping, Optional, Any
+
+DEADLINE_HEADER = "X-Request-Deadline-Seconds"
+DEFAULT_DEADLINE_SECONDS = 230.0
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request runs out of its deadline budget"""
+
+    def __init__(self, stage: str, progress: Optional[Dict[str, Any]] = None):
+        super().__init__(f"Deadline exceeded during {stage}")
+        self.stage = stage
+        self.progress = progress or {}
+
+
+class Deadline:
+    """Time budget for one request, measured on the monotonic clock"""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.started = time.monotonic()
+
+    @classmethod
+    def from_request(cls, headers: Mapping[str, str]) -> "Deadline":
+        """Build a deadline from the request header, capped by configuration"""
+        configured = float(os.getenv("REQUEST_DEADLINE_SECONDS", str(DEFAULT_DEADLINE_SECONDS)))
+        try:
+            requested = float(headers.get(DEADLINE_HEADER) or configured)
+        except ValueError:
+            requested = configured
+
+        # Clients may shorten the budget but never extend it
+        return cls(min(requested, configured) if requested > 0 else configured)
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def remaining(self) -> float:
+        return max(0.0, self.seconds - self.elapsed)
+
+    @property
+    def expired(self) -> bool:
+        return self.elapsed >= self.seconds
+
+    def check(self, stage: str, **progress: Any) -> None:
+        """Raise DeadlineExceeded if the budget is spent before a stage starts"""
+        if self.expired:
+            raise DeadlineExceeded(stage, progress)
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "deadline_seconds": self.seconds,
+            "elapsed_seconds": round(self.elapsed, 3),
+        }
+
+
+_current_deadline: ContextVar[Optional[Deadline]] = ContextVar(
+    "current_deadline", default=None)
+
+
+@contextmanager
+def request_deadline(deadline: Deadline) -> Iterator[Deadline]:
+    """Make a deadline the active budget for the enclosed block"""
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """The active request deadline, or None outside a request"""
+    return _current_deadline.get()
@@ -0,0 +1,351 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+"""
+Failover and latency-aware routing across AI Foundry project endpoints.
+
+Each endpoint keeps its own client and default agent, a moving average of
+call latency and error rate, and a circuit breaker that opens after
+consecutive failures. New conversations go to the healthiest endpoint and
+fail over to the next one when a call fails with a transient error.
+Threads, agents and files only exist where they were created, so their ids
+are pinned to that home endpoint; requests that name one never fail over.
+An operation that has created a run (or any other state it cannot redo
+elsewhere) calls commit_endpoint(), and from then on its errors are raised
+instead of replaying the operation on another endpoint. The latency sample
+of a committed call stops at the commit: what follows is run polling, whose
+length depends on the answer, not on the endpoint.
+
+The endpoint serving the current request is held in a context variable, so
+get_project_client() and the per-endpoint singletons in function_app.py
+follow it without threading it through call signatures.
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator, List, Optional, Any, TypeVar
+from urllib.parse import urlparse
+from azure.core.exceptions import HttpResponseError, ServiceRequestError, ServiceResponseError
+
+from metrics import METRICS, MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Statuses that say the endpoint, not the request, is the problem
+FAILOVER_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class EndpointUnavailable(Exception):
+    """Raised when no endpoint able to serve a request has a closed breaker"""
+
+    def __init__(self, message: str, retry_after_seconds: float):
+        super().__init__(message)
+        self.retry_after_seconds = retry_after_seconds
+
+
+def is_endpoint_failure(error: Exception) -> bool:
+    """Whether an error should count against the endpoint and trigger failover"""
+    if isinstance(error, (ServiceRequestError, ServiceResponseError)):
+        return True
+    return isinstance(error, HttpResponseError) and error.status_code in FAILOVER_STATUS_CODES
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with a single half-open trial call"""
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if self.clock() - self.opened_at >= self.reset_seconds else "open"
+
+    def retry_after(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.reset_seconds - (self.clock() - self.opened_at))
+
+    def allow(self) -> bool:
+        """Whether a call may go through; half-open lets one trial call at a time"""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self) -> bool:
+        """Count a failure; returns True when it trips the breaker open"""
+        with self._lock:
+            self.failures += 1
+            was_trial, self._trial = self._trial, False
+            if was_trial or (self.opened_at is None and self.failures >= self.failure_threshold):
+                self.opened_at = self.clock()
+                return True
+            return False
+
+
+class ProjectEndpoint:
+    """One project endpoint with its client, default agent and health"""
+
+    def __init__(self, name: str, url: str, primary: bool = False,
+                 breaker: Optional[CircuitBreaker] = None, latency_alpha: float = 0.2):
+        self.name = name
+        self.url = url
+        self.primary = primary
+        self.breaker = breaker or CircuitBreaker()
+        self.latency_alpha = latency_alpha
+        self.latency_ms: Optional[float] = None
+        self.error_rate = 0.0
+        self.agent: Any = None
+        self.agent_registry: Any = None
+        self._client: Any = None
+        self._lock = threading.Lock()
+
+    def get_client(self, build_client: Callable[[str], Any]) -> Any:
+        """The endpoint's client, built on first use"""
+        with self._lock:
+            if self._client is None:
+                self._client = build_client(self.url)
+            return self._client
+
+    def observe(self, seconds: float, failed: bool) -> None:
+        """Fold one call into the latency and error rate moving averages"""
+        alpha = self.latency_alpha
+        if not failed:
+            sample = seconds * 1000
+            self.latency_ms = sample if self.latency_ms is None else \
+                alpha * sample + (1 - alpha) * self.latency_ms
+        self.error_rate = alpha * float(failed) + (1 - alpha) * self.error_rate
+
+    def score(self, error_penalty: float = 4.0) -> float:
+        """Lower is better; endpoints without samples score 0 so they get tried"""
+        return (self.latency_ms or 0.0) * (1 + error_penalty * self.error_rate)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "primary": self.primary,
+            "breaker": self.breaker.state,
+            "latency_ms": round(self.latency_ms, 1) if self.latency_ms is not None else None,
+            "error_rate": round(self.error_rate, 3),
+        }
+
+
+_current_endpoint: ContextVar[Optional[ProjectEndpoint]] = ContextVar(
+    "current_endpoint", default=None)
+
+
+@contextmanager
+def use_endpoint(endpoint: ProjectEndpoint) -> Iterator[ProjectEndpoint]:
+    """Make an endpoint the one serving the enclosed block"""
+    token = _current_endpoint.set(endpoint)
+    try:
+        yield endpoint
+    finally:
+        _current_endpoint.reset(token)
+
+
+def current_endpoint() -> Optional[ProjectEndpoint]:
+    """The endpoint serving the current request, or None when unrouted"""
+    return _current_endpoint.get()
+
+
+class _Attempt:
+    """One EndpointPool.call attempt on one endpoint"""
+
+    def __init__(self, clock: Callable[[], float]):
+        self.clock = clock
+        self.started = clock()
+        self.committed_at: Optional[float] = None
+
+    @property
+    def committed(self) -> bool:
+        return self.committed_at is not None
+
+    def seconds(self) -> float:
+        """Time until the commit, or until now for calls that never committed"""
+        return (self.committed_at if self.committed else self.clock()) - self.started
+
+
+# The attempt in progress; None outside EndpointPool.call
+_attempt: ContextVar[Optional[_Attempt]] = ContextVar("endpoint_attempt", default=None)
+
+
+def commit_endpoint() -> None:
+    """
+    Bind the current pool call to its endpoint.
+
+    Call it once the operation has created state that failing over would
+    duplicate, such as a run; later failures are then raised as they are.
+    """
+    attempt = _attempt.get()
+    if attempt is not None and not attempt.committed:
+        attempt.committed_at = attempt.clock()
+
+
+def parse_endpoints(primary_url: str, extra: str) -> List[ProjectEndpoint]:
+    """
+    The primary endpoint followed by comma-separated "url" or "name=url" entries.
+
+    Unnamed extra endpoints are named by host (and port, for local stand-ins).
+    """
+    endpoints = [ProjectEndpoint("primary", primary_url, primary=True)]
+    for entry in filter(None, (item.strip() for item in extra.split(","))):
+        name, _, url = entry.partition("=") if "=" in entry.split("://")[0] else ("", "", entry)
+        if url.rstrip("/") in (endpoint.url.rstrip("/") for endpoint in endpoints):
+            continue
+        name = name or urlparse(url).netloc
+        if name in (endpoint.name for endpoint in endpoints):
+            name = f"{name}-{len(endpoints)}"
+        endpoints.append(ProjectEndpoint(name, url))
+    return endpoints
+
+
+class EndpointPool:
+    """Routes calls to the healthiest endpoint and keeps resources on their home"""
+
+    def __init__(self, endpoints: List[ProjectEndpoint], max_pins: int = 10000,
+                 metrics: MetricsRegistry = METRICS, clock: Callable[[], float] = time.monotonic):
+        if not endpoints:
+            raise ValueError("At least one endpoint is required")
+        self.endpoints = endpoints
+        self.max_pins = max_pins
+        self.metrics = metrics
+        self.clock = clock
+        self._pins: "OrderedDict[str, ProjectEndpoint]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.endpoints)
+
+    @property
+    def primary(self) -> ProjectEndpoint:
+        return self.endpoints[0]
+
+    def ranked(self) -> List[ProjectEndpoint]:
+        """Endpoints by score; ties keep configuration order, so the primary wins"""
+        return sorted(self.endpoints, key=lambda endpoint: endpoint.score())
+
+    def pin(self, resource_id: Optional[str], endpoint: Optional[ProjectEndpoint]) -> None:
+        """Remember which endpoint a thread, agent or file lives on"""
+        if not resource_id or endpoint is None or len(self.endpoints) == 1:
+            return
+        with self._lock:
+            self._pins[resource_id] = endpoint
+            self._pins.move_to_end(resource_id)
+            while len(self._pins) > self.max_pins:
+                self._pins.popitem(last=False)
+
+    def home(self, resource_id: str, probe: Callable[[], Any]) -> ProjectEndpoint:
+        """
+        The endpoint a resource lives on.
+
+        Unknown ids (created before a restart, or on another instance) are
+        looked up by running probe on each endpoint until one does not raise.
+        Falls back to the primary so the caller gets that endpoint's 404.
+        """
+        if len(self.endpoints) == 1:
+            return self.primary
+        with self._lock:
+            endpoint = self._pins.get(resource_id)
+        if endpoint:
+            return endpoint
+
+        for endpoint in self.endpoints:
+            if endpoint.breaker.state == "open":
+                continue
+            with use_endpoint(endpoint):
+                try:
+                    probe()
+                except Exception:
+                    continue
+            self.pin(resource_id, endpoint)
+            return endpoint
+        return self.primary
+
+    def record(self, endpoint: ProjectEndpoint, seconds: float, failed: bool) -> None:
+        endpoint.observe(seconds, failed)
+        if not failed:
+            endpoint.breaker.record_success()
+        elif endpoint.breaker.record_failure():
+            self.metrics.counter(f"endpoints.{endpoint.name}.breaker_trips").inc()
+            logger.warning("Circuit breaker opened for endpoint %s after %s failures",
+                           endpoint.name, endpoint.breaker.failures)
+        if endpoint.latency_ms is not None:
+            self.metrics.gauge(f"endpoints.{endpoint.name}.latency_ms").set(endpoint.latency_ms)
+
+    def call(self, operation: Callable[[], T], home: Optional[ProjectEndpoint] = None) -> T:
+        """
+        Run operation on the home endpoint, or on the best endpoint with failover.
+
+        Only transient endpoint failures (connection errors, 408, 429, 5xx)
+        before the operation commits move a new conversation to the next
+        endpoint; any other error is raised straight away. When every
+        attempt failed over, the last error is raised if only one endpoint
+        was tried, and EndpointUnavailable otherwise or when every
+        candidate's breaker is open.
+        """
+        candidates = [home] if home else self.ranked()
+        last_error: Optional[Exception] = None
+        attempts = 0
+        for endpoint in candidates:
+            if not endpoint.breaker.allow():
+                continue
+            if last_error is not None:
+                self.metrics.counter("endpoints.failovers").inc()
+                logger.warning("Failing over to endpoint %s: %s", endpoint.name, last_error)
+
+            attempts += 1
+            attempt = _Attempt(self.clock)
+            token = _attempt.set(attempt)
+            with use_endpoint(endpoint):
+                try:
+                    result = operation()
+                except Exception as e:
+                    failed = is_endpoint_failure(e)
+                    self.record(endpoint, attempt.seconds(), failed)
+                    if not failed or home or attempt.committed:
+                        raise
+                    last_error = e
+                    continue
+                finally:
+                    _attempt.reset(token)
+            self.record(endpoint, attempt.seconds(), False)
+            return result
+
+        # Without an alternative, the endpoint's own error says more than "unavailable"
+        if attempts == 1 and last_error is not None:
+            raise last_error
+
+        retry_after = min(endpoint.breaker.retry_after() for endpoint in candidates)
+        raise EndpointUnavailable(
+            f"No healthy endpoint among {', '.join(endpoint.name for endpoint in candidates)}",
+            retry_after) from last_error
+
+    def snapshot(self) -> List[dict]:
+        return [endpoint.to_dict() for endpoint in self.endpoints]
@@ -0,0 +1,255 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+"""
+Bulk upload of documents to the agents files API and a vector store.
+
+Each file is hashed in fixed-size chunks and deduplicated against a local
+manifest (content hash -> file id), so uploading the same document again
+costs no upstream calls. New files are uploaded on a bounded thread pool
+straight from their request streams, without extra copies, then attached to
+the vector store with batch ingestion calls of up to batch_size files each.
+
+Any worker on the instance may upload, so the manifest is shared through its
+file: lookups pick up records other workers saved, and a save merges this
+worker's records into the file under an advisory lock instead of
+overwriting it.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import IO, Any, Dict, List, Optional, Tuple
+
+from file_lock import file_lock
+from metrics import METRICS, MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+# Most file ids a single vector store file batch accepts
+MAX_BATCH_SIZE = 500
+
+
+def hash_stream(stream: IO[bytes], chunk_size: int = CHUNK_SIZE) -> Tuple[str, int]:
+    """SHA-256 and size of a stream, read in chunks and rewound afterwards"""
+    digest = hashlib.sha256()
+    size = 0
+    start = stream.tell()
+    for chunk in iter(lambda: stream.read(chunk_size), b""):
+        digest.update(chunk)
+        size += len(chunk)
+    stream.seek(start)
+    return digest.hexdigest(), size
+
+
+class UploadManifest:
+    """Content hash -> uploaded file record, persisted as JSON shared by all workers"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._records: Dict[str, Dict[str, Any]] = {}
+        self._loaded_mtime: Optional[int] = None
+        self._refresh()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def _read(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _refresh(self) -> None:
+        """Merge in records other workers saved since the file was last read"""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._loaded_mtime:
+            return
+        records = self._read()
+        with self._lock:
+            self._merge(records)
+            self._loaded_mtime = mtime
+
+    def _merge(self, records: Dict[str, Dict[str, Any]]) -> None:
+        # Records are only ever added to, so a union loses nothing
+        for sha256, record in records.items():
+            mine = self._records.setdefault(sha256, record)
+            if mine is not record:
+                for vector_store_id in record.get("vector_store_ids", []):
+                    if vector_store_id not in mine["vector_store_ids"]:
+                        mine["vector_store_ids"].append(vector_store_id)
+
+    def get(self, sha256: str) -> Optional[Dict[str, Any]]:
+        self._refresh()
+        with self._lock:
+            record = self._records.get(sha256)
+            return dict(record) if record else None
+
+    def put(self, sha256: str, record: Dict[str, Any]) -> None:
+        with self._lock:
+            self._records[sha256] = record
+
+    def add_vector_store(self, file_ids: List[str], vector_store_id: str) -> None:
+        """Record that files were attached to a vector store"""
+        attached = set(file_ids)
+        self._refresh()
+        with self._lock:
+            for record in self._records.values():
+                if record["file_id"] in attached and vector_store_id not in record["vector_store_ids"]:
+                    record["vector_store_ids"].append(vector_store_id)
+
+    def save(self) -> None:
+        """Merge this worker's records into the file and write it atomically"""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with file_lock(f"{self.path}.lock"):
+            records = self._read()
+            with self._lock:
+                self._merge(records)
+                payload = json.dumps(self._records)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(payload)
+            os.replace(tmp_path, self.path)
+            self._loaded_mtime = os.stat(self.path).st_mtime_ns
+
+
+class FileIngestor:
+    """Uploads files with dedupe and attaches them to a vector store in batches"""
+
+    def __init__(
+        self,
+        agents_client: Any,
+        manifest: UploadManifest,
+        max_concurrency: int = 4,
+        batch_size: int = 100,
+        poll_interval_seconds: float = 1.0,
+        metrics: MetricsRegistry = METRICS
+    ):
+        self.agents_client = agents_client
+        self.manifest = manifest
+        self.max_concurrency = max_concurrency
+        self.batch_size = min(batch_size, MAX_BATCH_SIZE)
+        self.poll_interval_seconds = poll_interval_seconds
+        self.metrics = metrics
+
+    def ingest(self, files: List[Tuple[str, IO[bytes]]], vector_store_id: Optional[str] = None,
+               timeout_seconds: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Upload (filename, stream) pairs and attach them to a vector store.
+
+        Returns per-file results in request order, aggregate throughput and
+        the status of each ingestion batch.
+        """
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_concurrency,
+                                thread_name_prefix="file-upload") as executor:
+            results = list(executor.map(lambda item: self._upload_one(*item), files))
+            self.manifest.save()
+
+            ingestion = None
+            if vector_store_id:
+                pending = list(dict.fromkeys(
+                    result["file_id"] for result in results
+                    if result["status"] != "failed"
+                    and vector_store_id not in result["vector_store_ids"]))
+                batches = [pending[i:i + self.batch_size]
+                           for i in range(0, len(pending), self.batch_size)]
+                ingestion = {
+                    "vector_store_id": vector_store_id,
+                    "batches": list(executor.map(
+                        lambda batch: self._ingest_batch(vector_store_id, batch, timeout_seconds),
+                        batches)),
+                }
+                self.manifest.save()
+
+        for result in results:
+            result.pop("vector_store_ids", None)
+
+        seconds = time.perf_counter() - started
+        uploaded_bytes = sum(result["bytes"] for result in results if result["status"] == "uploaded")
+        report = {
+            "files": results,
+            "summary": {
+                "files": len(results),
+                "uploaded": sum(result["status"] == "uploaded" for result in results),
+                "duplicates": sum(result["status"] == "duplicate" for result in results),
+                "failed": sum(result["status"] == "failed" for result in results),
+                "bytes": sum(result["bytes"] for result in results),
+                "uploaded_bytes": uploaded_bytes,
+                "seconds": round(seconds, 3),
+                "mb_per_second": _mb_per_second(uploaded_bytes, seconds),
+            },
+        }
+        if ingestion:
+            report["ingestion"] = ingestion
+        return report
+
+    def _upload_one(self, filename: str, stream: IO[bytes]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        sha256, size = hash_stream(stream)
+        result: Dict[str, Any] = {"filename": filename, "bytes": size, "sha256": sha256}
+
+        record = self.manifest.get(sha256)
+        if record:
+            self.metrics.counter("upload.duplicates").inc()
+            result.update(file_id=record["file_id"], status="duplicate",
+                          vector_store_ids=record.get("vector_store_ids", []))
+            return result
+
+        try:
+            file_info = self.agents_client.files.upload(
+                file=(filename, stream), purpose="assistants")
+        except Exception as e:
+            self.metrics.counter("upload.failures").inc()
+            logger.error("Failed to upload %s: %s", filename, e)
+            result.update(file_id=None, status="failed", error=str(e)[:200])
+            return result
+
+        seconds = time.perf_counter() - started
+        self.manifest.put(sha256, {"file_id": file_info.id, "filename": filename,
+                                   "bytes": size, "vector_store_ids": []})
+        self.metrics.counter("upload.files").inc()
+        self.metrics.counter("upload.bytes").inc(size)
+        self.metrics.histogram("upload.file_ms").observe(seconds * 1000)
+        result.update(file_id=file_info.id, status="uploaded", seconds=round(seconds, 3),
+                      mb_per_second=_mb_per_second(size, seconds), vector_store_ids=[])
+        return result
+
+    def _ingest_batch(self, vector_store_id: str, file_ids: List[str],
+                      timeout_seconds: Optional[float]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            batch = self.agents_client.vector_store_file_batches.create_and_poll(
+                vector_store_id=vector_store_id, file_ids=file_ids,
+                polling_interval=self.poll_interval_seconds, timeout=timeout_seconds)
+        except Exception as e:
+            logger.error("Vector store batch of %s files failed: %s", len(file_ids), e)
+            return {"files": len(file_ids), "status": "failed", "error": str(e)[:200]}
+
+        self.metrics.histogram("upload.batch_ms").observe((time.perf_counter() - started) * 1000)
+        status = str(getattr(batch.status, "value", batch.status))
+        if status == "completed":
+            self.manifest.add_vector_store(file_ids, vector_store_id)
+        counts = getattr(batch, "file_counts", None)
+        return {
+            "id": batch.id,
+            "files": len(file_ids),
+            "status": status,
+            "file_counts": counts.as_dict() if hasattr(counts, "as_dict") else counts,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+
+
+def _mb_per_second(size: int, seconds: float) -> float:
+    return round(size / (1024 * 1024) / seconds, 3) if seconds > 0 else 0.0
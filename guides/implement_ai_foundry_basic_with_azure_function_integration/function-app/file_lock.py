@@ -0,0 +1,54 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+"""
+Advisory locks on local files, shared by every worker on an instance.
+
+The Functions host may run several Python worker processes side by side,
+and any of them can serve a request that writes to the local index or
+upload manifest. A threading.Lock only serialises one process; these locks
+serialise all of them. Linux hosts use flock(2), Windows (local Core Tools)
+locks the first byte of the lock file.
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Lock file path -> in-process lock; flock alone does not exclude threads
+# of the same process on every platform
+_thread_locks: Dict[str, threading.Lock] = {}
+_thread_locks_guard = threading.Lock()
+
+
+def _thread_lock(path: str) -> threading.Lock:
+    with _thread_locks_guard:
+        return _thread_locks.setdefault(os.path.abspath(path), threading.Lock())
+
+
+@contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    """Hold an exclusive lock on path (created if missing) for the enclosed block"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with _thread_lock(path), open(path, "a+b") as f:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
@@ -5,41 +5,112 @@
 import os
 import json
 import logging
+import time
+import atexit
+import io
+import itertools
+import mimetypes
+import tempfile
+from contextlib import ExitStack, nullcontext
 import azure.functions as func
+from urllib.parse import urlparse
 from azure.identity import DefaultAzureCredential
-from azure.core.exceptions import AzureError
-from azure.ai.inference import ChatCompletionsClient
+from azure.core.pipeline.policies import HeadersPolicy
+from azure.core.exceptions import AzureError, ResourceNotFoundError
+from azure.ai.inference import ChatCompletionsClient, EmbeddingsClient
 from azure.ai.projects import AIProjectClient
-from typing import List, Dict, Optional, Tuple, Any
+from azure.ai.agents.models import (
+    AgentThreadCreationOptions, FileSearchToolResource, ThreadMessageOptions, ToolOutput, ToolResources)
+from vector_index import VectorIndex, parse_vector
+from http_transport import (
+    sdk_client_options, connection_stats, count_upstream_calls, cassette_mode)
+from metrics import METRICS, timed
+from deadline import Deadline, DeadlineExceeded, request_deadline, current_deadline
+from tool_registry import TOOLS
+from agent_registry import AgentRegistry, AgentNotFound
+from file_ingestion import FileIngestor, UploadManifest
+from artifact_cache import ArtifactCache, CachedArtifact
+from endpoint_pool import (
+    CircuitBreaker, EndpointPool, EndpointUnavailable, ProjectEndpoint, commit_endpoint,
+    current_endpoint, is_endpoint_failure, parse_endpoints, use_endpoint)
+from compression import CompressionPolicy
+from response_snapshots import ResponseSnapshots, not_modified
+from idempotency import (
+    IDEMPOTENCY_HEADER, MAX_KEY_LENGTH, REPLAYED_HEADER, IdempotencyStore, IdempotentRequest,
+    load_backend, request_fingerprint)
+from structured_logging import CORRELATION_HEADER, bind_request, configure_logging, debug_sampled
+from run_profile import fetch_run_profile
+from resource_sweeper import ResourceSweeper, merge_reports, thread_metadata
+from thread_locks import ThreadBusy, ThreadLockManager
+from thread_compaction import (
+    CompactionQueue, ThreadCompactor, message_text, resolve_thread, transcript_text)
+from transcript_import import TranscriptImporter, parse_transcript
+from token_budget import TokenBudget, parse_token_budget, record_budget_hit
+from prewarmed_threads import PrewarmedThreadPool
+from typing import Iterable, Iterator, List, Dict, Optional, Tuple, Any
 from datetime import datetime, timezone
 
 app = func.FunctionApp()
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Global agent instance (created once and reused)
 _agent_instance = None
 _project_client = None
+_embeddings_client = None
+_vector_index = None
+_thread_pool = None
+_agent_registry = None
+_upload_manifest = None
+_vector_store_id = None
+_artifact_cache = None
+_endpoint_pool = None
+_idempotency_store = None
+_thread_locks = None
+_compaction_queue = None
+_compression_policy = None
+_response_snapshots = None
+
+AVAILABLE_ACTIONS = ["create", "chat", "list", "delete",
+                     "code-interpreter", "index", "search", "sweep", "upload", "file", "import",
+                     "run-steps"]
+IDEMPOTENT_ACTIONS = ("chat", "code-interpreter")
+DEFAULT_VECTOR_STORE_NAME = "azure-function-documents"
+
+
+def is_local_emulator_endpoint(endpoint: str) -> bool:
+    """Check whether an endpoint points at a plain-http loopback emulator"""
+    parsed = urlparse(endpoint)
+    return parsed.scheme == "http" and parsed.hostname in ("localhost", "127.0.0.1", "::1")
 
 
 def get_project_client() -> AIProjectClient:
-    """Initialize Azure AI Project Client"""
+    """Initialize Azure AI Project Client for the endpoint serving this request"""
     global _project_client
 
+    # Requests routed to a secondary endpoint use that endpoint's client
+    endpoint = current_endpoint()
+    if endpoint and not endpoint.primary:
+        return endpoint.get_client(build_project_client)
+
     if _project_client:
         return _project_client
 
-    try:
-        credential = DefaultAzureCredential()
+    # Get endpoint from environment
+    endpoint = os.getenv("AI_FOUNDRY_ENDPOINT")
+    if not endpoint:
+        raise ValueError(
+            "AI_FOUNDRY_ENDPOINT environment variable is not set")
 
-        # Get endpoint from environment
-        endpoint = os.getenv("AI_FOUNDRY_ENDPOINT")
-        if not endpoint:
-            raise ValueError(
-                "AI_FOUNDRY_ENDPOINT environment variable is not set")
+    _project_client = build_project_client(endpoint)
+    return _project_client
 
+
+def build_project_client(endpoint: str) -> AIProjectClient:
+    """Build an AIProjectClient for an account or project endpoint"""
+    try:
         # Build project endpoint in the correct format
         project_name = os.getenv("AI_FOUNDRY_PROJECT_NAME", "ai-functions")
 
@@ -50,28 +121,332 @@ def get_project_client() -> AIProjectClient:
         else:
             project_endpoint = endpoint
 
+        # A plain-http loopback endpoint is the local agents emulator
+        # (tests/mock_foundry/server.py), which skips auth, and a replayed
+        # cassette never reaches the service. A fixed header replaces the
+        # bearer token policy there, so the credential is never asked for a token
+        client_options = {}
+        if is_local_emulator_endpoint(project_endpoint) or cassette_mode() == "replay":
+            client_options["authentication_policy"] = HeadersPolicy(
+                {"Authorization": "Bearer local-emulator"})
+
         # Create AI Project Client
-        _project_client = AIProjectClient(
+        project_client = AIProjectClient(
             endpoint=project_endpoint,
-            credential=credential
+            credential=DefaultAzureCredential(),
+            **client_options,
+            **sdk_client_options()
         )
 
-        logger.info(
-            f"AI Project Client initialized for endpoint: {project_endpoint}")
-        return _project_client
+        logger.info("AI Project Client initialized for endpoint: %s", project_endpoint)
+        return project_client
 
     except Exception as e:
-        logger.error(f"Failed to initialize AI Project Client: {str(e)}")
+        logger.error("Failed to initialize AI Project Client: %s", e)
         raise
 
 
+def get_endpoint_pool() -> EndpointPool:
+    """Get the primary endpoint plus any failover endpoints in AI_FOUNDRY_ENDPOINTS"""
+    global _endpoint_pool
+
+    if _endpoint_pool:
+        return _endpoint_pool
+
+    failures = int(os.getenv("ENDPOINT_BREAKER_FAILURES", "5"))
+    reset_seconds = float(os.getenv("ENDPOINT_BREAKER_RESET_SECONDS", "30"))
+    endpoints = parse_endpoints(os.getenv("AI_FOUNDRY_ENDPOINT", ""),
+                                os.getenv("AI_FOUNDRY_ENDPOINTS", ""))
+    for endpoint in endpoints:
+        endpoint.breaker = CircuitBreaker(failures, reset_seconds)
+    _endpoint_pool = EndpointPool(endpoints)
+    return _endpoint_pool
+
+
+def get_idempotency_store() -> IdempotencyStore:
+    """Get the store of Idempotency-Key records, backed by IDEMPOTENCY_BACKEND"""
+    global _idempotency_store
+
+    if not _idempotency_store:
+        backend = load_backend(os.getenv("IDEMPOTENCY_BACKEND", "memory"),
+                               int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000")))
+        _idempotency_store = IdempotencyStore(
+            backend, float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400")))
+    return _idempotency_store
+
+
+def get_thread_locks() -> ThreadLockManager:
+    """Get the queue that serializes concurrent turns on the same thread"""
+    global _thread_locks
+
+    if not _thread_locks:
+        _thread_locks = ThreadLockManager(
+            max_depth=int(os.getenv("THREAD_QUEUE_MAX_DEPTH", "8")),
+            wait_seconds=float(os.getenv("THREAD_QUEUE_WAIT_SECONDS", "60"))
+        )
+    return _thread_locks
+
+
+def get_compaction_queue() -> CompactionQueue:
+    """Get the background queue that compacts long threads between turns"""
+    global _compaction_queue
+
+    if not _compaction_queue:
+        _compaction_queue = CompactionQueue(
+            max_workers=int(os.getenv("THREAD_COMPACTION_WORKERS", "1")))
+        atexit.register(_compaction_queue.shutdown)
+    return _compaction_queue
+
+
+def get_compression_policy() -> CompressionPolicy:
+    """Get the response compression settings"""
+    global _compression_policy
+
+    if not _compression_policy:
+        _compression_policy = CompressionPolicy.from_env()
+    return _compression_policy
+
+
+def compress_response(req: func.HttpRequest, response: func.HttpResponse,
+                      route: str) -> func.HttpResponse:
+    """Compress a route's response with the encoding negotiated from Accept-Encoding"""
+    return get_compression_policy().apply(response, req.headers.get("Accept-Encoding"), route)
+
+
+def conditional_response(req: func.HttpRequest, response: func.HttpResponse,
+                         route: str) -> func.HttpResponse:
+    """A 304 when If-None-Match names the representation this client would get, else compress"""
+    policy = get_compression_policy()
+    accept_encoding = req.headers.get("Accept-Encoding")
+    if policy.varies(response, route):
+        response.headers["Vary"] = "Accept-Encoding"
+    response = not_modified(req.headers.get("If-None-Match"), response,
+                            encoding=policy.encoding_for(response, accept_encoding, route))
+    return policy.apply(response, accept_encoding, route)
+
+
+def get_response_snapshots() -> ResponseSnapshots:
+    """Get the cached list and health responses served to pollers"""
+    global _response_snapshots
+
+    if not _response_snapshots:
+        _response_snapshots = ResponseSnapshots(
+            ttl_seconds=float(os.getenv("SNAPSHOT_TTL_SECONDS", "10")),
+            max_entries=int(os.getenv("SNAPSHOT_MAX_ENTRIES", "256")))
+    return _response_snapshots
+
+
+def invalidate_agent_snapshots() -> None:
+    """Drop the list and health snapshots after the app changes the agent set"""
+    get_response_snapshots().invalidate(("list:", "health"))
+
+
+def get_thread_pool() -> Optional[PrewarmedThreadPool]:
+    """Get the pre-created thread pool, or None when it is disabled"""
+    global _thread_pool
+
+    # Pooled threads live on the primary endpoint
+    endpoint = current_endpoint()
+    if endpoint and not endpoint.primary:
+        return None
+
+    if _thread_pool:
+        return _thread_pool
+
+    target_size = int(os.getenv("THREAD_POOL_TARGET_SIZE", "0"))
+    if target_size <= 0:
+        return None
+
+    agents_client = get_project_client().agents
+    _thread_pool = PrewarmedThreadPool(
+        create_thread=lambda: agents_client.threads.create(metadata=new_thread_metadata()).id,
+        delete_thread=lambda thread_id: agents_client.threads.delete(thread_id),
+        target_size=target_size,
+        max_age_seconds=float(os.getenv("THREAD_POOL_MAX_AGE_SECONDS", "3600")),
+        refill_interval_seconds=float(
+            os.getenv("THREAD_POOL_REFILL_INTERVAL_SECONDS", "5"))
+    )
+    _thread_pool.start()
+
+    # Delete unused pooled threads when the worker shuts down
+    atexit.register(_thread_pool.shutdown)
+
+    logger.info("Thread pool started with target size %s", target_size)
+    return _thread_pool
+
+
+def get_agent_registry() -> AgentRegistry:
+    """Get the registry of agents addressable by chat's agent_id or agent_name"""
+    global _agent_registry
+
+    endpoint = current_endpoint()
+    if endpoint and not endpoint.primary:
+        if not endpoint.agent_registry:
+            endpoint.agent_registry = build_agent_registry(get_project_client().agents)
+        return endpoint.agent_registry
+
+    if not _agent_registry:
+        _agent_registry = build_agent_registry(get_project_client().agents)
+    return _agent_registry
+
+
+def build_agent_registry(agents_client: Any) -> AgentRegistry:
+    """Agent registry over one endpoint's agents"""
+    return AgentRegistry(
+        get_agent=agents_client.get_agent,
+        find_agent=lambda name: next(
+            (agent for agent in agents_client.list_agents(limit=MAX_AGENT_PAGE_SIZE)
+             if agent.name == name), None),
+        max_size=int(os.getenv("AGENT_REGISTRY_MAX_SIZE", "128")),
+        ttl_seconds=float(os.getenv("AGENT_REGISTRY_TTL_SECONDS", "300"))
+    )
+
+
+def get_file_ingestor() -> FileIngestor:
+    """Build the file uploader over the instance's shared upload manifest"""
+    global _upload_manifest
+
+    if not _upload_manifest:
+        _upload_manifest = UploadManifest(os.getenv("UPLOAD_MANIFEST_PATH", os.path.join(
+            tempfile.gettempdir(), "upload-manifest.json")))
+
+    return FileIngestor(
+        get_project_client().agents,
+        _upload_manifest,
+        max_concurrency=int(os.getenv("UPLOAD_MAX_CONCURRENCY", "4")),
+        batch_size=int(os.getenv("UPLOAD_BATCH_SIZE", "100")),
+        poll_interval_seconds=float(os.getenv("UPLOAD_POLL_INTERVAL_SECONDS", "1"))
+    )
+
+
+def get_default_vector_store_id() -> str:
+    """
+    Get the vector store behind the default agent's file_search tool.
+
+    Uses VECTOR_STORE_ID when set; otherwise finds or creates the app's
+    named store and attaches it to the default agent.
+    """
+    global _vector_store_id
+
+    if _vector_store_id:
+        return _vector_store_id
+
+    configured = os.getenv("VECTOR_STORE_ID")
+    if configured:
+        _vector_store_id = configured
+        return _vector_store_id
+
+    agents_client = get_project_client().agents
+    store = next((store for store in agents_client.vector_stores.list(limit=100)
+                  if store.name == DEFAULT_VECTOR_STORE_NAME), None)
+    if not store:
+        store = agents_client.vector_stores.create(name=DEFAULT_VECTOR_STORE_NAME)
+        logger.info("Created vector store: %s", store.id)
+
+    agent = get_or_create_agent()
+    agents_client.update_agent(agent.id, tools=agent.tools, tool_resources=ToolResources(
+        file_search=FileSearchToolResource(vector_store_ids=[store.id])))
+
+    _vector_store_id = store.id
+    return _vector_store_id
+
+
+def get_artifact_cache() -> ArtifactCache:
+    """Get the cache of recently downloaded agent files"""
+    global _artifact_cache
+
+    if not _artifact_cache:
+        _artifact_cache = ArtifactCache(
+            max_bytes=int(os.getenv("FILE_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+            max_item_bytes=int(os.getenv("FILE_CACHE_MAX_ITEM_BYTES", str(8 * 1024 * 1024)))
+        )
+    return _artifact_cache
+
+
+def get_resource_sweeper(dry_run: bool) -> ResourceSweeper:
+    """Build a sweeper for leaked temporary agents and idle threads from settings"""
+    return ResourceSweeper(
+        get_project_client().agents,
+        agent_max_age_seconds=float(os.getenv("SWEEPER_AGENT_MAX_AGE_SECONDS", "900")),
+        thread_idle_seconds=float(os.getenv("SWEEPER_THREAD_IDLE_SECONDS", "86400")),
+        max_concurrency=int(os.getenv("SWEEPER_MAX_CONCURRENCY", "4")),
+        deletes_per_second=float(os.getenv("SWEEPER_DELETES_PER_SECOND", "5")),
+        batch_size=int(os.getenv("SWEEPER_BATCH_SIZE", "50")),
+        max_scan=int(os.getenv("SWEEPER_MAX_SCAN", "5000")),
+        dry_run=dry_run
+    )
+
+
+def sweep_endpoints(dry_run: bool) -> Dict[str, Any]:
+    """Sweep every configured endpoint, since failover endpoints leak resources too"""
+    reports = {}
+    for endpoint in get_endpoint_pool().endpoints:
+        with use_endpoint(endpoint):
+            try:
+                reports[endpoint.name] = get_resource_sweeper(dry_run).sweep()
+            except Exception as e:
+                logger.error("Sweep of endpoint %s failed: %s", endpoint.name, e)
+                reports[endpoint.name] = {"dry_run": dry_run, "agents": {"error": str(e)[:200]},
+                                          "threads": {"error": str(e)[:200]}}
+    return merge_reports(reports)
+
+
+def get_thread_compactor(agents_client: Any, agent_id: str) -> Optional[ThreadCompactor]:
+    """Build the thread compactor from settings, or None when compaction is disabled"""
+    threshold = int(os.getenv("THREAD_COMPACTION_PROMPT_TOKENS", "0"))
+    if threshold <= 0:
+        return None
+
+    return ThreadCompactor(
+        agents_client,
+        summarize=lambda messages: summarize_messages(agents_client, agent_id, messages),
+        prompt_token_threshold=threshold,
+        keep_turns=int(os.getenv("THREAD_COMPACTION_KEEP_TURNS", "4")),
+        max_messages=int(os.getenv("THREAD_COMPACTION_MAX_MESSAGES", "200")),
+        thread_metadata=new_thread_metadata
+    )
+
+
+def get_transcript_importer(agents_client: Any) -> TranscriptImporter:
+    """Build an importer whose threads are tagged and pinned like chat threads"""
+    return TranscriptImporter(
+        agents_client,
+        batch_size=int(os.getenv("IMPORT_BATCH_SIZE", "32")),
+        thread_metadata=new_thread_metadata,
+        on_thread_created=keep_on_endpoint
+    )
+
+
 def get_or_create_agent() -> Any:
-    """Get existing agent or create a new one"""
+    """Get existing agent or create a new one on the endpoint serving this request"""
     global _agent_instance
 
-    if _agent_instance:
-        return _agent_instance
+    # Each endpoint has its own copy of the default agent
+    endpoint = current_endpoint()
+    if endpoint and not endpoint.primary:
+        if not endpoint.agent:
+            endpoint.agent = find_or_create_default_agent()
+        return endpoint.agent
+
+    if not _agent_instance:
+        _agent_instance = find_or_create_default_agent()
+    return _agent_instance
+
+
+def default_function_tools() -> List[Dict[str, Any]]:
+    """
+    Local function tools for the default agent, when DEFAULT_AGENT_FUNCTION_TOOLS is true.
+
+    Off by default: a run that calls one stops in requires_action until this
+    app submits the output, so the agent would depend on it being reachable.
+    """
+    if os.getenv("DEFAULT_AGENT_FUNCTION_TOOLS", "false").lower() != "true":
+        return []
+    return TOOLS.definitions()
 
+
+def find_or_create_default_agent() -> Any:
+    """Find the default agent by name, creating it when it does not exist"""
     try:
         project_client = get_project_client()
         agents_client = project_client.agents
@@ -82,8 +457,7 @@ def get_or_create_agent() -> Any:
             agents = agents_client.list_agents()
             for agent in agents:
                 if agent.name == agent_name:
-                    logger.info(f"Using existing agent: {agent.id}")
-                    _agent_instance = agent
+                    logger.info("Using existing agent: %s", agent.id)
                     return agent
         except:
             pass  # No existing agent found, create new one
@@ -96,7 +470,7 @@ def get_or_create_agent() -> Any:
         file_search_tool = {"type": "file_search"}
 
         # Create the agent
-        _agent_instance = agents_client.create_agent(
+        agent = agents_client.create_agent(
             model=os.getenv("MODEL_DEPLOYMENT_NAME", "gpt-4"),
             name=agent_name,
             instructions="""You are an intelligent AI assistant deployed through Azure AI Projects.
@@ -107,107 +481,499 @@ def get_or_create_agent() -> Any:
             - Providing helpful, accurate, and concise responses
 
             You have access to code interpreter and file search capabilities.""",
-            tools=[code_interpreter_tool, file_search_tool]
+            tools=[code_interpreter_tool, file_search_tool] + default_function_tools()
         )
 
-        logger.info(f"Created new agent: {_agent_instance.id}")
-        return _agent_instance
+        logger.info("Created new agent: %s", agent.id)
+        invalidate_agent_snapshots()
+        return agent
 
     except Exception as e:
-        logger.error(f"Failed to create agent: {str(e)}")
+        logger.error("Failed to create agent: %s", e)
         raise
 
 
-def run_agent_conversation(agent: Any, user_message: str, thread_id: Optional[str] = None) -> Dict:
-    """Run a conversation with the agent"""
+def start_run(agents_client: Any, agent_id: str, content: str,
+              thread_id: Optional[str] = None, budget: Optional[TokenBudget] = None) -> Any:
+    """Post a user message and start a run in a single upstream call"""
+    message = ThreadMessageOptions(role="user", content=content)
+    options = budget.run_options() if budget else {}
+
+    if thread_id:
+        return agents_client.runs.create(
+            thread_id=thread_id,
+            agent_id=agent_id,
+            additional_messages=[message],
+            **options
+        )
+
+    # New conversation: create the thread, seed the message and start the run together
+    return agents_client.create_thread_and_run(
+        agent_id=agent_id,
+        thread=AgentThreadCreationOptions(messages=[message], metadata=new_thread_metadata()),
+        **options
+    )
+
+
+def keep_on_endpoint(thread_id: str) -> None:
+    """
+    Bind the request to the endpoint its thread now lives on.
+
+    Failing over once a run exists would start a second, paid run on a new
+    thread and strand the first, so later polling errors are raised instead.
+    """
+    commit_endpoint()
+    get_endpoint_pool().pin(thread_id, current_endpoint())
+
+
+def new_thread_metadata() -> Dict[str, str]:
+    """Ownership and lease metadata for threads the app creates, read by the sweeper"""
+    return thread_metadata(float(os.getenv("THREAD_LEASE_SECONDS", "86400")))
+
+
+def wait_for_run(agents_client: Any, thread_id: str, run: Any,
+                 pending_statuses: Tuple[str, ...] = ("queued", "in_progress", "requires_action"),
+                 cancel_on_deadline: bool = True) -> Any:
+    """
+    Poll a run until it leaves the pending statuses.
+
+    Polls back off from 50 ms to RUN_POLL_INTERVAL_SECONDS. Function tool
+    calls are answered from the local tool registry. If the request
+    deadline runs out first, DeadlineExceeded is raised with the run's last
+    known state, and the upstream run is cancelled unless a retry may
+    still attach to it (cancel_on_deadline=False).
+    """
+    deadline = current_deadline()
+    max_interval = float(os.getenv("RUN_POLL_INTERVAL_SECONDS", "0.5"))
+    interval = min(0.05, max_interval)
+    started = time.monotonic()
+
+    while run.status in pending_statuses:
+        if deadline and deadline.expired:
+            if cancel_on_deadline:
+                cancel_run(agents_client, thread_id, run.id, time.monotonic() - started)
+            raise DeadlineExceeded("run", {
+                "thread_id": thread_id,
+                "run_id": run.id,
+                "run_status": run.status,
+            })
+
+        if run.status == "requires_action" and getattr(run, "required_action", None):
+            run = submit_tool_outputs(agents_client, thread_id, run)
+            continue
+
+        time.sleep(min(interval, deadline.remaining()) if deadline else interval)
+        interval = min(interval * 2, max_interval)
+        run = agents_client.runs.get(thread_id=thread_id, run_id=run.id)
+        if debug_sampled(logger):
+            logger.debug("Polled run %s on thread %s: %s after %.0f ms",
+                         run.id, thread_id, run.status, (time.monotonic() - started) * 1000)
+
+    return run
+
+
+def submit_tool_outputs(agents_client: Any, thread_id: str, run: Any) -> Any:
+    """Run the requested function tools locally and submit every output in one batch"""
+    deadline = current_deadline()
+    requested = run.required_action.submit_tool_outputs.tool_calls
+    tool_calls = [call for call in requested if getattr(call, "type", "function") == "function"]
+    if not tool_calls:
+        # The service rejects an empty submission and the run would sit in
+        # requires_action until the deadline, so give up on it now
+        types = sorted({str(getattr(call, "type", None)) for call in requested})
+        cancel_run(agents_client, thread_id, run.id, 0.0,
+                   reason=f"no answerable tool calls ({', '.join(types) or 'none requested'})")
+        raise RuntimeError(f"Run {run.id} requires tool calls this app cannot answer "
+                           f"({', '.join(types) or 'none requested'}); the run was cancelled")
+
+    outputs = TOOLS.execute(tool_calls, deadline.remaining() if deadline else None)
+    logger.info("Submitting %s tool outputs for run %s", len(outputs), run.id)
+
+    return agents_client.runs.submit_tool_outputs(
+        thread_id=thread_id,
+        run_id=run.id,
+        tool_outputs=[ToolOutput(**output) for output in outputs]
+    )
+
+
+def cancel_run(agents_client: Any, thread_id: str, run_id: str, wasted_seconds: float,
+               reason: str = "deadline exceeded") -> None:
+    """Cancel a run nobody is waiting for, so it stops consuming model capacity"""
+    METRICS.counter("runs.cancelled").inc()
+    METRICS.counter("runs.wasted_seconds").inc(wasted_seconds)
+
+    try:
+        agents_client.runs.cancel(thread_id=thread_id, run_id=run_id)
+        logger.warning("Cancelled run %s after %.1fs: %s", run_id, wasted_seconds, reason)
+    except Exception as e:
+        logger.error("Failed to cancel run %s: %s", run_id, e)
+
+
+COMPACTION_PROMPT = """Summarize the conversation below for your own future reference.
+Keep every fact, decision, name, number and open question the user may refer
+back to. Reply with the summary only."""
+
+
+def summarize_messages(agents_client: Any, agent_id: str, messages: List[Any]) -> str:
+    """
+    Ask the agent to summarize messages, returning the summary text.
+
+    The run happens on a scratch thread, deleted afterwards, so neither the
+    prompt nor the summary ends up in the conversation being compacted.
+    """
+    run = start_run(agents_client, agent_id, f"{COMPACTION_PROMPT}\n\n{transcript_text(messages)}")
+    scratch_thread_id = run.thread_id
+    try:
+        run = wait_for_run(agents_client, scratch_thread_id, run)
+        if run.status != "completed":
+            raise RuntimeError(f"Summary run {run.id} ended with status {run.status}")
+
+        for message in agents_client.messages.list(thread_id=scratch_thread_id, limit=1, order="desc"):
+            if message.role == "assistant":
+                return message_text(message)
+        raise RuntimeError(f"Summary run {run.id} produced no reply")
+    finally:
+        try:
+            agents_client.threads.delete(scratch_thread_id)
+        except Exception as e:
+            # Its lease metadata lets the sweeper reclaim it later
+            logger.warning("Failed to delete summary thread %s: %s", scratch_thread_id, e)
+
+
+def compact_between_turns(compactor: ThreadCompactor, thread_id: str) -> Optional[Dict]:
+    """
+    Compact a thread while holding it, so no turn lands on it mid-copy.
+
+    The compaction gets its own THREAD_COMPACTION_TIMEOUT_SECONDS deadline:
+    a summary run that never finishes is cancelled and the thread released,
+    instead of holding every later turn on the conversation.
+    """
+    deadline = Deadline(float(os.getenv("THREAD_COMPACTION_TIMEOUT_SECONDS", "120")))
+    with request_deadline(deadline), get_thread_locks().turn(thread_id):
+        return compactor.compact(thread_id)
+
+
+def conversation_result(agents_client: Any, agent: Any, run: Any) -> Dict:
+    """The chat response for a finished run: the latest assistant reply and usage"""
+    thread_id = run.thread_id
+
+    # Get messages from the thread
+    messages = agents_client.messages.list(thread_id=thread_id)
+
+    # Extract the latest assistant response
+    assistant_response = None
+    for msg in messages:
+        if msg.role == "assistant":
+            # Handle different content types
+            if hasattr(msg, 'content') and msg.content:
+                if isinstance(msg.content, list) and len(msg.content) > 0:
+                    content_item = msg.content[0]
+                    if hasattr(content_item, 'text'):
+                        assistant_response = content_item.text.value
+                elif isinstance(msg.content, str):
+                    assistant_response = msg.content
+            break
+
+    return {
+        "response": assistant_response or "No response generated",
+        "thread_id": thread_id,
+        "run_id": run.id,
+        "agent_id": agent.id,
+        "agent_name": agent.name,
+        "status": run.status,
+        "usage": {
+            "prompt_tokens": run.usage.prompt_tokens if hasattr(run, 'usage') and run.usage else 0,
+            "completion_tokens": run.usage.completion_tokens if hasattr(run, 'usage') and run.usage else 0,
+            "total_tokens": run.usage.total_tokens if hasattr(run, 'usage') and run.usage else 0,
+        }
+    }
+
+
+def run_agent_conversation(agent: Any, user_message: str, thread_id: Optional[str] = None,
+                           budget: Optional[TokenBudget] = None,
+                           idempotent: Optional[IdempotentRequest] = None) -> Dict:
+    """
+    Run a conversation with the agent.
+
+    With an idempotent request, the started run is recorded for retries to
+    attach to, and it is left running when the deadline runs out. A retry
+    whose request already started a run waits for that run instead.
+    """
     try:
         project_client = get_project_client()
         agents_client = project_client.agents
 
-        # Create or retrieve thread
+        if idempotent and idempotent.has_run:
+            return attach_conversation(agents_client, agent, thread_id, budget, idempotent)
+
+        # Retrieve the thread (following compactions), or lease a
+        # pre-created one for a new conversation when the pool is enabled
+        requested_thread_id = thread_id
+        deadline = current_deadline()
         if thread_id:
-            thread = agents_client.threads.get(thread_id)
-            logger.info(f"Using existing thread: {thread_id}")
+            thread_id = resolve_thread(agents_client, thread_id)
+            logger.info("Using existing thread: %s", thread_id)
+
+            # Concurrent turns on an existing thread wait for the active run
+            turn = get_thread_locks().turn(thread_id, deadline.remaining() if deadline else None)
         else:
-            thread = agents_client.threads.create()
-            logger.info(f"Created new thread: {thread.id}")
-
-        # Add user message to thread
-        message = agents_client.messages.create(
-            thread_id=thread.id,
-            role="user",
-            content=user_message
-        )
+            thread_pool = get_thread_pool()
+            thread_id = thread_pool.lease() if thread_pool else None
+            if thread_id:
+                logger.info("Leased pre-created thread: %s", thread_id)
+            turn = nullcontext()
+
+        with ExitStack() as held:
+            held.enter_context(turn)
+
+            # A compaction that finished while this turn waited moved the conversation
+            moved_to = get_compaction_queue().redirect(thread_id) if requested_thread_id else None
+            if moved_to:
+                logger.info("Thread %s was compacted into %s while waiting", thread_id, moved_to)
+                thread_id = moved_to
+                held.enter_context(get_thread_locks().turn(
+                    thread_id, deadline.remaining() if deadline else None))
+
+            # Add the user message and run the agent
+            if deadline:
+                deadline.check("start_run", thread_id=thread_id)
+            run = start_run(agents_client, agent.id, user_message, thread_id, budget)
+            thread_id = run.thread_id
+            logger.info("Started run %s on thread: %s", run.id, thread_id)
+            keep_on_endpoint(thread_id)
+            if idempotent:
+                idempotent.record_run(thread_id=thread_id, run_id=run.id, agent_id=agent.id,
+                                      endpoint=getattr(current_endpoint(), "name", None))
+
+            # Wait for completion
+            run = wait_for_run(agents_client, thread_id, run,
+                               ("queued", "in_progress", "requires_action"),
+                               cancel_on_deadline=idempotent is None)
+
+            return finish_conversation(agents_client, agent, run, requested_thread_id, budget)
 
-        # Run the agent
-        run = agents_client.runs.create(
-            thread_id=thread.id,
-            agent_id=agent.id
-        )
+    except Exception as e:
+        logger.error("Error in agent conversation: %s", e)
+        raise
 
-        # Wait for completion
-        while run.status in ["queued", "in_progress", "requires_action"]:
-            run = agents_client.runs.get(thread_id=thread.id, run_id=run.id)
-
-        # Get messages from the thread
-        messages = agents_client.messages.list(thread_id=thread.id)
-
-        # Extract the latest assistant response
-        assistant_response = None
-        for msg in messages:
-            if msg.role == "assistant":
-                # Handle different content types
-                if hasattr(msg, 'content') and msg.content:
-                    if isinstance(msg.content, list) and len(msg.content) > 0:
-                        content_item = msg.content[0]
-                        if hasattr(content_item, 'text'):
-                            assistant_response = content_item.text.value
-                    elif isinstance(msg.content, str):
-                        assistant_response = msg.content
-                break
-
-        return {
-            "response": assistant_response or "No response generated",
-            "thread_id": thread.id,
-            "run_id": run.id,
-            "agent_id": agent.id,
-            "agent_name": agent.name,
-            "status": run.status,
-            "usage": {
-                "prompt_tokens": run.usage.prompt_tokens if hasattr(run, 'usage') and run.usage else 0,
-                "completion_tokens": run.usage.completion_tokens if hasattr(run, 'usage') and run.usage else 0,
-                "total_tokens": run.usage.total_tokens if hasattr(run, 'usage') and run.usage else 0,
-            }
-        }
 
+def attach_conversation(agents_client: Any, agent: Any, requested_thread_id: Optional[str],
+                        budget: Optional[TokenBudget], idempotent: IdempotentRequest) -> Dict:
+    """Wait for the run an earlier request with the same Idempotency-Key started"""
+    recorded = idempotent.record["run"]
+    run = agents_client.runs.get(thread_id=recorded["thread_id"], run_id=recorded["run_id"])
+    logger.info("Attached to run %s on thread: %s", run.id, recorded["thread_id"])
+    run = wait_for_run(agents_client, recorded["thread_id"], run, cancel_on_deadline=False)
+    return finish_conversation(agents_client, agent, run, requested_thread_id, budget)
+
+
+def finish_conversation(agents_client: Any, agent: Any, run: Any,
+                        requested_thread_id: Optional[str],
+                        budget: Optional[TokenBudget]) -> Dict:
+    """Build the chat result for a finished run, queueing its thread for compaction if needed"""
+    thread_id = run.thread_id
+    result = conversation_result(agents_client, agent, run)
+    if budget:
+        result["token_budget"] = {**budget.to_dict(), "hit": record_budget_hit(run)}
+    if requested_thread_id and requested_thread_id != thread_id:
+        result["redirected_from"] = requested_thread_id
+
+    # Move later turns to a shorter thread once this one has grown too large.
+    # The summary is a whole run, so it happens in the background once this
+    # turn lets go of the thread; the next turn is redirected to the new one
+    compactor = get_thread_compactor(agents_client, agent.id)
+    if compactor and compactor.should_compact(result["usage"]["prompt_tokens"]):
+        get_compaction_queue().schedule(
+            thread_id, lambda: compact_between_turns(compactor, thread_id))
+        result["compaction"] = {"status": "scheduled"}
+
+    return result
+
+
+def collect_run_output(messages: Iterable[Any]) -> Tuple[Optional[str], List[Dict[str, str]]]:
+    """
+    Text and generated files of the latest assistant turn.
+
+    messages are newest first, as messages.list returns them. Files come from
+    image_file content and file_path annotations, each with a URL for the
+    file action.
+    """
+    turn = itertools.takewhile(
+        lambda msg: msg.role == "assistant",
+        itertools.dropwhile(lambda msg: msg.role != "assistant", messages))
+
+    texts: List[str] = []
+    files: Dict[str, Dict[str, str]] = {}
+    for msg in reversed(list(turn)):
+        content = msg.content if isinstance(getattr(msg, "content", None), list) else []
+        for item in content:
+            if getattr(item, "type", None) == "image_file":
+                files.setdefault(item.image_file.file_id, {"kind": "image", "name": None})
+                continue
+            if not hasattr(item, "text"):
+                continue
+            texts.append(item.text.value)
+            annotations = getattr(item.text, "annotations", None)
+            for annotation in annotations if isinstance(annotations, list) else []:
+                if getattr(annotation, "type", None) == "file_path":
+                    files.setdefault(annotation.file_path.file_id, {
+                        "kind": "file", "name": os.path.basename(annotation.text or "") or None})
+
+    return "\n\n".join(texts) or None, [
+        {"file_id": file_id, **details, "url": f"/api/agent?action=file&file_id={file_id}"}
+        for file_id, details in files.items()]
+
+
+def _json_timestamp(value: Any) -> Any:
+    """The SDK returns datetimes for created_at; keep other values as-is"""
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _truncate(text: Optional[str], length: int = 200) -> str:
+    text = text or ""
+    return text[:length] + "..." if len(text) > length else text
+
+
+# Listing projections; only the requested fields are computed per agent
+AGENT_FIELDS = {
+    "id": lambda agent: agent.id,
+    "name": lambda agent: agent.name,
+    "model": lambda agent: agent.model,
+    "instructions": lambda agent: _truncate(agent.instructions),
+    "tools": lambda agent: [str(tool) for tool in agent.tools] if hasattr(agent, 'tools') and agent.tools else [],
+    "created_at": lambda agent: _json_timestamp(agent.created_at) if hasattr(agent, 'created_at') else None,
+}
+MAX_AGENT_PAGE_SIZE = 100
+# Health shows a sample of agents; the full list is the list action's job
+HEALTH_AGENT_SAMPLE_SIZE = 10
+
+
+def iter_agents(limit: Optional[int] = None, cursor: Optional[str] = None,
+                fields: Optional[List[str]] = None,
+                name_prefix: Optional[str] = None) -> Iterator[Dict]:
+    """
+    Lazily list agents, newest first.
+
+    Pages are fetched only as the caller consumes them. cursor is the id of
+    the last agent already seen, name_prefix filters by agent name and
+    fields selects which AGENT_FIELDS to project (id is always included).
+    """
+    agents_client = get_project_client().agents
+
+    # A name filter is applied locally, so fetch full pages to avoid round trips
+    page_size = MAX_AGENT_PAGE_SIZE
+    if limit and not name_prefix:
+        page_size = min(limit, MAX_AGENT_PAGE_SIZE)
+
+    paged = agents_client.list_agents(limit=page_size)
+    agents = itertools.chain.from_iterable(
+        paged.by_page(continuation_token=cursor)) if cursor else paged
+
+    projections = [(field, AGENT_FIELDS[field])
+                   for field in ["id"] + [f for f in fields or AGENT_FIELDS if f != "id"]]
+
+    if limit == 0:
+        return
+
+    returned = 0
+    for agent in agents:
+        if name_prefix and not (agent.name or "").startswith(name_prefix):
+            continue
+        yield {field: project(agent) for field, project in projections}
+        returned += 1
+        # Stop before the pager fetches a page nobody asked for
+        if limit is not None and returned >= limit:
+            return
+
+
+def list_agents(limit: Optional[int] = None, cursor: Optional[str] = None,
+                fields: Optional[List[str]] = None,
+                name_prefix: Optional[str] = None) -> List[Dict]:
+    """List agents in the project"""
+    try:
+        return list(iter_agents(limit, cursor, fields, name_prefix))
     except Exception as e:
-        logger.error(f"Error in agent conversation: {str(e)}")
+        # An empty list here would be served, snapshotted and ETagged as the truth
+        logger.error("Error listing agents: %s", e)
         raise
 
 
-def list_agents() -> List[Dict]:
-    """List all agents in the project"""
-    try:
-        project_client = get_project_client()
-        agents_client = project_client.agents
+def get_embeddings_client() -> EmbeddingsClient:
+    """Initialize Azure AI Inference embeddings client"""
+    global _embeddings_client
 
-        agents = agents_client.list_agents()
-        agent_list = []
+    if _embeddings_client:
+        return _embeddings_client
 
-        for agent in agents:
-            agent_list.append({
-                "id": agent.id,
-                "name": agent.name,
-                "model": agent.model,
-                "instructions": agent.instructions[:200] + "..." if len(agent.instructions) > 200 else agent.instructions,
-                "tools": [str(tool) for tool in agent.tools] if hasattr(agent, 'tools') and agent.tools else [],
-                "created_at": agent.created_at if hasattr(agent, 'created_at') else None
-            })
+    endpoint = os.getenv("AI_EMBEDDINGS_ENDPOINT")
+    if not endpoint:
+        foundry_endpoint = os.getenv("AI_FOUNDRY_ENDPOINT")
+        if not foundry_endpoint:
+            raise ValueError(
+                "AI_FOUNDRY_ENDPOINT environment variable is not set")
+        account_name = foundry_endpoint.split("//")[1].split(".")[0]
+        endpoint = f"https://{account_name}.services.ai.azure.com/models"
+
+    _embeddings_client = EmbeddingsClient(
+        endpoint=endpoint,
+        credential=DefaultAzureCredential(),
+        credential_scopes=["https://cognitiveservices.azure.com/.default"],
+        **sdk_client_options()
+    )
 
-        return agent_list
-    except Exception as e:
-        logger.error(f"Error listing agents: {str(e)}")
-        return []
+    logger.info("Embeddings client initialized for endpoint: %s", endpoint)
+    return _embeddings_client
+
+
+def embed_texts(texts: List[str]) -> List[List[float]]:
+    """Embed texts with the configured embedding deployment"""
+    response = get_embeddings_client().embed(
+        input=texts,
+        model=os.getenv("EMBEDDING_DEPLOYMENT_NAME", "text-embedding-3-small")
+    )
+    return [item.embedding for item in response.data]
+
+
+def get_vector_index() -> VectorIndex:
+    """Open the local vector index shared by all workers on this instance"""
+    global _vector_index
+
+    if _vector_index:
+        return _vector_index
+
+    path = os.getenv("VECTOR_INDEX_PATH", os.path.join(
+        tempfile.gettempdir(), "vector-index"))
+    _vector_index = VectorIndex(path)
+
+    logger.info("Vector index opened at %s with %s vectors", path, len(_vector_index))
+    return _vector_index
+
+
+def search_local_index(query: Optional[str] = None, vector: Optional[List[float]] = None,
+                       top_k: int = 5) -> List[Dict]:
+    """Search the local vector index by query text or precomputed vector"""
+    if vector is None:
+        vector = embed_texts([query])[0]
+    return get_vector_index().search(vector, top_k=top_k)
+
+
+@TOOLS.register(description="Search the local knowledge base for passages relevant to a query")
+def search_knowledge_base(query: str, top_k: int = 3) -> List[Dict]:
+    return [{"id": doc.get("id"), "text": doc["text"], "score": round(doc["score"], 4)}
+            for doc in search_local_index(query, top_k=top_k)]
+
+
+def build_context_message(user_message: str, context: List[Dict]) -> str:
+    """Prepend retrieved passages to the user message"""
+    if not context:
+        return user_message
+
+    passages = "\n\n".join(
+        f"[{i + 1}] {doc['text']}" for i, doc in enumerate(context))
+    return (
+        "Use the following context to answer if it is relevant.\n\n"
+        f"{passages}\n\nQuestion: {user_message}"
+    )
 
 
 @app.route(route="health", auth_level=func.AuthLevel.ANONYMOUS)
@@ -215,6 +981,12 @@ def health_check(req: func.HttpRequest) -> func.HttpResponse:
     """Health check endpoint to verify function app and AI Foundry connectivity."""
     logger.info("Health check requested")
 
+    response = get_response_snapshots().get("health", build_health_response)
+    return conditional_response(req, response, "health")
+
+
+def build_health_response() -> func.HttpResponse:
+    """Check configuration, connectivity and authentication"""
     health_status = {
         "status": "healthy",
         "function_app": "running",
@@ -241,11 +1013,15 @@ def health_check(req: func.HttpRequest) -> func.HttpResponse:
         health_status["ai_foundry"]["project_name"] = os.getenv(
             "AI_FOUNDRY_PROJECT_NAME")
 
-        # Try to list agents
+        # Try to list a first page of agents
         try:
-            agents = list_agents()
+            # One extra agent tells us whether the sample is the whole list
+            agents = list_agents(limit=HEALTH_AGENT_SAMPLE_SIZE + 1, fields=["name"])
+            truncated = len(agents) > HEALTH_AGENT_SAMPLE_SIZE
+            agents = agents[:HEALTH_AGENT_SAMPLE_SIZE]
             health_status["ai_foundry"]["agents"] = agents
             health_status["ai_foundry"]["agent_count"] = len(agents)
+            health_status["ai_foundry"]["agents_truncated"] = truncated
 
             if len(agents) == 0:
                 health_status["ai_foundry"]["info"] = "No agents found. Create one using /agent endpoint with action=create."
@@ -267,6 +1043,8 @@ def health_check(req: func.HttpRequest) -> func.HttpResponse:
         health_status["ai_foundry"]["error"] = str(e)[:200]
         health_status["status"] = "unhealthy"
 
+    # Transport counters move with every call, health's own included, so they
+    # live on /api/metrics where they cannot change the snapshot's ETag
     return func.HttpResponse(
         json.dumps(health_status, indent=2),
         mimetype="application/json",
@@ -274,6 +1052,28 @@ def health_check(req: func.HttpRequest) -> func.HttpResponse:
     )
 
 
+@app.route(route="metrics", auth_level=func.AuthLevel.ANONYMOUS)
+def metrics_snapshot(req: func.HttpRequest) -> func.HttpResponse:
+    """In-process metrics for this worker as JSON."""
+    snapshot = {
+        "metrics": METRICS.snapshot(),
+        "transport": connection_stats(),
+        "thread_pool": {
+            "enabled": _thread_pool is not None,
+            "depth": _thread_pool.depth if _thread_pool else 0,
+            "target_size": _thread_pool.target_size if _thread_pool else 0,
+        },
+        "endpoints": _endpoint_pool.snapshot() if _endpoint_pool else [],
+        "thread_queues": _thread_locks.snapshot() if _thread_locks else [],
+    }
+
+    return compress_response(req, func.HttpResponse(
+        json.dumps(snapshot, indent=2),
+        mimetype="application/json",
+        status_code=200,
+    ), "metrics")
+
+
 @app.route(route="agent", auth_level=func.AuthLevel.ANONYMOUS)
 def agent_operations(req: func.HttpRequest) -> func.HttpResponse:
     """
@@ -285,16 +1085,44 @@ def agent_operations(req: func.HttpRequest) -> func.HttpResponse:
     - list: List all agents
     - delete: Delete an agent
     - code-interpreter: Demonstrate code interpreter capability
+    - index: Append documents to the local vector index
+    - search: Search the local vector index
+    - sweep: Report (or with dry_run=false, delete) leaked agents and idle threads
+    - upload: Upload files (multipart or raw body, ?action=upload) to a vector store
+    - file: Download a file produced by an agent, such as a code interpreter chart
+    - import: Seed a new thread with a transcript, optionally starting one run
+    - run-steps: Profile where a run's time went, step by step
 
     Expected JSON body:
     {
-        "action": "create|chat|list|delete|code-interpreter",
+        "action": "create|chat|list|delete|code-interpreter|index|search|sweep|file|import|run-steps",
         ... additional parameters based on action ...
     }
     """
-    logger.info("Agent operation requested")
+    with bind_request(req.headers) as request_context, count_upstream_calls() as upstream_calls, \
+            request_deadline(Deadline.from_request(req.headers)):
+        logger.info("Agent operation requested")
+        response = route_agent_operation(req)
+    response.headers[CORRELATION_HEADER] = request_context.correlation_id
+    return conditional_response(
+        req, report_upstream_calls(response, "agent", upstream_calls.value), "agent")
+
+
+def report_upstream_calls(response: func.HttpResponse, route: str,
+                          upstream_calls: int) -> func.HttpResponse:
+    """Expose the SDK round trips made for a request as a header and metric"""
+    response.headers["X-Upstream-Calls"] = str(upstream_calls)
+    METRICS.histogram(f"upstream_calls.{route}").observe(upstream_calls)
+    return response
 
+
+def route_agent_operation(req: func.HttpRequest) -> func.HttpResponse:
+    """Parse the action and dispatch to its handler"""
     try:
+        # Uploads carry file bytes rather than JSON, so their action is in the query string
+        if req.params.get("action") == "upload":
+            return handle_upload(req)
+
         # Parse request body
         try:
             req_body = req.get_json()
@@ -308,37 +1136,85 @@ def agent_operations(req: func.HttpRequest) -> func.HttpResponse:
             return func.HttpResponse(
                 json.dumps({
                     "error": "Please provide an 'action' parameter",
-                    "available_actions": ["create", "chat", "list", "delete", "code-interpreter"],
+                    "available_actions": AVAILABLE_ACTIONS,
                     "status": "error"
                 }),
                 mimetype="application/json",
                 status_code=400,
             )
 
+        idempotency_key = req.headers.get(IDEMPOTENCY_HEADER)
+        if idempotency_key and action in IDEMPOTENT_ACTIONS:
+            return handle_idempotent(action, idempotency_key, req_body, req.params)
+
         # Route to appropriate action handler
         if action == "create":
             return handle_create_agent(req_body)
         elif action == "chat":
             return handle_chat(req_body, req.params)
         elif action == "list":
-            return handle_list_agents()
+            return handle_list_agents(req_body, req.params)
         elif action == "delete":
             return handle_delete_agent(req_body, req.params)
         elif action == "code-interpreter":
-            return handle_code_interpreter(req_body)
+            return get_endpoint_pool().call(lambda: handle_code_interpreter(req_body))
+        elif action == "index":
+            return handle_index_documents(req_body)
+        elif action == "search":
+            return handle_search(req_body, req.params)
+        elif action == "sweep":
+            return handle_sweep(req_body, req.params)
+        elif action == "file":
+            return handle_file(req_body, req.params)
+        elif action == "import":
+            return handle_import(req_body, req.params)
+        elif action == "run-steps":
+            return handle_run_steps(req_body, req.params)
         else:
             return func.HttpResponse(
                 json.dumps({
                     "error": f"Unknown action: {action}",
-                    "available_actions": ["create", "chat", "list", "delete", "code-interpreter"],
+                    "available_actions": AVAILABLE_ACTIONS,
                     "status": "error"
                 }),
                 mimetype="application/json",
                 status_code=400,
             )
 
+    except EndpointUnavailable as e:
+        logger.error("No endpoint available: %s", e)
+        return func.HttpResponse(
+            json.dumps({"error": str(e), "status": "unavailable"}),
+            mimetype="application/json",
+            status_code=503,
+            headers={"Retry-After": str(max(1, round(e.retry_after_seconds)))},
+        )
+
+    except ThreadBusy as e:
+        logger.warning("Rejected turn: %s", e)
+        return func.HttpResponse(
+            json.dumps({"error": str(e), "thread_id": e.thread_id, "status": "busy"}),
+            mimetype="application/json",
+            status_code=409,
+            headers={"Retry-After": str(max(1, round(e.retry_after_seconds)))},
+        )
+
+    except DeadlineExceeded as e:
+        logger.error("Agent operation timed out: %s", e)
+        return func.HttpResponse(
+            json.dumps({
+                "error": str(e),
+                "status": "timeout",
+                "partial": {**e.progress, **current_deadline().summary()}
+            }),
+            mimetype="application/json",
+            status_code=504,
+        )
+
     except Exception as e:
-        logger.error(f"Error in agent operations: {str(e)}")
+        logger.error("Error in agent operations: %s", e)
+        if is_endpoint_failure(e):
+            return upstream_error_response(e)
         return func.HttpResponse(
             json.dumps({
                 "error": f"Failed to process agent operation: {str(e)}",
@@ -349,6 +1225,111 @@ def agent_operations(req: func.HttpRequest) -> func.HttpResponse:
         )
 
 
+def upstream_error_response(error: Exception) -> func.HttpResponse:
+    """502 for a failed upstream call, or 503 with Retry-After when it was throttled or down"""
+    status_code = getattr(error, "status_code", None)
+    if status_code in (429, 503):
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        return func.HttpResponse(
+            json.dumps({"error": f"Upstream unavailable: {error}", "status": "unavailable"}),
+            mimetype="application/json",
+            status_code=503,
+            headers={"Retry-After": retry_after or "1"},
+        )
+    return func.HttpResponse(
+        json.dumps({"error": f"Upstream call failed: {error}", "status": "error"}),
+        mimetype="application/json",
+        status_code=502,
+    )
+
+
+def recorded_run_home(pool: EndpointPool, idempotent: IdempotentRequest) -> ProjectEndpoint:
+    """The endpoint holding the run an idempotent request recorded"""
+    recorded = idempotent.record["run"]
+    for endpoint in pool.endpoints:
+        if endpoint.name == recorded.get("endpoint"):
+            return endpoint
+    thread_id = recorded["thread_id"]
+    return pool.home(thread_id, lambda: get_project_client().agents.threads.get(thread_id))
+
+
+def handle_idempotent(action: str, key: str, req_body: dict, params: dict) -> func.HttpResponse:
+    """
+    Run a chat or code-interpreter request at most once per Idempotency-Key.
+
+    The first request claims the key and records its run as soon as it
+    starts. A retry replays the stored response once there is one, waits for
+    the recorded run while it is still going, and gets 409 if the first
+    request has not started its run yet. Reusing a key for a different
+    request is rejected with 422.
+    """
+    if len(key) > MAX_KEY_LENGTH:
+        return func.HttpResponse(
+            json.dumps({
+                "error": f"{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters",
+                "status": "error"
+            }),
+            mimetype="application/json",
+            status_code=400,
+        )
+
+    fingerprint = request_fingerprint(action, req_body, params)
+    idempotent = get_idempotency_store().begin(key, fingerprint)
+    if not idempotent.claimed:
+        if idempotent.record["fingerprint"] != fingerprint:
+            return func.HttpResponse(
+                json.dumps({
+                    "error": f"{IDEMPOTENCY_HEADER} was already used for a different request",
+                    "status": "error"
+                }),
+                mimetype="application/json",
+                status_code=422,
+            )
+        if idempotent.completed:
+            stored = idempotent.record["response"]
+            return func.HttpResponse(
+                stored["body"],
+                mimetype="application/json",
+                status_code=stored["status_code"],
+                headers={REPLAYED_HEADER: "true"},
+            )
+        if not idempotent.has_run:
+            return func.HttpResponse(
+                json.dumps({
+                    "error": "A request with this key is still starting; retry shortly",
+                    "status": "in_progress"
+                }),
+                mimetype="application/json",
+                status_code=409,
+                headers={"Retry-After": "1"},
+            )
+
+    try:
+        if action == "chat":
+            response = handle_chat(req_body, params, idempotent)
+        else:
+            pool = get_endpoint_pool()
+            home = recorded_run_home(pool, idempotent) if idempotent.has_run else None
+            response = pool.call(lambda: handle_code_interpreter(req_body, idempotent), home)
+    except Exception:
+        # Without a run there is nothing to attach to, so a retry starts over
+        if not idempotent.has_run:
+            idempotent.release()
+        raise
+
+    if response.status_code == 200:
+        idempotent.complete(response.status_code, response.get_body().decode("utf-8"))
+    elif not idempotent.has_run:
+        idempotent.release()
+    return response
+
+
+def flag(req_body: dict, params: dict, name: str) -> bool:
+    """A boolean option from the JSON body or query string, false by default"""
+    return str(req_body.get(name) or params.get(name) or "").lower() in ("true", "1")
+
+
 def handle_create_agent(req_body: dict) -> func.HttpResponse:
     """Handle agent creation"""
     try:
@@ -361,6 +1342,9 @@ def handle_create_agent(req_body: dict) -> func.HttpResponse:
             tools.append({"type": "code_interpreter"})
         if req_body.get("enable_file_search", False):
             tools.append({"type": "file_search"})
+        # Runs calling function tools wait on this app to answer, so they are opt-in
+        if req_body.get("enable_function_tools", False):
+            tools.extend(TOOLS.definitions())
 
         # Create agent
         agent = agents_client.create_agent(
@@ -372,6 +1356,8 @@ def handle_create_agent(req_body: dict) -> func.HttpResponse:
                 "instructions", "You are a helpful AI assistant."),
             tools=tools
         )
+        get_agent_registry().put(agent)
+        invalidate_agent_snapshots()
 
         return func.HttpResponse(
             json.dumps({
@@ -389,11 +1375,12 @@ def handle_create_agent(req_body: dict) -> func.HttpResponse:
         )
 
     except Exception as e:
-        logger.error(f"Error creating agent: {str(e)}")
+        logger.error("Error creating agent: %s", e)
         raise
 
 
-def handle_chat(req_body: dict, params: dict) -> func.HttpResponse:
+def handle_chat(req_body: dict, params: dict,
+                idempotent: Optional[IdempotentRequest] = None) -> func.HttpResponse:
     """Handle chat with agent"""
     try:
         message = req_body.get("message") or req_body.get(
@@ -410,14 +1397,83 @@ def handle_chat(req_body: dict, params: dict) -> func.HttpResponse:
                 status_code=400,
             )
 
-        # Get or create agent
-        agent = get_or_create_agent()
-
-        # Run conversation
-        result = run_agent_conversation(agent, message, thread_id)
-
-        return func.HttpResponse(
-            json.dumps({
+        try:
+            budget = parse_token_budget("chat", req_body)
+        except ValueError as e:
+            return func.HttpResponse(
+                json.dumps({"error": str(e), "status": "error"}),
+                mimetype="application/json",
+                status_code=400,
+            )
+
+        # Optionally inject passages from the local vector index
+        use_local_context = req_body.get("use_local_context")
+        if use_local_context is None:
+            use_local_context = os.getenv(
+                "LOCAL_CONTEXT_ENABLED", "false").lower() == "true"
+
+        context = []
+        agent_message = message
+        if use_local_context:
+            try:
+                top_k = req_body.get("context_top_k") or os.getenv(
+                    "LOCAL_CONTEXT_TOP_K", "3")
+                if not str(top_k).isdigit() or int(top_k) < 1:
+                    raise ValueError("'context_top_k' must be a positive integer")
+                context = search_local_index(query=message, top_k=int(top_k))
+            except ValueError as e:
+                return func.HttpResponse(
+                    json.dumps({"error": str(e), "status": "error"}),
+                    mimetype="application/json",
+                    status_code=400,
+                )
+            agent_message = build_context_message(message, context)
+
+        # Existing threads and agents stay on their home endpoint; new
+        # conversations go to the healthiest one and fail over
+        agent_id = req_body.get("agent_id") or params.get("agent_id")
+        agent_name = req_body.get("agent_name") or params.get("agent_name")
+        profile = flag(req_body, params, "profile")
+        pool = get_endpoint_pool()
+        home = None
+        if idempotent and idempotent.has_run:
+            home = recorded_run_home(pool, idempotent)
+        elif thread_id:
+            home = pool.home(thread_id, lambda: get_project_client().agents.threads.get(thread_id))
+        elif agent_id:
+            home = pool.home(agent_id, lambda: get_project_client().agents.get_agent(agent_id))
+
+        def converse() -> Dict:
+            # Chat with the requested agent, or the app's default one
+            if agent_id or agent_name:
+                agent = get_agent_registry().get(agent_id, agent_name)
+            else:
+                agent = get_or_create_agent()
+
+            # Run conversation
+            result = run_agent_conversation(agent, agent_message, thread_id, budget, idempotent)
+            if profile:
+                result["profile"] = fetch_run_profile(
+                    get_project_client().agents, result["thread_id"], result["run_id"], METRICS)
+            result["endpoint"] = current_endpoint().name
+            pool.pin(result["thread_id"], current_endpoint())
+            return result
+
+        try:
+            result = pool.call(converse, home)
+        except AgentNotFound as e:
+            return func.HttpResponse(
+                json.dumps({"error": str(e), "status": "error"}),
+                mimetype="application/json",
+                status_code=404,
+            )
+
+        if use_local_context:
+            result["context"] = [
+                {"id": doc["id"], "score": doc["score"]} for doc in context]
+
+        return func.HttpResponse(
+            json.dumps({
                 "action": "chat",
                 "user_message": message,
                 **result,
@@ -428,32 +1484,195 @@ def handle_chat(req_body: dict, params: dict) -> func.HttpResponse:
         )
 
     except Exception as e:
-        logger.error(f"Error in chat: {str(e)}")
+        logger.error("Error in chat: %s", e)
         raise
 
 
-def handle_list_agents() -> func.HttpResponse:
-    """Handle listing agents"""
+def handle_import(req_body: dict, params: dict) -> func.HttpResponse:
+    """Handle import of a transcript into a new, pre-seeded thread"""
     try:
-        agents = list_agents()
+        try:
+            messages = parse_transcript(req_body.get("messages"),
+                                        int(os.getenv("IMPORT_MAX_MESSAGES", "1000")))
+            budget = parse_token_budget("chat", req_body)
+        except ValueError as e:
+            return func.HttpResponse(
+                json.dumps({"error": str(e), "status": "error"}),
+                mimetype="application/json",
+                status_code=400,
+            )
+
+        # History alone costs no tokens; a run is only started when asked for
+        start = flag(req_body, params, "run")
+        agent_id = req_body.get("agent_id") or params.get("agent_id")
+        agent_name = req_body.get("agent_name") or params.get("agent_name")
+        pool = get_endpoint_pool()
+        home = None
+        if agent_id:
+            home = pool.home(agent_id, lambda: get_project_client().agents.get_agent(agent_id))
+
+        def import_transcript() -> Dict:
+            agents_client = get_project_client().agents
+            agent = None
+            if start:
+                agent = (get_agent_registry().get(agent_id, agent_name)
+                         if agent_id or agent_name else get_or_create_agent())
+
+            deadline = current_deadline()
+            if deadline:
+                deadline.check("import")
+            imported = get_transcript_importer(agents_client).import_messages(
+                messages, agent.id if agent else None, budget.run_options())
+            run = imported.pop("run")
+            logger.info("Imported %s messages into thread %s in %s calls",
+                        imported["imported_messages"], imported["thread_id"],
+                        imported["upstream_calls"])
+
+            result = {"import": imported, "thread_id": imported["thread_id"]}
+            if run is not None:
+                run = wait_for_run(agents_client, run.thread_id, run)
+                result.update(finish_conversation(agents_client, agent, run, None, budget))
+            result["endpoint"] = current_endpoint().name
+            return result
+
+        try:
+            result = pool.call(import_transcript, home)
+        except AgentNotFound as e:
+            return func.HttpResponse(
+                json.dumps({"error": str(e), "status": "error"}),
+                mimetype="application/json",
+                status_code=404,
+            )
 
         return func.HttpResponse(
             json.dumps({
-                "action": "list",
-                "agents": agents,
-                "count": len(agents),
-                "project": os.getenv("AI_FOUNDRY_PROJECT_NAME"),
-                "status": "success"
+                "action": "import",
+                **result,
+                "timestamp": datetime.now(timezone.utc).isoformat()
             }, indent=2),
             mimetype="application/json",
             status_code=200,
         )
 
     except Exception as e:
-        logger.error(f"Error listing agents: {str(e)}")
+        logger.error("Error in transcript import: %s", e)
         raise
 
 
+def parse_list_options(req_body: dict, params: dict) -> Dict[str, Any]:
+    """Read and validate the list action's paging, projection and filter options"""
+    def option(name: str) -> Any:
+        return req_body.get(name) if req_body.get(name) is not None else params.get(name)
+
+    limit = option("limit")
+    if limit is not None:
+        limit = int(limit)
+        if limit < 1:
+            raise ValueError("'limit' must be a positive integer")
+
+    fields = option("fields")
+    if isinstance(fields, str):
+        fields = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in fields or [] if field not in AGENT_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(AGENT_FIELDS)}")
+
+    output_format = option("format") or "json"
+    if output_format not in ("json", "ndjson"):
+        raise ValueError("'format' must be 'json' or 'ndjson'")
+
+    return {
+        "limit": limit,
+        "cursor": option("cursor"),
+        "fields": fields,
+        "name_prefix": option("name_prefix"),
+        "format": output_format,
+    }
+
+
+def handle_list_agents(req_body: Optional[dict] = None, params: Optional[dict] = None) -> func.HttpResponse:
+    """Handle listing agents"""
+    try:
+        try:
+            options = parse_list_options(req_body or {}, params or {})
+        except ValueError as e:
+            return func.HttpResponse(
+                json.dumps({
+                    "error": str(e),
+                    "status": "error"
+                }),
+                mimetype="application/json",
+                status_code=400,
+            )
+
+        # Pollers get the cached listing until it expires or an agent changes
+        return get_response_snapshots().get(
+            "list:" + json.dumps(options, sort_keys=True), lambda: list_agents_response(options))
+
+    except Exception as e:
+        logger.error("Error listing agents: %s", e)
+        raise
+
+
+def list_agents_response(options: Dict[str, Any]) -> func.HttpResponse:
+    """List agents for validated list options as JSON or NDJSON"""
+    limit = options["limit"]
+    query = {
+        # One extra agent tells us whether another page exists
+        "limit": limit + 1 if limit else None,
+        "cursor": options["cursor"],
+        "fields": options["fields"],
+        "name_prefix": options["name_prefix"],
+    }
+
+    if options["format"] == "ndjson":
+        return stream_agents_ndjson(limit, query)
+
+    agents = list_agents(**query)
+    has_more = limit is not None and len(agents) > limit
+    agents = agents[:limit] if limit else agents
+
+    return func.HttpResponse(
+        json.dumps({
+            "action": "list",
+            "agents": agents,
+            "count": len(agents),
+            "next_cursor": agents[-1]["id"] if has_more else None,
+            "project": os.getenv("AI_FOUNDRY_PROJECT_NAME"),
+            "status": "success"
+        }, indent=2),
+        mimetype="application/json",
+        status_code=200,
+    )
+
+
+def stream_agents_ndjson(limit: Optional[int], query: Dict[str, Any]) -> func.HttpResponse:
+    """Serialize agents one line at a time without building the agent list"""
+    page = {"count": 0, "last_id": None, "has_more": False}
+
+    def lines() -> Iterator[bytes]:
+        for agent in iter_agents(**query):
+            if limit is not None and page["count"] == limit:
+                page["has_more"] = True
+                return
+            page["count"] += 1
+            page["last_id"] = agent["id"]
+            yield json.dumps(agent).encode("utf-8") + b"\n"
+
+    body = b"".join(lines())
+
+    headers = {"X-Count": str(page["count"])}
+    if page["has_more"]:
+        headers["X-Next-Cursor"] = page["last_id"]
+
+    return func.HttpResponse(
+        body,
+        mimetype="application/x-ndjson",
+        status_code=200,
+        headers=headers,
+    )
+
+
 def handle_delete_agent(req_body: dict, params: dict) -> func.HttpResponse:
     """Handle agent deletion"""
     try:
@@ -475,10 +1694,12 @@ def handle_delete_agent(req_body: dict, params: dict) -> func.HttpResponse:
         # Delete the agent
         agents_client.delete_agent(agent_id)
 
-        # Clear global instance if it was deleted
+        # Clear global instance and registry entry if it was deleted
         global _agent_instance
         if _agent_instance and _agent_instance.id == agent_id:
             _agent_instance = None
+        get_agent_registry().invalidate(agent_id)
+        invalidate_agent_snapshots()
 
         return func.HttpResponse(
             json.dumps({
@@ -492,68 +1713,280 @@ def handle_delete_agent(req_body: dict, params: dict) -> func.HttpResponse:
         )
 
     except Exception as e:
-        logger.error(f"Error deleting agent: {str(e)}")
+        logger.error("Error deleting agent: %s", e)
         raise
 
 
-def handle_code_interpreter(req_body: dict) -> func.HttpResponse:
+def handle_code_interpreter(req_body: dict,
+                            idempotent: Optional[IdempotentRequest] = None) -> func.HttpResponse:
     """Handle code interpreter demonstration"""
     try:
         code_task = req_body.get(
             "code_task", "Calculate the sum of squares from 1 to 10")
 
+        try:
+            budget = parse_token_budget("code-interpreter", req_body)
+        except ValueError as e:
+            return func.HttpResponse(
+                json.dumps({"error": str(e), "status": "error"}),
+                mimetype="application/json",
+                status_code=400,
+            )
+
         project_client = get_project_client()
         agents_client = project_client.agents
 
-        # Create specialized agent for code tasks
-        code_agent = agents_client.create_agent(
-            model=os.getenv("MODEL_DEPLOYMENT_NAME", "gpt-4"),
-            name=f"code-interpreter-{datetime.now(timezone.utc).strftime('%H%M%S')}",
-            instructions="You are a Python code expert. Use the code interpreter to solve computational tasks.",
-            tools=[{"type": "code_interpreter"}]
+        if idempotent and idempotent.has_run:
+            # A retry waits for the run its first attempt started
+            recorded = idempotent.record["run"]
+            code_agent_id = recorded["agent_id"]
+            run = agents_client.runs.get(thread_id=recorded["thread_id"], run_id=recorded["run_id"])
+            logger.info("Attached to run %s on thread: %s", run.id, recorded["thread_id"])
+        else:
+            # Create specialized agent for code tasks
+            code_agent_id = agents_client.create_agent(
+                model=os.getenv("MODEL_DEPLOYMENT_NAME", "gpt-4"),
+                name=f"code-interpreter-{datetime.now(timezone.utc).strftime('%H%M%S')}",
+                instructions="You are a Python code expert. Use the code interpreter to solve computational tasks.",
+                tools=[{"type": "code_interpreter"}]
+            ).id
+            run = None
+
+        finished = False
+        try:
+            # Run the code task
+            if run is None:
+                run = start_run(agents_client, code_agent_id,
+                                f"Please solve this task using code: {code_task}", budget=budget)
+                keep_on_endpoint(run.thread_id)
+                if idempotent:
+                    idempotent.record_run(thread_id=run.thread_id, run_id=run.id,
+                                          agent_id=code_agent_id,
+                                          endpoint=getattr(current_endpoint(), "name", None))
+            thread_id = run.thread_id
+
+            # Wait for completion
+            run = wait_for_run(agents_client, thread_id, run, cancel_on_deadline=idempotent is None)
+
+            # Get results, with references to any files the code produced
+            result, files = collect_run_output(agents_client.messages.list(thread_id=thread_id))
+            profile = fetch_run_profile(agents_client, thread_id, run.id, METRICS) \
+                if flag(req_body, {}, "profile") else None
+            for file in files:
+                get_endpoint_pool().pin(file["file_id"], current_endpoint())
+            finished = True
+        finally:
+            # Clean up temporary agent, also when the deadline ran out, unless a
+            # retry may still attach to its run (the sweeper reclaims it if not)
+            if finished or not (idempotent and idempotent.has_run):
+                agents_client.delete_agent(code_agent_id)
+
+        return func.HttpResponse(
+            json.dumps({
+                "action": "code-interpreter",
+                "task": code_task,
+                "result": result,
+                "files": files,
+                "thread_id": thread_id,
+                "status": run.status,
+                "token_budget": {**budget.to_dict(), "hit": record_budget_hit(run)},
+                **({"profile": profile} if profile else {}),
+                "timestamp": datetime.now(timezone.utc).isoformat()
+            }, indent=2),
+            mimetype="application/json",
+            status_code=200,
+        )
+
+    except Exception as e:
+        logger.error("Error in code interpreter: %s", e)
+        raise
+
+
+def handle_run_steps(req_body: dict, params: dict) -> func.HttpResponse:
+    """Handle a run-step profile of a finished or running run"""
+    thread_id = req_body.get("thread_id") or params.get("thread_id")
+    run_id = req_body.get("run_id") or params.get("run_id")
+    try:
+        if not thread_id or not run_id:
+            return func.HttpResponse(
+                json.dumps({
+                    "error": "Please provide 'thread_id' and 'run_id' to profile",
+                    "status": "error"
+                }),
+                mimetype="application/json",
+                status_code=400,
+            )
+
+        # Runs live on their thread's endpoint
+        pool = get_endpoint_pool()
+        home = pool.home(thread_id, lambda: get_project_client().agents.threads.get(thread_id))
+        profile = pool.call(
+            lambda: fetch_run_profile(get_project_client().agents, thread_id, run_id), home)
+
+        return func.HttpResponse(
+            json.dumps({
+                "action": "run-steps",
+                "thread_id": thread_id,
+                **profile,
+                "timestamp": datetime.now(timezone.utc).isoformat()
+            }, indent=2),
+            mimetype="application/json",
+            status_code=200,
+        )
+
+    except ResourceNotFoundError:
+        return func.HttpResponse(
+            json.dumps({"error": f"Run not found: {run_id} on thread {thread_id}",
+                        "status": "error"}),
+            mimetype="application/json",
+            status_code=404,
+        )
+    except Exception as e:
+        logger.error("Error profiling run: %s", e)
+        raise
+
+
+def read_capped(chunks: Iterable[bytes], max_bytes: int) -> Optional[bytes]:
+    """Join chunks into one body, or None as soon as they pass max_bytes"""
+    body = bytearray()
+    for chunk in chunks:
+        body += chunk
+        if len(body) > max_bytes:
+            return None
+    return bytes(body)
+
+
+def handle_file(req_body: dict, params: dict) -> func.HttpResponse:
+    """Handle download of an agent file, served from the artifact cache when possible"""
+    try:
+        file_id = req_body.get("file_id") or params.get("file_id")
+        if not file_id:
+            return func.HttpResponse(
+                json.dumps({
+                    "error": "Please provide 'file_id' to download",
+                    "status": "error"
+                }),
+                mimetype="application/json",
+                status_code=400,
+            )
+
+        cache = get_artifact_cache()
+        artifact = cache.get(file_id)
+        if not artifact:
+            # Files live on the endpoint whose run produced them
+            pool = get_endpoint_pool()
+            home = pool.home(file_id, lambda: get_project_client().agents.files.get(file_id))
+            info = pool.call(lambda: get_project_client().agents.files.get(file_id), home)
+            # The worker cannot stream a response, so the whole body is held
+            # in memory; the limit keeps that to a few MB per download
+            max_bytes = int(os.getenv("FILE_DOWNLOAD_MAX_BYTES", str(8 * 1024 * 1024)))
+            content = None
+            if (info.bytes or 0) <= max_bytes:
+                content = pool.call(lambda: read_capped(
+                    get_project_client().agents.files.get_content(file_id), max_bytes), home)
+            if content is None:
+                return func.HttpResponse(
+                    json.dumps({
+                        "error": f"File is {info.bytes} bytes; the limit is {max_bytes}",
+                        "status": "error"
+                    }),
+                    mimetype="application/json",
+                    status_code=413,
+                )
+
+            filename = os.path.basename(info.filename or file_id)
+            artifact = CachedArtifact(
+                content=content,
+                content_type=mimetypes.guess_type(filename)[0] or "application/octet-stream",
+                filename=filename
+            )
+            cache.put(file_id, artifact)
+            cached = "miss"
+        else:
+            cached = "hit"
+
+        return func.HttpResponse(
+            artifact.content,
+            mimetype=artifact.content_type,
+            status_code=200,
+            headers={
+                "Content-Disposition": f'inline; filename="{artifact.filename}"',
+                "X-Cache": cached,
+            },
         )
 
-        # Run the code task
-        thread = agents_client.threads.create()
-        message = agents_client.messages.create(
-            thread_id=thread.id,
-            role="user",
-            content=f"Please solve this task using code: {code_task}"
+    except ResourceNotFoundError:
+        return func.HttpResponse(
+            json.dumps({"error": f"File not found: {file_id}", "status": "error"}),
+            mimetype="application/json",
+            status_code=404,
         )
+    except Exception as e:
+        logger.error("Error downloading file: %s", e)
+        raise
 
-        run = agents_client.runs.create(
-            thread_id=thread.id,
-            agent_id=code_agent.id
+
+def handle_sweep(req_body: dict, params: dict) -> func.HttpResponse:
+    """Handle an on-demand sweep; dry run unless dry_run is explicitly false"""
+    try:
+        dry_run = req_body.get("dry_run", params.get("dry_run", True))
+        if isinstance(dry_run, str):
+            dry_run = dry_run.lower() != "false"
+
+        report = sweep_endpoints(dry_run=bool(dry_run))
+
+        return func.HttpResponse(
+            json.dumps({
+                "action": "sweep",
+                **report,
+                "status": "success",
+                "timestamp": datetime.now(timezone.utc).isoformat()
+            }, indent=2),
+            mimetype="application/json",
+            status_code=200,
         )
 
-        # Wait for completion
-        while run.status in ["queued", "in_progress"]:
-            run = agents_client.runs.get(thread_id=thread.id, run_id=run.id)
-
-        # Get results
-        messages = agents_client.messages.list(thread_id=thread.id)
-        result = None
-        for msg in messages:
-            if msg.role == "assistant":
-                if hasattr(msg, 'content') and msg.content:
-                    if isinstance(msg.content, list) and len(msg.content) > 0:
-                        content_item = msg.content[0]
-                        if hasattr(content_item, 'text'):
-                            result = content_item.text.value
-                    elif isinstance(msg.content, str):
-                        result = msg.content
-                break
-
-        # Clean up temporary agent
-        agents_client.delete_agent(code_agent.id)
+    except Exception as e:
+        logger.error("Error sweeping resources: %s", e)
+        raise
+
+
+def handle_upload(req: func.HttpRequest) -> func.HttpResponse:
+    """Handle file upload to the agents files API and a vector store"""
+    try:
+        # Multipart forms may carry many files; a raw body is one file named by ?filename=
+        if req.headers.get("Content-Type", "").startswith("multipart/form-data"):
+            files = [(upload.filename, upload.stream)
+                     for name in req.files for upload in req.files.getlist(name)]
+        else:
+            body = req.get_body()
+            filename = req.params.get("filename") or req.headers.get("X-File-Name")
+            files = [(filename, io.BytesIO(body))] if body and filename else []
+
+        if not files:
+            return func.HttpResponse(
+                json.dumps({
+                    "error": "Send files as multipart/form-data, or a raw body with ?filename=",
+                    "status": "error"
+                }),
+                mimetype="application/json",
+                status_code=400,
+            )
+
+        # Attach to the requested vector store, or the default agent's one
+        vector_store_id = None
+        if req.params.get("attach", "true").lower() == "true":
+            vector_store_id = req.params.get("vector_store_id") or get_default_vector_store_id()
+
+        deadline = current_deadline()
+        report = get_file_ingestor().ingest(
+            files, vector_store_id, timeout_seconds=deadline.remaining() if deadline else None)
 
         return func.HttpResponse(
             json.dumps({
-                "action": "code-interpreter",
-                "task": code_task,
-                "result": result,
-                "thread_id": thread.id,
-                "status": "completed",
+                "action": "upload",
+                **report,
+                "status": "failed" if report["summary"]["failed"] == len(files) else "completed",
                 "timestamp": datetime.now(timezone.utc).isoformat()
             }, indent=2),
             mimetype="application/json",
@@ -561,17 +1994,266 @@ def handle_code_interpreter(req_body: dict) -> func.HttpResponse:
         )
 
     except Exception as e:
-        logger.error(f"Error in code interpreter: {str(e)}")
+        logger.error("Error uploading files: %s", e)
+        raise
+
+
+def handle_index_documents(req_body: dict) -> func.HttpResponse:
+    """Handle appending documents to the local vector index"""
+    try:
+        documents = req_body.get("documents")
+
+        if not documents or not isinstance(documents, list):
+            return func.HttpResponse(
+                json.dumps({
+                    "error": "Please provide a non-empty 'documents' list",
+                    "status": "error"
+                }),
+                mimetype="application/json",
+                status_code=400,
+            )
+
+        index = get_vector_index()
+        try:
+            documents, vectors = parse_index_documents(documents, len(index) and index.dimension)
+        except ValueError as e:
+            return func.HttpResponse(
+                json.dumps({"error": str(e), "status": "error"}),
+                mimetype="application/json",
+                status_code=400,
+            )
+
+        # Embed only the documents that did not bring their own vector
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            embedded = embed_texts([documents[i]["text"] for i in missing])
+            for i, vector in zip(missing, embedded):
+                vectors[i] = vector
+
+        count = index.append(vectors, documents)
+
+        return func.HttpResponse(
+            json.dumps({
+                "action": "index",
+                "indexed": len(documents),
+                "total": count,
+                "status": "success",
+                "timestamp": datetime.now(timezone.utc).isoformat()
+            }, indent=2),
+            mimetype="application/json",
+            status_code=200,
+        )
+
+    except Exception as e:
+        logger.error("Error indexing documents: %s", e)
+        raise
+
+
+def parse_index_documents(documents: List[Any], dimension: Optional[int] = None
+                          ) -> Tuple[List[Dict[str, Any]], List[Optional[List[float]]]]:
+    """
+    Validate documents to index, given as text or {"text", "vector", ...} objects.
+
+    Returns the documents and their vectors, None where the text still needs
+    embedding. Raises ValueError naming the first invalid document; vectors
+    must all share one dimension, the index's once it holds any.
+    """
+    parsed, vectors = [], []
+    for i, doc in enumerate(documents):
+        doc = {"text": doc} if isinstance(doc, str) else doc
+        if not isinstance(doc, dict):
+            raise ValueError(f"documents[{i}] must be text or an object")
+        vector = doc.get("vector")
+        if vector is None and (not isinstance(doc.get("text"), str) or not doc["text"].strip()):
+            raise ValueError(f"documents[{i}] needs non-empty 'text' or a 'vector'")
+        if vector is not None:
+            try:
+                vector = parse_vector(vector, dimension)
+            except ValueError as e:
+                raise ValueError(f"documents[{i}].vector: {e}") from None
+            dimension = len(vector)
+        parsed.append(doc)
+        vectors.append(vector)
+    return parsed, vectors
+
+
+def handle_search(req_body: dict, params: dict) -> func.HttpResponse:
+    """Handle top-k search over the local vector index"""
+    try:
+        query = req_body.get("query") or params.get("query")
+        vector = req_body.get("vector")
+
+        if not query and vector is None:
+            return func.HttpResponse(
+                json.dumps({
+                    "error": "Please provide a 'query' or 'vector' to search",
+                    "status": "error"
+                }),
+                mimetype="application/json",
+                status_code=400,
+            )
+
+        try:
+            top_k = req_body.get("top_k") or params.get("top_k") or 5
+            if not str(top_k).isdigit() or int(top_k) < 1:
+                raise ValueError("'top_k' must be a positive integer")
+            top_k = int(top_k)
+            if vector is not None:
+                index = get_vector_index()
+                vector = parse_vector(vector, len(index) and index.dimension)
+            # An embedding model that does not match the index is a bad
+            # request, not a server fault
+            results = search_local_index(query=query, vector=vector, top_k=top_k)
+        except ValueError as e:
+            return func.HttpResponse(
+                json.dumps({"error": str(e), "status": "error"}),
+                mimetype="application/json",
+                status_code=400,
+            )
+
+        return func.HttpResponse(
+            json.dumps({
+                "action": "search",
+                "query": query,
+                "results": results,
+                "count": len(results),
+                "status": "success"
+            }, indent=2),
+            mimetype="application/json",
+            status_code=200,
+        )
+
+    except Exception as e:
+        logger.error("Error searching local index: %s", e)
         raise
 
 
+@app.timer_trigger(schedule="0 */30 * * * *", arg_name="timer", run_on_startup=False, use_monitor=False)
+def sweep_resources(timer: func.TimerRequest) -> None:
+    """Every 30 minutes, delete leaked temporary agents and idle threads."""
+    if os.getenv("SWEEPER_ENABLED", "true").lower() != "true":
+        return
+
+    dry_run = os.getenv("SWEEPER_DRY_RUN", "false").lower() == "true"
+    report = sweep_endpoints(dry_run=dry_run)
+
+    for kind in ("agents", "threads"):
+        summary = report.get(kind, {})
+        logger.info(
+            "Sweeper %s %s: %s of %s scanned, %s failed",
+            "would reclaim" if dry_run else "reclaimed", kind,
+            len(summary.get("candidates", [])) if dry_run else summary.get("deleted", 0),
+            summary.get("scanned", 0), len(summary.get("failed", [])))
+
+
+def warm_up() -> Dict[str, float]:
+    """
+    Initialize everything the first chat on a cold instance would wait for.
+
+    Builds the project client, resolves the default agent and makes one
+    cheap authenticated call per endpoint, which fetches the access token
+    and opens the pooled connection, then fills the thread pool. Returns
+    per-stage milliseconds.
+    """
+    timings: Dict[str, float] = {}
+    with timed("warmup.project_client_ms", timings):
+        agents_client = get_project_client().agents
+    with timed("warmup.agent_ms", timings):
+        get_or_create_agent()
+    with timed("warmup.token_and_connection_ms", timings):
+        next(iter(agents_client.list_agents(limit=1)), None)
+        # Failover endpoints get their own token and connection ready too
+        for endpoint in get_endpoint_pool().endpoints[1:]:
+            with use_endpoint(endpoint):
+                try:
+                    next(iter(get_project_client().agents.list_agents(limit=1)), None)
+                except Exception as e:
+                    logger.warning("Warm-up of endpoint %s failed: %s", endpoint.name, e)
+    with timed("warmup.thread_pool_ms", timings):
+        thread_pool = get_thread_pool()
+        if thread_pool:
+            thread_pool.replenish()
+    if os.getenv("LOCAL_CONTEXT_ENABLED", "false").lower() == "true":
+        with timed("warmup.local_index_ms", timings):
+            get_embeddings_client()
+            get_vector_index()
+    return timings
+
+
+def run_probe() -> Dict[str, Any]:
+    """
+    Run a minimal synthetic chat and record its end-to-end and per-stage latency.
+
+    Stage histograms are probe.<stage>_ms; the probe thread is deleted afterwards.
+    """
+    agents_client = get_project_client().agents
+    agent = get_or_create_agent()
+    budget = TokenBudget(max_completion_tokens=int(os.getenv("PROBE_MAX_COMPLETION_TOKENS", "16")))
+    timings: Dict[str, float] = {}
+
+    with request_deadline(Deadline(float(os.getenv("PROBE_TIMEOUT_SECONDS", "60")))):
+        with timed("probe.total_ms", timings):
+            with timed("probe.start_run_ms", timings):
+                run = start_run(agents_client, agent.id,
+                                os.getenv("PROBE_PROMPT", "Reply with the single word: pong"),
+                                budget=budget)
+            try:
+                with timed("probe.run_ms", timings):
+                    run = wait_for_run(agents_client, run.thread_id, run)
+                with timed("probe.read_reply_ms", timings):
+                    next(iter(agents_client.messages.list(
+                        thread_id=run.thread_id, limit=1, order="desc")), None)
+            finally:
+                agents_client.threads.delete(run.thread_id)
+
+    METRICS.counter("probe.success" if run.status in ("completed", "incomplete")
+                    else "probe.failures").inc()
+    return {"status": run.status, "run_id": run.id, "timings_ms": timings}
+
+
+@app.timer_trigger(schedule="%WARMUP_SCHEDULE%", arg_name="timer", run_on_startup=True, use_monitor=False)
+def warm_up_instance(timer: func.TimerRequest) -> None:
+    """On WARMUP_SCHEDULE and at startup, warm the instance. Makes no billable calls."""
+    try:
+        timings = warm_up()
+        logger.info("Warm-up completed: %s", timings)
+    except Exception as e:
+        METRICS.counter("warmup.failures").inc()
+        logger.error("Warm-up failed: %s", e)
+
+
+@app.timer_trigger(schedule="%PROBE_SCHEDULE%", arg_name="timer", run_on_startup=False, use_monitor=False)
+def run_latency_probe(timer: func.TimerRequest) -> None:
+    """On PROBE_SCHEDULE when PROBE_ENABLED=true, run the billable synthetic chat probe."""
+    if os.getenv("PROBE_ENABLED", "false").lower() != "true":
+        return
+
+    try:
+        probe = run_probe()
+        logger.info("Probe %s in %s ms: %s", probe["status"],
+                    probe["timings_ms"].get("total_ms"), probe["timings_ms"])
+    except Exception as e:
+        METRICS.counter("probe.failures").inc()
+        logger.error("Probe failed: %s", e)
+
+
 @app.route(route="demo", auth_level=func.AuthLevel.ANONYMOUS)
 def demo_agent_capabilities(req: func.HttpRequest) -> func.HttpResponse:
     """
     One-click demonstration of the entire integration.
     Shows creating an agent, having a conversation, and using tools.
     """
-    logger.info("Running agent capabilities demo")
+    with bind_request(req.headers) as request_context, count_upstream_calls() as upstream_calls, \
+            request_deadline(Deadline.from_request(req.headers)):
+        logger.info("Running agent capabilities demo")
+        response = run_demo()
+    response.headers[CORRELATION_HEADER] = request_context.correlation_id
+    return compress_response(
+        req, report_upstream_calls(response, "demo", upstream_calls.value), "demo")
+
+
+def run_demo() -> func.HttpResponse:
+    """Run the demo steps and collect their results"""
 
     demo_results = {
         "demo": "Complete Agent Integration Showcase",
@@ -603,50 +2285,31 @@ def demo_agent_capabilities(req: func.HttpRequest) -> func.HttpResponse:
             "name": demo_agent.name
         }
 
-        # Step 2: Create a conversation thread
+        # Step 2: Create a conversation thread and ask a general question
         demo_results["steps"].append(
             {"step": 2, "action": "Creating conversation thread"})
-        thread = agents_client.threads.create()
-        demo_results["thread_id"] = thread.id
-
-        # Step 3: Ask a general question
         demo_results["steps"].append(
             {"step": 3, "action": "Asking general question"})
 
-        msg1 = agents_client.messages.create(
-            thread_id=thread.id,
-            role="user",
-            content="Hello! What can you help me with today?"
-        )
-
-        run1 = agents_client.runs.create(
-            thread_id=thread.id,
-            agent_id=demo_agent.id
-        )
+        run1 = start_run(agents_client, demo_agent.id,
+                         "Hello! What can you help me with today?")
+        thread_id = run1.thread_id
+        demo_results["thread_id"] = thread_id
 
-        while run1.status in ["queued", "in_progress"]:
-            run1 = agents_client.runs.get(thread_id=thread.id, run_id=run1.id)
+        run1 = wait_for_run(agents_client, thread_id, run1)
 
         # Step 4: Ask for a calculation
         demo_results["steps"].append(
             {"step": 4, "action": "Requesting calculation with code interpreter"})
 
-        msg2 = agents_client.messages.create(
-            thread_id=thread.id,
-            role="user",
-            content="Calculate the factorial of 10 and explain what factorial means"
-        )
-
-        run2 = agents_client.runs.create(
-            thread_id=thread.id,
-            agent_id=demo_agent.id
-        )
+        run2 = start_run(agents_client, demo_agent.id,
+                         "Calculate the factorial of 10 and explain what factorial means",
+                         thread_id)
 
-        while run2.status in ["queued", "in_progress"]:
-            run2 = agents_client.runs.get(thread_id=thread.id, run_id=run2.id)
+        run2 = wait_for_run(agents_client, thread_id, run2)
 
         # Get all messages
-        messages = agents_client.messages.list(thread_id=thread.id)
+        messages = agents_client.messages.list(thread_id=thread_id)
 
         conversation = []
         for msg in reversed(list(messages)):
@@ -679,6 +2342,21 @@ def demo_agent_capabilities(req: func.HttpRequest) -> func.HttpResponse:
             status_code=200,
         )
 
+    except DeadlineExceeded as e:
+        if "agent_created" in demo_results:
+            agents_client.delete_agent(demo_results["agent_created"]["id"])
+            demo_results["cleanup"] = "Demo agent deleted"
+
+        demo_results["error"] = str(e)
+        demo_results["status"] = "timeout"
+        demo_results["partial"] = {**e.progress, **current_deadline().summary()}
+
+        return func.HttpResponse(
+            json.dumps(demo_results, indent=2),
+            mimetype="application/json",
+            status_code=504,
+        )
+
     except Exception as e:
         demo_results["error"] = str(e)
         demo_results["status"] = "error"
@@ -0,0 +1,259 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+"""
+Shared, tunable HTTP transport for every Azure SDK client in the function app.
+
+All clients built with sdk_client_options() send requests through one
+requests.Session, so they share a single connection pool per host and pay
+for TCP and TLS setup once per connection instead of once per client.
+Every attempt is also counted against the invocation that made it, see
+count_upstream_calls().
+
+Settings (environment variables):
+    HTTP_POOL_CONNECTIONS          number of per-host pools to cache (default 10)
+    HTTP_POOL_MAXSIZE              connections kept per host (default 32)
+    HTTP_KEEP_ALIVE                "false" sends Connection: close (default "true")
+    HTTP_TCP_KEEPALIVE_SECONDS     idle seconds before TCP keepalive probes (default 60, 0 disables)
+    HTTP_CONNECT_TIMEOUT_SECONDS   connect timeout (default 10)
+    HTTP_READ_TIMEOUT_SECONDS      read timeout (default 120)
+    HTTP_PROXY_URL                 proxy for http and https traffic (default: environment)
+    SDK_CASSETTE                   cassette file to record to or replay from (see cassettes.py)
+    SDK_CASSETTE_MODE              "record" or "replay" (default "replay")
+    SDK_CASSETTE_TIMING            replay delay as a multiple of recorded durations (default 1)
+"""
+
+import os
+import atexit
+import socket
+import threading
+import requests
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional, Any
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from azure.core.pipeline.policies import SansIOHTTPPolicy
+from azure.core.pipeline.transport import RequestsTransport
+
+from cassettes import Cassette, RecordingAdapter, ReplayAdapter
+
+_shared_transport = None
+_shared_transport_lock = threading.Lock()
+
+
+class ConnectionStats:
+    """Thread-safe counters for requests and newly opened connections"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+        self.new_tls_connections = 0
+
+    def record_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def record_new_connection(self, scheme: str) -> None:
+        with self._lock:
+            self.new_connections += 1
+            if scheme == "https":
+                self.new_tls_connections += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            reused = max(0, self.requests - self.new_connections)
+            return {
+                "requests": self.requests,
+                "new_connections": self.new_connections,
+                "reused_connections": reused,
+                "tls_handshakes": self.new_tls_connections,
+                "reuse_ratio": round(reused / self.requests, 4) if self.requests else 0.0,
+            }
+
+
+_connection_stats = ConnectionStats()
+
+
+class UpstreamCallCount:
+    """Number of HTTP attempts made while handling one function invocation"""
+
+    def __init__(self):
+        self.value = 0
+
+
+_upstream_calls: ContextVar[Optional[UpstreamCallCount]] = ContextVar(
+    "upstream_calls", default=None)
+
+
+class UpstreamCallPolicy(SansIOHTTPPolicy):
+    """Per-retry policy that counts every attempt against the active invocation"""
+
+    def on_request(self, request) -> None:
+        count = _upstream_calls.get()
+        if count is not None:
+            count.value += 1
+
+
+@contextmanager
+def count_upstream_calls() -> Iterator[UpstreamCallCount]:
+    """Count SDK round trips (retries included) made inside the block"""
+    count = UpstreamCallCount()
+    token = _upstream_calls.set(count)
+    try:
+        yield count
+    finally:
+        _upstream_calls.reset(token)
+
+
+def _counting_pool(base: type, stats: ConnectionStats) -> type:
+    """Subclass a urllib3 pool so every socket it opens is counted"""
+
+    class CountingConnection(base.ConnectionCls):
+        # urllib3 reopens a dropped pooled connection in place, so count
+        # connect() calls rather than connection objects
+        def connect(self):
+            stats.record_new_connection(base.scheme)
+            return super().connect()
+
+    class CountingPool(base):
+        ConnectionCls = CountingConnection
+
+    CountingPool.__name__ = f"Counting{base.__name__}"
+    return CountingPool
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter with TCP keepalive and connection accounting"""
+
+    def __init__(self, stats: ConnectionStats, tcp_keepalive_seconds: int = 60, **kwargs):
+        self.stats = stats
+        self.tcp_keepalive_seconds = tcp_keepalive_seconds
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        if self.tcp_keepalive_seconds > 0:
+            options = list(HTTPConnectionPool.ConnectionCls.default_socket_options)
+            options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+            if hasattr(socket, "TCP_KEEPIDLE"):
+                options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE,
+                                self.tcp_keepalive_seconds))
+            pool_kwargs["socket_options"] = options
+
+        super().init_poolmanager(connections, maxsize, block=block, **pool_kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _counting_pool(HTTPConnectionPool, self.stats),
+            "https": _counting_pool(HTTPSConnectionPool, self.stats),
+        }
+
+    def send(self, request, **kwargs):
+        self.stats.record_request()
+        return super().send(request, **kwargs)
+
+
+def build_transport(
+    pool_connections: int = 10,
+    pool_maxsize: int = 32,
+    keep_alive: bool = True,
+    tcp_keepalive_seconds: int = 60,
+    connect_timeout: float = 10.0,
+    read_timeout: float = 120.0,
+    connection_verify: Any = True,
+    stats: Optional[ConnectionStats] = None,
+    cassette: Optional[Cassette] = None,
+    cassette_mode: str = "replay"
+) -> RequestsTransport:
+    """
+    Build a RequestsTransport over a pooled, instrumented session.
+
+    With a cassette, requests are recorded to it or, in replay mode, served
+    from it without opening connections.
+    """
+    stats = stats or _connection_stats
+    session = requests.Session()
+
+    # Retries belong to the SDK pipeline's RetryPolicy, not urllib3
+    adapter = PooledHTTPAdapter(
+        stats, tcp_keepalive_seconds=tcp_keepalive_seconds,
+        pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+        max_retries=Retry(total=False, redirect=False, raise_on_status=False))
+    if cassette is not None and cassette_mode == "record":
+        adapter = RecordingAdapter(adapter, cassette)
+    elif cassette is not None:
+        adapter = ReplayAdapter(cassette)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    if not keep_alive:
+        session.headers["Connection"] = "close"
+
+    return RequestsTransport(
+        session=session, session_owner=False,
+        connection_timeout=connect_timeout, read_timeout=read_timeout,
+        connection_verify=connection_verify)
+
+
+def get_shared_transport() -> RequestsTransport:
+    """Return the process-wide transport, building it from settings once"""
+    global _shared_transport
+
+    if _shared_transport:
+        return _shared_transport
+
+    with _shared_transport_lock:
+        if not _shared_transport:
+            _shared_transport = build_transport(
+                pool_connections=int(os.getenv("HTTP_POOL_CONNECTIONS", "10")),
+                pool_maxsize=int(os.getenv("HTTP_POOL_MAXSIZE", "32")),
+                keep_alive=os.getenv("HTTP_KEEP_ALIVE", "true").lower() == "true",
+                tcp_keepalive_seconds=int(os.getenv("HTTP_TCP_KEEPALIVE_SECONDS", "60")),
+                connect_timeout=float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "10")),
+                read_timeout=float(os.getenv("HTTP_READ_TIMEOUT_SECONDS", "120")),
+                cassette=open_cassette(),
+                cassette_mode=cassette_mode() or "replay")
+    return _shared_transport
+
+
+def cassette_mode() -> Optional[str]:
+    """"record" or "replay" when SDK_CASSETTE is set, else None"""
+    if not os.getenv("SDK_CASSETTE"):
+        return None
+    return os.getenv("SDK_CASSETTE_MODE", "replay").lower()
+
+
+def open_cassette() -> Optional[Cassette]:
+    """The cassette named by SDK_CASSETTE; a recording is saved at exit"""
+    path = os.getenv("SDK_CASSETTE")
+    if not path:
+        return None
+    if cassette_mode() == "record":
+        cassette = Cassette(path, endpoint=os.getenv("AI_FOUNDRY_ENDPOINT"))
+        atexit.register(cassette.save)
+        return cassette
+    return Cassette.load(path, timing=float(os.getenv("SDK_CASSETTE_TIMING", "1")))
+
+
+def sdk_client_options() -> Dict[str, Any]:
+    """Keyword arguments that make an Azure SDK client use the shared transport"""
+    options: Dict[str, Any] = {
+        "transport": get_shared_transport(),
+        "per_retry_policies": [UpstreamCallPolicy()],
+    }
+
+    proxy_url = os.getenv("HTTP_PROXY_URL")
+    if proxy_url:
+        options["proxies"] = {"http": proxy_url, "https": proxy_url}
+
+    # With failover endpoints it is cheaper to move on than to keep retrying
+    retry_total = os.getenv("SDK_RETRY_TOTAL")
+    if retry_total:
+        options["retry_total"] = int(retry_total)
+
+    return options
+
+
+def connection_stats() -> Dict[str, Any]:
+    """Connection reuse counters for the shared transport"""
+    return _connection_stats.snapshot()
@@ -0,0 +1,169 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+"""
+Idempotency-Key support for requests that start agent runs.
+
+The first request with a key claims a record and stores the run it starts
+as soon as the run exists. A retry with the same key either replays the
+stored response, or, while the original is still going, attaches to the
+recorded run instead of posting the message again. Records are plain JSON
+dicts kept for IDEMPOTENCY_TTL_SECONDS in a pluggable backend; the default
+is a bounded in-memory LRU, which covers retries that land on the same
+instance. A shared backend can be plugged in as "package.module:Class".
+"""
+
+import abc
+import json
+import time
+import hashlib
+import importlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from metrics import METRICS, MetricsRegistry
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+
+def request_fingerprint(action: str, req_body: Dict[str, Any], params: Dict[str, str]) -> str:
+    """Hash of what was asked, so a key reused for a different request is caught"""
+    payload = json.dumps({"action": action, "body": req_body, "params": dict(params)},
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class IdempotencyBackend(abc.ABC):
+    """Storage for idempotency records; add must be atomic across callers"""
+
+    @abc.abstractmethod
+    def add(self, key: str, record: Dict[str, Any], ttl_seconds: float) -> Optional[Dict[str, Any]]:
+        """Store record unless the key is live; returns the existing record if it is"""
+
+    @abc.abstractmethod
+    def set(self, key: str, record: Dict[str, Any], ttl_seconds: float) -> None:
+        """Store record, replacing any live one"""
+
+    @abc.abstractmethod
+    def delete(self, key: str) -> None:
+        """Drop the record for key, if any"""
+
+
+class InMemoryIdempotencyBackend(IdempotencyBackend):
+    """Per-instance records with expiry, evicting the oldest beyond max_size"""
+
+    def __init__(self, max_size: int = 10000, clock: Callable[[], float] = time.monotonic):
+        self.max_size = max_size
+        self.clock = clock
+        self._records: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def _live(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._records.get(key)
+        if entry and entry[0] <= self.clock():
+            del self._records[key]
+            return None
+        return dict(entry[1]) if entry else None
+
+    def _store(self, key: str, record: Dict[str, Any], ttl_seconds: float) -> None:
+        self._records[key] = (self.clock() + ttl_seconds, dict(record))
+        self._records.move_to_end(key)
+        while len(self._records) > self.max_size:
+            self._records.popitem(last=False)
+
+    def add(self, key: str, record: Dict[str, Any], ttl_seconds: float) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            existing = self._live(key)
+            if existing is None:
+                self._store(key, record, ttl_seconds)
+            return existing
+
+    def set(self, key: str, record: Dict[str, Any], ttl_seconds: float) -> None:
+        with self._lock:
+            self._store(key, record, ttl_seconds)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._records.pop(key, None)
+
+
+def load_backend(spec: str, max_size: int) -> IdempotencyBackend:
+    """The in-memory backend for "memory", else the class named by "module:Class\""""
+    if spec == "memory":
+        return InMemoryIdempotencyBackend(max_size)
+
+    module_name, _, class_name = spec.partition(":")
+    if not class_name:
+        raise ValueError(f"IDEMPOTENCY_BACKEND must be 'memory' or 'module:Class', got {spec!r}")
+    backend = getattr(importlib.import_module(module_name), class_name)()
+    if not isinstance(backend, IdempotencyBackend):
+        raise ValueError(f"IDEMPOTENCY_BACKEND {spec!r} is not an IdempotencyBackend")
+    return backend
+
+
+class IdempotentRequest:
+    """A request's view of its key's record; claimed is True for the first use"""
+
+    def __init__(self, store: "IdempotencyStore", key: str, record: Dict[str, Any],
+                 claimed: bool = True):
+        self.store = store
+        self.key = key
+        self.record = record
+        self.claimed = claimed
+
+    @property
+    def completed(self) -> bool:
+        return self.record.get("status") == "completed"
+
+    @property
+    def has_run(self) -> bool:
+        return "run" in self.record
+
+    def record_run(self, **run: Any) -> None:
+        """Remember the started run so retries can attach to it"""
+        self.record["run"] = run
+        self.store.save(self.key, self.record)
+
+    def complete(self, status_code: int, body: str) -> None:
+        """Store the response that retries will replay"""
+        self.record["status"] = "completed"
+        self.record["response"] = {"status_code": status_code, "body": body}
+        self.store.save(self.key, self.record)
+
+    def release(self) -> None:
+        """Forget the key so a retry starts over"""
+        self.store.backend.delete(self.key)
+
+
+class IdempotencyStore:
+    """Claims keys and keeps their records for ttl_seconds"""
+
+    def __init__(self, backend: IdempotencyBackend, ttl_seconds: float = 86400,
+                 metrics: MetricsRegistry = METRICS):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.metrics = metrics
+
+    def begin(self, key: str, fingerprint: str) -> IdempotentRequest:
+        """
+        Claim a key for a request.
+
+        A new key gets a fresh in-progress record; a key already in use
+        returns its existing record with claimed=False.
+        """
+        record = {"fingerprint": fingerprint, "status": "in_progress", "created_at": time.time()}
+        existing = self.backend.add(key, record, self.ttl_seconds)
+        self.metrics.counter("idempotency.retries" if existing else "idempotency.keys").inc()
+        if existing:
+            return IdempotentRequest(self, key, existing, claimed=False)
+        return IdempotentRequest(self, key, record)
+
+    def save(self, key: str, record: Dict[str, Any]) -> None:
+        self.backend.set(key, record, self.ttl_seconds)
@@ -0,0 +1,154 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+"""
+Background-replenished pool of empty agent threads.
+
+A new conversation leases a thread that was created ahead of time instead
+of paying for threads.create() on the request path. A daemon thread keeps
+the pool at its target size, deletes pooled threads older than the maximum
+age, and the remaining idle threads are deleted on shutdown. The warm-up
+timer also calls replenish() directly, so a cold instance has a full pool
+before its first chat rather than filling it alongside the first requests.
+"""
+
+import time
+import logging
+import threading
+from collections import deque
+from typing import Callable, Optional
+
+from metrics import METRICS, MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+
+class PrewarmedThreadPool:
+    """Pool of pre-created, unused agent thread ids"""
+
+    def __init__(
+        self,
+        create_thread: Callable[[], str],
+        delete_thread: Callable[[str], None],
+        target_size: int = 4,
+        max_age_seconds: float = 3600.0,
+        refill_interval_seconds: float = 5.0,
+        metrics: MetricsRegistry = METRICS
+    ):
+        self.create_thread = create_thread
+        self.delete_thread = delete_thread
+        self.target_size = target_size
+        self.max_age_seconds = max_age_seconds
+        self.refill_interval_seconds = refill_interval_seconds
+        self.metrics = metrics
+
+        # (thread_id, created_at monotonic); newest on the right
+        self._idle = deque()
+        self._expired = []
+        self._lock = threading.Lock()
+        # One refill at a time, so the worker and warm-up never overshoot the target
+        self._replenish_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+
+    @property
+    def depth(self) -> int:
+        return len(self._idle)
+
+    def start(self) -> None:
+        """Start the background replenisher"""
+        if self._worker:
+            return
+        self._worker = threading.Thread(
+            target=self._run, name="prewarmed-thread-pool", daemon=True)
+        self._worker.start()
+
+    def lease(self) -> Optional[str]:
+        """Take a pooled thread id, or None when the pool is empty"""
+        started = time.perf_counter()
+        now = time.monotonic()
+        thread_id = None
+
+        with self._lock:
+            while self._idle:
+                candidate, created_at = self._idle.pop()
+                if now - created_at < self.max_age_seconds:
+                    thread_id = candidate
+                    break
+                self._expired.append(candidate)
+            depth = len(self._idle)
+
+        self.metrics.histogram("thread_pool.lease_ms").observe(
+            (time.perf_counter() - started) * 1000)
+        self.metrics.gauge("thread_pool.depth").set(depth)
+        self.metrics.counter(
+            "thread_pool.hits" if thread_id else "thread_pool.misses").inc()
+
+        self._wake.set()
+        return thread_id
+
+    def replenish(self) -> None:
+        """Delete expired threads and top the pool up to its target size"""
+        with self._replenish_lock:
+            self._replenish()
+
+    def _replenish(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            while self._idle and now - self._idle[0][1] >= self.max_age_seconds:
+                self._expired.append(self._idle.popleft()[0])
+            expired, self._expired = self._expired, []
+            missing = self.target_size - len(self._idle)
+
+        for thread_id in expired:
+            self._delete(thread_id)
+        if expired:
+            self.metrics.counter("thread_pool.expired").inc(len(expired))
+
+        for _ in range(max(0, missing)):
+            if self._stopped.is_set():
+                break
+            started = time.perf_counter()
+            try:
+                thread_id = self.create_thread()
+            except Exception as e:
+                logger.warning("Failed to pre-create thread: %s", e)
+                self.metrics.counter("thread_pool.create_errors").inc()
+                break
+            self.metrics.histogram("thread_pool.create_ms").observe(
+                (time.perf_counter() - started) * 1000)
+            with self._lock:
+                self._idle.append((thread_id, time.monotonic()))
+
+        self.metrics.gauge("thread_pool.depth").set(self.depth)
+
+    def shutdown(self) -> None:
+        """Stop replenishing and delete every idle thread"""
+        self._stopped.set()
+        self._wake.set()
+        if self._worker and self._worker is not threading.current_thread():
+            self._worker.join(timeout=self.refill_interval_seconds)
+
+        with self._lock:
+            idle = [thread_id for thread_id, _ in self._idle] + self._expired
+            self._idle.clear()
+            self._expired = []
+
+        for thread_id in idle:
+            self._delete(thread_id)
+        self.metrics.gauge("thread_pool.depth").set(0)
+        logger.info("Thread pool shut down, reclaimed %s threads", len(idle))
+
+    def _delete(self, thread_id: str) -> None:
+        try:
+            self.delete_thread(thread_id)
+        except Exception as e:
+            logger.warning("Failed to delete pooled thread %s: %s", thread_id, e)
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self.replenish()
+            self._wake.wait(self.refill_interval_seconds)
+            self._wake.clear()
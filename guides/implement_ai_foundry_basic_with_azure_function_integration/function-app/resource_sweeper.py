@@ -0,0 +1,225 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+"""
+Garbage collector for agents and threads the function app leaves behind.
+
+Temporary agents are matched by name prefix (code-interpreter-*, demo-agent-*)
+and only reclaimed once older than a grace period, so agents still in use by
+an in-flight request are left alone. Threads are reclaimed only when the app
+created them (owner metadata), their recorded lease (lease_until metadata)
+has expired and their last message is older than the idle limit.
+
+Deletes run on a small thread pool in batches behind a shared rate limit,
+and dry_run reports what would be reclaimed without deleting anything.
+With failover endpoints each endpoint is swept on its own, since resources
+live where they were created, and merge_reports combines the results.
+"""
+
+import time
+import logging
+import itertools
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Any
+
+from metrics import METRICS, MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+THREAD_OWNER = "azure-function-app"
+TEMP_AGENT_PREFIXES = ("code-interpreter-", "demo-agent-")
+
+
+def thread_metadata(lease_seconds: float) -> Dict[str, str]:
+    """Metadata that marks a thread as owned by the app and leased until a time"""
+    return {
+        "owner": THREAD_OWNER,
+        "lease_until": str(int(time.time() + lease_seconds)),
+    }
+
+
+def to_epoch(value: Any) -> Optional[float]:
+    """Normalize SDK timestamps (datetime or epoch seconds) to epoch seconds"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return float(value)
+
+
+class RateLimiter:
+    """Spaces calls evenly so at most rate_per_second start each second"""
+
+    def __init__(self, rate_per_second: float):
+        self.interval = 1.0 / rate_per_second if rate_per_second > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self._next - now)
+            self._next = max(now, self._next) + self.interval
+        if wait:
+            time.sleep(wait)
+
+
+class ResourceSweeper:
+    """Finds and deletes leaked temporary agents and idle threads"""
+
+    def __init__(
+        self,
+        agents_client: Any,
+        agent_prefixes: Tuple[str, ...] = TEMP_AGENT_PREFIXES,
+        agent_max_age_seconds: float = 900.0,
+        thread_idle_seconds: float = 86400.0,
+        max_concurrency: int = 4,
+        deletes_per_second: float = 5.0,
+        batch_size: int = 50,
+        max_scan: int = 5000,
+        dry_run: bool = False,
+        metrics: MetricsRegistry = METRICS,
+        clock: Callable[[], float] = time.time
+    ):
+        self.agents_client = agents_client
+        self.agent_prefixes = agent_prefixes
+        self.agent_max_age_seconds = agent_max_age_seconds
+        self.thread_idle_seconds = thread_idle_seconds
+        self.max_concurrency = max_concurrency
+        self.batch_size = batch_size
+        self.max_scan = max_scan
+        self.dry_run = dry_run
+        self.metrics = metrics
+        self.clock = clock
+        self.rate_limiter = RateLimiter(deletes_per_second)
+
+    def find_agents(self) -> Tuple[int, List[Dict[str, Any]]]:
+        """Temporary agents past their grace period, plus how many were scanned"""
+        now = self.clock()
+        scanned = 0
+        candidates = []
+        for agent in itertools.islice(self.agents_client.list_agents(limit=100), self.max_scan):
+            scanned += 1
+            if not (agent.name or "").startswith(self.agent_prefixes):
+                continue
+            created_at = to_epoch(getattr(agent, "created_at", None))
+            if created_at is None or now - created_at < self.agent_max_age_seconds:
+                continue
+            candidates.append({"id": agent.id, "name": agent.name,
+                               "age_seconds": int(now - created_at)})
+        return scanned, candidates
+
+    def find_threads(self) -> Tuple[int, List[Dict[str, Any]]]:
+        """App-owned threads whose lease expired and that have been idle too long"""
+        now = self.clock()
+        scanned = 0
+        candidates = []
+        for thread in itertools.islice(self.agents_client.threads.list(limit=100), self.max_scan):
+            scanned += 1
+            metadata = getattr(thread, "metadata", None) or {}
+            if metadata.get("owner") != THREAD_OWNER:
+                continue
+            if float(metadata.get("lease_until") or 0) > now:
+                continue
+            created_at = to_epoch(getattr(thread, "created_at", None)) or 0
+            if now - created_at < self.thread_idle_seconds:
+                continue
+
+            last_active = self._last_activity(thread.id) or created_at
+            if now - last_active < self.thread_idle_seconds:
+                continue
+            candidates.append({"id": thread.id, "idle_seconds": int(now - last_active)})
+        return scanned, candidates
+
+    def sweep(self) -> Dict[str, Any]:
+        """Find and reclaim leaked resources, returning a report"""
+        started = time.monotonic()
+        report: Dict[str, Any] = {"dry_run": self.dry_run}
+
+        for kind, find, delete in (
+            ("agents", self.find_agents, self.agents_client.delete_agent),
+            ("threads", self.find_threads, self.agents_client.threads.delete),
+        ):
+            try:
+                scanned, candidates = find()
+            except Exception as e:
+                logger.error("Sweeper failed to scan %s: %s", kind, e)
+                report[kind] = {"error": str(e)[:200]}
+                continue
+
+            deleted, failed = ([], []) if self.dry_run else self._delete_all(
+                [candidate["id"] for candidate in candidates], delete)
+            report[kind] = {
+                "scanned": scanned,
+                "candidates": candidates,
+                "deleted": len(deleted),
+                "failed": failed,
+            }
+            self.metrics.counter(f"sweeper.{kind}_deleted").inc(len(deleted))
+
+        report["duration_seconds"] = round(time.monotonic() - started, 3)
+        return report
+
+    def _last_activity(self, thread_id: str) -> Optional[float]:
+        self.rate_limiter.acquire()
+        for message in self.agents_client.messages.list(
+                thread_id=thread_id, limit=1, order="desc"):
+            return to_epoch(getattr(message, "created_at", None))
+        return None
+
+    def _delete_all(self, ids: List[str], delete: Callable[[str], Any]) -> Tuple[List[str], List[Dict[str, str]]]:
+        deleted: List[str] = []
+        failed: List[Dict[str, str]] = []
+
+        def delete_one(resource_id: str) -> None:
+            self.rate_limiter.acquire()
+            try:
+                delete(resource_id)
+                deleted.append(resource_id)
+            except Exception as e:
+                failed.append({"id": resource_id, "error": str(e)[:200]})
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency,
+                                thread_name_prefix="sweeper") as executor:
+            for batch in _batches(ids, self.batch_size):
+                list(executor.map(delete_one, batch))
+                logger.info("Sweeper deleted %s/%s", len(deleted), len(ids))
+        return deleted, failed
+
+
+def merge_reports(reports: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Combine sweep reports keyed by endpoint name into one.
+
+    Counts are summed and each candidate and failure names its endpoint;
+    scan errors are kept per endpoint under the kind's "errors".
+    """
+    merged: Dict[str, Any] = {
+        "dry_run": all(report.get("dry_run") for report in reports.values()),
+        "endpoints": list(reports),
+    }
+    for kind in ("agents", "threads"):
+        summary: Dict[str, Any] = {"scanned": 0, "candidates": [], "deleted": 0, "failed": []}
+        for endpoint, report in reports.items():
+            part = report.get(kind, {})
+            if "error" in part:
+                summary.setdefault("errors", {})[endpoint] = part["error"]
+                continue
+            summary["scanned"] += part["scanned"]
+            summary["deleted"] += part["deleted"]
+            summary["candidates"] += [dict(item, endpoint=endpoint) for item in part["candidates"]]
+            summary["failed"] += [dict(item, endpoint=endpoint) for item in part["failed"]]
+        merged[kind] = summary
+    merged["duration_seconds"] = round(
+        sum(report.get("duration_seconds", 0) for report in reports.values()), 3)
+    return merged
+
+
+def _batches(items: List[str], size: int) -> Iterable[List[str]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
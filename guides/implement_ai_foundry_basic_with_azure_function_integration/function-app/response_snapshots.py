@@ -0,0 +1,126 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+"""
+Cached response snapshots with strong ETags for polled GET routes.
+
+Dashboards poll the agent list and health check every few seconds. A
+snapshot keeps the last successful response body for SNAPSHOT_TTL_SECONDS
+together with a strong ETag (a hash of the body), so a poll inside that
+window makes no upstream calls, and a client sending the ETag back in
+If-None-Match gets an empty 304 instead of the body. Snapshots are dropped
+as soon as the app itself creates or deletes an agent; changes made
+elsewhere show up once the TTL runs out.
+
+List options come from anonymous callers, so the store is bounded: at most
+max_entries snapshots are kept, least recently used first out, and expired
+snapshots are dropped whenever a lookup misses.
+"""
+
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import azure.functions as func
+
+from compression import base_etag, etag_for_encoding
+from metrics import METRICS, MetricsRegistry
+
+
+def strong_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    """If-None-Match weak comparison, ignoring content-coding suffixes"""
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    wanted = base_etag(etag)
+    return any(base_etag(tag) == wanted for tag in if_none_match.split(","))
+
+
+def not_modified(if_none_match: Optional[str], response: func.HttpResponse,
+                 metrics: MetricsRegistry = METRICS,
+                 encoding: Optional[str] = None) -> func.HttpResponse:
+    """
+    An empty 304 when the client already has this representation.
+
+    encoding is the content coding the 200 would have been sent with; the
+    304 then echoes that representation's ETag rather than the base one.
+    """
+    etag = response.headers.get("ETag")
+    if response.status_code != 200 or not etag_matches(if_none_match, etag):
+        return response
+    metrics.counter("responses.not_modified").inc()
+    headers = {name: value for name, value in response.headers.items()
+               if name.lower() not in ("content-type", "content-length")}
+    if encoding:
+        headers["ETag"] = etag_for_encoding(etag, encoding)
+    return func.HttpResponse(status_code=304, headers=headers)
+
+
+class ResponseSnapshots:
+    """Last successful response per key, reused for ttl_seconds"""
+
+    def __init__(self, ttl_seconds: float = 10.0, max_entries: int = 256,
+                 metrics: MetricsRegistry = METRICS, clock: Callable[[], float] = time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.metrics = metrics
+        self.clock = clock
+        # key -> (taken at, body, mimetype, headers), least recently used first
+        self._snapshots: "OrderedDict[str, Tuple[float, bytes, str, Dict[str, str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._snapshots)
+
+    def get(self, key: str, build: Callable[[], func.HttpResponse]) -> func.HttpResponse:
+        """
+        The snapshot for key, or build()'s response when there is none.
+
+        Only 200 responses are kept. Every response returned carries the
+        snapshot's ETag and asks clients to revalidate.
+        """
+        now = self.clock()
+        with self._lock:
+            snapshot = self._snapshots.get(key)
+            if snapshot and now - snapshot[0] < self.ttl_seconds:
+                self._snapshots.move_to_end(key)
+            else:
+                snapshot = None
+                for expired in [k for k, v in self._snapshots.items() if now - v[0] >= self.ttl_seconds]:
+                    del self._snapshots[expired]
+        if snapshot:
+            self.metrics.counter("snapshots.hits").inc()
+            _, body, mimetype, headers = snapshot
+            return func.HttpResponse(body, status_code=200, mimetype=mimetype,
+                                     headers=dict(headers))
+
+        self.metrics.counter("snapshots.misses").inc()
+        response = build()
+        if response.status_code != 200 or not self.ttl_seconds:
+            return response
+
+        body = response.get_body()
+        response.headers["ETag"] = strong_etag(body)
+        response.headers["Cache-Control"] = "no-cache"
+        with self._lock:
+            self._snapshots[key] = (self.clock(), body, response.mimetype, dict(response.headers))
+            self._snapshots.move_to_end(key)
+            while len(self._snapshots) > self.max_entries:
+                self._snapshots.popitem(last=False)
+                self.metrics.counter("snapshots.evictions").inc()
+        return response
+
+    def invalidate(self, prefixes: Iterable[str] = ("",)) -> None:
+        """Drop the snapshots whose key starts with any of prefixes (all by default)"""
+        prefixes = tuple(prefixes)
+        with self._lock:
+            for key in [key for key in self._snapshots if key.startswith(prefixes)]:
+                del self._snapshots[key]
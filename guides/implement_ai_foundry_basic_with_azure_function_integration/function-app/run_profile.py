@@ -0,0 +1,143 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+"""
+Run-step profiles: where a run's wall time went.
+
+A run's status and usage say nothing about whether a slow answer came from
+waiting in the queue, model generation or a tool. The run steps do: each
+message_creation step is model time, and each tool_calls step is time spent
+in code interpreter, file search or a function tool (for functions, that
+includes the app computing and submitting the output). Whatever the steps
+do not cover is reported as "other".
+
+The service timestamps runs and steps in whole seconds, so single profiles
+are coarse; the runs.queued_ms and runs.step_ms.<stage> histograms show the
+systematic picture across many runs. Only the caller that ran the run passes
+a registry, so re-fetching a profile does not count its run twice.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from metrics import MetricsRegistry
+
+# Stages in report order; tool stages are named after the tool call type, and
+# tools not listed here (Bing grounding, Azure AI Search, ...) are added after
+STAGES = ("queued", "model", "code_interpreter", "file_search", "function", "other")
+END_FIELDS = ("completed_at", "failed_at", "cancelled_at", "expired_at")
+
+
+def _seconds(value: Any) -> Optional[float]:
+    """A datetime or Unix timestamp as epoch seconds"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return float(value)
+
+
+def _duration_ms(item: Any, start_field: str = "created_at") -> Optional[float]:
+    start = _seconds(getattr(item, start_field, None))
+    end = next((_seconds(getattr(item, field, None)) for field in END_FIELDS
+                if getattr(item, field, None) is not None), None)
+    if start is None or end is None:
+        return None
+    return max(0.0, (end - start) * 1000)
+
+
+def _text(value: Any) -> Optional[str]:
+    """SDK enum members and plain strings alike as their string value"""
+    return None if value is None else str(getattr(value, "value", value))
+
+
+def _field(value: Any, name: str) -> Any:
+    return value.get(name) if isinstance(value, dict) else getattr(value, name, None)
+
+
+def step_tools(step: Any) -> List[Dict[str, str]]:
+    """The type and name of each tool call in a tool_calls step"""
+    tools = []
+    for call in _field(step.step_details, "tool_calls") or []:
+        call_type = _text(_field(call, "type"))
+        function = _field(call, "function")
+        tools.append({"type": call_type,
+                      "name": _field(function, "name") if function is not None else call_type})
+    return tools
+
+
+def step_stage(step: Any) -> str:
+    if _text(step.type) == "message_creation":
+        return "model"
+    tools = step_tools(step)
+    return tools[0]["type"] if tools and tools[0]["type"] else "other"
+
+
+def step_usage(step: Any) -> Optional[Dict[str, int]]:
+    usage = getattr(step, "usage", None)
+    if usage is None:
+        return None
+    return {field: _field(usage, field) or 0
+            for field in ("prompt_tokens", "completion_tokens", "total_tokens")}
+
+
+def profile_run(run: Any, steps: Iterable[Any],
+                metrics: Optional[MetricsRegistry] = None) -> Dict[str, Any]:
+    """
+    Per-step timings and the share of the run's wall time spent in each stage.
+
+    steps are in creation order. With metrics, finished step durations are
+    observed on the runs.step_ms.<stage> histograms and the queue wait on
+    runs.queued_ms.
+    """
+    stages = {stage: 0.0 for stage in STAGES if stage != "other"}
+    if getattr(run, "started_at", None) is not None:
+        queued = max(0.0, (_seconds(run.started_at) - _seconds(run.created_at)) * 1000)
+        stages["queued"] = queued
+        if metrics:
+            metrics.histogram("runs.queued_ms").observe(queued)
+
+    profiled = []
+    for step in steps:
+        stage = step_stage(step)
+        duration = _duration_ms(step)
+        if duration is not None:
+            stages[stage] = stages.get(stage, 0.0) + duration
+            if metrics:
+                metrics.histogram(f"runs.step_ms.{stage}").observe(duration)
+        profiled.append({
+            "id": step.id,
+            "type": _text(step.type),
+            "stage": stage,
+            "status": _text(step.status),
+            "tools": step_tools(step),
+            "duration_ms": duration,
+            "usage": step_usage(step),
+        })
+
+    total = _duration_ms(run)
+    # Time neither the queue nor a step accounts for; added last to end the report
+    stages["other"] = max(0.0, total - sum(stages.values())) if total is not None else 0.0
+    if metrics and total is not None:
+        metrics.histogram("runs.profiled_ms").observe(total)
+
+    return {
+        "run_id": run.id,
+        "status": _text(run.status),
+        "duration_ms": total,
+        "steps": profiled,
+        "stages": {
+            stage: {"ms": round(ms, 1),
+                    "percent": round(100 * ms / total, 1) if total else None}
+            for stage, ms in stages.items() if ms or stage in ("queued", "model", "other")
+        },
+    }
+
+
+def fetch_run_profile(agents_client: Any, thread_id: str, run_id: str,
+                      metrics: Optional[MetricsRegistry] = None) -> Dict[str, Any]:
+    """Fetch a run and its steps and profile them, observing them on metrics if given"""
+    run = agents_client.runs.get(thread_id=thread_id, run_id=run_id)
+    steps = agents_client.run_steps.list(thread_id=thread_id, run_id=run_id, limit=100, order="asc")
+    return profile_run(run, steps, metrics)
@@ -0,0 +1,153 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+"""
+Structured logging with a per-request correlation ID.
+
+Each invocation binds a correlation ID once: the X-Correlation-ID header,
+else the trace id of the W3C traceparent header, else a fresh one. A log
+record factory stamps it on every record, so the thread, run and message
+steps of one request can be joined in Application Insights. Log calls pass
+%-style arguments, so records below the configured level are never built
+or formatted.
+
+High-volume debug events (one per run poll) are sampled per request: the
+decision is taken once when the ID is bound, using LOG_DEBUG_SAMPLE_RATE,
+so a sampled request keeps all of its polls.
+"""
+
+import os
+import re
+import json
+import uuid
+import random
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Iterator, Mapping, Optional
+
+CORRELATION_HEADER = "X-Correlation-ID"
+TRACEPARENT_PATTERN = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-[0-9a-f]{16}-[0-9a-f]{2}$")
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s [%(correlation_id)s] %(message)s"
+
+# Attributes every LogRecord has; anything else was passed through extra=
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {
+    "message", "asctime", "correlation_id"}
+
+
+class RequestContext:
+    """Correlation ID and debug sampling decision for one invocation"""
+
+    def __init__(self, correlation_id: str, sampled: bool):
+        self.correlation_id = correlation_id
+        self.sampled = sampled
+
+
+_current_request: ContextVar[Optional[RequestContext]] = ContextVar(
+    "current_request", default=None)
+
+
+def debug_sample_rate() -> float:
+    return float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.1"))
+
+
+def correlation_id_from(headers: Mapping[str, str]) -> str:
+    """The caller's correlation ID, its trace id, or a new ID"""
+    correlation_id = (headers.get(CORRELATION_HEADER) or "").strip()
+    if correlation_id:
+        return correlation_id[:128]
+
+    match = TRACEPARENT_PATTERN.match((headers.get("traceparent") or "").strip())
+    if match:
+        return match.group(1)
+    return uuid.uuid4().hex
+
+
+@contextmanager
+def bind_request(headers: Mapping[str, str],
+                 sample_rate: Optional[float] = None) -> Iterator[RequestContext]:
+    """Bind a correlation ID and sampling decision to the enclosed block"""
+    rate = debug_sample_rate() if sample_rate is None else sample_rate
+    context = RequestContext(correlation_id_from(headers), random.random() < rate)
+    token = _current_request.set(context)
+    try:
+        yield context
+    finally:
+        _current_request.reset(token)
+
+
+def current_correlation_id() -> Optional[str]:
+    """The bound correlation ID, or None outside a request"""
+    context = _current_request.get()
+    return context.correlation_id if context else None
+
+
+def debug_sampled(logger: logging.Logger) -> bool:
+    """
+    Whether a sampled debug event should be logged.
+
+    Checks the level first, so with debug logging off this costs one
+    comparison. Outside a request every event is sampled on its own.
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return False
+    context = _current_request.get()
+    if context is not None:
+        return context.sampled
+    return random.random() < debug_sample_rate()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, including extra= fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "correlation_id": getattr(record, "correlation_id", None),
+        }
+        entry.update({key: value for key, value in vars(record).items()
+                      if key not in _RECORD_ATTRIBUTES})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def _install_record_factory() -> None:
+    """Stamp the bound correlation ID on every record, once per process"""
+    base_factory = logging.getLogRecordFactory()
+    if getattr(base_factory, "correlating", False):
+        return
+
+    def record_factory(*args, **kwargs) -> logging.LogRecord:
+        record = base_factory(*args, **kwargs)
+        context = _current_request.get()
+        record.correlation_id = context.correlation_id if context else "-"
+        return record
+
+    record_factory.correlating = True
+    logging.setLogRecordFactory(record_factory)
+
+
+def configure_logging() -> None:
+    """
+    Set up levels, correlation and formatting from the environment.
+
+    LOG_LEVEL sets the root level (default INFO) and LOG_FORMAT=json
+    switches every root handler to JsonFormatter. Under the Functions
+    worker the root handler already exists and is reused.
+    """
+    _install_record_factory()
+    level = os.getenv("LOG_LEVEL", "INFO").upper()
+    root = logging.getLogger()
+    if not root.handlers:
+        logging.basicConfig(format=TEXT_FORMAT)
+    root.setLevel(level)
+
+    if os.getenv("LOG_FORMAT", "text").lower() == "json":
+        for handler in root.handlers:
+            handler.setFormatter(JsonFormatter())
@@ -0,0 +1,132 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+# Reproducible benchmark of recorded SDK sessions
+#
+# record: runs each scenario once against AI_FOUNDRY_ENDPOINT (or, with
+#         --emulator, the local agents emulator) and saves the scrubbed
+#         SDK traffic to the cassette
+# replay: runs the same scenarios --iterations times against the cassette,
+#         offline, with responses delayed by --timing times their recorded
+#         duration (0 leaves only the function app's own work and poll
+#         intervals), and reports latency and upstream calls per scenario
+#
+# Scenarios:
+#   chat   run_agent_conversation on a new thread with the default agent
+#   list   list_agents
+#   demo   run_demo (agent, conversation, code interpreter)
+#
+# Usage (from the function-app directory):
+#   python tests/benchmarks/bench_cassette.py record --cassette chat.json
+#   python tests/benchmarks/bench_cassette.py replay --cassette chat.json --timing 0
+
+import os
+import sys
+import time
+import logging
+import argparse
+import statistics
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+SCENARIOS = ("chat", "list", "demo")
+
+# Per-process state that changes which requests a scenario makes
+APP_STATE = ("_agent_instance", "_agent_registry", "_thread_pool", "_response_snapshots",
+             "_thread_locks", "_idempotency_store", "_artifact_cache", "_endpoint_pool")
+
+
+def reset_app_state(function_app) -> None:
+    for name in APP_STATE:
+        setattr(function_app, name, None)
+
+
+def run_scenario(function_app, name: str) -> None:
+    if name == "chat":
+        agent = function_app.get_or_create_agent()
+        function_app.run_agent_conversation(agent, "What is 2 + 2?")
+    elif name == "list":
+        function_app.list_agents()
+    else:
+        response = function_app.run_demo()
+        if response.status_code != 200:
+            raise RuntimeError(f"Demo failed: {response.get_body()[:200]!r}")
+
+
+def record(args) -> None:
+    os.environ.update({"SDK_CASSETTE": args.cassette, "SDK_CASSETTE_MODE": "record"})
+    server = None
+    if args.emulator:
+        from mock_foundry.server import MockFoundryServer
+        server = MockFoundryServer(("127.0.0.1", 0), queued_seconds=0.05, in_progress_seconds=0.2)
+        server.start_background()
+        os.environ["AI_FOUNDRY_ENDPOINT"] = server.endpoint
+
+    import function_app
+    from http_transport import get_shared_transport
+    for name in args.scenarios:
+        reset_app_state(function_app)
+        run_scenario(function_app, name)
+        print(f"recorded {name}")
+
+    cassette = get_shared_transport().session.get_adapter("https://").cassette
+    cassette.save()
+    print(f"{len(cassette)} interactions saved to {args.cassette}")
+    if server:
+        server.shutdown()
+
+
+def replay(args) -> None:
+    from cassettes import Cassette
+    os.environ.update({
+        "SDK_CASSETTE": args.cassette,
+        "SDK_CASSETTE_MODE": "replay",
+        "SDK_CASSETTE_TIMING": str(args.timing),
+        "AI_FOUNDRY_ENDPOINT": Cassette.load(args.cassette).endpoint,
+    })
+
+    import function_app
+    from http_transport import count_upstream_calls, get_shared_transport
+    cassette = get_shared_transport().session.get_adapter("https://").cassette
+
+    results = {name: {"ms": [], "calls": []} for name in args.scenarios}
+    for _ in range(args.iterations):
+        cassette.rewind()
+        for name in args.scenarios:
+            reset_app_state(function_app)
+            with count_upstream_calls() as calls:
+                started = time.perf_counter()
+                run_scenario(function_app, name)
+                results[name]["ms"].append((time.perf_counter() - started) * 1000)
+            results[name]["calls"].append(calls.value)
+
+    print(f"timing x{args.timing}, {args.iterations} iterations")
+    print(f"{'scenario':<9} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} {'upstream':>9}")
+    for name, result in results.items():
+        samples = sorted(result["ms"])
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        print(f"{name:<9} {statistics.median(samples):>9.2f} {p95:>9.2f} "
+              f"{samples[-1]:>9.2f} {statistics.mean(result['calls']):>9.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Record or replay SDK sessions for benchmarking")
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("--cassette", required=True)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--emulator", action="store_true",
+                        help="record against the local agents emulator")
+    parser.add_argument("--timing", type=float, default=1.0)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    os.environ.setdefault("RUN_POLL_INTERVAL_SECONDS", "0.05")
+    logging.getLogger("azure").setLevel(logging.WARNING)
+    (record if args.mode == "record" else replay)(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+# Response compression trade-off benchmark
+#
+# Builds real list action bodies (indented JSON and NDJSON) for projects with
+# --agents agents against the in-memory fake project client, then compresses
+# each with every installed encoder at levels 1, 5 and 9 and reports:
+#   bytes     compressed size
+#   ratio     compressed / original size
+#   cpu ms    CPU time per compression (best of --repeat)
+#   MB/s      original bytes compressed per CPU second
+# Use it to pick COMPRESSION_LEVELS and COMPRESSION_MIN_BYTES.
+#
+# Usage (from the function-app directory):
+#   python tests/benchmarks/bench_compression.py --agents 10 100 1000
+
+import sys
+import time
+import argparse
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import function_app  # noqa: E402
+from compression import ENCODERS  # noqa: E402
+from tool_registry import TOOLS  # noqa: E402
+from load.fake_project_client import FakeProjectClient  # noqa: E402
+
+LEVELS = (1, 5, 9)
+INSTRUCTIONS = ("You are a helpful AI assistant for the finance team. Answer questions about "
+                "quarterly reports, cite the document you used and say when you are unsure.")
+
+
+def list_bodies(agents: int) -> dict:
+    """The list action's JSON and NDJSON bodies for a project with this many agents"""
+    client = FakeProjectClient(latency_ms=0)
+    tools = [{"type": "code_interpreter"}, *TOOLS.definitions()]
+    for i in range(agents):
+        client.agents.create_agent(model="gpt-4o", name=f"finance-agent-{i:05d}",
+                                   instructions=INSTRUCTIONS, tools=tools)
+
+    with patch("function_app.get_project_client", return_value=client):
+        return {
+            "json": function_app.handle_list_agents({}, {}).get_body(),
+            "ndjson": function_app.handle_list_agents({"format": "ndjson"}, {}).get_body(),
+        }
+
+
+def measure(encode, body: bytes, level: int, repeat: int) -> dict:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.process_time()
+        compressed = encode(body, level)
+        best = min(best, time.process_time() - started)
+    return {"bytes": len(compressed), "ratio": len(compressed) / len(body), "cpu_ms": best * 1000}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Response compression bytes/CPU benchmark")
+    parser.add_argument("--agents", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"encoders: {', '.join(ENCODERS)}")
+    print(f"{'agents':>6} {'format':<7} {'encoding':<9} {'level':>5} "
+          f"{'bytes':>10} {'ratio':>6} {'cpu ms':>8} {'MB/s':>7}")
+    for agents in args.agents:
+        for body_format, body in list_bodies(agents).items():
+            print(f"{agents:>6} {body_format:<7} {'identity':<9} {'-':>5} {len(body):>10}")
+            for encoding, encode in ENCODERS.items():
+                for level in LEVELS:
+                    result = measure(encode, body, level, args.repeat)
+                    throughput = len(body) / 1e6 / max(result["cpu_ms"] / 1000, 1e-9)
+                    print(f"{agents:>6} {body_format:<7} {encoding:<9} {level:>5} "
+                          f"{result['bytes']:>10} {result['ratio']:>6.3f} "
+                          f"{result['cpu_ms']:>8.3f} {throughput:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
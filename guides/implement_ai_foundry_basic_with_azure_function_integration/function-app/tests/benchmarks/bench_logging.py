@@ -0,0 +1,113 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+# Logging overhead benchmark for the agent handler
+#
+# Sends chat requests through agent_operations against the in-memory fake
+# project client (no upstream latency) and reports the CPU time per request
+# for each logging setup:
+#   off             root level WARNING, nothing below it is built
+#   info            INFO records to a text handler
+#   info-json       INFO records to a JsonFormatter handler
+#   debug-sampled   DEBUG with per-poll events sampled at --sample-rate
+#   debug-all       DEBUG with every per-poll event logged
+# followed by the cost of a filtered-out f-string call versus a lazy one.
+#
+# Usage (from the function-app directory):
+#   python tests/benchmarks/bench_logging.py --requests 300
+
+import os
+import sys
+import time
+import timeit
+import logging
+import argparse
+import statistics
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import azure.functions as func  # noqa: E402
+import function_app  # noqa: E402
+from structured_logging import JsonFormatter, TEXT_FORMAT  # noqa: E402
+from load.fake_project_client import FakeProjectClient  # noqa: E402
+
+SCENARIOS = {
+    "off": (logging.WARNING, None, 0.0),
+    "info": (logging.INFO, logging.Formatter(TEXT_FORMAT), 0.0),
+    "info-json": (logging.INFO, JsonFormatter(), 0.0),
+    "debug-sampled": (logging.DEBUG, logging.Formatter(TEXT_FORMAT), None),
+    "debug-all": (logging.DEBUG, logging.Formatter(TEXT_FORMAT), 1.0),
+}
+
+
+def chat_request() -> func.HttpRequest:
+    return func.HttpRequest(
+        method="POST", url="/api/agent", params={},
+        body=b'{"action": "chat", "message": "Hello"}')
+
+
+def run_scenario(name: str, requests: int, sample_rate: float, sink) -> dict:
+    level, formatter, rate = SCENARIOS[name]
+    root = logging.getLogger()
+    handler = logging.StreamHandler(sink)
+    if formatter:
+        handler.setFormatter(formatter)
+    root.handlers = [handler]
+    root.setLevel(level)
+    os.environ["LOG_DEBUG_SAMPLE_RATE"] = str(sample_rate if rate is None else rate)
+
+    client = FakeProjectClient(latency_ms=0, queued_seconds=0, in_progress_seconds=0.004)
+    function_app._agent_instance = None
+    cpu_ms = []
+    with patch("function_app.get_project_client", return_value=client):
+        function_app.agent_operations(chat_request())
+        for _ in range(requests):
+            started = time.process_time()
+            function_app.agent_operations(chat_request())
+            cpu_ms.append((time.process_time() - started) * 1000)
+    function_app._agent_instance = None
+
+    return {"mean": statistics.mean(cpu_ms), "p50": statistics.median(cpu_ms)}
+
+
+def filtered_call_cost(number: int = 200_000) -> dict:
+    """Nanoseconds per logger.info call when INFO is filtered out"""
+    logger = logging.getLogger("bench.filtered")
+    logger.setLevel(logging.WARNING)
+    run_id, thread_id = "run_000000000042", "thread_000000000042"
+    eager = timeit.timeit(
+        lambda: logger.info(f"Started run {run_id} on thread: {thread_id}"), number=number)
+    lazy = timeit.timeit(
+        lambda: logger.info("Started run %s on thread: %s", run_id, thread_id), number=number)
+    return {"f-string": eager / number * 1e9, "lazy": lazy / number * 1e9}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Agent handler logging overhead benchmark")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--sample-rate", type=float, default=0.1)
+    args = parser.parse_args()
+
+    os.environ["RUN_POLL_INTERVAL_SECONDS"] = "0.001"
+    with open(os.devnull, "w") as sink:
+        results = {name: run_scenario(name, args.requests, args.sample_rate, sink)
+                   for name in SCENARIOS}
+    logging.getLogger().handlers = []
+
+    baseline = results["off"]["mean"]
+    print(f"{'scenario':<14} {'cpu ms/req':>11} {'p50 ms':>8} {'overhead':>9}")
+    for name, result in results.items():
+        overhead = (result["mean"] / baseline - 1) * 100
+        print(f"{name:<14} {result['mean']:>11.3f} {result['p50']:>8.3f} {overhead:>8.1f}%")
+
+    print()
+    for style, nanoseconds in filtered_call_cost().items():
+        print(f"filtered logger.info, {style:<9} {nanoseconds:>7.0f} ns/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+# Connection reuse benchmark for the shared SDK transport
+#
+# Runs two SDK clients against a local HTTPS stand-in (the agents emulator
+# with a throwaway self-signed certificate) and compares:
+#   shared        one pooled keep-alive transport shared by both clients
+#   per-client    a separate transport per client
+#   no-keepalive  a shared transport sending Connection: close
+#
+# Usage (from the function-app directory):
+#   python tests/benchmarks/bench_transport.py --requests 200
+
+import sys
+import ssl
+import time
+import logging
+import argparse
+import tempfile
+import ipaddress
+import statistics
+from pathlib import Path
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from cryptography import x509  # noqa: E402
+from cryptography.x509.oid import NameOID  # noqa: E402
+from cryptography.hazmat.primitives import hashes, serialization  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric import ec  # noqa: E402
+from azure.ai.projects import AIProjectClient  # noqa: E402
+
+from mock_foundry.credentials import LocalEmulatorCredential  # noqa: E402
+from http_transport import build_transport, ConnectionStats  # noqa: E402
+from mock_foundry.server import MockFoundryServer  # noqa: E402
+
+
+def write_self_signed_certificate(directory: str):
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "127.0.0.1")])
+    now = datetime.now(timezone.utc)
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name).issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - timedelta(minutes=5))
+        .not_valid_after(now + timedelta(hours=1))
+        .add_extension(x509.SubjectAlternativeName(
+            [x509.IPAddress(ipaddress.ip_address("127.0.0.1"))]), critical=False)
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(key, hashes.SHA256())
+    )
+    certfile = Path(directory) / "cert.pem"
+    keyfile = Path(directory) / "key.pem"
+    certfile.write_bytes(certificate.public_bytes(serialization.Encoding.PEM))
+    keyfile.write_bytes(key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption()))
+    return str(certfile), str(keyfile)
+
+
+def make_client(endpoint: str, transport):
+    return AIProjectClient(
+        endpoint=endpoint, credential=LocalEmulatorCredential(), transport=transport).agents
+
+
+def run_scenario(name: str, endpoint: str, certfile: str, requests: int):
+    stats = ConnectionStats()
+    if name == "per-client":
+        clients = [make_client(endpoint, build_transport(connection_verify=certfile, stats=stats))
+                   for _ in range(2)]
+    else:
+        transport = build_transport(
+            keep_alive=name != "no-keepalive", connection_verify=certfile, stats=stats)
+        clients = [make_client(endpoint, transport) for _ in range(2)]
+
+    samples = []
+    for i in range(requests):
+        client = clients[i % 2]
+        started = time.perf_counter()
+        if i % 2:
+            next(iter(client.list_agents(limit=1)), None)
+        else:
+            client.threads.create()
+        samples.append((time.perf_counter() - started) * 1000)
+
+    snapshot = stats.snapshot()
+    ordered = sorted(samples)
+    print(f"{name:<14} {statistics.median(samples):>8.2f} "
+          f"{ordered[int(len(ordered) * 0.95)]:>8.2f} "
+          f"{snapshot['tls_handshakes']:>14} {snapshot['reuse_ratio']:>8.2%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Connection reuse benchmark for the shared SDK transport")
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+    logging.getLogger("azure").setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as directory:
+        certfile, keyfile = write_self_signed_certificate(directory)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(certfile, keyfile)
+        server = MockFoundryServer(("127.0.0.1", 0), ssl_context=context)
+        server.start_background()
+
+        print(f"{'scenario':<14} {'p50 ms':>8} {'p95 ms':>8} {'tls handshakes':>14} {'reused':>8}")
+        for name in ("shared", "per-client", "no-keepalive"):
+            run_scenario(name, server.endpoint, certfile, args.requests)
+
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
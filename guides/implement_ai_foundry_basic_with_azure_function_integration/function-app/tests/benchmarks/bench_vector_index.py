@@ -0,0 +1,81 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+# Query latency benchmark for the local vector index
+#
+# Usage (from the function-app directory):
+#   python tests/benchmarks/bench_vector_index.py
+#   python tests/benchmarks/bench_vector_index.py --sizes 10000 100000 --dimension 1536
+
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+import numpy as np
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from vector_index import VectorIndex  # noqa: E402
+
+APPEND_BATCH = 50_000
+
+
+def build_index(path: str, size: int, dimension: int, rng: np.random.Generator) -> VectorIndex:
+    index = VectorIndex(path, dimension)
+    for start in range(0, size, APPEND_BATCH):
+        batch = min(APPEND_BATCH, size - start)
+        vectors = rng.standard_normal((batch, dimension), dtype=np.float32)
+        documents = [{"text": f"document {start + i}"} for i in range(batch)]
+        index.append(vectors, documents)
+    return index
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Query latency benchmark for the local vector index")
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--dimension", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    print(f"{'vectors':>10} {'build s':>9} {'cold ms':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as path:
+            started = time.perf_counter()
+            build_index(path, size, args.dimension, rng)
+            build_seconds = time.perf_counter() - started
+
+            # A fresh reader maps the files the way a new worker would
+            index = VectorIndex(path)
+            queries = rng.standard_normal(
+                (args.queries + 1, args.dimension), dtype=np.float32)
+
+            started = time.perf_counter()
+            index.search(queries[0], top_k=args.top_k)
+            cold_ms = (time.perf_counter() - started) * 1000
+
+            samples = []
+            for query in queries[1:]:
+                started = time.perf_counter()
+                index.search(query, top_k=args.top_k)
+                samples.append((time.perf_counter() - started) * 1000)
+
+            print(f"{size:>10} {build_seconds:>9.2f} {cold_ms:>9.2f} "
+                  f"{statistics.median(samples):>8.2f} {percentile(samples, 95):>8.2f} "
+                  f"{percentile(samples, 99):>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+"""
+Latency-simulating stand-in for AIProjectClient used by the load tests.
+
+Unlike the instant Mock objects in conftest.py, every upstream call sleeps
+for a sampled latency, can be throttled (429) or fail (500), and runs move
+through queued -> in_progress -> completed based on wall-clock time. Calls
+are counted per operation and per calling thread so the harness can report
+upstream calls per request.
+"""
+
+import math
+import time
+import random
+import itertools
+import threading
+from types import SimpleNamespace
+from collections import Counter
+from typing import Dict, Optional, Any
+from azure.core.exceptions import HttpResponseError
+
+
+class FakeUpstreamError(HttpResponseError):
+    """HttpResponseError carrying a status code without a real response"""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message=message)
+        self.status_code = status_code
+
+
+class _Operations:
+    """Namespace object whose methods route through the owning client"""
+
+    def __init__(self, client: "FakeAgentsClient", prefix: str):
+        self._client = client
+        self._prefix = prefix
+
+    def __getattr__(self, name: str):
+        handler = getattr(self._client, f"_{self._prefix}_{name}")
+
+        def call(*args, **kwargs):
+            return self._client._call(f"{self._prefix}.{name}", handler, *args, **kwargs)
+        return call
+
+
+class FakeAgentsClient:
+    """In-memory agents surface with configurable latency and errors"""
+
+    def __init__(
+        self,
+        latency_ms: float = 30.0,
+        latency_sigma: float = 0.5,
+        operation_latency_ms: Optional[Dict[str, float]] = None,
+        queued_seconds: float = 0.2,
+        in_progress_seconds: float = 1.0,
+        throttle_rate: float = 0.0,
+        failure_rate: float = 0.0,
+        seed: Optional[int] = None
+    ):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.operation_latency_ms = operation_latency_ms or {}
+        self.queued_seconds = queued_seconds
+        self.in_progress_seconds = in_progress_seconds
+        self.throttle_rate = throttle_rate
+        self.failure_rate = failure_rate
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._local = threading.local()
+        self.calls = Counter()
+
+        self._agents: Dict[str, Any] = {}
+        self._threads: Dict[str, Any] = {}
+        self._runs: Dict[str, Any] = {}
+
+        self.threads = _Operations(self, "threads")
+        self.messages = _Operations(self, "messages")
+        self.runs = _Operations(self, "runs")
+
+    # ----------------------------------------------------------------- plumbing
+
+    def _new_id(self, prefix: str) -> str:
+        return f"{prefix}_{next(self._ids):08d}"
+
+    def _sample_latency(self, operation: str) -> float:
+        median_ms = self.operation_latency_ms.get(operation, self.latency_ms)
+        if median_ms <= 0:
+            return 0.0
+        return median_ms * math.exp(self._random.gauss(0.0, self.latency_sigma)) / 1000
+
+    def _call(self, operation: str, handler, *args, **kwargs):
+        with self._lock:
+            self.calls[operation] += 1
+            roll = self._random.random()
+            latency = self._sample_latency(operation)
+        self._local.calls = getattr(self._local, "calls", 0) + 1
+
+        time.sleep(latency)
+
+        if roll < self.throttle_rate:
+            raise FakeUpstreamError(429, f"Too Many Requests: {operation}")
+        if roll < self.throttle_rate + self.failure_rate:
+            raise FakeUpstreamError(500, f"Internal Server Error: {operation}")
+
+        with self._lock:
+            return handler(*args, **kwargs)
+
+    def reset_thread_calls(self) -> None:
+        """Reset the upstream call count attributed to the calling thread"""
+        self._local.calls = 0
+
+    def thread_calls(self) -> int:
+        """Upstream calls made by the calling thread since the last reset"""
+        return getattr(self._local, "calls", 0)
+
+    # ------------------------------------------------------------------ agents
+
+    def list_agents(self, **kwargs):
+        return self._call("list_agents", lambda: list(self._agents.values()))
+
+    def create_agent(self, model: str, name: str, instructions: str = "", tools=None, **kwargs):
+        def handler():
+            agent = SimpleNamespace(
+                id=self._new_id("asst"), name=name, model=model,
+                instructions=instructions, tools=tools or [],
+                created_at=int(time.time()))
+            self._agents[agent.id] = agent
+            return agent
+        return self._call("create_agent", handler)
+
+    def delete_agent(self, agent_id: str):
+        return self._call("delete_agent", lambda: self._agents.pop(agent_id, None))
+
+    def create_thread_and_run(self, agent_id: str, thread=None, **kwargs):
+        def handler():
+            thread_id = self._threads_create().id
+            for message in (thread or {}).get("messages") or []:
+                self._messages_create(thread_id, message["role"], message["content"])
+            return self._runs_create(thread_id, agent_id)
+        return self._call("create_thread_and_run", handler)
+
+    # ----------------------------------------------------------------- threads
+
+    def _threads_create(self, **kwargs):
+        thread = SimpleNamespace(
+            id=self._new_id("thread"), created_at=int(time.time()), messages=[])
+        self._threads[thread.id] = thread
+        return thread
+
+    def _threads_get(self, thread_id: str):
+        return self._threads[thread_id]
+
+    # ---------------------------------------------------------------- messages
+
+    def _messages_create(self, thread_id: str, role: str, content: str, **kwargs):
+        message = _message(self._new_id("msg"), thread_id, role, content)
+        self._threads[thread_id].messages.append(message)
+        return message
+
+    def _messages_list(self, thread_id: str, **kwargs):
+        self._advance_runs(thread_id)
+        return list(reversed(self._threads[thread_id].messages))
+
+    # -------------------------------------------------------------------- runs
+
+    def _runs_create(self, thread_id: str, agent_id: str, additional_messages=None, **kwargs):
+        for message in additional_messages or []:
+            self._messages_create(thread_id, message["role"], message["content"])
+        run = SimpleNamespace(
+            id=self._new_id("run"), thread_id=thread_id, agent_id=agent_id,
+            status="queued", usage=None, started=time.monotonic())
+        self._runs[run.id] = run
+        return run
+
+    def _runs_get(self, thread_id: str, run_id: str, **kwargs):
+        run = self._runs[run_id]
+        self._advance(run)
+        return run
+
+    def _runs_cancel(self, thread_id: str, run_id: str, **kwargs):
+        run = self._runs[run_id]
+        if run.status in ("queued", "in_progress", "requires_action"):
+            run.status = "cancelled"
+        return run
+
+    def _advance_runs(self, thread_id: str) -> None:
+        for run in self._runs.values():
+            if run.thread_id == thread_id:
+                self._advance(run)
+
+    def _advance(self, run) -> None:
+        if run.status not in ("queued", "in_progress"):
+            return
+
+        elapsed = time.monotonic() - run.started
+        if elapsed < self.queued_seconds:
+            run.status = "queued"
+        elif elapsed < self.queued_seconds + self.in_progress_seconds:
+            run.status = "in_progress"
+        else:
+            run.status = "completed"
+            run.usage = SimpleNamespace(
+                prompt_tokens=120, completion_tokens=40, total_tokens=160)
+            self._threads[run.thread_id].messages.append(_message(
+                self._new_id("msg"), run.thread_id, "assistant",
+                f"Simulated response for {run.id}"))
+
+
+class FakeProjectClient:
+    """AIProjectClient stand-in exposing a FakeAgentsClient as .agents"""
+
+    def __init__(self, **kwargs):
+        self.agents = FakeAgentsClient(**kwargs)
+
+
+def _message(message_id: str, thread_id: str, role: str, content: str):
+    return SimpleNamespace(
+        id=message_id, thread_id=thread_id, role=role,
+        content=[SimpleNamespace(text=SimpleNamespace(value=content))])
@@ -0,0 +1,252 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+"""
+Open-loop load test for the function app handlers.
+
+Each action is driven at a fixed target RPS against a FakeProjectClient.
+Latency is measured from the scheduled start of each request, so time spent
+waiting for a free worker counts against the handler (no coordinated
+omission). Results are written as a JSON baseline that can be compared
+with a previous run.
+
+Usage (from the function-app directory):
+    python tests/load/run_load.py --rps 20 --duration 30 --output baseline.json
+    python tests/load/run_load.py --compare baseline.json --tolerance 0.15
+"""
+
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import subprocess
+import threading
+from pathlib import Path
+from unittest.mock import patch
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import List, Dict, Optional, Any
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import azure.functions as func  # noqa: E402
+import function_app  # noqa: E402
+from metrics import METRICS  # noqa: E402
+from load.fake_project_client import FakeProjectClient  # noqa: E402
+
+ACTION_REQUESTS = {
+    "chat": ("/api/agent", {"action": "chat", "message": "Hello"}),
+    "list": ("/api/agent", {"action": "list"}),
+    "code-interpreter": ("/api/agent", {"action": "code-interpreter"}),
+    "health": ("/api/health", None),
+    "demo": ("/api/demo", None),
+}
+
+ROUTES = {
+    "/api/agent": lambda req: function_app.agent_operations(req),
+    "/api/health": lambda req: function_app.health_check(req),
+    "/api/demo": lambda req: function_app.demo_agent_capabilities(req),
+}
+
+# Metrics compared across baselines; higher values are regressions
+COMPARED_METRICS = ["p50_ms", "p95_ms", "p99_ms",
+                    "upstream_calls_per_request", "cpu_ms_per_request"]
+
+# Per-worker caches that would carry one action's warm state into the next
+APP_CACHES = ["_agent_instance", "_project_client", "_agent_registry", "_artifact_cache",
+              "_endpoint_pool", "_idempotency_store", "_thread_locks", "_response_snapshots"]
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run_action(action: str, client: FakeProjectClient, rps: float,
+               duration: float, workers: int) -> Dict[str, Any]:
+    """Drive one action at the target RPS and summarise the results"""
+    url, body = ACTION_REQUESTS[action]
+    handler = ROUTES[url]
+    total = max(1, int(rps * duration))
+    interval = 1.0 / rps
+    samples: List[Dict[str, Any]] = []
+    samples_lock = threading.Lock()
+
+    def one_request(scheduled: float) -> None:
+        client.agents.reset_thread_calls()
+        cpu_started = time.thread_time()
+        req = func.HttpRequest(
+            method="POST" if body else "GET", url=url, params={},
+            body=json.dumps(body).encode("utf-8") if body else b"")
+        try:
+            status_code = handler(req).status_code
+        except Exception:
+            status_code = 599
+        sample = {
+            "latency_ms": (time.perf_counter() - scheduled) * 1000,
+            "status_code": status_code,
+            "upstream_calls": client.agents.thread_calls(),
+            "cpu_ms": (time.thread_time() - cpu_started) * 1000,
+        }
+        with samples_lock:
+            samples.append(sample)
+
+    process_cpu_started = time.process_time()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for i in range(total):
+            scheduled = started + i * interval
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(one_request, scheduled)
+    wall = time.perf_counter() - started
+    process_cpu = time.process_time() - process_cpu_started
+
+    latencies = [s["latency_ms"] for s in samples]
+    errors = [s for s in samples if s["status_code"] >= 400]
+    status_codes: Dict[str, int] = {}
+    for s in samples:
+        status_codes[str(s["status_code"])] = status_codes.get(
+            str(s["status_code"]), 0) + 1
+
+    return {
+        "requests": len(samples),
+        "target_rps": rps,
+        "achieved_rps": round(len(samples) / wall, 2),
+        "errors": len(errors),
+        "error_rate": round(len(errors) / len(samples), 4),
+        "status_codes": status_codes,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_ms": round(max(latencies), 2),
+        "upstream_calls_per_request": round(
+            sum(s["upstream_calls"] for s in samples) / len(samples), 2),
+        "cpu_ms_per_request": round(
+            sum(s["cpu_ms"] for s in samples) / len(samples), 3),
+        "worker_cpu_percent": round(process_cpu / wall * 100, 1),
+    }
+
+
+def reset_app_state() -> None:
+    """Start an action with cold caches, as on a freshly started worker"""
+    for name in APP_CACHES:
+        setattr(function_app, name, None)
+
+
+def counter_value(name: str) -> float:
+    return METRICS.counter(name).snapshot()
+
+
+def run_suite(actions: List[str], rps: float, duration: float, workers: int,
+              client_options: Dict[str, Any]) -> Dict[str, Any]:
+    """Run every action against a fresh fake client and cold app caches"""
+    results = {}
+    for action in actions:
+        client = FakeProjectClient(**client_options)
+        reset_app_state()
+        hits, misses = counter_value("snapshots.hits"), counter_value("snapshots.misses")
+        with patch("function_app.get_project_client", return_value=client), \
+                patch("function_app.DefaultAzureCredential"):
+            results[action] = run_action(action, client, rps, duration, workers)
+        # Snapshot hits skip upstream calls entirely, so say how many there were
+        results[action]["snapshot_hits"] = int(counter_value("snapshots.hits") - hits)
+        results[action]["snapshot_misses"] = int(counter_value("snapshots.misses") - misses)
+        reset_app_state()
+
+    return {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "config": {
+            "rps": rps,
+            "duration_seconds": duration,
+            "workers": workers,
+            "client": client_options,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float) -> List[str]:
+    """Return a description of every metric that regressed beyond tolerance"""
+    regressions = []
+    for action, previous in baseline["results"].items():
+        latest = current["results"].get(action)
+        if not latest:
+            continue
+        for metric in COMPARED_METRICS:
+            before, after = previous.get(metric, 0), latest.get(metric, 0)
+            if before > 0 and after > before * (1 + tolerance):
+                regressions.append(
+                    f"{action}.{metric}: {before} -> {after} (+{(after / before - 1) * 100:.1f}%)")
+    return regressions
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], text=True,
+            stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Open-loop load test for the function app handlers")
+    parser.add_argument("--actions", nargs="+", default=["chat", "list", "code-interpreter"],
+                        choices=sorted(ACTION_REQUESTS))
+    parser.add_argument("--rps", type=float, default=10.0)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--latency-ms", type=float, default=30.0)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--queued-seconds", type=float, default=0.2)
+    parser.add_argument("--in-progress-seconds", type=float, default=1.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="allowed relative regression before failing (default 0.10)")
+    args = parser.parse_args()
+
+    # Handler logging would dominate worker CPU at high RPS
+    logging.getLogger("function_app").setLevel(logging.WARNING)
+
+    client_options = {
+        "latency_ms": args.latency_ms,
+        "latency_sigma": args.latency_sigma,
+        "queued_seconds": args.queued_seconds,
+        "in_progress_seconds": args.in_progress_seconds,
+        "throttle_rate": args.throttle_rate,
+        "failure_rate": args.failure_rate,
+        "seed": args.seed,
+    }
+    current = run_suite(args.actions, args.rps, args.duration, args.workers, client_options)
+    print(json.dumps(current["results"], indent=2))
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(current, indent=2))
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        regressions = compare(baseline, current, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+"""
+Full-stack offline benchmark: function app handlers -> real AIProjectClient
+-> local agents emulator.
+
+Reports per-action latency, upstream HTTP requests per action (including
+pagination and polling) and new TCP connections per action, which shows
+whether the SDK transport reuses connections.
+
+Usage (from the function-app directory):
+    python tests/mock_foundry/bench_full_stack.py --iterations 20 --agents 250 --latency-ms 15
+"""
+
+import os
+import sys
+import json
+import logging
+import argparse
+import statistics
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import azure.functions as func  # noqa: E402
+from mock_foundry.server import MockFoundryServer  # noqa: E402
+
+ACTIONS = {
+    "chat": {"action": "chat", "message": "Hello"},
+    "list": {"action": "list"},
+    "code-interpreter": {"action": "code-interpreter"},
+}
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Full-stack offline benchmark against the local agents emulator")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--agents", type=int, default=100,
+                        help="pre-existing agents, to exercise list pagination")
+    parser.add_argument("--latency-ms", type=float, default=10.0)
+    parser.add_argument("--in-progress-seconds", type=float, default=0.3)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--actions", nargs="+", default=list(ACTIONS), choices=list(ACTIONS))
+    args = parser.parse_args()
+
+    server = MockFoundryServer(
+        ("127.0.0.1", 0), latency_ms=args.latency_ms, queued_seconds=0.05,
+        in_progress_seconds=args.in_progress_seconds, page_size=args.page_size, seed=1)
+    server.start_background()
+    for i in range(args.agents):
+        server.state.create_agent({"name": f"seed-agent-{i}", "model": "gpt-4"})
+
+    os.environ["AI_FOUNDRY_ENDPOINT"] = server.endpoint
+    import function_app
+    logging.getLogger("function_app").setLevel(logging.WARNING)
+    logging.getLogger("azure").setLevel(logging.WARNING)
+
+    print(f"{'action':<18} {'p50 ms':>8} {'p95 ms':>8} {'http/req':>9} {'new conn/req':>13}")
+    for action in args.actions:
+        body = json.dumps(ACTIONS[action]).encode("utf-8")
+        before = server.snapshot_stats()
+        samples = []
+        for _ in range(args.iterations):
+            req = func.HttpRequest(method="POST", url="/api/agent", params={}, body=body)
+            started = time.perf_counter()
+            function_app.agent_operations(req)
+            samples.append((time.perf_counter() - started) * 1000)
+        after = server.snapshot_stats()
+
+        requests = (after["requests"] - before["requests"]) / args.iterations
+        connections = (after["connections"] - before["connections"]) / args.iterations
+        print(f"{action:<18} {statistics.median(samples):>8.1f} {percentile(samples, 95):>8.1f} "
+              f"{requests:>9.1f} {connections:>13.2f}")
+
+    server.shutdown()
+    server.server_close()
+
+
+if __name__ == "__main__":
+    main()
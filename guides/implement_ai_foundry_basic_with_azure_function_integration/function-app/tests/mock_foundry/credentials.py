@@ -0,0 +1,23 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+"""
+Placeholder credential for SDK clients pointed at the local agents emulator.
+
+The emulator skips auth, so clients built directly against it (rather than
+through function_app, which swaps in a fixed Authorization header) only need
+something that satisfies the TokenCredential protocol.
+"""
+
+import time
+from typing import Any
+
+from azure.core.credentials import AccessToken
+
+
+class LocalEmulatorCredential:
+    """Hands out a fixed token that only the emulator accepts"""
+
+    def get_token(self, *scopes: str, **kwargs: Any) -> AccessToken:
+        return AccessToken("local-emulator", int(time.time()) + 3600)
@@ -0,0 +1,734 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+"""
+Local emulator for the AI Foundry agents REST surface used by function_app.py.
+
+Serves assistants, threads, messages, runs and run steps with cursor pagination and
+time-based run status transitions, so the real AIProjectClient (transport,
+serialization, retries and paging included) can be exercised offline.
+Latency and error rates are configurable, connections are kept alive
+(HTTP/1.1), and /_mock/stats reports how many connections and requests the
+server has seen so connection reuse and pagination costs can be measured.
+
+Point the function app at it with:
+    AI_FOUNDRY_ENDPOINT=http://127.0.0.1:8089/api/projects/local
+
+Usage (from the function-app directory):
+    python tests/mock_foundry/server.py --port 8089 --latency-ms 20 --in-progress-seconds 1
+"""
+
+import re
+import ssl
+import json
+import math
+import time
+import random
+import argparse
+import itertools
+import threading
+from email import policy
+from email.parser import BytesParser
+from typing import Dict, List, Optional, Tuple, Any
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class MockFoundryState:
+    """In-memory agents, threads, messages and runs"""
+
+    def __init__(self, queued_seconds: float = 0.1, in_progress_seconds: float = 0.5):
+        self.queued_seconds = queued_seconds
+        self.in_progress_seconds = in_progress_seconds
+        self.lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.agents: Dict[str, Dict[str, Any]] = {}
+        self.threads: Dict[str, Dict[str, Any]] = {}
+        self.messages: Dict[str, List[Dict[str, Any]]] = {}
+        self.runs: Dict[str, Dict[str, Any]] = {}
+        self.run_started: Dict[str, float] = {}
+        self.run_steps: Dict[str, List[Dict[str, Any]]] = {}
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.file_contents: Dict[str, bytes] = {}
+        self.vector_stores: Dict[str, Dict[str, Any]] = {}
+        self.file_batches: Dict[str, Dict[str, Any]] = {}
+        # Code interpreter runs attach a chart and a CSV to their reply
+        self.code_interpreter_artifacts = False
+
+    def new_id(self, prefix: str) -> str:
+        return f"{prefix}_{next(self._ids):012d}"
+
+    def create_agent(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        agent = {
+            "id": self.new_id("asst"),
+            "object": "assistant",
+            "created_at": int(time.time()),
+            "name": body.get("name"),
+            "description": body.get("description"),
+            "model": body.get("model"),
+            "instructions": body.get("instructions") or "",
+            "tools": body.get("tools") or [],
+            "tool_resources": body.get("tool_resources") or {},
+            "temperature": body.get("temperature", 1.0),
+            "top_p": body.get("top_p", 1.0),
+            "metadata": body.get("metadata") or {},
+        }
+        self.agents[agent["id"]] = agent
+        return agent
+
+    def create_thread(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        thread = {
+            "id": self.new_id("thread"),
+            "object": "thread",
+            "created_at": int(time.time()),
+            "tool_resources": body.get("tool_resources") or {},
+            "metadata": body.get("metadata") or {},
+        }
+        self.threads[thread["id"]] = thread
+        self.messages[thread["id"]] = []
+        for message in body.get("messages") or []:
+            self.create_message(thread["id"], message)
+        return thread
+
+    def create_message(self, thread_id: str, body: Dict[str, Any],
+                       run_id: Optional[str] = None, assistant_id: Optional[str] = None) -> Dict[str, Any]:
+        content = body.get("content")
+        if isinstance(content, str):
+            content = [{"type": "text", "text": {"value": content, "annotations": []}}]
+        message = {
+            "id": self.new_id("msg"),
+            "object": "thread.message",
+            "created_at": int(time.time()),
+            "thread_id": thread_id,
+            "status": "completed",
+            "role": body.get("role", "user"),
+            "content": content or [],
+            "assistant_id": assistant_id,
+            "run_id": run_id,
+            "attachments": body.get("attachments") or [],
+            "metadata": body.get("metadata") or {},
+        }
+        self.messages[thread_id].append(message)
+        return message
+
+    def create_run(self, thread_id: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        agent = self.agents.get(body.get("assistant_id"), {})
+        for message in body.get("additional_messages") or []:
+            self.create_message(thread_id, message)
+        run = {
+            "id": self.new_id("run"),
+            "object": "thread.run",
+            "created_at": int(time.time()),
+            "thread_id": thread_id,
+            "assistant_id": body.get("assistant_id"),
+            "status": "queued",
+            "required_action": None,
+            "last_error": None,
+            "model": body.get("model") or agent.get("model"),
+            "instructions": body.get("instructions") or agent.get("instructions", ""),
+            "tools": body.get("tools") or agent.get("tools", []),
+            "tool_resources": {},
+            "metadata": body.get("metadata") or {},
+            "usage": None,
+            "parallel_tool_calls": True,
+            "max_prompt_tokens": body.get("max_prompt_tokens"),
+            "max_completion_tokens": body.get("max_completion_tokens"),
+            "truncation_strategy": body.get("truncation_strategy") or {"type": "auto"},
+            "incomplete_details": None,
+        }
+        self.runs[run["id"]] = run
+        self.run_started[run["id"]] = time.monotonic()
+        self.run_steps[run["id"]] = []
+        return run
+
+    def last_step_end(self, run: Dict[str, Any]) -> int:
+        """When the run's previous step finished, or when the run started"""
+        ends = [step["completed_at"] for step in self.run_steps[run["id"]] if step["completed_at"]]
+        return max(ends + [run["started_at"]])
+
+    def add_step(self, run: Dict[str, Any], details: Dict[str, Any], status: str = "completed",
+                 usage: Optional[Dict[str, int]] = None,
+                 created_at: Optional[int] = None) -> Dict[str, Any]:
+        now = int(time.time())
+        step = {
+            "id": self.new_id("step"),
+            "object": "thread.run.step",
+            "type": details["type"],
+            "assistant_id": run["assistant_id"],
+            "thread_id": run["thread_id"],
+            "run_id": run["id"],
+            "status": status,
+            "step_details": details,
+            "last_error": None,
+            "created_at": created_at or now,
+            "expired_at": None,
+            "completed_at": now if status == "completed" else None,
+            "cancelled_at": None,
+            "failed_at": None,
+            "usage": usage,
+            "metadata": {},
+        }
+        self.run_steps[run["id"]].append(step)
+        return step
+
+    def advance(self, run: Dict[str, Any]) -> Dict[str, Any]:
+        """Move a run along queued -> in_progress -> completed by elapsed time"""
+        if run["status"] not in ("queued", "in_progress"):
+            return run
+
+        elapsed = time.monotonic() - self.run_started[run["id"]]
+        if elapsed < self.queued_seconds:
+            return run
+        if elapsed < self.queued_seconds + self.in_progress_seconds:
+            run["status"] = "in_progress"
+            run["started_at"] = run.get("started_at") or int(time.time())
+            return run
+
+        # Runs with function tools call each of them once before completing
+        functions = [tool["function"]["name"] for tool in run["tools"]
+                     if tool.get("type") == "function"]
+        if functions and "tool_outputs" not in run:
+            calls = [{"id": self.new_id("call"), "type": "function",
+                      "function": {"name": name, "arguments": "{}"}}
+                     for name in functions]
+            run["status"] = "requires_action"
+            run["required_action"] = {
+                "type": "submit_tool_outputs",
+                "submit_tool_outputs": {"tool_calls": calls},
+            }
+            self.add_step(run, {"type": "tool_calls", "tool_calls": calls}, status="in_progress")
+            return run
+
+        content = f"Simulated response for {run['id']}"
+        if run.get("tool_outputs"):
+            outputs = "; ".join(output["output"] for output in run["tool_outputs"])
+            content += f" using tool outputs: {outputs}"
+
+        run["status"] = "completed"
+        run["completed_at"] = int(time.time())
+        # Runs resend the whole thread, so prompt tokens grow with its history;
+        # auto truncation drops the oldest messages to fit max_prompt_tokens
+        messages = self.messages[run["thread_id"]]
+        truncation = run["truncation_strategy"]
+        if truncation.get("type") == "last_messages":
+            messages = messages[-truncation["last_messages"]:]
+        history = sum(len(part["text"]["value"]) for message in messages
+                      for part in message["content"] if part.get("type") == "text")
+        prompt_tokens = 100 + history // 4
+        completion_tokens = 40
+        max_prompt, max_completion = run["max_prompt_tokens"], run["max_completion_tokens"]
+        if max_prompt and prompt_tokens > max_prompt:
+            if truncation.get("type") == "auto":
+                prompt_tokens = max_prompt
+            else:
+                run["status"] = "incomplete"
+                run["incomplete_details"] = {"reason": "max_prompt_tokens"}
+        if run["status"] == "completed" and max_completion and completion_tokens > max_completion:
+            completion_tokens = max_completion
+            run["status"] = "incomplete"
+            run["incomplete_details"] = {"reason": "max_completion_tokens"}
+        run["usage"] = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                        "total_tokens": prompt_tokens + completion_tokens}
+        if run["incomplete_details"] != {"reason": "max_prompt_tokens"}:
+            # Built-in tools run inside the service, before the reply is written
+            run["started_at"] = run.get("started_at") or int(time.time())
+            for tool_type in ("code_interpreter", "file_search"):
+                if any(tool.get("type") == tool_type for tool in run["tools"]):
+                    call = {"id": self.new_id("call"), "type": tool_type,
+                            tool_type: {"input": "print(1)", "outputs": []}
+                            if tool_type == "code_interpreter" else {}}
+                    self.add_step(run, {"type": "tool_calls", "tool_calls": [call]},
+                                  created_at=self.last_step_end(run))
+            if self.code_interpreter_artifacts and any(
+                    tool.get("type") == "code_interpreter" for tool in run["tools"]):
+                content = self.code_interpreter_output(run, content)
+            message = self.create_message(
+                run["thread_id"], {"role": "assistant", "content": content},
+                run_id=run["id"], assistant_id=run["assistant_id"])
+            self.add_step(run, {"type": "message_creation",
+                                "message_creation": {"message_id": message["id"]}},
+                          usage=run["usage"], created_at=self.last_step_end(run))
+        return run
+
+    def code_interpreter_output(self, run: Dict[str, Any], text: str) -> List[Dict[str, Any]]:
+        """Reply content with a generated image and a file_path annotation"""
+        chart = self.create_file(f"{run['id']}-chart.png", b"\x89PNG\r\n\x1a\n" + b"\0" * 64,
+                                 "assistants_output")
+        table = self.create_file(f"{run['id']}.csv", b"x,y\n1,1\n2,4\n3,9\n", "assistants_output")
+        link = f"sandbox:/mnt/data/{table['filename']}"
+        return [
+            {"type": "text", "text": {"value": f"{text} [{table['filename']}]({link})", "annotations": [
+                {"type": "file_path", "text": link, "start_index": 0, "end_index": len(link),
+                 "file_path": {"file_id": table["id"]}}]}},
+            {"type": "image_file", "image_file": {"file_id": chart["id"]}},
+        ]
+
+    def submit_tool_outputs(self, run: Dict[str, Any], body: Dict[str, Any]) -> Dict[str, Any]:
+        """Accept tool outputs and put the run back in progress"""
+        run["tool_outputs"] = body.get("tool_outputs") or []
+        outputs = {output.get("tool_call_id"): output.get("output") for output in run["tool_outputs"]}
+        for step in self.run_steps[run["id"]]:
+            if step["status"] == "in_progress":
+                for call in step["step_details"]["tool_calls"]:
+                    call["function"]["output"] = outputs.get(call["id"])
+                step["status"] = "completed"
+                step["completed_at"] = int(time.time())
+        run["required_action"] = None
+        run["status"] = "in_progress"
+        self.run_started[run["id"]] = time.monotonic() - self.queued_seconds
+        return run
+
+    def create_file(self, filename: str, content: bytes, purpose: str) -> Dict[str, Any]:
+        file = {
+            "id": self.new_id("assistant-file"),
+            "object": "file",
+            "bytes": len(content),
+            "filename": filename,
+            "created_at": int(time.time()),
+            "purpose": purpose,
+            "status": "processed",
+        }
+        self.files[file["id"]] = file
+        self.file_contents[file["id"]] = content
+        return file
+
+    def create_vector_store(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        store = {
+            "id": self.new_id("vs"),
+            "object": "vector_store",
+            "created_at": int(time.time()),
+            "name": body.get("name"),
+            "status": "completed",
+            "usage_bytes": 0,
+            "file_counts": {"in_progress": 0, "completed": 0, "failed": 0,
+                            "cancelled": 0, "total": 0},
+            "metadata": body.get("metadata") or {},
+            "file_ids": [],
+        }
+        self.vector_stores[store["id"]] = store
+        return store
+
+    def create_file_batch(self, vector_store_id: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        """Attach files to a vector store; ingestion completes immediately"""
+        store = self.vector_stores[vector_store_id]
+        file_ids = body.get("file_ids") or []
+        missing = [file_id for file_id in file_ids if file_id not in self.files]
+        store["file_ids"] += [file_id for file_id in file_ids if file_id in self.files]
+        batch = {
+            "id": self.new_id("vsfb"),
+            "object": "vector_store.file_batch",
+            "created_at": int(time.time()),
+            "vector_store_id": vector_store_id,
+            "status": "failed" if missing else "completed",
+            "file_counts": {"in_progress": 0, "completed": len(file_ids) - len(missing),
+                            "failed": len(missing), "cancelled": 0, "total": len(file_ids)},
+        }
+        self.file_batches[batch["id"]] = batch
+        return batch
+
+    def advance_thread(self, thread_id: str) -> None:
+        for run in self.runs.values():
+            if run["thread_id"] == thread_id:
+                self.advance(run)
+
+    def active_run(self, thread_id: str) -> Optional[str]:
+        """The id of the thread's queued, in-progress or requires_action run"""
+        self.advance_thread(thread_id)
+        for run in self.runs.values():
+            if run["thread_id"] == thread_id and \
+                    run["status"] in ("queued", "in_progress", "requires_action"):
+                return run["id"]
+        return None
+
+
+def parse_multipart(content_type: str, raw: bytes) -> Dict[str, Any]:
+    """Form fields as strings and file parts as (filename, bytes)"""
+    message = BytesParser(policy=policy.default).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + raw)
+    fields: Dict[str, Any] = {}
+    for part in message.iter_parts():
+        name = part.get_param("name", header="content-disposition")
+        payload = part.get_payload(decode=True) or b""
+        filename = part.get_filename()
+        fields[name] = (filename, payload) if filename else payload.decode("utf-8")
+    return fields
+
+
+def paginate(items: List[Dict[str, Any]], query: Dict[str, str]) -> Dict[str, Any]:
+    """OpenAI-style cursor pagination over items ordered by creation"""
+    limit = min(int(query.get("limit", DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+    ordered = items if query.get("order", "desc") == "asc" else list(reversed(items))
+
+    ids = [item["id"] for item in ordered]
+    start = ids.index(query["after"]) + 1 if query.get("after") in ids else 0
+    end = ids.index(query["before"]) if query.get("before") in ids else len(ordered)
+
+    page = ordered[start:min(end, start + limit)]
+    return {
+        "object": "list",
+        "data": page,
+        "first_id": page[0]["id"] if page else None,
+        "last_id": page[-1]["id"] if page else None,
+        "has_more": start + limit < end,
+    }
+
+
+class MockFoundryServer(ThreadingHTTPServer):
+    """Threaded HTTP server holding the emulator state and its knobs"""
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], latency_ms: float = 0.0,
+                 latency_sigma: float = 0.5, throttle_rate: float = 0.0,
+                 failure_rate: float = 0.0, page_size: int = DEFAULT_PAGE_SIZE,
+                 queued_seconds: float = 0.1, in_progress_seconds: float = 0.5,
+                 seed: Optional[int] = None, ssl_context: Optional[ssl.SSLContext] = None):
+        super().__init__(address, MockFoundryHandler)
+        self.tls = ssl_context is not None
+        if ssl_context:
+            # Handshake lazily so it runs on the handler thread, not the accept loop
+            self.socket = ssl_context.wrap_socket(
+                self.socket, server_side=True, do_handshake_on_connect=False)
+        self.state = MockFoundryState(queued_seconds, in_progress_seconds)
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.throttle_rate = throttle_rate
+        self.failure_rate = failure_rate
+        # Route names (as in stats["routes"]) that always answer 503
+        self.failing_routes: set = set()
+        self.page_size = page_size
+        self.random = random.Random(seed)
+        self.stats_lock = threading.Lock()
+        self.stats = {"connections": 0, "requests": 0, "throttled": 0, "failed": 0, "routes": {}}
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self.server_address[:2]
+        scheme = "https" if self.tls else "http"
+        return f"{scheme}://{host}:{port}/api/projects/local"
+
+    def record(self, key: str, route: Optional[str] = None) -> None:
+        with self.stats_lock:
+            self.stats[key] += 1
+            if route:
+                self.stats["routes"][route] = self.stats["routes"].get(route, 0) + 1
+
+    def snapshot_stats(self) -> Dict[str, Any]:
+        """Copy of the connection and request counters"""
+        with self.stats_lock:
+            return json.loads(json.dumps(self.stats))
+
+    def start_background(self) -> threading.Thread:
+        """Serve on a daemon thread and return it"""
+        thread = threading.Thread(
+            target=self.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        thread.start()
+        return thread
+
+
+# (method, pattern, handler name); patterns are matched after the project prefix
+ROUTES = [
+    ("GET", r"/assistants", "list_agents"),
+    ("POST", r"/assistants", "create_agent"),
+    ("GET", r"/assistants/(?P<agent_id>[^/]+)", "get_agent"),
+    ("POST", r"/assistants/(?P<agent_id>[^/]+)", "update_agent"),
+    ("DELETE", r"/assistants/(?P<agent_id>[^/]+)", "delete_agent"),
+    ("GET", r"/threads", "list_threads"),
+    ("POST", r"/threads", "create_thread"),
+    ("POST", r"/threads/runs", "create_thread_and_run"),
+    ("GET", r"/threads/(?P<thread_id>[^/]+)", "get_thread"),
+    ("POST", r"/threads/(?P<thread_id>[^/]+)", "update_thread"),
+    ("DELETE", r"/threads/(?P<thread_id>[^/]+)", "delete_thread"),
+    ("GET", r"/threads/(?P<thread_id>[^/]+)/messages", "list_messages"),
+    ("POST", r"/threads/(?P<thread_id>[^/]+)/messages", "create_message"),
+    ("GET", r"/threads/(?P<thread_id>[^/]+)/runs", "list_runs"),
+    ("POST", r"/threads/(?P<thread_id>[^/]+)/runs", "create_run"),
+    ("GET", r"/threads/(?P<thread_id>[^/]+)/runs/(?P<run_id>[^/]+)", "get_run"),
+    ("POST", r"/threads/(?P<thread_id>[^/]+)/runs/(?P<run_id>[^/]+)/cancel", "cancel_run"),
+    ("POST", r"/threads/(?P<thread_id>[^/]+)/runs/(?P<run_id>[^/]+)/submit_tool_outputs",
+     "submit_tool_outputs"),
+    ("GET", r"/threads/(?P<thread_id>[^/]+)/runs/(?P<run_id>[^/]+)/steps", "list_run_steps"),
+    ("GET", r"/threads/(?P<thread_id>[^/]+)/runs/(?P<run_id>[^/]+)/steps/(?P<step_id>[^/]+)",
+     "get_run_step"),
+    ("POST", r"/files", "upload_file"),
+    ("GET", r"/files/(?P<file_id>[^/]+)", "get_file"),
+    ("GET", r"/files/(?P<file_id>[^/]+)/content", "get_file_content"),
+    ("GET", r"/vector_stores", "list_vector_stores"),
+    ("POST", r"/vector_stores", "create_vector_store"),
+    ("POST", r"/vector_stores/(?P<vector_store_id>[^/]+)/file_batches", "create_file_batch"),
+    ("GET", r"/vector_stores/(?P<vector_store_id>[^/]+)/file_batches/(?P<batch_id>[^/]+)",
+     "get_file_batch"),
+]
+COMPILED_ROUTES = [(method, re.compile(f"^(?:/api/projects/[^/]+)?{pattern}$"), name)
+                   for method, pattern, name in ROUTES]
+
+
+class MockFoundryHandler(BaseHTTPRequestHandler):
+    """Routes agents REST calls to MockFoundryState"""
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server: MockFoundryServer
+
+    def setup(self):
+        super().setup()
+        self.server.record("connections")
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def _send(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        # bytes payloads are file contents, everything else is JSON
+        raw = isinstance(payload, bytes)
+        body = payload if raw else json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/octet-stream" if raw else "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status: int, code: str, message: str, headers=None) -> None:
+        self._send(status, {"error": {"code": code, "message": message}}, headers)
+
+    def _dispatch(self, method: str) -> None:
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        content_type = self.headers.get("Content-Type") or ""
+        if content_type.startswith("multipart/form-data"):
+            body = parse_multipart(content_type, raw)
+        else:
+            body = json.loads(raw) if raw else {}
+
+        if url.path == "/_mock/stats":
+            return self._send(200, self.server.snapshot_stats())
+
+        for route_method, pattern, name in COMPILED_ROUTES:
+            match = pattern.match(url.path)
+            if route_method == method and match:
+                break
+        else:
+            return self._error(404, "not_found", f"No route for {method} {url.path}")
+
+        self.server.record("requests", name)
+        server = self.server
+        with server.stats_lock:
+            roll = server.random.random()
+            latency = 0.0
+            if server.latency_ms > 0:
+                latency = server.latency_ms * math.exp(
+                    server.random.gauss(0.0, server.latency_sigma)) / 1000
+        time.sleep(latency)
+
+        if roll < server.throttle_rate:
+            server.record("throttled")
+            return self._error(429, "rate_limit_exceeded", "Too Many Requests",
+                               {"Retry-After": "1"})
+        if name in server.failing_routes:
+            server.record("failed")
+            return self._error(503, "service_unavailable", "Simulated outage", {"Retry-After": "2"})
+        if roll < server.throttle_rate + server.failure_rate:
+            server.record("failed")
+            return self._error(500, "server_error", "Simulated failure")
+
+        with server.state.lock:
+            try:
+                status, payload = getattr(self, f"_{name}")(
+                    query=query, body=body, **match.groupdict())
+            except KeyError as e:
+                status, payload = 404, {"error": {"code": "not_found", "message": f"Not found: {e}"}}
+        self._send(status, payload)
+
+    # ------------------------------------------------------------------ routes
+
+    def _paged(self, items, query):
+        # page_size caps the page like the service's own maximum
+        page_size = self.server.page_size
+        query["limit"] = str(min(int(query.get("limit", page_size)), page_size))
+        return 200, paginate(items, query)
+
+    def _list_agents(self, query, body):
+        return self._paged(list(self.server.state.agents.values()), query)
+
+    def _create_agent(self, query, body):
+        return 200, self.server.state.create_agent(body)
+
+    def _get_agent(self, query, body, agent_id):
+        return 200, self.server.state.agents[agent_id]
+
+    def _update_agent(self, query, body, agent_id):
+        agent = self.server.state.agents[agent_id]
+        agent.update({key: value for key, value in body.items() if key in agent})
+        return 200, agent
+
+    def _delete_agent(self, query, body, agent_id):
+        self.server.state.agents.pop(agent_id)
+        return 200, {"id": agent_id, "object": "assistant.deleted", "deleted": True}
+
+    def _create_thread(self, query, body):
+        return 200, self.server.state.create_thread(body)
+
+    def _create_thread_and_run(self, query, body):
+        state = self.server.state
+        thread = state.create_thread(body.get("thread") or {})
+        return 200, state.create_run(thread["id"], body)
+
+    def _list_threads(self, query, body):
+        return self._paged(list(self.server.state.threads.values()), query)
+
+    def _get_thread(self, query, body, thread_id):
+        return 200, self.server.state.threads[thread_id]
+
+    def _upload_file(self, query, body):
+        filename, content = body["file"]
+        return 200, self.server.state.create_file(filename, content, body.get("purpose", "assistants"))
+
+    def _get_file(self, query, body, file_id):
+        return 200, self.server.state.files[file_id]
+
+    def _get_file_content(self, query, body, file_id):
+        return 200, self.server.state.file_contents[file_id]
+
+    def _list_vector_stores(self, query, body):
+        return self._paged(list(self.server.state.vector_stores.values()), query)
+
+    def _create_vector_store(self, query, body):
+        return 200, self.server.state.create_vector_store(body)
+
+    def _create_file_batch(self, query, body, vector_store_id):
+        return 200, self.server.state.create_file_batch(vector_store_id, body)
+
+    def _get_file_batch(self, query, body, vector_store_id, batch_id):
+        return 200, self.server.state.file_batches[batch_id]
+
+    def _update_thread(self, query, body, thread_id):
+        thread = self.server.state.threads[thread_id]
+        if body.get("metadata") is not None:
+            thread["metadata"] = body["metadata"]
+        return 200, thread
+
+    def _delete_thread(self, query, body, thread_id):
+        state = self.server.state
+        state.threads.pop(thread_id)
+        state.messages.pop(thread_id, None)
+        return 200, {"id": thread_id, "object": "thread.deleted", "deleted": True}
+
+    def _list_messages(self, query, body, thread_id):
+        state = self.server.state
+        state.advance_thread(thread_id)
+        return self._paged(state.messages[thread_id], query)
+
+    def _create_message(self, query, body, thread_id):
+        state = self.server.state
+        if thread_id not in state.threads:
+            raise KeyError(thread_id)
+        if state.active_run(thread_id):
+            return self._run_active(thread_id)
+        return 200, state.create_message(thread_id, body)
+
+    def _list_runs(self, query, body, thread_id):
+        state = self.server.state
+        state.advance_thread(thread_id)
+        runs = [run for run in state.runs.values() if run["thread_id"] == thread_id]
+        return self._paged(runs, query)
+
+    def _create_run(self, query, body, thread_id):
+        state = self.server.state
+        if thread_id not in state.threads:
+            raise KeyError(thread_id)
+        if state.active_run(thread_id):
+            return self._run_active(thread_id)
+        return 200, state.create_run(thread_id, body)
+
+    def _run_active(self, thread_id):
+        # The service refuses new turns on a thread while a run is active
+        run_id = self.server.state.active_run(thread_id)
+        return 400, {"error": {"code": "invalid_request_error",
+                               "message": f"Can't add messages to {thread_id} while a run "
+                                          f"{run_id} is active."}}
+
+    def _get_run(self, query, body, thread_id, run_id):
+        state = self.server.state
+        return 200, state.advance(state.runs[run_id])
+
+    def _list_run_steps(self, query, body, thread_id, run_id):
+        state = self.server.state
+        state.advance(state.runs[run_id])
+        return self._paged(state.run_steps[run_id], query)
+
+    def _get_run_step(self, query, body, thread_id, run_id, step_id):
+        steps = {step["id"]: step for step in self.server.state.run_steps[run_id]}
+        return 200, steps[step_id]
+
+    def _submit_tool_outputs(self, query, body, thread_id, run_id):
+        state = self.server.state
+        run = state.runs[run_id]
+        if run["status"] != "requires_action":
+            return 400, {"error": {"code": "invalid_state",
+                                   "message": f"Run {run_id} is {run['status']}"}}
+        return 200, state.submit_tool_outputs(run, body)
+
+    def _cancel_run(self, query, body, thread_id, run_id):
+        state = self.server.state
+        run = state.advance(state.runs[run_id])
+        if run["status"] in ("queued", "in_progress", "requires_action"):
+            run["status"] = "cancelled"
+            run["cancelled_at"] = int(time.time())
+        return 200, run
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Local emulator for the AI Foundry agents REST surface")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE)
+    parser.add_argument("--queued-seconds", type=float, default=0.1)
+    parser.add_argument("--in-progress-seconds", type=float, default=0.5)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--certfile", help="serve HTTPS with this certificate chain")
+    parser.add_argument("--keyfile", help="private key for --certfile")
+    args = parser.parse_args()
+
+    ssl_context = None
+    if args.certfile:
+        ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        ssl_context.load_cert_chain(args.certfile, args.keyfile)
+
+    server = MockFoundryServer(
+        (args.host, args.port), latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma, throttle_rate=args.throttle_rate,
+        failure_rate=args.failure_rate, page_size=args.page_size,
+        queued_seconds=args.queued_seconds, in_progress_seconds=args.in_progress_seconds,
+        seed=args.seed, ssl_context=ssl_context)
+    print(f"Mock Foundry agents API listening; AI_FOUNDRY_ENDPOINT={server.endpoint}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -26,9 +26,30 @@ def reset_environment():
     # Reset global variables
     function_app._agent_instance = None
     function_app._project_client = None
+    function_app._embeddings_client = None
+    function_app._vector_index = None
+    function_app._thread_pool = None
+    function_app._agent_registry = None
+    function_app._upload_manifest = None
+    function_app._vector_store_id = None
+    function_app._artifact_cache = None
+    function_app._endpoint_pool = None
+    function_app._idempotency_store = None
+    function_app._thread_locks = None
+    function_app._compaction_queue = None
+    function_app._compression_policy = None
+    function_app._response_snapshots = None
 
     yield
 
+    if function_app._thread_pool:
+        function_app._thread_pool.shutdown()
+        function_app._thread_pool = None
+    if function_app._compaction_queue:
+        function_app._compaction_queue.wait(timeout=5)
+        function_app._compaction_queue.shutdown()
+        function_app._compaction_queue = None
+
     os.environ.clear()
     os.environ.update(original_environ)
 
@@ -176,6 +197,9 @@ def mock_agents_client(mock_agent, mock_thread, mock_message, mock_run):
     agents_client.runs.create = Mock(return_value=mock_run)
     agents_client.runs.get = Mock(return_value=mock_run)
 
+    # Setup combined thread-and-run creation
+    agents_client.create_thread_and_run = Mock(return_value=mock_run)
+
     return agents_client
 
 
@@ -324,6 +348,7 @@ def mock_health_response():
             'project_name': 'ai-functions',
             'agents': [],
             'agent_count': 0,
+            'agents_truncated': False,
             'info': 'No agents found. Create one using /agent endpoint with action=create.',
             'authentication': 'Success - Managed Identity working'
         },
@@ -0,0 +1,128 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+# Unit tests for the LRU agent registry
+
+import pytest
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+from azure.core.exceptions import ResourceNotFoundError
+from metrics import MetricsRegistry
+from agent_registry import AgentRegistry, AgentNotFound
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def build_registry(agents, max_size=3, ttl_seconds=60):
+    by_id = {agent.id: agent for agent in agents}
+
+    def get_agent(agent_id):
+        if agent_id not in by_id:
+            raise ResourceNotFoundError("not found")
+        return by_id[agent_id]
+
+    get = Mock(side_effect=get_agent)
+    find = Mock(side_effect=lambda name: next((a for a in by_id.values() if a.name == name), None))
+    clock = FakeClock()
+    registry = AgentRegistry(get, find, max_size=max_size, ttl_seconds=ttl_seconds,
+                             metrics=MetricsRegistry(), clock=clock)
+    return registry, get, find, clock, by_id
+
+
+def agent(index):
+    return SimpleNamespace(id=f"asst_{index}", name=f"agent-{index}")
+
+
+class TestAgentRegistry:
+    """Test suite for AgentRegistry"""
+
+    def test_repeat_lookups_are_served_from_cache(self):
+        """Test id and name lookups fetch once and then hit the cache"""
+        # Arrange
+        registry, get, find, _, _ = build_registry([agent(1), agent(2)])
+
+        # Act
+        for _ in range(3):
+            registry.get(agent_id="asst_1")
+            registry.get(agent_name="agent-2")
+
+        # Assert
+        assert get.call_count == 1
+        assert find.call_count == 1
+        assert registry.metrics.counter("agent_registry.hits").value == 4
+
+    def test_stale_entries_are_revalidated(self):
+        """Test entries past the TTL are refreshed with one get_agent call"""
+        # Arrange
+        registry, get, _, clock, by_id = build_registry([agent(1)])
+        registry.get(agent_id="asst_1")
+        by_id["asst_1"] = SimpleNamespace(id="asst_1", name="renamed")
+        clock.now = 61
+
+        # Act
+        refreshed = registry.get(agent_id="asst_1")
+
+        # Assert
+        assert refreshed.name == "renamed"
+        assert get.call_count == 2
+
+    def test_deleted_agent_drops_out_after_ttl(self):
+        """Test an agent deleted elsewhere is reported missing on revalidation"""
+        # Arrange
+        registry, _, _, clock, by_id = build_registry([agent(1)])
+        registry.get(agent_name="agent-1")
+        del by_id["asst_1"]
+        clock.now = 61
+
+        # Act & Assert
+        with pytest.raises(AgentNotFound):
+            registry.get(agent_name="agent-1")
+        assert len(registry) == 0
+
+    def test_least_recently_used_agent_is_evicted(self):
+        """Test the registry stays within max_size, evicting the oldest use"""
+        # Arrange
+        registry, get, _, _, _ = build_registry([agent(i) for i in range(4)], max_size=3)
+        for index in (0, 1, 2, 0):
+            registry.get(agent_id=f"asst_{index}")
+
+        # Act
+        registry.get(agent_id="asst_3")
+
+        # Assert
+        assert len(registry) == 3
+        assert registry.metrics.counter("agent_registry.evictions").value == 1
+        registry.get(agent_id="asst_0")
+        assert get.call_count == 4
+        registry.get(agent_id="asst_1")
+        assert get.call_count == 5
+
+    def test_invalidate_forces_refetch(self):
+        """Test invalidated agents are fetched again on next use"""
+        # Arrange
+        registry, get, _, _, _ = build_registry([agent(1)])
+        registry.put(agent(1))
+
+        # Act
+        assert registry.invalidate("asst_1")
+        registry.get(agent_id="asst_1")
+
+        # Assert
+        assert get.call_count == 1
+        assert not registry.invalidate("asst_missing")
+
+    def test_unknown_agent_raises(self):
+        """Test unknown ids and names raise AgentNotFound"""
+        registry, _, _, _, _ = build_registry([])
+        with pytest.raises(AgentNotFound):
+            registry.get(agent_id="asst_missing")
+        with pytest.raises(AgentNotFound):
+            registry.get(agent_name="missing")
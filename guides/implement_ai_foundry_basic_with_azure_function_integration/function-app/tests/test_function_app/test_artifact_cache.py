@@ -0,0 +1,64 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+# Unit tests for the bounded artifact cache
+
+from metrics import MetricsRegistry
+from artifact_cache import ArtifactCache, CachedArtifact
+
+
+def artifact(size):
+    return CachedArtifact(b"x" * size, "image/png", "chart.png")
+
+
+class TestArtifactCache:
+    """Test suite for ArtifactCache"""
+
+    def test_evicts_least_recently_used_within_byte_budget(self):
+        """Test reading an artifact protects it from the next eviction"""
+        # Arrange
+        metrics = MetricsRegistry()
+        cache = ArtifactCache(max_bytes=300, max_item_bytes=200, metrics=metrics)
+        cache.put("file_a", artifact(100))
+        cache.put("file_b", artifact(100))
+        cache.get("file_a")
+
+        # Act
+        cache.put("file_c", artifact(150))
+
+        # Assert
+        assert cache.get("file_b") is None
+        assert cache.get("file_a") is not None
+        assert cache.size == 250
+        snapshot = metrics.snapshot()
+        assert snapshot["artifact_cache.evictions"] == 1
+        assert snapshot["artifact_cache.hits"] == 2
+        assert snapshot["artifact_cache.misses"] == 1
+
+    def test_oversized_artifacts_are_not_cached(self):
+        """Test a file above the per-item limit leaves the cache untouched"""
+        # Arrange
+        cache = ArtifactCache(max_bytes=1000, max_item_bytes=100, metrics=MetricsRegistry())
+        cache.put("file_a", artifact(50))
+
+        # Act
+        stored = cache.put("file_big", artifact(101))
+
+        # Assert
+        assert stored is False
+        assert len(cache) == 1
+        assert cache.get("file_a") is not None
+
+    def test_replacing_an_artifact_updates_the_size(self):
+        """Test putting the same id twice counts its bytes once"""
+        # Arrange
+        cache = ArtifactCache(max_bytes=1000, metrics=MetricsRegistry())
+        cache.put("file_a", artifact(100))
+
+        # Act
+        cache.put("file_a", artifact(40))
+
+        # Assert
+        assert len(cache) == 1
+        assert cache.size == 40
@@ -0,0 +1,107 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+# Unit tests for SDK cassette recording, scrubbing and replay
+
+import json
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+from cassettes import (
+    Cassette, CassetteMiss, RecordingAdapter, ReplayAdapter, scrub_json, scrub_url)
+
+HOST = "https://acct.services.ai.azure.com"
+
+
+class ScriptedAdapter(BaseAdapter):
+    """Answers each request with the next scripted (status, body)"""
+
+    def __init__(self, *replies):
+        super().__init__()
+        self.replies = list(replies)
+
+    def send(self, request, **kwargs):
+        status, body = self.replies.pop(0)
+        response = requests.Response()
+        response.status_code = status
+        response._content = body.encode("utf-8")
+        response.headers["Content-Type"] = "application/json"
+        response.headers["Set-Cookie"] = "session=secret"
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+def session_with(adapter):
+    session = requests.Session()
+    session.mount("https://", adapter)
+    return session
+
+
+class TestCassettes:
+    """Test suite for Cassette, RecordingAdapter and ReplayAdapter"""
+
+    def test_scrubbing_removes_hosts_keys_and_tokens(self):
+        """Test URLs lose their host and SAS values and JSON loses secret fields"""
+        # Act
+        url = scrub_url(f"{HOST}/api/projects/p/files/f1?api-version=v1&sig=abc&se=2026")
+        body = scrub_json({"api_key": "k", "usage": {"prompt_tokens": 12},
+                           "items": [{"accessToken": "t", "name": "n"}]})
+
+        # Assert
+        assert url == ("https://recorded.invalid/api/projects/p/files/f1"
+                       "?api-version=v1&sig=REDACTED&se=REDACTED")
+        assert body == {"api_key": "REDACTED", "usage": {"prompt_tokens": 12},
+                        "items": [{"accessToken": "REDACTED", "name": "n"}]}
+
+    def test_recorded_session_replays_offline(self, tmp_path):
+        """Test a recorded exchange is saved scrubbed and served back in order"""
+        # Arrange
+        path = str(tmp_path / "session.json")
+        recorder = Cassette(path, endpoint=f"{HOST}/api/projects/p")
+        live = session_with(RecordingAdapter(ScriptedAdapter(
+            (200, '{"status": "queued"}'),
+            (200, json.dumps({"status": "completed", "url": f"{HOST}/files/1"})),
+        ), recorder))
+        run_url = f"{HOST}/api/projects/p/threads/t/runs/r?api-version=v1"
+
+        # Act
+        live.get(run_url, headers={"Authorization": "Bearer secret"})
+        live.get(run_url)
+        recorder.save()
+        saved = (tmp_path / "session.json").read_text()
+        cassette = Cassette.load(path, timing=0)
+        offline = session_with(ReplayAdapter(cassette))
+        statuses = [offline.get(run_url).json()["status"] for _ in range(3)]
+
+        # Assert
+        assert "secret" not in saved and "acct" not in saved
+        assert cassette.endpoint == "https://recorded.invalid/api/projects/p"
+        assert statuses == ["queued", "completed", "completed"]
+        with pytest.raises(CassetteMiss):
+            offline.get(f"{HOST}/api/projects/p/threads?api-version=v1")
+
+    def test_rewind_restarts_each_request_sequence(self):
+        """Test replay iterations see the same sequence again after a rewind"""
+        # Arrange
+        url = "https://recorded.invalid/threads/t/runs/r"
+        cassette = Cassette("unused.json", [
+            {"request": {"method": "GET", "url": url, "body": {}},
+             "response": {"status": 200, "headers": {}, "body": {"json": {"n": n}}},
+             "elapsed_seconds": 0.0}
+            for n in (1, 2)], timing=0)
+
+        # Act
+        first = [cassette.play("GET", url)["response"]["body"]["json"]["n"] for _ in range(2)]
+        cassette.rewind()
+        again = cassette.play("GET", f"{HOST}/threads/t/runs/r")["response"]["body"]["json"]["n"]
+
+        # Assert
+        assert first == [1, 2]
+        assert again == 1
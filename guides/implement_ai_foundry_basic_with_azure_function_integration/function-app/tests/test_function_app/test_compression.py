@@ -0,0 +1,80 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+# Unit tests for Accept-Encoding negotiated response compression
+
+import gzip
+import json
+
+import azure.functions as func
+
+from metrics import MetricsRegistry
+from compression import CompressionPolicy, negotiate, parse_levels
+
+ENCODERS = {"zstd": None, "br": None, "gzip": None}
+
+
+def json_response(size=4096, mimetype="application/json"):
+    body = json.dumps({"agents": [{"id": f"asst_{i}", "name": "agent"} for i in range(size // 40)]})
+    return func.HttpResponse(body, mimetype=mimetype, status_code=200,
+                             headers={"X-Count": "100"})
+
+
+class TestCompression:
+    """Test suite for negotiate and CompressionPolicy"""
+
+    def test_negotiate_honours_q_values_then_server_preference(self):
+        """Test the best-weighted accepted encoding wins, with ties going to the server order"""
+        # Act & Assert
+        assert negotiate("gzip, br, zstd", ENCODERS) == "zstd"
+        assert negotiate("gzip;q=1.0, br;q=0.5", ENCODERS) == "gzip"
+        assert negotiate("br;q=0, *", ENCODERS) == "zstd"
+        assert negotiate("gzip", {"gzip": None}) == "gzip"
+        assert negotiate("deflate, identity", ENCODERS) is None
+        assert negotiate("*;q=0", ENCODERS) is None
+        assert negotiate(None, ENCODERS) is None
+
+    def test_large_json_is_gzipped_with_headers_kept(self):
+        """Test a body over the threshold is compressed and its metrics recorded"""
+        # Arrange
+        metrics = MetricsRegistry()
+        policy = CompressionPolicy(min_bytes=1024, metrics=metrics)
+        response = json_response()
+
+        # Act
+        compressed = policy.apply(response, "gzip", "agent")
+
+        # Assert
+        assert compressed.headers["Content-Encoding"] == "gzip"
+        assert compressed.headers["X-Count"] == "100"
+        assert compressed.mimetype == "application/json"
+        assert gzip.decompress(compressed.get_body()) == response.get_body()
+        snapshot = metrics.snapshot()
+        assert snapshot["compression.agent.bytes_in"] == len(response.get_body())
+        assert snapshot["compression.agent.bytes_out"] == len(compressed.get_body())
+
+    def test_small_binary_or_disabled_responses_pass_through(self):
+        """Test the size threshold, content type and per-route level 0 skip compression"""
+        # Arrange
+        policy = CompressionPolicy(min_bytes=1024, levels={"health": 0},
+                                   metrics=MetricsRegistry())
+
+        # Act
+        small = policy.apply(json_response(size=200), "gzip", "agent")
+        image = policy.apply(json_response(mimetype="image/png"), "gzip", "agent")
+        disabled = policy.apply(json_response(), "gzip", "health")
+        identity = policy.apply(json_response(), None, "agent")
+
+        # Assert
+        assert all("Content-Encoding" not in r.headers for r in (small, image, disabled, identity))
+        assert small.headers["Vary"] == "Accept-Encoding"
+        assert "Vary" not in image.headers
+
+    def test_levels_are_parsed_per_route_and_clamped(self):
+        """Test "route=level" settings override the default level within 0-9"""
+        # Arrange
+        policy = CompressionPolicy(default_level=5, levels=parse_levels("agent=1, health=12"))
+
+        # Act & Assert
+        assert [policy.level(route) for route in ("agent", "health", "demo")] == [1, 9, 5]
@@ -0,0 +1,105 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+# Unit tests for the per-request deadline budget
+
+import os
+import json
+import pytest
+from unittest.mock import Mock
+
+import function_app
+from deadline import Deadline, DeadlineExceeded, request_deadline, current_deadline
+
+
+class TestDeadline:
+    """Test suite for Deadline"""
+
+    def test_header_can_shorten_but_not_extend_budget(self):
+        """Test the header is capped by REQUEST_DEADLINE_SECONDS"""
+        # Arrange
+        os.environ['REQUEST_DEADLINE_SECONDS'] = '30'
+
+        # Act
+        shorter = Deadline.from_request({'X-Request-Deadline-Seconds': '5'})
+        longer = Deadline.from_request({'X-Request-Deadline-Seconds': '600'})
+        invalid = Deadline.from_request({'X-Request-Deadline-Seconds': 'soon'})
+
+        # Assert
+        assert shorter.seconds == 5
+        assert longer.seconds == 30
+        assert invalid.seconds == 30
+
+    def test_check_raises_with_progress_once_expired(self):
+        """Test an expired deadline raises with the progress so far"""
+        # Arrange
+        deadline = Deadline(0)
+
+        # Act / Assert
+        with pytest.raises(DeadlineExceeded) as exc_info:
+            deadline.check("start_run", thread_id="thread_1")
+        assert exc_info.value.stage == "start_run"
+        assert exc_info.value.progress == {"thread_id": "thread_1"}
+
+    def test_request_deadline_scopes_the_active_budget(self):
+        """Test the active deadline is only visible inside its block"""
+        # Arrange
+        deadline = Deadline(10)
+
+        # Act
+        with request_deadline(deadline):
+            inside = current_deadline()
+
+        # Assert
+        assert inside is deadline
+        assert current_deadline() is None
+
+
+class TestWaitForRun:
+    """Test suite for deadline-bounded run polling"""
+
+    def test_expired_deadline_cancels_run(self):
+        """Test a run still pending at the deadline is cancelled"""
+        # Arrange
+        agents_client = Mock()
+        pending = Mock(id='run_1', status='in_progress')
+        agents_client.runs.get.return_value = pending
+        cancelled_before = function_app.METRICS.counter("runs.cancelled").value
+
+        # Act
+        with request_deadline(Deadline(0.05)), \
+                pytest.raises(DeadlineExceeded) as exc_info:
+            function_app.wait_for_run(agents_client, 'thread_1', pending)
+
+        # Assert
+        agents_client.runs.cancel.assert_called_once_with(
+            thread_id='thread_1', run_id='run_1')
+        assert exc_info.value.progress['run_status'] == 'in_progress'
+        assert function_app.METRICS.counter("runs.cancelled").value == cancelled_before + 1
+        assert function_app.METRICS.counter("runs.wasted_seconds").value > 0
+
+    def test_code_interpreter_times_out_with_504_and_cleans_up(
+            self, http_request_factory, azure_environment,
+            mock_get_project_client, mock_agents_client):
+        """Test the endpoint returns 504 with partial progress and deletes its agent"""
+        # Arrange
+        pending = Mock(id='run_1', thread_id='thread_1', status='queued')
+        mock_agents_client.create_thread_and_run.return_value = pending
+        mock_agents_client.runs.get.return_value = pending
+        req = http_request_factory(
+            method='POST', url='/api/agent',
+            body={'action': 'code-interpreter'},
+            headers={'X-Request-Deadline-Seconds': '0.05'})
+
+        # Act
+        response = function_app.agent_operations(req)
+
+        # Assert
+        body = json.loads(response.get_body())
+        assert response.status_code == 504
+        assert body['status'] == 'timeout'
+        assert body['partial']['run_id'] == 'run_1'
+        assert body['partial']['deadline_seconds'] == 0.05
+        mock_agents_client.runs.cancel.assert_called_once()
+        mock_agents_client.delete_agent.assert_called_once()
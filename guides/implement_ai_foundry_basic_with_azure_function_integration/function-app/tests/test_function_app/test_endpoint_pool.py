@@ -0,0 +1,196 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+# Unit tests for endpoint failover, breakers and latency-aware routing
+
+import pytest
+from azure.core.exceptions import HttpResponseError, ResourceNotFoundError
+
+from metrics import MetricsRegistry
+from endpoint_pool import (
+    CircuitBreaker, EndpointPool, EndpointUnavailable, ProjectEndpoint,
+    commit_endpoint, current_endpoint, parse_endpoints)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def unavailable(status_code=503):
+    error = HttpResponseError(message="Service Unavailable")
+    error.status_code = status_code
+    return error
+
+
+def build_pool(*names, failure_threshold=2, clock=None):
+    clock = clock or FakeClock()
+    endpoints = [ProjectEndpoint(name, f"https://{name}.example", primary=i == 0,
+                                 breaker=CircuitBreaker(failure_threshold, 30, clock))
+                 for i, name in enumerate(names)]
+    metrics = MetricsRegistry()
+    return EndpointPool(endpoints, metrics=metrics, clock=clock), metrics, clock
+
+
+class TestEndpointPool:
+    """Test suite for EndpointPool, ProjectEndpoint and CircuitBreaker"""
+
+    def test_breaker_opens_then_allows_one_trial(self):
+        """Test consecutive failures open the breaker until the reset delay passes"""
+        # Arrange
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=2, reset_seconds=30, clock=clock)
+
+        # Act
+        tripped = [breaker.record_failure(), breaker.record_failure()]
+        blocked = breaker.allow()
+        clock.now = 31
+        trials = [breaker.allow(), breaker.allow()]
+        breaker.record_success()
+
+        # Assert
+        assert tripped == [False, True]
+        assert blocked is False
+        assert trials == [True, False]
+        assert breaker.state == "closed"
+
+    def test_new_conversations_prefer_lower_latency(self):
+        """Test ranking follows the latency moving average, penalised by errors"""
+        # Arrange
+        pool, _, _ = build_pool("west", "east")
+        west, east = pool.endpoints
+
+        # Act
+        pool.record(west, 0.5, failed=False)
+        pool.record(east, 0.3, failed=False)
+        fast_first = [endpoint.name for endpoint in pool.ranked()]
+        pool.record(east, 0.3, failed=True)
+
+        # Assert
+        assert fast_first == ["east", "west"]
+        assert east.error_rate > 0
+        assert [endpoint.name for endpoint in pool.ranked()] == ["west", "east"]
+
+    def test_transient_failure_fails_over_and_trips_breaker(self):
+        """Test a 503 moves the call to the next endpoint and counts against the first"""
+        # Arrange
+        pool, metrics, _ = build_pool("west", "east", failure_threshold=1)
+        served = []
+
+        def operation():
+            served.append(current_endpoint().name)
+            if current_endpoint().name == "west":
+                raise unavailable()
+            return "ok"
+
+        # Act
+        first = pool.call(operation)
+        second = pool.call(operation)
+
+        # Assert
+        assert (first, second) == ("ok", "ok")
+        assert served == ["west", "east", "east"]
+        assert pool.endpoints[0].breaker.state == "open"
+        snapshot = metrics.snapshot()
+        assert snapshot["endpoints.failovers"] == 1
+        assert snapshot["endpoints.west.breaker_trips"] == 1
+
+    def test_request_errors_and_pinned_calls_do_not_fail_over(self):
+        """Test client errors surface directly and home endpoints are never swapped"""
+        # Arrange
+        pool, _, _ = build_pool("west", "east", failure_threshold=1)
+        west = pool.endpoints[0]
+
+        def not_found():
+            raise ResourceNotFoundError("No thread")
+
+        def down():
+            raise unavailable(500)
+
+        # Act & Assert
+        with pytest.raises(ResourceNotFoundError):
+            pool.call(not_found)
+        with pytest.raises(HttpResponseError):
+            pool.call(down, home=west)
+        with pytest.raises(EndpointUnavailable) as exc_info:
+            pool.call(lambda: "ok", home=west)
+        assert exc_info.value.retry_after_seconds == 30
+
+    def test_committed_calls_and_lone_endpoints_raise_the_original_error(self):
+        """Test a call that created its run never fails over and one endpoint keeps its error"""
+        # Arrange
+        pool, metrics, _ = build_pool("west", "east")
+        lone, _, _ = build_pool("west")
+        served = []
+
+        def run_then_poll():
+            served.append(current_endpoint().name)
+            commit_endpoint()
+            raise unavailable()
+
+        def throttled():
+            raise unavailable(429)
+
+        # Act & Assert
+        with pytest.raises(HttpResponseError):
+            pool.call(run_then_poll)
+        with pytest.raises(HttpResponseError) as exc_info:
+            lone.call(throttled)
+        assert served == ["west"]
+        assert exc_info.value.status_code == 429
+        assert metrics.snapshot().get("endpoints.failovers", 0) == 0
+
+    def test_latency_sample_stops_when_the_run_is_created(self):
+        """Test run polling after the commit does not count as endpoint latency"""
+        # Arrange
+        pool, _, clock = build_pool("west")
+        west = pool.endpoints[0]
+
+        def create_run_then_poll():
+            clock.now += 0.2
+            commit_endpoint()
+            clock.now += 30
+            return "answer"
+
+        # Act
+        result = pool.call(create_run_then_poll)
+
+        # Assert
+        assert result == "answer"
+        assert west.latency_ms == pytest.approx(200)
+
+    def test_home_probes_unknown_ids_and_pins_them(self):
+        """Test a thread created elsewhere is located once and then remembered"""
+        # Arrange
+        pool, _, _ = build_pool("west", "east")
+        probes = []
+
+        def probe():
+            probes.append(current_endpoint().name)
+            if current_endpoint().name != "east":
+                raise ResourceNotFoundError("No thread")
+
+        # Act
+        first = pool.home("thread_1", probe)
+        second = pool.home("thread_1", probe)
+
+        # Assert
+        assert first is second is pool.endpoints[1]
+        assert probes == ["west", "east"]
+
+    def test_parse_endpoints_names_and_dedupes(self):
+        """Test the primary comes first and extra entries may be named"""
+        # Act
+        endpoints = parse_endpoints(
+            "https://west.example/api/projects/p",
+            "east=https://east.example/api/projects/p, http://127.0.0.1:8090/api/projects/local,"
+            "https://west.example/api/projects/p")
+
+        # Assert
+        assert [(e.name, e.primary) for e in endpoints] == [
+            ("primary", True), ("east", False), ("127.0.0.1:8090", False)]
+        assert endpoints[1].url == "https://east.example/api/projects/p"
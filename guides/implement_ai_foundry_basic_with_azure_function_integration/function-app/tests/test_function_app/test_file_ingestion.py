@@ -0,0 +1,122 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+# Unit tests for bulk file upload and vector store ingestion
+
+import io
+import hashlib
+import threading
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+from metrics import MetricsRegistry
+from file_ingestion import FileIngestor, UploadManifest, hash_stream
+
+
+def build_ingestor(tmp_path, **kwargs):
+    agents_client = Mock()
+    uploads = iter(range(1, 100))
+    agents_client.files.upload.side_effect = lambda **kw: SimpleNamespace(id=f"file_{next(uploads)}")
+    agents_client.vector_store_file_batches.create_and_poll.side_effect = \
+        lambda vector_store_id, file_ids, **kw: SimpleNamespace(
+            id="vsfb_1", status="completed", file_counts={"completed": len(file_ids)})
+    manifest = UploadManifest(str(tmp_path / "manifest.json"))
+    return FileIngestor(agents_client, manifest, metrics=MetricsRegistry(), **kwargs), agents_client
+
+
+class TestFileIngestion:
+    """Test suite for FileIngestor and UploadManifest"""
+
+    def test_hash_stream_reads_in_chunks_and_rewinds(self):
+        """Test hashing matches hashlib and leaves the stream ready to upload"""
+        # Arrange
+        stream = io.BytesIO(b"x" * 2500)
+
+        # Act
+        sha256, size = hash_stream(stream, chunk_size=1024)
+
+        # Assert
+        assert sha256 == hashlib.sha256(b"x" * 2500).hexdigest()
+        assert size == 2500
+        assert stream.tell() == 0
+
+    def test_manifest_survives_restart(self, tmp_path):
+        """Test a new ingestor with the same manifest skips known content"""
+        # Arrange
+        ingestor, _ = build_ingestor(tmp_path)
+        ingestor.ingest([("a.txt", io.BytesIO(b"alpha"))], "vs_1")
+        restarted, agents_client = build_ingestor(tmp_path)
+
+        # Act
+        report = restarted.ingest([("a-again.txt", io.BytesIO(b"alpha"))], "vs_1")
+
+        # Assert
+        assert report["files"][0]["status"] == "duplicate"
+        agents_client.files.upload.assert_not_called()
+        agents_client.vector_store_file_batches.create_and_poll.assert_not_called()
+
+    def test_workers_sharing_a_manifest_merge_their_records(self, tmp_path):
+        """Test concurrent saves from separate manifests keep every record and attachment"""
+        # Arrange
+        path = str(tmp_path / "manifest.json")
+        workers = [UploadManifest(path) for _ in range(8)]
+        for i, worker in enumerate(workers):
+            worker.put(f"sha_{i}", {"file_id": f"file_{i}", "filename": f"{i}.txt",
+                                    "bytes": i, "vector_store_ids": []})
+        workers[0].put("shared", {"file_id": "file_s", "filename": "s.txt",
+                                  "bytes": 1, "vector_store_ids": []})
+        workers[0].save()
+        workers[1].add_vector_store(["file_s"], "vs_1")
+
+        # Act
+        threads = [threading.Thread(target=worker.save) for worker in workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        reader = UploadManifest(path)
+
+        # Assert
+        assert len(reader) == 9
+        assert workers[2].get("sha_7")["file_id"] == "file_7"
+        assert reader.get("shared")["vector_store_ids"] == ["vs_1"]
+
+    def test_duplicates_are_attached_to_new_vector_stores(self, tmp_path):
+        """Test known files are still attached to a store they are not in yet"""
+        # Arrange
+        ingestor, agents_client = build_ingestor(tmp_path)
+        ingestor.ingest([("a.txt", io.BytesIO(b"alpha"))], "vs_1")
+
+        # Act
+        report = ingestor.ingest([("a.txt", io.BytesIO(b"alpha"))], "vs_2")
+
+        # Assert
+        assert agents_client.files.upload.call_count == 1
+        assert report["ingestion"]["batches"][0]["files"] == 1
+        batch_call = agents_client.vector_store_file_batches.create_and_poll.call_args
+        assert batch_call.kwargs["vector_store_id"] == "vs_2"
+        assert batch_call.kwargs["file_ids"] == ["file_1"]
+
+    def test_failed_uploads_are_reported_and_not_ingested(self, tmp_path):
+        """Test one failing file does not stop the others"""
+        # Arrange
+        ingestor, agents_client = build_ingestor(tmp_path, batch_size=10)
+        ok = agents_client.files.upload.side_effect
+
+        def upload(**kwargs):
+            if kwargs["file"][0] == "bad.txt":
+                raise RuntimeError("payload too large")
+            return ok(**kwargs)
+        agents_client.files.upload.side_effect = upload
+
+        # Act
+        report = ingestor.ingest([("good.txt", io.BytesIO(b"good")),
+                                  ("bad.txt", io.BytesIO(b"bad"))], "vs_1")
+
+        # Assert
+        assert [f["status"] for f in report["files"]] == ["uploaded", "failed"]
+        assert "payload too large" in report["files"][1]["error"]
+        assert report["summary"]["failed"] == 1
+        assert report["summary"]["uploaded_bytes"] == 4
+        assert agents_client.vector_store_file_batches.create_and_poll.call_args.kwargs["file_ids"] == ["file_1"]
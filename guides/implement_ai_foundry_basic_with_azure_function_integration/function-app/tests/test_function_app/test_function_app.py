@@ -319,6 +319,50 @@ class TestAgentOperations:
         assert response_data['action'] == 'list'
         assert response_data['status'] == 'success'
 
+    def test_agent_response_echoes_correlation_id(
+            self, http_request_factory, azure_environment,
+            mock_list_agents):
+        """Test the caller's correlation ID is bound and returned"""
+        # Arrange
+        from function_app import agent_operations
+        req = http_request_factory(
+            method='POST',
+            url='/api/agent',
+            body={'action': 'list'},
+            headers={'X-Correlation-ID': 'order-17'}
+        )
+
+        # Act
+        response = agent_operations(req)
+
+        # Assert
+        assert response.headers['X-Correlation-ID'] == 'order-17'
+
+    def test_agent_response_is_compressed_when_accepted(
+            self, http_request_factory, azure_environment,
+            mock_list_agents, monkeypatch):
+        """Test a client sending Accept-Encoding gets a gzip body with headers intact"""
+        # Arrange
+        import gzip
+        from function_app import agent_operations
+        monkeypatch.setenv('COMPRESSION_MIN_BYTES', '0')
+        req = http_request_factory(
+            method='POST',
+            url='/api/agent',
+            body={'action': 'list'},
+            headers={'Accept-Encoding': 'gzip, deflate', 'X-Correlation-ID': 'order-17'}
+        )
+
+        # Act
+        response = agent_operations(req)
+
+        # Assert
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert response.headers['Vary'] == 'Accept-Encoding'
+        assert response.headers['X-Correlation-ID'] == 'order-17'
+        assert response.mimetype == 'application/json'
+        assert json.loads(gzip.decompress(response.get_body()))['action'] == 'list'
+
 
 class TestDemo:
     """Test suite for demo endpoint"""
@@ -420,6 +464,23 @@ class TestProjectClientInitialization:
         assert "AI_FOUNDRY_ENDPOINT environment variable is not set" in str(
             exc_info.value)
 
+    def test_only_the_local_emulator_skips_the_bearer_token(self, mock_default_credential):
+        """Test the emulator gets a fixed auth header and Azure endpoints keep the credential"""
+        # Arrange
+        from function_app import build_project_client
+
+        # Act
+        with patch('function_app.AIProjectClient') as mock_client_class:
+            build_project_client('http://127.0.0.1:8089/api/projects/local')
+            build_project_client('https://test.services.ai.azure.com/api/projects/ai-functions')
+        emulator, azure = (call[1] for call in mock_client_class.call_args_list)
+
+        # Assert
+        assert 'authentication_policy' in emulator
+        assert 'authentication_policy' not in azure
+        assert emulator['credential'] is azure['credential'] is mock_default_credential
+        mock_default_credential.get_token.assert_not_called()
+
 
 class TestAgentHelperFunctions:
     """Test suite for agent helper functions"""
@@ -476,10 +537,8 @@ class TestAgentHelperFunctions:
         # Arrange
         from function_app import run_agent_conversation
 
-        mock_project_client.agents.threads.create.return_value = mock_thread
-        mock_project_client.agents.messages.create.return_value = mock_message
+        mock_project_client.agents.create_thread_and_run.return_value = mock_run
         mock_project_client.agents.messages.list.return_value = [mock_message]
-        mock_project_client.agents.runs.create.return_value = mock_run
         mock_project_client.agents.runs.get.return_value = mock_run
 
         # Act
@@ -490,7 +549,10 @@ class TestAgentHelperFunctions:
         assert result['thread_id'] == 'thread_test123'
         assert result['response'] == 'Test response from assistant'
         assert result['status'] == 'completed'
-        mock_project_client.agents.threads.create.assert_called_once()
+        mock_project_client.agents.create_thread_and_run.assert_called_once()
+        mock_project_client.agents.threads.create.assert_not_called()
+        mock_project_client.agents.messages.create.assert_not_called()
+        mock_project_client.agents.runs.create.assert_not_called()
 
     def test_run_agent_conversation_existing_thread(
             self, azure_environment, mock_project_client,
@@ -515,3 +577,172 @@ class TestAgentHelperFunctions:
         mock_project_client.agents.threads.get.assert_called_once_with(
             'thread_existing')
         mock_project_client.agents.threads.create.assert_not_called()
+        mock_project_client.agents.messages.create.assert_not_called()
+        assert mock_project_client.agents.runs.create.call_args.kwargs[
+            'additional_messages'][0].content == "Test message"
+
+
+class TestLocalRetrieval:
+    """Test suite for local vector index actions and context injection"""
+
+    def test_index_and_search_with_vectors(
+            self, http_request_factory, azure_environment, tmp_path):
+        """Test indexing precomputed vectors and searching by vector"""
+        # Arrange
+        from function_app import agent_operations
+        import os
+        os.environ['VECTOR_INDEX_PATH'] = str(tmp_path)
+        index_req = http_request_factory(
+            method='POST',
+            url='/api/agent',
+            body={
+                'action': 'index',
+                'documents': [
+                    {'id': 'doc1', 'text': 'Azure Functions', 'vector': [1.0, 0.0]},
+                    {'id': 'doc2', 'text': 'AI Foundry', 'vector': [0.0, 1.0]}
+                ]
+            }
+        )
+        search_req = http_request_factory(
+            method='POST',
+            url='/api/agent',
+            body={'action': 'search', 'vector': [0.1, 1.0], 'top_k': 1}
+        )
+
+        # Act
+        index_response = agent_operations(index_req)
+        search_response = agent_operations(search_req)
+
+        # Assert
+        assert index_response.status_code == 200
+        assert json.loads(index_response.get_body())['total'] == 2
+        assert search_response.status_code == 200
+        response_data = json.loads(search_response.get_body())
+        assert response_data['count'] == 1
+        assert response_data['results'][0]['id'] == 'doc2'
+
+    def test_search_embeds_query(
+            self, http_request_factory, azure_environment, tmp_path):
+        """Test a text query is embedded before searching"""
+        # Arrange
+        from function_app import agent_operations
+        import os
+        os.environ['VECTOR_INDEX_PATH'] = str(tmp_path)
+        req = http_request_factory(
+            method='POST',
+            url='/api/agent',
+            body={'action': 'search', 'query': 'functions'}
+        )
+
+        # Act
+        with patch('function_app.embed_texts', return_value=[[1.0, 0.0]]) as mock_embed:
+            response = agent_operations(req)
+
+        # Assert
+        assert response.status_code == 200
+        mock_embed.assert_called_once_with(['functions'])
+        assert json.loads(response.get_body())['results'] == []
+
+    def test_search_requires_query(self, http_request_factory, azure_environment):
+        """Test search without query or vector"""
+        # Arrange
+        from function_app import agent_operations
+        req = http_request_factory(
+            method='POST',
+            url='/api/agent',
+            body={'action': 'search'}
+        )
+
+        # Act
+        response = agent_operations(req)
+
+        # Assert
+        assert response.status_code == 400
+
+    def test_invalid_documents_and_vectors_are_rejected(
+            self, http_request_factory, azure_environment, tmp_path):
+        """Test malformed bodies and vectors of the wrong dimension get a 400, not a 500"""
+        # Arrange
+        from function_app import agent_operations
+        import os
+        os.environ['VECTOR_INDEX_PATH'] = str(tmp_path)
+
+        def send(**body):
+            return agent_operations(http_request_factory(method='POST', url='/api/agent', body=body))
+
+        send(action='index', documents=[{'text': 'Azure Functions', 'vector': [1.0, 0.0]}])
+
+        # Act
+        responses = [
+            send(action='index', documents=[42]),
+            send(action='index', documents=[{'metadata': {}}]),
+            send(action='index', documents=[{'text': 'x', 'vector': [1.0, 0.0, 0.0]}]),
+            send(action='index', documents=[{'text': 'x', 'vector': ['a', 'b']}]),
+            send(action='search', vector=[1.0, 0.0, 0.0]),
+            send(action='search', vector='1,0'),
+            send(action='search', vector=[1.0, 0.0], top_k='many'),
+        ]
+
+        # Assert
+        assert [r.status_code for r in responses] == [400] * len(responses)
+        assert 'dimension 2' in json.loads(responses[2].get_body())['error']
+        assert send(action='search', vector=[1.0, 0.0]).status_code == 200
+
+    def test_mismatched_embeddings_and_context_top_k_are_rejected(
+            self, http_request_factory, azure_environment, tmp_path):
+        """Test a query embedding of the wrong dimension and a bad context_top_k get a 400"""
+        # Arrange
+        from function_app import agent_operations
+        import os
+        os.environ['VECTOR_INDEX_PATH'] = str(tmp_path)
+
+        def send(**body):
+            return agent_operations(http_request_factory(method='POST', url='/api/agent', body=body))
+
+        send(action='index', documents=[{'text': 'Azure Functions', 'vector': [1.0, 0.0]}])
+
+        # Act
+        with patch('function_app.embed_texts', return_value=[[1.0, 0.0, 0.0]]):
+            search = send(action='search', query='functions')
+            chat = send(action='chat', message='hi', use_local_context=True)
+        bad_top_k = send(action='chat', message='hi', use_local_context=True,
+                         context_top_k='many')
+
+        # Assert
+        assert search.status_code == 400
+        assert 'dimension 2' in json.loads(search.get_body())['error']
+        assert chat.status_code == 400
+        assert bad_top_k.status_code == 400
+        assert 'context_top_k' in json.loads(bad_top_k.get_body())['error']
+
+    def test_chat_injects_local_context(
+            self, http_request_factory, azure_environment,
+            mock_get_or_create_agent, mock_run_agent_conversation,
+            mock_datetime):
+        """Test retrieved passages are prepended to the agent message"""
+        # Arrange
+        from function_app import agent_operations
+        req = http_request_factory(
+            method='POST',
+            url='/api/agent',
+            body={
+                'action': 'chat',
+                'message': 'What runs my code?',
+                'use_local_context': True
+            }
+        )
+        context = [{'id': 'doc1', 'text': 'Azure Functions runs code.',
+                    'metadata': {}, 'score': 0.9}]
+
+        # Act
+        with patch('function_app.search_local_index', return_value=context):
+            response = agent_operations(req)
+
+        # Assert
+        assert response.status_code == 200
+        response_data = json.loads(response.get_body())
+        assert response_data['user_message'] == 'What runs my code?'
+        assert response_data['context'] == [{'id': 'doc1', 'score': 0.9}]
+        agent_message = mock_run_agent_conversation.call_args[0][1]
+        assert 'Azure Functions runs code.' in agent_message
+        assert agent_message.endswith('Question: What runs my code?')
@@ -0,0 +1,135 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+# Unit tests for the shared pooled SDK transport
+
+import os
+import json
+import pytest
+from azure.core.rest import HttpRequest
+from azure.core.pipeline import Pipeline
+
+import http_transport
+from http_transport import (build_transport, sdk_client_options, ConnectionStats,
+                            UpstreamCallPolicy, count_upstream_calls)
+from mock_foundry.server import MockFoundryServer
+
+
+@pytest.fixture
+def local_server():
+    """Plain-http agents emulator on an ephemeral port"""
+    server = MockFoundryServer(("127.0.0.1", 0))
+    server.start_background()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def send_requests(transport, url, count, policies=None):
+    with Pipeline(transport, policies=policies) as pipeline:
+        for _ in range(count):
+            pipeline.run(HttpRequest("POST", url, json={}))
+
+
+class TestHttpTransport:
+    """Test suite for the pooled transport factory"""
+
+    def test_keep_alive_reuses_connections(self, local_server):
+        """Test sequential requests share one pooled connection"""
+        # Arrange
+        stats = ConnectionStats()
+        transport = build_transport(stats=stats)
+
+        # Act
+        send_requests(transport, f"{local_server.endpoint}/threads", 5)
+
+        # Assert
+        snapshot = stats.snapshot()
+        assert snapshot['requests'] == 5
+        assert snapshot['new_connections'] == 1
+        assert snapshot['reused_connections'] == 4
+        assert local_server.snapshot_stats()['connections'] == 1
+
+    def test_keep_alive_disabled_opens_new_connections(self, local_server):
+        """Test Connection: close forces a new connection per request"""
+        # Arrange
+        stats = ConnectionStats()
+        transport = build_transport(keep_alive=False, stats=stats)
+
+        # Act
+        send_requests(transport, f"{local_server.endpoint}/threads", 3)
+
+        # Assert
+        assert stats.snapshot()['new_connections'] == 3
+        assert stats.snapshot()['reuse_ratio'] == 0.0
+
+    def test_sdk_client_options_share_transport_and_proxy(self):
+        """Test every client gets the same transport and the configured proxy"""
+        # Arrange
+        http_transport._shared_transport = None
+        os.environ['HTTP_PROXY_URL'] = 'http://proxy.internal:3128'
+
+        # Act
+        first = sdk_client_options()
+        second = sdk_client_options()
+
+        # Assert
+        assert first['transport'] is second['transport']
+        assert first['proxies'] == {
+            'http': 'http://proxy.internal:3128',
+            'https': 'http://proxy.internal:3128'
+        }
+        http_transport._shared_transport = None
+
+    def test_transport_stats_are_on_metrics_not_health(
+            self, http_request_factory, azure_environment,
+            mock_ai_project_client_class, mock_list_agents,
+            mock_default_credential):
+        """Test connection stats are on /metrics and rebuilt health snapshots keep their ETag"""
+        # Arrange
+        from function_app import get_response_snapshots, health_check, metrics_snapshot
+
+        def get(handler, url):
+            return handler(http_request_factory(method='GET', url=url))
+
+        # Act
+        first = get(health_check, '/api/health')
+        get_response_snapshots().invalidate()
+        rebuilt = get(health_check, '/api/health')
+        metrics = json.loads(get(metrics_snapshot, '/api/metrics').get_body())
+
+        # Assert
+        assert 'transport' not in json.loads(first.get_body())
+        assert rebuilt.headers['ETag'] == first.headers['ETag']
+        assert set(metrics['transport']) >= {'requests', 'new_connections',
+                                             'reused_connections', 'tls_handshakes'}
+
+    def test_upstream_calls_counted_per_invocation(self, local_server):
+        """Test round trips are attributed only to the active counting block"""
+        # Arrange
+        transport = build_transport(stats=ConnectionStats())
+        url = f"{local_server.endpoint}/threads"
+        policies = [UpstreamCallPolicy()]
+
+        # Act
+        with count_upstream_calls() as upstream_calls:
+            send_requests(transport, url, 3, policies)
+        send_requests(transport, url, 2, policies)
+
+        # Assert
+        assert upstream_calls.value == 3
+
+    def test_agent_operations_report_upstream_calls(
+            self, http_request_factory, azure_environment, mock_list_agents):
+        """Test the agent endpoint returns its round-trip count as a header"""
+        # Arrange
+        from function_app import agent_operations
+        req = http_request_factory(method='POST', url='/api/agent',
+                                   body={'action': 'list'})
+
+        # Act
+        response = agent_operations(req)
+
+        # Assert
+        assert response.headers['X-Upstream-Calls'] == '0'
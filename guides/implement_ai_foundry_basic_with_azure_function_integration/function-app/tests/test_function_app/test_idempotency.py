@@ -0,0 +1,123 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+# Unit tests for Idempotency-Key records and their in-memory backend
+
+import pytest
+
+from metrics import MetricsRegistry
+from idempotency import (
+    IdempotencyBackend, IdempotencyStore, InMemoryIdempotencyBackend, load_backend, request_fingerprint)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def build_store(max_size=10, ttl_seconds=60):
+    clock = FakeClock()
+    metrics = MetricsRegistry()
+    backend = InMemoryIdempotencyBackend(max_size, clock)
+    return IdempotencyStore(backend, ttl_seconds, metrics), metrics, clock
+
+
+class TestIdempotency:
+    """Test suite for IdempotencyStore, IdempotentRequest and the in-memory backend"""
+
+    def test_first_use_claims_and_retries_see_the_recorded_run(self):
+        """Test a retry gets the run and then the response stored by the first request"""
+        # Arrange
+        store, metrics, _ = build_store()
+        fingerprint = request_fingerprint("chat", {"message": "Hello"}, {})
+
+        # Act
+        first = store.begin("key-1", fingerprint)
+        first.record_run(thread_id="thread_1", run_id="run_1")
+        in_flight = store.begin("key-1", fingerprint)
+        first.complete(200, '{"response": "Hi"}')
+        done = store.begin("key-1", fingerprint)
+
+        # Assert
+        assert first.claimed is True
+        assert in_flight.claimed is False
+        assert in_flight.record["run"] == {"thread_id": "thread_1", "run_id": "run_1"}
+        assert not in_flight.completed
+        assert done.completed
+        assert done.record["response"] == {"status_code": 200, "body": '{"response": "Hi"}'}
+        snapshot = metrics.snapshot()
+        assert snapshot["idempotency.keys"] == 1
+        assert snapshot["idempotency.retries"] == 2
+
+    def test_release_and_expiry_free_the_key(self):
+        """Test a released or expired key is claimed afresh"""
+        # Arrange
+        store, _, clock = build_store(ttl_seconds=60)
+
+        # Act
+        store.begin("released", "a").release()
+        reclaimed = store.begin("released", "a")
+        store.begin("expiring", "a")
+        clock.now = 61
+        expired = store.begin("expiring", "a")
+
+        # Assert
+        assert reclaimed.claimed is True
+        assert expired.claimed is True
+
+    def test_backend_evicts_oldest_beyond_max_size(self):
+        """Test the in-memory backend stays bounded and hands out copies"""
+        # Arrange
+        backend = InMemoryIdempotencyBackend(max_size=2, clock=FakeClock())
+
+        # Act
+        for key in ("a", "b", "c"):
+            backend.add(key, {"key": key}, 60)
+        existing = backend.add("c", {"key": "other"}, 60)
+        existing["key"] = "mutated"
+
+        # Assert
+        assert len(backend) == 2
+        assert backend.add("a", {"key": "a"}, 60) is None
+        assert backend.add("c", {}, 60) == {"key": "c"}
+
+    def test_fingerprint_covers_action_body_and_params(self):
+        """Test the same key reused for a different request can be told apart"""
+        # Act
+        base = request_fingerprint("chat", {"message": "Hello", "thread_id": "t"}, {})
+        reordered = request_fingerprint("chat", {"thread_id": "t", "message": "Hello"}, {})
+        changed = request_fingerprint("chat", {"message": "Bye", "thread_id": "t"}, {})
+        other_action = request_fingerprint("code-interpreter", {"message": "Hello", "thread_id": "t"}, {})
+
+        # Assert
+        assert base == reordered
+        assert len({base, changed, other_action}) == 3
+
+    def test_load_backend_by_name(self):
+        """Test "memory" and "module:Class" specs, and rejects anything else"""
+        # Act
+        memory = load_backend("memory", 5)
+        imported = load_backend("idempotency:InMemoryIdempotencyBackend", 5)
+
+        # Assert
+        assert memory.max_size == 5
+        assert isinstance(imported, InMemoryIdempotencyBackend)
+        with pytest.raises(ValueError):
+            load_backend("redis", 5)
+        with pytest.raises(ValueError):
+            load_backend("collections:OrderedDict", 5)
+
+    def test_backend_must_implement_every_operation(self):
+        """Test a backend missing an operation fails at construction, not on first use"""
+        # Arrange
+        class AddOnly(IdempotencyBackend):
+            def add(self, key, record, ttl_seconds):
+                return None
+
+        # Act / Assert
+        with pytest.raises(TypeError):
+            AddOnly()
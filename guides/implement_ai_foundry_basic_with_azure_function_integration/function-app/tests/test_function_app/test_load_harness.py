@@ -0,0 +1,96 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+# Smoke tests for the load-test harness and its fake project client
+
+import time
+import pytest
+
+from load.fake_project_client import FakeProjectClient, FakeUpstreamError
+from load.run_load import run_suite, compare
+
+
+class TestFakeProjectClient:
+    """Test suite for the latency-simulating fake client"""
+
+    def test_run_status_transitions(self):
+        """Test runs move from queued through in_progress to completed"""
+        # Arrange
+        client = FakeProjectClient(
+            latency_ms=0, queued_seconds=0.05, in_progress_seconds=0.05)
+        agents = client.agents
+        thread = agents.threads.create()
+        agents.messages.create(thread_id=thread.id, role="user", content="Hi")
+        run = agents.runs.create(thread_id=thread.id, agent_id="asst_1")
+
+        # Act
+        first = agents.runs.get(thread_id=thread.id, run_id=run.id).status
+        time.sleep(0.12)
+        last = agents.runs.get(thread_id=thread.id, run_id=run.id).status
+        messages = agents.messages.list(thread_id=thread.id)
+
+        # Assert
+        assert first == "queued"
+        assert last == "completed"
+        assert messages[0].role == "assistant"
+        assert agents.calls["runs.get"] == 2
+
+    def test_throttling_raises_429(self):
+        """Test throttle_rate injects 429 errors"""
+        # Arrange
+        client = FakeProjectClient(latency_ms=0, throttle_rate=1.0)
+
+        # Act & Assert
+        with pytest.raises(FakeUpstreamError) as exc_info:
+            client.agents.threads.create()
+        assert exc_info.value.status_code == 429
+
+
+class TestLoadHarness:
+    """Test suite for the load-test driver"""
+
+    def test_run_suite_reports_latency_and_upstream_calls(self):
+        """Test a short run produces a comparable baseline"""
+        # Act
+        baseline = run_suite(
+            ["chat", "list"], rps=20, duration=0.25, workers=4,
+            client_options={"latency_ms": 0, "queued_seconds": 0,
+                            "in_progress_seconds": 0, "seed": 1})
+
+        # Assert
+        chat = baseline["results"]["chat"]
+        assert chat["requests"] == 5
+        assert chat["errors"] == 0
+        assert chat["p50_ms"] <= chat["p99_ms"]
+        assert 3 <= chat["upstream_calls_per_request"] < 4
+        # Repeated lists are served from the response snapshot
+        assert baseline["results"]["list"]["upstream_calls_per_request"] < 1
+        assert baseline["results"]["list"]["snapshot_misses"] >= 1
+        assert baseline["results"]["list"]["snapshot_hits"] >= 1
+        assert baseline["results"]["chat"]["snapshot_hits"] == 0
+
+    def test_each_action_starts_with_cold_caches(self):
+        """Test a health run cannot hit a snapshot left behind by the previous action"""
+        # Arrange
+        options = {"latency_ms": 0, "queued_seconds": 0, "in_progress_seconds": 0, "seed": 1}
+        run_suite(["health"], rps=20, duration=0.1, workers=1, client_options=options)
+
+        # Act
+        baseline = run_suite(["health"], rps=20, duration=0.1, workers=1, client_options=options)
+
+        # Assert
+        assert baseline["results"]["health"]["snapshot_misses"] == 1
+
+    def test_compare_flags_regressions(self):
+        """Test compare reports metrics beyond the tolerance"""
+        # Arrange
+        before = {"results": {"chat": {"p95_ms": 100.0, "p99_ms": 200.0}}}
+        after = {"results": {"chat": {"p95_ms": 105.0, "p99_ms": 300.0}}}
+
+        # Act
+        regressions = compare(before, after, tolerance=0.10)
+
+        # Assert
+        assert len(regressions) == 1
+        assert regressions[0].startswith("chat.p99_ms")
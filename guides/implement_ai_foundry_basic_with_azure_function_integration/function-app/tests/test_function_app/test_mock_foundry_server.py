@@ -0,0 +1,820 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+# End-to-end tests running the real AIProjectClient against the local emulator
+
+import os
+import json
+import pytest
+
+from mock_foundry.server import MockFoundryServer
+
+
+@pytest.fixture
+def mock_foundry():
+    """Local agents emulator on an ephemeral port, wired into the function app"""
+    server = MockFoundryServer(
+        ("127.0.0.1", 0), queued_seconds=0, in_progress_seconds=0.05, page_size=10)
+    server.start_background()
+    os.environ['AI_FOUNDRY_ENDPOINT'] = server.endpoint
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def standby_foundry():
+    """Second emulator standing in for a failover endpoint in another region"""
+    server = MockFoundryServer(
+        ("127.0.0.1", 0), queued_seconds=0, in_progress_seconds=0.05, page_size=10)
+    server.start_background()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class TestMockFoundryServer:
+    """Test suite for the real SDK against the local agents emulator"""
+
+    def test_run_agent_conversation_end_to_end(self, mock_foundry):
+        """Test a full conversation through the real SDK transport"""
+        # Arrange
+        from function_app import get_or_create_agent, run_agent_conversation
+
+        from http_transport import count_upstream_calls
+        agent = get_or_create_agent()
+        requests_before = mock_foundry.snapshot_stats()['requests']
+
+        # Act
+        with count_upstream_calls() as upstream_calls:
+            result = run_agent_conversation(agent, "Hello")
+
+        # Assert
+        assert result['status'] == 'completed'
+        assert result['response'].startswith('Simulated response for run_')
+        assert result['usage']['prompt_tokens'] > 100
+        assert result['usage']['total_tokens'] == result['usage']['prompt_tokens'] + 40
+        stats = mock_foundry.snapshot_stats()
+        assert stats['routes']['create_thread_and_run'] == 1
+        assert 'create_thread' not in stats['routes']
+        assert 'create_message' not in stats['routes']
+        assert upstream_calls.value == stats['requests'] - requests_before
+        assert stats['connections'] < stats['requests']
+
+    def test_list_agents_follows_pagination(self, mock_foundry):
+        """Test listing walks every page of the emulator"""
+        # Arrange
+        from function_app import list_agents
+        for i in range(25):
+            mock_foundry.state.create_agent({"name": f"agent-{i}", "model": "gpt-4"})
+
+        # Act
+        agents = list_agents()
+
+        # Assert
+        assert len(agents) == 25
+        assert isinstance(agents[0]['created_at'], str)
+        assert mock_foundry.snapshot_stats()['routes']['list_agents'] >= 3
+
+    def test_injected_failures_surface_as_http_errors(self, mock_foundry):
+        """Test emulator failures reach the caller as HttpResponseError"""
+        # Arrange
+        from azure.core.exceptions import HttpResponseError
+        from function_app import get_project_client
+        mock_foundry.failure_rate = 1.0
+
+        # Act & Assert
+        with pytest.raises(HttpResponseError) as exc_info:
+            get_project_client().agents.threads.create(retry_total=0)
+        assert exc_info.value.status_code == 500
+
+    def test_deadline_cancels_stuck_run(self, mock_foundry, http_request_factory):
+        """Test a run outliving the request deadline is cancelled upstream"""
+        # Arrange
+        from function_app import agent_operations
+        mock_foundry.state.in_progress_seconds = 30
+        req = http_request_factory(
+            method='POST', url='/api/agent',
+            body={'action': 'chat', 'message': 'Hello'},
+            headers={'X-Request-Deadline-Seconds': '0.5'})
+
+        # Act
+        response = agent_operations(req)
+
+        # Assert
+        assert response.status_code == 504
+        run_id = json.loads(response.get_body())['partial']['run_id']
+        assert mock_foundry.state.runs[run_id]['status'] == 'cancelled'
+        assert mock_foundry.snapshot_stats()['routes']['cancel_run'] == 1
+
+    def test_function_tools_answer_requires_action(self, mock_foundry):
+        """Test a run that calls a function tool completes with its output"""
+        # Arrange
+        from unittest.mock import patch
+        from function_app import get_or_create_agent, run_agent_conversation
+        from metrics import MetricsRegistry
+        from tool_registry import ToolRegistry
+        registry = ToolRegistry(metrics=MetricsRegistry())
+        registry.register(lambda: "42 open tickets", name="count_open_tickets")
+        os.environ['DEFAULT_AGENT_FUNCTION_TOOLS'] = 'true'
+
+        # Act
+        with patch('function_app.TOOLS', registry):
+            agent = get_or_create_agent()
+            result = run_agent_conversation(agent, "How many tickets are open?")
+
+        # Assert
+        assert result['status'] == 'completed'
+        assert result['response'].endswith('using tool outputs: 42 open tickets')
+        assert mock_foundry.snapshot_stats()['routes']['submit_tool_outputs'] == 1
+
+    def test_sweep_reclaims_threads_created_by_chat(self, mock_foundry, http_request_factory):
+        """Test chat threads carry ownership metadata the sweep action acts on"""
+        # Arrange
+        from function_app import agent_operations, get_or_create_agent, run_agent_conversation
+        os.environ['THREAD_LEASE_SECONDS'] = '0'
+        os.environ['SWEEPER_THREAD_IDLE_SECONDS'] = '0'
+        thread_id = run_agent_conversation(get_or_create_agent(), "Hello")['thread_id']
+        mock_foundry.state.create_thread({})
+
+        # Act
+        response = agent_operations(http_request_factory(
+            method='POST', url='/api/agent', body={'action': 'sweep', 'dry_run': False}))
+
+        # Assert
+        body = json.loads(response.get_body())
+        assert body['threads']['deleted'] == 1
+        assert body['threads']['candidates'][0]['id'] == thread_id
+        assert thread_id not in mock_foundry.state.threads
+        assert len(mock_foundry.state.threads) == 1
+
+    def test_sweep_reclaims_resources_on_failover_endpoints(
+            self, mock_foundry, standby_foundry, http_request_factory):
+        """Test agents and threads leaked on a failover endpoint are swept with the primary's"""
+        # Arrange
+        from function_app import agent_operations
+        from resource_sweeper import thread_metadata
+        os.environ['AI_FOUNDRY_ENDPOINTS'] = f'standby={standby_foundry.endpoint}'
+        os.environ['SWEEPER_AGENT_MAX_AGE_SECONDS'] = '0'
+        os.environ['SWEEPER_THREAD_IDLE_SECONDS'] = '0'
+        standby_thread = standby_foundry.state.create_thread({'metadata': thread_metadata(0)})['id']
+        standby_foundry.state.create_agent({'name': 'demo-agent-leaked', 'model': 'gpt-4o'})
+
+        # Act
+        response = agent_operations(http_request_factory(
+            method='POST', url='/api/agent', body={'action': 'sweep', 'dry_run': False}))
+
+        # Assert
+        body = json.loads(response.get_body())
+        assert body['endpoints'] == ['primary', 'standby']
+        assert [(c['id'], c['endpoint']) for c in body['threads']['candidates']] == [
+            (standby_thread, 'standby')]
+        assert body['agents']['deleted'] == 1
+        assert standby_foundry.state.threads == {}
+        assert standby_foundry.state.agents == {}
+
+    def test_long_thread_is_compacted_and_old_id_redirects(self, mock_foundry):
+        """Test a thread over the token threshold is replaced in the background by a shorter one"""
+        # Arrange
+        from function_app import get_compaction_queue, get_or_create_agent, run_agent_conversation
+        os.environ['THREAD_COMPACTION_PROMPT_TOKENS'] = '200'
+        os.environ['THREAD_COMPACTION_KEEP_TURNS'] = '1'
+        agent = get_or_create_agent()
+        first = run_agent_conversation(agent, "Hello")
+        old_thread_id = first['thread_id']
+
+        # Act
+        result = run_agent_conversation(agent, "x" * 800, old_thread_id)
+        get_compaction_queue().wait(timeout=5)
+        followup = run_agent_conversation(agent, "And then?", old_thread_id)
+
+        # Assert
+        assert result['compaction'] == {'status': 'scheduled'}
+        assert result['thread_id'] == old_thread_id
+        state = mock_foundry.state
+        new_thread_id = state.threads[old_thread_id]['metadata']['compacted_into']
+        assert state.threads[old_thread_id]['metadata']['owner'] == 'azure-function-app'
+        old_messages = [m['content'][0]['text']['value'] for m in state.messages[old_thread_id]]
+        assert not any(text.startswith('Summarize the conversation') for text in old_messages)
+        assert len(old_messages) == 4
+        seeded = [m['content'][0]['text']['value'] for m in state.messages[new_thread_id]]
+        assert seeded[0].startswith('Summary of the earlier conversation:')
+        assert seeded[1] == "x" * 800
+        assert followup['thread_id'] == new_thread_id
+        assert followup['redirected_from'] == old_thread_id
+        assert "And then?" in [m['content'][0]['text']['value'] for m in state.messages[new_thread_id]]
+        # The scratch thread the summary was written on is gone
+        assert set(state.threads) == {old_thread_id, new_thread_id}
+
+    def test_stuck_summary_run_is_cancelled_and_releases_the_thread(self, mock_foundry):
+        """Test a summary run that never finishes is cancelled at the compaction deadline"""
+        # Arrange
+        from function_app import (
+            compact_between_turns, get_compaction_queue, get_or_create_agent,
+            get_project_client, get_thread_compactor, get_thread_locks, run_agent_conversation)
+        from metrics import METRICS
+        agent = get_or_create_agent()
+        thread_id = run_agent_conversation(agent, "Hello")['thread_id']
+        run_agent_conversation(agent, "x" * 800, thread_id)
+        os.environ['THREAD_COMPACTION_PROMPT_TOKENS'] = '200'
+        os.environ['THREAD_COMPACTION_KEEP_TURNS'] = '1'
+        os.environ['THREAD_COMPACTION_TIMEOUT_SECONDS'] = '0.5'
+        mock_foundry.state.in_progress_seconds = 3600
+        compactor = get_thread_compactor(get_project_client().agents, agent.id)
+        errors = METRICS.counter('threads.compaction_errors').value
+
+        # Act
+        get_compaction_queue().schedule(thread_id, lambda: compact_between_turns(compactor, thread_id))
+        get_compaction_queue().wait(timeout=5)
+
+        # Assert
+        state = mock_foundry.state
+        summary_runs = [run for run in state.runs.values() if run['thread_id'] != thread_id]
+        assert [run['status'] for run in summary_runs] == ['cancelled']
+        assert METRICS.counter('threads.compaction_errors').value == errors + 1
+        assert 'compacted_into' not in state.threads[thread_id]['metadata']
+        assert set(state.threads) == {thread_id}
+        with get_thread_locks().turn(thread_id):
+            pass
+
+    def test_chat_token_budget_reaches_run_and_reports_hit(self, mock_foundry, http_request_factory):
+        """Test chat budgets are sent with the run and budget hits are reported"""
+        # Arrange
+        from function_app import agent_operations
+        from metrics import METRICS
+        os.environ['TOKEN_BUDGET_CHAT_MAX_PROMPT_TOKENS_CEILING'] = '2000'
+        req = http_request_factory(method='POST', url='/api/agent', body={
+            'action': 'chat', 'message': 'Hello', 'max_prompt_tokens': 5000,
+            'max_completion_tokens': 10, 'truncation_strategy': 'last_messages:2'})
+
+        # Act
+        response = agent_operations(req)
+
+        # Assert
+        body = json.loads(response.get_body())
+        assert response.status_code == 200
+        assert body['status'] == 'incomplete'
+        assert body['usage']['completion_tokens'] == 10
+        assert body['token_budget'] == {
+            'max_prompt_tokens': 2000, 'max_completion_tokens': 10,
+            'truncation_strategy': {'type': 'last_messages', 'last_messages': 2},
+            'clamped': ['max_prompt_tokens'], 'hit': 'max_completion_tokens'}
+        run = mock_foundry.state.runs[body['run_id']]
+        assert run['max_prompt_tokens'] == 2000
+        assert run['truncation_strategy'] == {'type': 'last_messages', 'last_messages': 2}
+        assert METRICS.counter('runs.budget_hits.max_completion_tokens').value >= 1
+
+    def test_chat_rejects_invalid_token_budget(self, mock_foundry, http_request_factory):
+        """Test an invalid budget is a 400 before any upstream call"""
+        # Arrange
+        from function_app import agent_operations
+        req = http_request_factory(method='POST', url='/api/agent', body={
+            'action': 'chat', 'message': 'Hello', 'max_completion_tokens': -1})
+
+        # Act
+        response = agent_operations(req)
+
+        # Assert
+        assert response.status_code == 400
+        assert 'max_completion_tokens' in json.loads(response.get_body())['error']
+        assert mock_foundry.snapshot_stats()['requests'] == 0
+
+    def test_chat_with_created_agent_by_id_and_name(self, mock_foundry, http_request_factory):
+        """Test chat reaches agents made by create without extra lookups until deleted"""
+        # Arrange
+        from function_app import agent_operations
+
+        def call(body):
+            response = agent_operations(http_request_factory(
+                method='POST', url='/api/agent', body=body))
+            return response.status_code, json.loads(response.get_body())
+
+        _, created = call({'action': 'create', 'name': 'support-bot'})
+
+        # Act
+        by_id = call({'action': 'chat', 'message': 'Hi', 'agent_id': created['agent_id']})
+        by_name = call({'action': 'chat', 'message': 'Hi', 'agent_name': 'support-bot'})
+        call({'action': 'delete', 'agent_id': created['agent_id']})
+        after_delete = call({'action': 'chat', 'message': 'Hi', 'agent_id': created['agent_id']})
+
+        # Assert
+        assert by_id[0] == 200 and by_id[1]['agent_id'] == created['agent_id']
+        assert by_name[0] == 200 and by_name[1]['agent_name'] == 'support-bot'
+        assert after_delete[0] == 404
+        routes = mock_foundry.snapshot_stats()['routes']
+        assert routes['get_agent'] == 1
+        assert 'list_agents' not in routes
+
+    def test_warm_up_and_probe_record_stage_latency(self, mock_foundry):
+        """Test the timers warm the instance and an enabled probe records per-stage latency"""
+        # Arrange
+        from unittest.mock import Mock
+        import function_app
+        from metrics import METRICS
+        os.environ['PROBE_ENABLED'] = 'true'
+        probes_before = METRICS.histogram('probe.total_ms').count
+
+        # Act
+        function_app.warm_up_instance(Mock())
+        function_app.run_latency_probe(Mock())
+
+        # Assert
+        assert function_app._project_client is not None
+        assert function_app._agent_instance is not None
+        snapshot = METRICS.snapshot()
+        assert snapshot['probe.total_ms']['count'] == probes_before + 1
+        for stage in ('start_run', 'run', 'read_reply'):
+            assert snapshot[f'probe.{stage}_ms']['count'] >= 1
+        assert snapshot['warmup.token_and_connection_ms']['count'] >= 1
+        routes = mock_foundry.snapshot_stats()['routes']
+        assert routes['create_thread_and_run'] == 1
+        assert routes['delete_thread'] == 1
+        assert mock_foundry.state.threads == {}
+
+    def test_probe_is_opt_in(self, mock_foundry):
+        """Test warm-up makes no runs and the probe skips its chat unless PROBE_ENABLED=true"""
+        # Arrange
+        from unittest.mock import Mock
+        import function_app
+
+        # Act
+        function_app.warm_up_instance(Mock())
+        function_app.run_latency_probe(Mock())
+
+        # Assert
+        routes = mock_foundry.snapshot_stats()['routes']
+        assert routes['list_agents'] >= 1
+        assert 'create_thread_and_run' not in routes
+        assert mock_foundry.state.runs == {}
+
+    def test_upload_dedupes_and_ingests_in_batches(self, mock_foundry, http_request_factory, tmp_path):
+        """Test multipart uploads skip known content and attach new files in batches"""
+        # Arrange
+        from function_app import agent_operations
+        os.environ['UPLOAD_MANIFEST_PATH'] = str(tmp_path / 'manifest.json')
+        os.environ['UPLOAD_BATCH_SIZE'] = '2'
+        boundary = 'upload-boundary'
+
+        def multipart(*files):
+            parts = b''.join(
+                f'--{boundary}\r\nContent-Disposition: form-data; name="file"; '
+                f'filename="{name}"\r\nContent-Type: text/plain\r\n\r\n'.encode() + content + b'\r\n'
+                for name, content in files)
+            return http_request_factory(
+                method='POST', url='/api/agent', params={'action': 'upload'},
+                body=parts + f'--{boundary}--\r\n'.encode(),
+                headers={'Content-Type': f'multipart/form-data; boundary={boundary}'})
+
+        # Act
+        first = json.loads(agent_operations(multipart(
+            ('a.txt', b'alpha'), ('b.txt', b'bravo'), ('c.txt', b'charlie'))).get_body())
+        second = json.loads(agent_operations(multipart(
+            ('a-copy.txt', b'alpha'), ('d.txt', b'delta'))).get_body())
+
+        # Assert
+        state = mock_foundry.state
+        assert first['summary']['uploaded'] == 3
+        assert [batch['files'] for batch in first['ingestion']['batches']] == [2, 1]
+        assert second['summary']['duplicates'] == 1
+        assert [f['status'] for f in second['files']] == ['duplicate', 'uploaded']
+        assert second['files'][0]['file_id'] == first['files'][0]['file_id']
+        assert [batch['files'] for batch in second['ingestion']['batches']] == [1]
+        assert len(state.files) == 4
+        store = state.vector_stores[first['ingestion']['vector_store_id']]
+        assert len(store['file_ids']) == 4
+        agent = next(iter(state.agents.values()))
+        assert agent['tool_resources']['file_search']['vector_store_ids'] == [store['id']]
+        assert state.file_contents[first['files'][2]['file_id']] == b'charlie'
+
+    def test_upload_raw_body_without_attaching(self, mock_foundry, http_request_factory, tmp_path):
+        """Test a raw body upload named by ?filename= and kept out of vector stores"""
+        # Arrange
+        from function_app import agent_operations
+        os.environ['UPLOAD_MANIFEST_PATH'] = str(tmp_path / 'manifest.json')
+        req = http_request_factory(
+            method='POST', url='/api/agent',
+            params={'action': 'upload', 'filename': 'notes.json', 'attach': 'false'},
+            body=b'{"not": "an action"}')
+
+        # Act
+        body = json.loads(agent_operations(req).get_body())
+
+        # Assert
+        assert body['status'] == 'completed'
+        assert body['files'][0]['filename'] == 'notes.json'
+        assert body['files'][0]['bytes'] == 20
+        assert 'ingestion' not in body
+        assert mock_foundry.state.vector_stores == {}
+
+    def test_code_interpreter_files_are_downloadable(self, mock_foundry, http_request_factory):
+        """Test generated files are referenced in the result and served by the file action"""
+        # Arrange
+        from function_app import agent_operations
+        mock_foundry.state.code_interpreter_artifacts = True
+        req = http_request_factory(
+            method='POST', url='/api/agent', body={'action': 'code-interpreter'})
+
+        # Act
+        body = json.loads(agent_operations(req).get_body())
+        downloads = [
+            agent_operations(http_request_factory(
+                method='GET', url='/api/agent',
+                params={'action': 'file', 'file_id': body['files'][0]['file_id']}, body=b''))
+            for _ in range(2)]
+        missing = agent_operations(http_request_factory(
+            method='GET', url='/api/agent',
+            params={'action': 'file', 'file_id': 'assistant-file_none'}, body=b''))
+
+        # Assert
+        state = mock_foundry.state
+        assert body['status'] == 'completed'
+        assert [f['kind'] for f in body['files']] == ['file', 'image']
+        assert body['files'][0]['name'].endswith('.csv')
+        assert body['files'][1]['url'] == f"/api/agent?action=file&file_id={body['files'][1]['file_id']}"
+        first, second = downloads
+        assert first.get_body() == state.file_contents[body['files'][0]['file_id']]
+        assert first.mimetype == 'text/csv'
+        assert first.headers['Content-Disposition'].endswith('.csv"')
+        assert [d.headers['X-Cache'] for d in downloads] == ['miss', 'hit']
+        assert second.headers['X-Upstream-Calls'] == '0'
+        assert missing.status_code == 404
+
+    def test_file_downloads_over_the_limit_are_refused(self, mock_foundry, http_request_factory):
+        """Test a file over FILE_DOWNLOAD_MAX_BYTES gets a 413 instead of being buffered"""
+        # Arrange
+        from function_app import agent_operations, read_capped
+        mock_foundry.state.code_interpreter_artifacts = True
+        body = json.loads(agent_operations(http_request_factory(
+            method='POST', url='/api/agent', body={'action': 'code-interpreter'})).get_body())
+        os.environ['FILE_DOWNLOAD_MAX_BYTES'] = '4'
+
+        # Act
+        response = agent_operations(http_request_factory(
+            method='GET', url='/api/agent',
+            params={'action': 'file', 'file_id': body['files'][0]['file_id']}, body=b''))
+
+        # Assert
+        assert response.status_code == 413
+        assert read_capped([b'ab', b'cd'], 4) == b'abcd'
+        assert read_capped(iter([b'ab', b'cd', b'e']), 4) is None
+
+    def test_failover_routes_new_chats_and_keeps_threads_home(
+            self, mock_foundry, standby_foundry, http_request_factory):
+        """Test a failing primary trips its breaker while threads stay on their endpoint"""
+        # Arrange
+        from function_app import agent_operations
+        from metrics import METRICS
+        os.environ['AI_FOUNDRY_ENDPOINTS'] = f'standby={standby_foundry.endpoint}'
+        os.environ['SDK_RETRY_TOTAL'] = '0'
+        os.environ['ENDPOINT_BREAKER_FAILURES'] = '1'
+        mock_foundry.failure_rate = 1.0
+        primary_thread_id = mock_foundry.state.create_thread({})['id']
+        failovers = METRICS.counter('endpoints.failovers').value
+
+        def chat(**body):
+            return agent_operations(http_request_factory(
+                method='POST', url='/api/agent', body={'action': 'chat', 'message': 'Hello', **body}))
+
+        # Act
+        first = json.loads(chat().get_body())
+        primary_requests = mock_foundry.snapshot_stats()['requests']
+        second = json.loads(chat().get_body())
+        followup = json.loads(chat(thread_id=first['thread_id']).get_body())
+        mock_foundry.failure_rate = 0.0
+        stranded = chat(thread_id=primary_thread_id)
+
+        # Assert
+        assert [r['endpoint'] for r in (first, second, followup)] == ['standby'] * 3
+        assert followup['thread_id'] == first['thread_id']
+        assert first['thread_id'] in standby_foundry.state.threads
+        assert METRICS.counter('endpoints.failovers').value == failovers + 1
+        assert mock_foundry.snapshot_stats()['requests'] == primary_requests
+        assert stranded.status_code == 503
+        assert int(stranded.headers['Retry-After']) >= 1
+
+    def test_polling_errors_after_the_run_starts_do_not_fail_over(
+            self, mock_foundry, standby_foundry, http_request_factory):
+        """Test a primary failing only on runs.get returns 503 instead of rerunning on the standby"""
+        # Arrange
+        from function_app import agent_operations
+        os.environ['AI_FOUNDRY_ENDPOINTS'] = f'standby={standby_foundry.endpoint}'
+        os.environ['SDK_RETRY_TOTAL'] = '0'
+        mock_foundry.failing_routes = {'get_run'}
+
+        # Act
+        response = agent_operations(http_request_factory(
+            method='POST', url='/api/agent', body={'action': 'chat', 'message': 'Hello'}))
+
+        # Assert
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '2'
+        assert len(mock_foundry.state.runs) == 1
+        assert standby_foundry.state.runs == {}
+        assert standby_foundry.state.threads == {}
+
+    def test_idempotency_key_attaches_retries_to_the_first_run(
+            self, mock_foundry, http_request_factory):
+        """Test a retry after a timeout waits for the same run and later retries replay"""
+        # Arrange
+        from function_app import agent_operations
+        mock_foundry.state.in_progress_seconds = 1.0
+
+        def chat(message='Hello', **headers):
+            return agent_operations(http_request_factory(
+                method='POST', url='/api/agent', body={'action': 'chat', 'message': message},
+                headers={'Idempotency-Key': 'order-17', **headers}))
+
+        # Act
+        timed_out = chat(**{'X-Request-Deadline-Seconds': '0.3'})
+        attached = chat()
+        replayed = chat()
+        conflict = chat(message='Goodbye')
+
+        # Assert
+        routes = mock_foundry.snapshot_stats()['routes']
+        run_id = json.loads(timed_out.get_body())['partial']['run_id']
+        assert timed_out.status_code == 504
+        assert mock_foundry.state.runs[run_id]['status'] == 'completed'
+        assert json.loads(attached.get_body())['run_id'] == run_id
+        assert routes.get('create_run', 0) + routes.get('create_thread_and_run', 0) == 1
+        assert 'cancel_run' not in routes
+        assert replayed.get_body() == attached.get_body()
+        assert replayed.headers['Idempotent-Replayed'] == 'true'
+        assert 'Idempotent-Replayed' not in attached.headers
+        assert conflict.status_code == 422
+
+    def test_concurrent_turns_on_a_thread_wait_instead_of_failing(
+            self, mock_foundry, http_request_factory):
+        """Test a second chat on a busy thread runs after the first instead of erroring"""
+        # Arrange
+        import function_app
+        from concurrent.futures import ThreadPoolExecutor
+        from function_app import agent_operations
+        from metrics import METRICS
+        mock_foundry.state.in_progress_seconds = 0.3
+        thread_id = mock_foundry.state.create_thread({})['id']
+        queued = METRICS.counter('threads.turns_queued').value
+
+        def chat(message):
+            return agent_operations(http_request_factory(
+                method='POST', url='/api/agent',
+                body={'action': 'chat', 'message': message, 'thread_id': thread_id}))
+
+        # Act
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            responses = list(executor.map(chat, ['First', 'Second']))
+        os.environ['THREAD_QUEUE_MAX_DEPTH'] = '0'
+        function_app._thread_locks = None
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            contended = list(executor.map(chat, ['Third', 'Fourth']))
+
+        # Assert
+        bodies = [json.loads(r.get_body()) for r in responses]
+        assert [r.status_code for r in responses] == [200, 200]
+        assert bodies[0]['run_id'] != bodies[1]['run_id']
+        assert METRICS.counter('threads.turns_queued').value == queued + 1
+        assert sorted(r.status_code for r in contended) == [200, 409]
+        assert 'Retry-After' in [r for r in contended if r.status_code == 409][0].headers
+
+    def test_list_polls_revalidate_without_upstream_calls(self, mock_foundry, http_request_factory):
+        """Test a repeated list is served from its snapshot and 304s until an agent is created"""
+        # Arrange
+        from function_app import agent_operations
+
+        def poll(etag=None):
+            headers = {'If-None-Match': etag} if etag else {}
+            return agent_operations(http_request_factory(
+                method='GET', url='/api/agent', params={'action': 'list'}, body=b'',
+                headers=headers))
+
+        # Act
+        first = poll()
+        etag = first.headers['ETag']
+        unchanged = poll(etag)
+        agent_operations(http_request_factory(
+            method='POST', url='/api/agent', body={'action': 'create', 'name': 'new-agent'}))
+        changed = poll(etag)
+
+        # Assert
+        assert first.status_code == 200
+        assert unchanged.status_code == 304
+        assert unchanged.get_body() == b''
+        assert unchanged.headers['X-Upstream-Calls'] == '0'
+        assert changed.status_code == 200
+        assert changed.headers['ETag'] != etag
+        assert json.loads(changed.get_body())['agents'][0]['name'] == 'new-agent'
+
+    def test_failed_listings_are_errors_and_not_snapshotted(self, mock_foundry, http_request_factory):
+        """Test an upstream listing failure is a 503, not an empty list cached for pollers"""
+        # Arrange
+        from function_app import agent_operations, get_response_snapshots
+        os.environ['SDK_RETRY_TOTAL'] = '0'
+        mock_foundry.failing_routes = {'list_agents'}
+
+        def poll():
+            return agent_operations(http_request_factory(
+                method='GET', url='/api/agent', params={'action': 'list'}, body=b''))
+
+        # Act
+        failed = poll()
+        mock_foundry.failing_routes = set()
+        recovered = poll()
+
+        # Assert
+        assert failed.status_code == 503
+        assert 'ETag' not in failed.headers
+        assert recovered.status_code == 200
+        assert len(get_response_snapshots()) == 1
+
+    def test_import_seeds_a_thread_and_optionally_runs(self, mock_foundry, http_request_factory):
+        """Test a transcript is imported in batched calls and a run is only started on request"""
+        # Arrange
+        from function_app import agent_operations
+        os.environ['IMPORT_BATCH_SIZE'] = '4'
+        messages = []
+        for turn in range(3):
+            messages += [{'role': 'user', 'content': f'question {turn}'},
+                         {'role': 'assistant', 'content': f'answer {turn}'}]
+
+        def import_request(**fields):
+            return agent_operations(http_request_factory(method='POST', url='/api/agent', body={
+                'action': 'import', 'messages': messages, **fields}))
+
+        # Act
+        seeded = json.loads(import_request().get_body())
+        routes_after_seed = dict(mock_foundry.snapshot_stats()['routes'])
+        answered = json.loads(import_request(run=True).get_body())
+
+        # Assert
+        thread = mock_foundry.state.messages[seeded['thread_id']]
+        assert [m['content'][0]['text']['value'] for m in thread] == [
+            m['content'] for m in messages]
+        assert seeded['import']['upstream_calls'] == 3
+        assert seeded['import']['imported_turns'] == 3
+        assert routes_after_seed['create_thread'] == 1
+        assert routes_after_seed['create_message'] == 2
+        assert 'create_run' not in routes_after_seed
+        assert answered['status'] == 'completed'
+        assert answered['response'].startswith('Simulated response for run_')
+        assert answered['import']['upstream_calls'] == 2
+        assert len(mock_foundry.state.messages[answered['thread_id']]) == len(messages) + 1
+
+    def test_run_steps_profile_where_run_time_went(self, mock_foundry, http_request_factory):
+        """Test chat, code interpreter and run-steps report per-step stages from the real SDK"""
+        # Arrange
+        from function_app import agent_operations
+        from metrics import METRICS
+        from tool_registry import TOOLS
+        os.environ['DEFAULT_AGENT_FUNCTION_TOOLS'] = 'true'
+
+        def operation(**body):
+            response = agent_operations(http_request_factory(method='POST', url='/api/agent', body=body))
+            return response.status_code, json.loads(response.get_body())
+
+        model_steps = METRICS.histogram('runs.step_ms.model').count
+
+        # Act
+        _, chat = operation(action='chat', message='Hello', profile=True)
+        _, code = operation(action='code-interpreter', code_task='1 + 1', profile=True)
+        status, steps = operation(action='run-steps', thread_id=chat['thread_id'],
+                                  run_id=chat['run_id'])
+        missing, _ = operation(action='run-steps', thread_id=chat['thread_id'], run_id='run_missing')
+
+        # Assert
+        # The default agent calls its function tools, then the built-in tools, then replies
+        assert [step['stage'] for step in chat['profile']['steps']] == [
+            'function', 'code_interpreter', 'file_search', 'model']
+        assert [tool['name'] for tool in chat['profile']['steps'][0]['tools']] == \
+            [tool['function']['name'] for tool in TOOLS.definitions()]
+        assert chat['profile']['steps'][-1]['usage'] == chat['usage']
+        assert [step['stage'] for step in code['profile']['steps']] == ['code_interpreter', 'model']
+        assert code['profile']['steps'][0]['tools'] == [
+            {'type': 'code_interpreter', 'name': 'code_interpreter'}]
+        assert {'queued', 'model', 'other'} <= set(code['profile']['stages'])
+        assert status == 200
+        assert steps['run_id'] == chat['run_id']
+        assert steps['steps'] == chat['profile']['steps']
+        assert missing == 404
+        # Chat and code interpreter each observe their run; run-steps observes nothing
+        assert METRICS.histogram('runs.step_ms.model').count - model_steps == 2
+
+    def test_recorded_session_replays_without_the_emulator(
+            self, mock_foundry, tmp_path, monkeypatch):
+        """Test a cassette recorded against the emulator reproduces the conversation offline"""
+        # Arrange
+        import function_app
+        import http_transport
+        from cassettes import Cassette
+        from function_app import get_or_create_agent, list_agents, run_agent_conversation
+        path = str(tmp_path / 'chat.json')
+
+        def conversation():
+            function_app._agent_instance = None
+            function_app._agent_registry = None
+            function_app._project_client = None
+            monkeypatch.setattr(http_transport, '_shared_transport', None)
+            result = run_agent_conversation(get_or_create_agent(), 'Hello')
+            return result, list_agents()
+
+        # Act
+        monkeypatch.setenv('SDK_CASSETTE', path)
+        monkeypatch.setenv('SDK_CASSETTE_MODE', 'record')
+        recorded, recorded_agents = conversation()
+        http_transport.get_shared_transport().session.get_adapter('http://').cassette.save()
+        mock_foundry.shutdown()
+        monkeypatch.setenv('SDK_CASSETTE_MODE', 'replay')
+        monkeypatch.setenv('SDK_CASSETTE_TIMING', '0')
+        monkeypatch.setenv('AI_FOUNDRY_ENDPOINT', Cassette.load(path).endpoint)
+        replayed, replayed_agents = conversation()
+
+        # Assert
+        assert replayed['response'] == recorded['response']
+        assert replayed['thread_id'] == recorded['thread_id']
+        assert replayed['status'] == 'completed'
+        assert replayed_agents == recorded_agents
+
+
+class TestAgentListing:
+    """Test suite for paginated, projected and streamed agent listing"""
+
+    @pytest.fixture
+    def agents(self, mock_foundry):
+        for i in range(15):
+            mock_foundry.state.create_agent({"name": f"code-interpreter-{i}", "model": "gpt-4"})
+        for i in range(10):
+            mock_foundry.state.create_agent({"name": f"support-{i}", "model": "gpt-4"})
+        return mock_foundry
+
+    def list_request(self, http_request_factory, **options):
+        from function_app import agent_operations
+        return agent_operations(http_request_factory(
+            method='POST', url='/api/agent', body={'action': 'list', **options}))
+
+    def test_cursor_walks_pages_with_projection(self, agents, http_request_factory):
+        """Test limit and cursor page through agents with only the requested fields"""
+        # Act
+        first = json.loads(self.list_request(
+            http_request_factory, limit=10, fields='name').get_body())
+        second = json.loads(self.list_request(
+            http_request_factory, limit=10, fields='name', cursor=first['next_cursor']).get_body())
+        last = json.loads(self.list_request(
+            http_request_factory, limit=10, fields='name', cursor=second['next_cursor']).get_body())
+
+        # Assert
+        assert first['count'] == 10 and second['count'] == 10 and last['count'] == 5
+        assert set(first['agents'][0]) == {'id', 'name'}
+        assert first['agents'][0]['name'] == 'support-9'
+        assert last['next_cursor'] is None
+        ids = [a['id'] for page in (first, second, last) for a in page['agents']]
+        assert len(set(ids)) == 25
+
+    def test_name_prefix_filters_agents(self, agents, http_request_factory):
+        """Test name_prefix returns only matching agents"""
+        # Act
+        body = json.loads(self.list_request(
+            http_request_factory, name_prefix='support-').get_body())
+
+        # Assert
+        assert body['count'] == 10
+        assert all(a['name'].startswith('support-') for a in body['agents'])
+
+    def test_ndjson_streams_one_agent_per_line(self, agents, http_request_factory):
+        """Test NDJSON output with the cursor in a header"""
+        # Act
+        response = self.list_request(
+            http_request_factory, format='ndjson', limit=12, fields=['model'])
+
+        # Assert
+        lines = response.get_body().decode().splitlines()
+        assert response.mimetype == 'application/x-ndjson'
+        assert len(lines) == 12
+        assert set(json.loads(lines[0])) == {'id', 'model'}
+        assert response.headers['X-Count'] == '12'
+        assert response.headers['X-Next-Cursor'] == json.loads(lines[-1])['id']
+
+    def test_health_shows_one_small_page_of_agents(self, agents, http_request_factory):
+        """Test health lists a bounded sample of agents rather than all of them"""
+        # Arrange
+        from function_app import health_check, HEALTH_AGENT_SAMPLE_SIZE
+
+        # Act
+        body = json.loads(health_check(
+            http_request_factory(method='GET', url='/api/health')).get_body())
+
+        # Assert
+        assert body['ai_foundry']['agent_count'] == HEALTH_AGENT_SAMPLE_SIZE
+        assert body['ai_foundry']['agents_truncated'] is True
+        assert set(body['ai_foundry']['agents'][0]) == {'id', 'name'}
+        # The emulator serves pages of 10; the eleventh agent needs one more,
+        # but the third page of 25 is never fetched
+        assert agents.snapshot_stats()['routes']['list_agents'] == 2
+
+    def test_unknown_field_is_rejected(self, http_request_factory):
+        """Test an unknown projection field returns 400"""
+        # Act
+        response = self.list_request(http_request_factory, fields='id,secret')
+
+        # Assert
+        assert response.status_code == 400
+        assert 'Unknown fields: secret' in json.loads(response.get_body())['error']
@@ -0,0 +1,150 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+# Unit tests for the pre-created thread pool and metrics registry
+
+import json
+import itertools
+from unittest.mock import patch
+
+import function_app
+from metrics import MetricsRegistry
+from prewarmed_threads import PrewarmedThreadPool
+
+
+def build_pool(**kwargs):
+    counter = itertools.count()
+    deleted = []
+    pool = PrewarmedThreadPool(
+        create_thread=lambda: f"thread_{next(counter)}",
+        delete_thread=deleted.append,
+        metrics=MetricsRegistry(),
+        **kwargs
+    )
+    return pool, deleted
+
+
+class TestPrewarmedThreadPool:
+    """Test suite for PrewarmedThreadPool"""
+
+    def test_replenish_fills_to_target_and_lease_takes_newest(self):
+        """Test the pool fills to target size and leases without creating"""
+        # Arrange
+        pool, _ = build_pool(target_size=3)
+
+        # Act
+        pool.replenish()
+        leased = pool.lease()
+
+        # Assert
+        assert leased == "thread_2"
+        assert pool.depth == 2
+        snapshot = pool.metrics.snapshot()
+        assert snapshot["thread_pool.hits"] == 1
+        assert snapshot["thread_pool.depth"] == 2
+        assert snapshot["thread_pool.lease_ms"]["count"] == 1
+
+    def test_lease_from_empty_pool_is_a_miss(self):
+        """Test an empty pool returns None so the caller creates a thread"""
+        # Arrange
+        pool, _ = build_pool(target_size=2)
+
+        # Act
+        leased = pool.lease()
+
+        # Assert
+        assert leased is None
+        assert pool.metrics.snapshot()["thread_pool.misses"] == 1
+
+    def test_expired_threads_are_deleted(self):
+        """Test threads older than the maximum age are reclaimed"""
+        # Arrange
+        pool, deleted = build_pool(target_size=2, max_age_seconds=60)
+        with patch("prewarmed_threads.time.monotonic", return_value=1000.0):
+            pool.replenish()
+
+        # Act
+        with patch("prewarmed_threads.time.monotonic", return_value=1100.0):
+            pool.replenish()
+
+        # Assert
+        assert deleted == ["thread_0", "thread_1"]
+        assert pool.depth == 2
+        assert pool.metrics.snapshot()["thread_pool.expired"] == 2
+
+    def test_shutdown_deletes_idle_threads(self):
+        """Test unused threads are deleted when the pool shuts down"""
+        # Arrange
+        pool, deleted = build_pool(target_size=2, refill_interval_seconds=0.01)
+        pool.start()
+        pool.replenish()
+
+        # Act
+        pool.shutdown()
+
+        # Assert
+        assert sorted(deleted) == ["thread_0", "thread_1"]
+        assert pool.depth == 0
+
+
+class TestThreadPoolIntegration:
+    """Test suite for the thread pool wiring in function_app"""
+
+    def test_pool_disabled_by_default(self, mock_get_project_client):
+        """Test no pool is created without THREAD_POOL_TARGET_SIZE"""
+        assert function_app.get_thread_pool() is None
+
+    def test_new_conversation_leases_pooled_thread(
+            self, mock_get_project_client, mock_agents_client, mock_agent):
+        """Test a new conversation uses a pooled thread instead of creating one"""
+        # Arrange
+        pool, _ = build_pool(target_size=1)
+        pool.replenish()
+        function_app._thread_pool = pool
+        mock_agents_client.runs.create.return_value.thread_id = "thread_0"
+
+        # Act
+        result = function_app.run_agent_conversation(mock_agent, "Hello")
+
+        # Assert
+        assert result["thread_id"] == "thread_0"
+        mock_agents_client.threads.create.assert_not_called()
+        mock_agents_client.create_thread_and_run.assert_not_called()
+        assert mock_agents_client.runs.create.call_args.kwargs["thread_id"] == "thread_0"
+
+    def test_warm_up_fills_the_pool_before_the_first_chat(
+            self, mock_get_project_client, mock_agents_client):
+        """Test warm-up starts the pool and tops it up to its target size"""
+        # Arrange
+        import os
+        os.environ["THREAD_POOL_TARGET_SIZE"] = "2"
+        os.environ["THREAD_POOL_REFILL_INTERVAL_SECONDS"] = "3600"
+        thread_ids = iter(f"thread_{i}" for i in range(10))
+        mock_agents_client.threads.create.side_effect = \
+            lambda **kwargs: type("Thread", (), {"id": next(thread_ids)})()
+
+        # Act
+        with patch("function_app.get_or_create_agent"), patch("function_app.atexit.register"):
+            function_app.warm_up()
+
+        # Assert
+        assert function_app._thread_pool.depth == 2
+        assert mock_agents_client.threads.create.call_count == 2
+
+    def test_metrics_route_reports_pool(self, http_request_factory):
+        """Test /metrics returns registry, transport and pool state"""
+        # Arrange
+        pool, _ = build_pool(target_size=2)
+        pool.replenish()
+        function_app._thread_pool = pool
+        req = http_request_factory(method='GET', url='/api/metrics')
+
+        # Act
+        response = function_app.metrics_snapshot(req)
+
+        # Assert
+        body = json.loads(response.get_body())
+        assert response.status_code == 200
+        assert body["thread_pool"] == {"enabled": True, "depth": 2, "target_size": 2}
+        assert "transport" in body
@@ -0,0 +1,155 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+# Unit tests for the leaked agent and idle thread sweeper
+
+import time
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+from metrics import MetricsRegistry
+from resource_sweeper import ResourceSweeper, RateLimiter, THREAD_OWNER, merge_reports
+
+NOW = 1_700_000_000.0
+HOUR = 3600
+
+
+def agent(agent_id, name, age_seconds):
+    return SimpleNamespace(id=agent_id, name=name, created_at=NOW - age_seconds)
+
+
+def thread(thread_id, age_seconds, owner=THREAD_OWNER, lease_until=0):
+    return SimpleNamespace(id=thread_id, created_at=NOW - age_seconds,
+                           metadata={"owner": owner, "lease_until": str(int(lease_until))})
+
+
+def build_sweeper(agents=(), threads=(), last_message_age=None, **kwargs):
+    agents_client = Mock()
+    agents_client.list_agents.return_value = list(agents)
+    agents_client.threads.list.return_value = list(threads)
+    agents_client.messages.list.side_effect = lambda thread_id, **kw: [
+        SimpleNamespace(created_at=NOW - last_message_age[thread_id])
+    ] if last_message_age and thread_id in last_message_age else []
+    sweeper = ResourceSweeper(
+        agents_client, agent_max_age_seconds=HOUR, thread_idle_seconds=24 * HOUR,
+        deletes_per_second=0, metrics=MetricsRegistry(), clock=lambda: NOW, **kwargs)
+    return sweeper, agents_client
+
+
+class TestResourceSweeper:
+    """Test suite for ResourceSweeper"""
+
+    def test_deletes_only_old_temporary_agents(self):
+        """Test agents are matched by name prefix and grace period"""
+        # Arrange
+        sweeper, agents_client = build_sweeper(agents=[
+            agent("asst_1", "code-interpreter-101500", 2 * HOUR),
+            agent("asst_2", "demo-agent-101500", 2 * HOUR),
+            agent("asst_3", "code-interpreter-120000", 60),
+            agent("asst_4", "azure-function-assistant", 30 * 24 * HOUR),
+        ])
+
+        # Act
+        report = sweeper.sweep()
+
+        # Assert
+        assert report["agents"]["scanned"] == 4
+        assert report["agents"]["deleted"] == 2
+        deleted = sorted(call.args[0] for call in agents_client.delete_agent.call_args_list)
+        assert deleted == ["asst_1", "asst_2"]
+
+    def test_deletes_only_owned_idle_threads_with_expired_lease(self):
+        """Test threads need app ownership, an expired lease and no recent messages"""
+        # Arrange
+        sweeper, agents_client = build_sweeper(
+            threads=[
+                thread("thread_idle", 3 * 24 * HOUR),
+                thread("thread_recent_message", 3 * 24 * HOUR),
+                thread("thread_leased", 3 * 24 * HOUR, lease_until=NOW + HOUR),
+                thread("thread_foreign", 3 * 24 * HOUR, owner="someone-else"),
+                thread("thread_new", HOUR),
+            ],
+            last_message_age={"thread_idle": 2 * 24 * HOUR, "thread_recent_message": HOUR})
+
+        # Act
+        report = sweeper.sweep()
+
+        # Assert
+        assert [c["id"] for c in report["threads"]["candidates"]] == ["thread_idle"]
+        agents_client.threads.delete.assert_called_once_with("thread_idle")
+        assert sweeper.metrics.snapshot()["sweeper.threads_deleted"] == 1
+
+    def test_dry_run_reports_without_deleting(self):
+        """Test dry run lists candidates but deletes nothing"""
+        # Arrange
+        sweeper, agents_client = build_sweeper(
+            agents=[agent("asst_1", "demo-agent-090000", 2 * HOUR)],
+            threads=[thread("thread_idle", 3 * 24 * HOUR)],
+            dry_run=True)
+
+        # Act
+        report = sweeper.sweep()
+
+        # Assert
+        assert report["dry_run"] is True
+        assert len(report["agents"]["candidates"]) == 1
+        assert len(report["threads"]["candidates"]) == 1
+        agents_client.delete_agent.assert_not_called()
+        agents_client.threads.delete.assert_not_called()
+
+    def test_failed_deletes_are_reported(self):
+        """Test a delete failure is recorded and the sweep continues"""
+        # Arrange
+        sweeper, agents_client = build_sweeper(agents=[
+            agent("asst_1", "code-interpreter-1", 2 * HOUR),
+            agent("asst_2", "code-interpreter-2", 2 * HOUR),
+        ])
+
+        def delete_agent(agent_id):
+            if agent_id == "asst_2":
+                raise RuntimeError("429 Too Many Requests")
+        agents_client.delete_agent.side_effect = delete_agent
+
+        # Act
+        report = sweeper.sweep()
+
+        # Assert
+        assert report["agents"]["deleted"] == 1
+        assert report["agents"]["failed"] == [{"id": "asst_2", "error": "429 Too Many Requests"}]
+
+    def test_reports_from_each_endpoint_are_merged(self):
+        """Test counts are summed, items name their endpoint and scan errors stay per endpoint"""
+        # Arrange
+        primary = {"dry_run": False, "duration_seconds": 0.5,
+                   "agents": {"scanned": 2, "candidates": [{"id": "asst_1"}], "deleted": 1, "failed": []},
+                   "threads": {"error": "boom"}}
+        standby = {"dry_run": False, "duration_seconds": 0.25,
+                   "agents": {"scanned": 1, "candidates": [], "deleted": 0, "failed": []},
+                   "threads": {"scanned": 3, "candidates": [{"id": "thread_1"}], "deleted": 0,
+                               "failed": [{"id": "thread_1", "error": "409"}]}}
+
+        # Act
+        report = merge_reports({"primary": primary, "standby": standby})
+
+        # Assert
+        assert report["endpoints"] == ["primary", "standby"]
+        assert report["agents"]["scanned"] == 3
+        assert report["agents"]["candidates"] == [{"id": "asst_1", "endpoint": "primary"}]
+        assert report["threads"]["errors"] == {"primary": "boom"}
+        assert report["threads"]["failed"][0]["endpoint"] == "standby"
+        assert report["duration_seconds"] == 0.75
+
+    def test_rate_limiter_spaces_calls(self):
+        """Test the limiter keeps calls at or below the configured rate"""
+        # Arrange
+        limiter = RateLimiter(rate_per_second=50)
+
+        # Act
+        started = time.monotonic()
+        for _ in range(5):
+            limiter.acquire()
+        elapsed = time.monotonic() - started
+
+        # Assert
+        assert elapsed >= 4 / 50 * 0.9
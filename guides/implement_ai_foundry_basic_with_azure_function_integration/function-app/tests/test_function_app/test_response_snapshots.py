@@ -0,0 +1,140 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+# Unit tests for cached response snapshots, ETags and conditional GET
+
+import azure.functions as func
+
+from metrics import MetricsRegistry
+from compression import CompressionPolicy
+from response_snapshots import ResponseSnapshots, etag_matches, not_modified
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def json_response(body='{"agents": []}', status_code=200):
+    return func.HttpResponse(body, mimetype="application/json", status_code=status_code)
+
+
+class TestResponseSnapshots:
+    """Test suite for ResponseSnapshots and not_modified"""
+
+    def test_snapshot_is_reused_until_ttl_or_invalidation(self):
+        """Test builds happen on a miss, after expiry and after invalidation only"""
+        # Arrange
+        clock = FakeClock()
+        metrics = MetricsRegistry()
+        snapshots = ResponseSnapshots(ttl_seconds=10, metrics=metrics, clock=clock)
+        builds = []
+
+        def build():
+            builds.append(clock.now)
+            return json_response()
+
+        # Act
+        first = snapshots.get("list:{}", build)
+        second = snapshots.get("list:{}", build)
+        clock.now = 11
+        snapshots.get("list:{}", build)
+        snapshots.get("health", build)
+        snapshots.invalidate(["list:"])
+        snapshots.get("list:{}", build)
+        snapshots.get("health", build)
+
+        # Assert
+        assert builds == [0, 11, 11, 11]
+        assert first.headers["ETag"] == second.headers["ETag"]
+        assert first.headers["Cache-Control"] == "no-cache"
+        assert second.get_body() == first.get_body()
+        assert metrics.snapshot()["snapshots.hits"] == 2
+
+    def test_store_is_bounded_and_drops_expired_snapshots(self):
+        """Test the least recently used snapshot is evicted and expired ones go on a miss"""
+        # Arrange
+        clock = FakeClock()
+        metrics = MetricsRegistry()
+        snapshots = ResponseSnapshots(ttl_seconds=10, max_entries=2, metrics=metrics, clock=clock)
+
+        # Act
+        snapshots.get("list:a", json_response)
+        snapshots.get("list:b", json_response)
+        snapshots.get("list:a", json_response)
+        snapshots.get("list:c", json_response)
+        kept = set(snapshots._snapshots)
+        clock.now = 11
+        snapshots.get("health", json_response)
+
+        # Assert
+        assert kept == {"list:a", "list:c"}
+        assert metrics.snapshot()["snapshots.evictions"] == 1
+        assert list(snapshots._snapshots) == ["health"]
+
+    def test_errors_are_not_snapshotted(self):
+        """Test a failed build is returned as-is and retried next time"""
+        # Arrange
+        snapshots = ResponseSnapshots(metrics=MetricsRegistry())
+
+        # Act
+        failed = snapshots.get("health", lambda: json_response('{"error": "x"}', 500))
+
+        # Assert
+        assert "ETag" not in failed.headers
+        assert len(snapshots) == 0
+
+    def test_matching_if_none_match_gets_empty_304(self):
+        """Test the client's ETag, a list containing it or * short-circuits the body"""
+        # Arrange
+        metrics = MetricsRegistry()
+        response = ResponseSnapshots(metrics=metrics).get("health", json_response)
+        etag = response.headers["ETag"]
+
+        # Act
+        unchanged = not_modified(f'"stale", {etag}', response, metrics)
+        changed = not_modified('"stale"', response, metrics)
+
+        # Assert
+        assert unchanged.status_code == 304
+        assert unchanged.get_body() == b""
+        assert unchanged.headers["ETag"] == etag
+        assert changed is response
+        assert etag_matches("*", etag)
+        assert metrics.snapshot()["responses.not_modified"] == 1
+
+    def test_compressed_etag_still_revalidates(self):
+        """Test a gzip variant gets its own ETag that still matches its source"""
+        # Arrange
+        response = ResponseSnapshots(metrics=MetricsRegistry()).get(
+            "health", lambda: json_response('{"agents": ["' + "a" * 2000 + '"]}'))
+        etag = response.headers["ETag"]
+
+        # Act
+        compressed = CompressionPolicy(metrics=MetricsRegistry()).apply(response, "gzip", "agent")
+
+        # Assert
+        assert compressed.headers["ETag"] == etag[:-1] + '-gzip"'
+        assert etag_matches(compressed.headers["ETag"], etag)
+        assert etag_matches(f"W/{etag}", etag)
+
+    def test_304_echoes_the_compressed_representation_etag(self):
+        """Test a client holding the gzip variant is told it still has the gzip variant"""
+        # Arrange
+        policy = CompressionPolicy(metrics=MetricsRegistry())
+        response = ResponseSnapshots(metrics=MetricsRegistry()).get(
+            "health", lambda: json_response('{"agents": ["' + "a" * 2000 + '"]}'))
+        gzip_etag = policy.apply(response, "gzip", "agent").headers["ETag"]
+
+        # Act
+        encoding = policy.encoding_for(response, "gzip", "agent")
+        unchanged = not_modified(gzip_etag, response, MetricsRegistry(), encoding=encoding)
+
+        # Assert
+        assert encoding == "gzip"
+        assert unchanged.status_code == 304
+        assert unchanged.headers["ETag"] == gzip_etag
@@ -0,0 +1,108 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+# Unit tests for run-step profiles
+
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from metrics import METRICS, MetricsRegistry
+from run_profile import profile_run, step_stage
+
+
+def at(seconds):
+    return datetime.fromtimestamp(1_700_000_000 + seconds, tz=timezone.utc)
+
+
+def step(step_id, details, start, end, usage=None):
+    return SimpleNamespace(
+        id=step_id, type=details["type"], status="completed" if end is not None else "in_progress",
+        step_details=details, created_at=at(start), completed_at=at(end) if end is not None else None,
+        usage=usage)
+
+
+def tool_step(step_id, *calls, start=0, end=None):
+    return step(step_id, {"type": "tool_calls", "tool_calls": list(calls)}, start, end)
+
+
+def message_step(step_id, start, end, usage=None):
+    return step(step_id, {"type": "message_creation", "message_creation": {"message_id": "msg_1"}},
+                start, end, usage)
+
+
+def run(created, started, completed, status="completed"):
+    return SimpleNamespace(id="run_1", status=status, created_at=at(created),
+                           started_at=at(started) if started is not None else None,
+                           completed_at=at(completed) if completed is not None else None)
+
+
+class TestRunProfile:
+    """Test suite for profile_run"""
+
+    def test_stages_split_the_run_wall_time(self):
+        """Test queue, tool and model time add up to the run with the rest as other"""
+        # Arrange
+        metrics = MetricsRegistry()
+        steps = [
+            tool_step("step_1", {"id": "call_1", "type": "code_interpreter"}, start=2, end=6),
+            message_step("step_2", 6, 9, usage={"prompt_tokens": 500, "completion_tokens": 60,
+                                                "total_tokens": 560}),
+        ]
+
+        # Act
+        profile = profile_run(run(0, 1, 10), steps, metrics)
+
+        # Assert
+        assert profile["duration_ms"] == 10000
+        assert profile["stages"] == {
+            "queued": {"ms": 1000, "percent": 10.0},
+            "model": {"ms": 3000, "percent": 30.0},
+            "code_interpreter": {"ms": 4000, "percent": 40.0},
+            "other": {"ms": 2000, "percent": 20.0},
+        }
+        assert [s["stage"] for s in profile["steps"]] == ["code_interpreter", "model"]
+        assert profile["steps"][1]["usage"]["total_tokens"] == 560
+        assert metrics.histogram("runs.step_ms.code_interpreter").count == 1
+        assert metrics.histogram("runs.queued_ms").count == 1
+
+    def test_function_and_unknown_tools_are_named(self):
+        """Test function steps report their function names and other tools keep their type"""
+        # Arrange
+        functions = tool_step("step_1", {"id": "c1", "type": "function", "function": {"name": "get_time"}},
+                              {"id": "c2", "type": "function", "function": {"name": "get_weather"}})
+        grounding = tool_step("step_2", {"id": "c3", "type": "bing_grounding"})
+
+        # Act
+        profile = profile_run(run(0, 0, 5), [functions, grounding], MetricsRegistry())
+
+        # Assert
+        assert step_stage(functions) == "function"
+        assert step_stage(grounding) == "bing_grounding"
+        assert [tool["name"] for tool in profile["steps"][0]["tools"]] == ["get_time", "get_weather"]
+        assert profile["steps"][0]["duration_ms"] is None
+
+    def test_unfinished_run_has_no_percentages(self):
+        """Test a run still in progress is profiled without a total or shares"""
+        # Act
+        profile = profile_run(run(0, None, None, status="queued"), [], MetricsRegistry())
+
+        # Assert
+        assert profile["duration_ms"] is None
+        assert profile["stages"]["other"] == {"ms": 0.0, "percent": None}
+        assert profile["status"] == "queued"
+
+    def test_profile_without_a_registry_observes_nothing(self):
+        """Test re-fetched profiles leave the run histograms alone"""
+        # Arrange
+        steps = [message_step("step_1", 1, 3)]
+        before = METRICS.histogram("runs.step_ms.model").count
+
+        # Act
+        first = profile_run(run(0, 1, 4), steps)
+        second = profile_run(run(0, 1, 4), steps)
+
+        # Assert
+        assert first == second
+        assert first["stages"]["model"]["ms"] == 2000
+        assert METRICS.histogram("runs.step_ms.model").count == before
@@ -0,0 +1,91 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+# Unit tests for correlated, sampled structured logging
+
+import json
+import logging
+
+from structured_logging import (
+    JsonFormatter, bind_request, configure_logging, current_correlation_id, debug_sampled)
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+
+
+class TestStructuredLogging:
+    """Test suite for correlation binding, sampling and JSON formatting"""
+
+    def test_correlation_id_prefers_header_then_traceparent(self):
+        """Test the caller's ID wins, then the W3C trace id, then a new ID"""
+        # Arrange
+        traceparent = f"00-{TRACE_ID}-00f067aa0ba902b7-01"
+
+        # Act
+        with bind_request({"X-Correlation-ID": "order-17", "traceparent": traceparent}) as explicit:
+            pass
+        with bind_request({"traceparent": traceparent}) as traced:
+            pass
+        with bind_request({}) as generated:
+            inside = current_correlation_id()
+
+        # Assert
+        assert explicit.correlation_id == "order-17"
+        assert traced.correlation_id == TRACE_ID
+        assert len(generated.correlation_id) == 32
+        assert inside == generated.correlation_id
+        assert current_correlation_id() is None
+
+    def test_every_record_carries_the_bound_id(self, caplog):
+        """Test records from any logger inside a request get the correlation ID"""
+        # Arrange
+        configure_logging()
+        caplog.set_level(logging.INFO)
+
+        # Act
+        with bind_request({"X-Correlation-ID": "order-17"}):
+            logging.getLogger("azure.core").info("Request %s", "GET /threads")
+        logging.getLogger("function_app").info("Outside a request")
+
+        # Assert
+        assert [record.correlation_id for record in caplog.records] == ["order-17", "-"]
+        assert caplog.records[0].getMessage() == "Request GET /threads"
+
+    def test_debug_sampling_is_decided_once_per_request(self):
+        """Test a request either logs all of its debug events or none"""
+        # Arrange
+        logger = logging.getLogger("bench.sampled")
+        logger.setLevel(logging.DEBUG)
+
+        # Act
+        with bind_request({}, sample_rate=1.0):
+            sampled = [debug_sampled(logger) for _ in range(5)]
+        with bind_request({}, sample_rate=0.0):
+            skipped = [debug_sampled(logger) for _ in range(5)]
+        logger.setLevel(logging.INFO)
+        with bind_request({}, sample_rate=1.0):
+            filtered = debug_sampled(logger)
+
+        # Assert
+        assert sampled == [True] * 5
+        assert skipped == [False] * 5
+        assert filtered is False
+
+    def test_json_formatter_includes_extra_fields(self):
+        """Test JSON output has the message, correlation ID and extra= fields"""
+        # Arrange
+        configure_logging()
+        logger = logging.getLogger("function_app")
+        with bind_request({"X-Correlation-ID": "order-17"}):
+            record = logger.makeRecord(
+                logger.name, logging.INFO, __file__, 1, "Started run %s", ("run_1",), None,
+                extra={"thread_id": "thread_1"})
+
+        # Act
+        entry = json.loads(JsonFormatter().format(record))
+
+        # Assert
+        assert entry["message"] == "Started run run_1"
+        assert entry["correlation_id"] == "order-17"
+        assert entry["thread_id"] == "thread_1"
+        assert entry["level"] == "INFO"
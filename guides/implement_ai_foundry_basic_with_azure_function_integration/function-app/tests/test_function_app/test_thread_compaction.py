@@ -0,0 +1,153 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+# Unit tests for long-thread compaction
+
+import threading
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+from metrics import MetricsRegistry
+from thread_compaction import (
+    CompactionQueue, ThreadCompactor, split_turns, resolve_thread, message_text,
+    transcript_text, COMPACTED_FROM, COMPACTED_INTO, SUMMARY_PREFIX)
+
+
+def message(role, text):
+    return SimpleNamespace(role=role, content=[SimpleNamespace(text=SimpleNamespace(value=text))])
+
+
+def conversation(turns):
+    messages = []
+    for turn in range(turns):
+        messages += [message("user", f"question {turn}"), message("assistant", f"answer {turn}")]
+    return messages
+
+
+def build_compactor(messages, keep_turns=2, threshold=1000):
+    agents_client = Mock()
+    # The SDK lists newest first when order="desc"
+    agents_client.messages.list.return_value = list(reversed(messages))
+    agents_client.threads.create.return_value = SimpleNamespace(id="thread_new")
+    agents_client.threads.get.return_value = SimpleNamespace(
+        id="thread_old", metadata={"owner": "azure-function-app"})
+    summarize = Mock(return_value="The user asked five questions.")
+    compactor = ThreadCompactor(
+        agents_client, summarize, prompt_token_threshold=threshold, keep_turns=keep_turns,
+        thread_metadata=lambda: {"owner": "azure-function-app"}, metrics=MetricsRegistry())
+    return compactor, agents_client, summarize
+
+
+class TestThreadCompaction:
+    """Test suite for ThreadCompactor and its helpers"""
+
+    def test_split_turns_keeps_last_turns(self):
+        """Test a turn starts at a user message and includes its replies"""
+        # Arrange
+        messages = conversation(3) + [message("assistant", "follow-up")]
+
+        # Act
+        older, recent = split_turns(messages, keep_turns=2)
+
+        # Assert
+        assert [message_text(m) for m in older] == ["question 0", "answer 0"]
+        assert [message_text(m) for m in recent] == [
+            "question 1", "answer 1", "question 2", "answer 2", "follow-up"]
+
+    def test_should_compact_only_above_threshold(self):
+        """Test the threshold gates compaction and zero disables it"""
+        # Arrange
+        compactor, _, _ = build_compactor([], threshold=1000)
+
+        # Act & Assert
+        assert not compactor.should_compact(999)
+        assert compactor.should_compact(1000)
+        compactor.prompt_token_threshold = 0
+        assert not compactor.should_compact(10_000)
+
+    def test_compact_seeds_new_thread_with_summary_and_recent_turns(self):
+        """Test the new thread holds the summary plus the kept turns in order"""
+        # Arrange
+        compactor, agents_client, summarize = build_compactor(conversation(5), keep_turns=2)
+
+        # Act
+        result = compactor.compact("thread_old")
+
+        # Assert
+        assert result == {"previous_thread_id": "thread_old", "thread_id": "thread_new",
+                          "summarized_messages": 6, "kept_messages": 4}
+        older = summarize.call_args.args[0]
+        assert [message_text(m) for m in older] == [
+            "question 0", "answer 0", "question 1", "answer 1", "question 2", "answer 2"]
+        seed = agents_client.threads.create.call_args.kwargs["messages"]
+        assert seed[0].content == SUMMARY_PREFIX + "The user asked five questions."
+        assert [(m.role, m.content) for m in seed[1:]] == [
+            ("user", "question 3"), ("assistant", "answer 3"),
+            ("user", "question 4"), ("assistant", "answer 4")]
+        assert agents_client.threads.create.call_args.kwargs["metadata"][COMPACTED_FROM] == "thread_old"
+        agents_client.threads.update.assert_called_once_with("thread_old", metadata={
+            "owner": "azure-function-app", COMPACTED_INTO: "thread_new"})
+        assert compactor.metrics.counter("threads.compacted").value == 1
+
+    def test_compact_skips_short_threads(self):
+        """Test nothing is summarized when every turn would be kept"""
+        # Arrange
+        compactor, agents_client, summarize = build_compactor(conversation(2), keep_turns=2)
+
+        # Act
+        result = compactor.compact("thread_old")
+
+        # Assert
+        assert result is None
+        summarize.assert_not_called()
+        agents_client.threads.create.assert_not_called()
+
+    def test_resolve_thread_follows_compactions(self):
+        """Test an old thread id resolves through every compaction"""
+        # Arrange
+        agents_client = Mock()
+        threads = {
+            "thread_1": SimpleNamespace(id="thread_1", metadata={COMPACTED_INTO: "thread_2"}),
+            "thread_2": SimpleNamespace(id="thread_2", metadata={COMPACTED_INTO: "thread_3"}),
+            "thread_3": SimpleNamespace(id="thread_3", metadata={}),
+        }
+        agents_client.threads.get.side_effect = threads.get
+
+        # Act & Assert
+        assert resolve_thread(agents_client, "thread_1") == "thread_3"
+        assert resolve_thread(agents_client, "thread_3") == "thread_3"
+
+    def test_queue_runs_one_compaction_per_thread_and_records_redirects(self):
+        """Test compactions run in the background, dedupe per thread and count failures"""
+        # Arrange
+        queue = CompactionQueue(metrics=MetricsRegistry())
+        release = threading.Event()
+
+        def compact():
+            release.wait(5)
+            return {"previous_thread_id": "thread_old", "thread_id": "thread_new"}
+
+        def broken():
+            raise RuntimeError("summary run failed")
+
+        # Act
+        first = queue.schedule("thread_old", compact)
+        duplicate = queue.schedule("thread_old", compact)
+        redirect_before = queue.redirect("thread_old")
+        release.set()
+        queue.schedule("thread_other", broken)
+        queue.wait(timeout=5)
+        queue.shutdown()
+
+        # Assert
+        assert (first, duplicate) == (True, False)
+        assert redirect_before is None
+        assert queue.redirect("thread_old") == "thread_new"
+        assert queue.redirect("thread_other") is None
+        assert queue.metrics.counter("threads.compaction_errors").value == 1
+
+    def test_transcript_text_labels_roles(self):
+        """Test messages are rendered for summarizing on a scratch thread"""
+        # Act & Assert
+        assert transcript_text(conversation(1)) == "user: question 0\n\nassistant: answer 0"
@@ -0,0 +1,131 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+# Unit tests for the per-thread turn queue
+
+import threading
+
+import pytest
+
+from metrics import MetricsRegistry
+from thread_locks import ThreadBusy, ThreadLockManager
+
+
+def wait_for_depth(locks, thread_id, depth):
+    for _ in range(200):
+        if locks.depth(thread_id) == depth:
+            return
+        threading.Event().wait(0.005)
+    raise AssertionError(f"queue depth never reached {depth}")
+
+
+class TestThreadLockManager:
+    """Test suite for ThreadLockManager"""
+
+    def test_turns_are_handed_out_in_arrival_order(self):
+        """Test waiters get the thread one at a time, first come first served"""
+        # Arrange
+        locks = ThreadLockManager(metrics=MetricsRegistry())
+        order = []
+
+        def take_turn(name):
+            with locks.turn("thread_1"):
+                order.append(name)
+
+        # Act
+        with locks.turn("thread_1"):
+            workers = []
+            for i, name in enumerate(["second", "third"]):
+                worker = threading.Thread(target=take_turn, args=(name,))
+                worker.start()
+                wait_for_depth(locks, "thread_1", i + 1)
+                workers.append(worker)
+            order.append("first")
+        for worker in workers:
+            worker.join(5)
+
+        # Assert
+        assert order == ["first", "second", "third"]
+        assert len(locks) == 0
+
+    def test_turn_time_average_feeds_retry_after(self):
+        """Test the held time of finished turns moves the Retry-After estimate"""
+        # Arrange
+        now = [0.0]
+        locks = ThreadLockManager(max_depth=0, metrics=MetricsRegistry(), clock=lambda: now[0])
+
+        # Act
+        with locks.turn("thread_1"):
+            now[0] += 10.0
+        with locks.turn("thread_1"):
+            with pytest.raises(ThreadBusy) as exc_info:
+                with locks.turn("thread_1"):
+                    pass
+
+        # Assert
+        assert locks.turn_seconds == pytest.approx(0.8 * 2.8)
+        assert exc_info.value.retry_after_seconds == pytest.approx(2.8)
+
+    def test_full_queue_rejects_with_retry_after(self):
+        """Test a request beyond max_depth is turned away instead of queued"""
+        # Arrange
+        metrics = MetricsRegistry()
+        locks = ThreadLockManager(max_depth=0, metrics=metrics)
+
+        # Act
+        with locks.turn("thread_1"):
+            with pytest.raises(ThreadBusy) as exc_info:
+                with locks.turn("thread_1"):
+                    pass
+            with locks.turn("thread_2"):
+                other_thread = len(locks)
+
+        # Assert
+        assert exc_info.value.retry_after_seconds >= 1
+        assert other_thread == 2
+        assert metrics.snapshot()["threads.turns_rejected"] == 1
+
+    def test_wait_is_bounded_and_leaves_the_queue(self):
+        """Test a waiter that times out is removed and the holder's release still works"""
+        # Arrange
+        metrics = MetricsRegistry()
+        locks = ThreadLockManager(wait_seconds=0.05, metrics=metrics)
+
+        # Act
+        with locks.turn("thread_1"):
+            with pytest.raises(ThreadBusy):
+                with locks.turn("thread_1", timeout=10):
+                    pass
+            depth_after_timeout = locks.depth("thread_1")
+        with locks.turn("thread_1") as waited:
+            pass
+
+        # Assert
+        assert depth_after_timeout == 0
+        assert waited < 0.05
+        assert len(locks) == 0
+        snapshot = metrics.snapshot()
+        assert snapshot["threads.turns_queued"] == 1
+        assert snapshot["threads.max_queue_depth"] == 0
+
+    def test_snapshot_lists_deepest_queues(self):
+        """Test the metrics view reports each held thread's queue depth"""
+        # Arrange
+        locks = ThreadLockManager(metrics=MetricsRegistry())
+
+        def waiter():
+            with locks.turn("busy"):
+                pass
+
+        # Act
+        with locks.turn("quiet"), locks.turn("busy"):
+            worker = threading.Thread(target=waiter)
+            worker.start()
+            wait_for_depth(locks, "busy", 1)
+            snapshot = locks.snapshot()
+        worker.join(5)
+
+        # Assert
+        assert snapshot == [{"thread_id": "busy", "queue_depth": 1},
+                            {"thread_id": "quiet", "queue_depth": 0}]
@@ -0,0 +1,90 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+# Unit tests for per-request token budgets
+
+import os
+import pytest
+from types import SimpleNamespace
+
+from metrics import MetricsRegistry
+from token_budget import parse_token_budget, parse_truncation, record_budget_hit
+
+
+class TestTokenBudget:
+    """Test suite for token budget parsing and reporting"""
+
+    def test_request_values_override_defaults(self):
+        """Test request fields win over the action's defaults"""
+        # Arrange
+        os.environ['TOKEN_BUDGET_CHAT_MAX_PROMPT_TOKENS'] = '4000'
+        os.environ['TOKEN_BUDGET_CHAT_MAX_COMPLETION_TOKENS'] = '500'
+
+        # Act
+        budget = parse_token_budget("chat", {"max_completion_tokens": 200})
+
+        # Assert
+        assert budget.max_prompt_tokens == 4000
+        assert budget.max_completion_tokens == 200
+        assert budget.clamped == []
+
+    def test_ceilings_clamp_requests_and_bound_unset_fields(self):
+        """Test values above the ceiling are clamped and unset fields get the ceiling"""
+        # Arrange
+        os.environ['TOKEN_BUDGET_CODE_INTERPRETER_MAX_PROMPT_TOKENS_CEILING'] = '8000'
+        os.environ['TOKEN_BUDGET_CODE_INTERPRETER_MAX_COMPLETION_TOKENS_CEILING'] = '1000'
+
+        # Act
+        budget = parse_token_budget("code-interpreter", {"max_prompt_tokens": 100000})
+
+        # Assert
+        assert budget.max_prompt_tokens == 8000
+        assert budget.max_completion_tokens == 1000
+        assert budget.clamped == ["max_prompt_tokens"]
+
+    @pytest.mark.parametrize("body", [
+        {"max_prompt_tokens": 0},
+        {"max_prompt_tokens": 100},
+        {"max_completion_tokens": "lots"},
+        {"max_completion_tokens": True},
+        {"truncation_strategy": "newest"},
+        {"truncation_strategy": {"type": "last_messages"}},
+    ])
+    def test_invalid_fields_are_rejected(self, body):
+        """Test invalid budgets raise ValueError"""
+        with pytest.raises(ValueError):
+            parse_token_budget("chat", body)
+
+    def test_truncation_forms(self):
+        """Test string and object truncation strategies normalize the same way"""
+        assert parse_truncation("auto") == {"type": "auto"}
+        assert parse_truncation("last_messages:6") == {"type": "last_messages", "last_messages": 6}
+        assert parse_truncation({"type": "last_messages", "last_messages": 6}) == \
+            {"type": "last_messages", "last_messages": 6}
+        assert parse_truncation(None) is None
+
+    def test_run_options_only_include_set_fields(self):
+        """Test unset limits are not sent to the service"""
+        # Arrange
+        budget = parse_token_budget("chat", {"max_completion_tokens": 300,
+                                             "truncation_strategy": "last_messages:4"})
+
+        # Act
+        options = budget.run_options()
+
+        # Assert
+        assert set(options) == {"max_completion_tokens", "truncation_strategy"}
+        assert options["truncation_strategy"].last_messages == 4
+
+    def test_record_budget_hit_counts_reason(self):
+        """Test incomplete runs report and count the budget they hit"""
+        # Arrange
+        metrics = MetricsRegistry()
+        incomplete = SimpleNamespace(status="incomplete",
+                                     incomplete_details=SimpleNamespace(reason="max_completion_tokens"))
+
+        # Act & Assert
+        assert record_budget_hit(incomplete, metrics) == "max_completion_tokens"
+        assert record_budget_hit(SimpleNamespace(status="completed"), metrics) is None
+        assert metrics.counter("runs.budget_hits.max_completion_tokens").value == 1
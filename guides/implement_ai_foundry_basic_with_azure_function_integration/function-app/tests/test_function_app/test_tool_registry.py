@@ -0,0 +1,182 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+# Unit tests for the local function-tool registry
+
+import json
+import threading
+import contextvars
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+
+import pytest
+
+import function_app
+from metrics import MetricsRegistry
+from tool_registry import ToolRegistry
+
+
+def tool_call(call_id, name, **arguments):
+    return SimpleNamespace(id=call_id, type="function", function=SimpleNamespace(
+        name=name, arguments=json.dumps(arguments)))
+
+
+class TestToolRegistry:
+    """Test suite for ToolRegistry"""
+
+    def test_register_builds_function_definition(self):
+        """Test a decorated callable is advertised with a schema from its signature"""
+        # Arrange
+        registry = ToolRegistry(metrics=MetricsRegistry())
+
+        @registry.register
+        def get_order_status(order_id: str, include_history: bool = False) -> dict:
+            """Look up an order's shipping status"""
+            return {}
+
+        # Act
+        definition = registry.definitions()[0]
+
+        # Assert
+        assert definition["function"]["name"] == "get_order_status"
+        assert definition["function"]["description"] == "Look up an order's shipping status"
+        assert definition["function"]["parameters"] == {
+            "type": "object",
+            "properties": {"order_id": {"type": "string"},
+                           "include_history": {"type": "boolean"}},
+            "required": ["order_id"],
+        }
+
+    def test_execute_runs_calls_in_parallel(self):
+        """Test tool calls overlap instead of running one after another"""
+        # Arrange
+        registry = ToolRegistry(max_workers=4, metrics=MetricsRegistry())
+        barrier = threading.Barrier(3, timeout=2)
+
+        @registry.register
+        def slow_lookup(key: str) -> str:
+            barrier.wait()
+            return key.upper()
+
+        calls = [tool_call(f"call_{i}", "slow_lookup", key=f"k{i}") for i in range(3)]
+
+        # Act
+        outputs = registry.execute(calls)
+
+        # Assert
+        assert outputs == [{"tool_call_id": f"call_{i}", "output": f"K{i}"} for i in range(3)]
+
+    def test_timeouts_errors_and_unknown_tools_become_outputs(self):
+        """Test failures are reported to the model instead of raised"""
+        # Arrange
+        registry = ToolRegistry(metrics=MetricsRegistry())
+        release = threading.Event()
+
+        @registry.register(timeout_seconds=0.05)
+        def hangs() -> str:
+            release.wait(2)
+            return "late"
+
+        @registry.register
+        def fails() -> str:
+            raise RuntimeError("backend down")
+
+        # Act
+        outputs = registry.execute([
+            tool_call("call_1", "hangs"),
+            tool_call("call_2", "fails"),
+            tool_call("call_3", "missing"),
+        ])
+        release.set()
+
+        # Assert
+        errors = [json.loads(output["output"])["error"] for output in outputs]
+        assert "timed out" in errors[0]
+        assert "backend down" in errors[1]
+        assert errors[2] == "Unknown tool: missing"
+        snapshot = registry.metrics.snapshot()
+        assert snapshot["tools.timeouts"] == 1
+        assert snapshot["tools.errors"] == 1
+
+    def test_memoized_tool_runs_once_per_arguments(self):
+        """Test memoized results are served from the cache"""
+        # Arrange
+        registry = ToolRegistry(metrics=MetricsRegistry())
+        lookups = []
+
+        @registry.register(memoize=True)
+        def get_rate(currency: str) -> dict:
+            lookups.append(currency)
+            return {"currency": currency, "rate": 1.1}
+
+        # Act
+        first = registry.execute([tool_call("call_1", "get_rate", currency="EUR")])
+        second = registry.execute([tool_call("call_2", "get_rate", currency="EUR")])
+
+        # Assert
+        assert lookups == ["EUR"]
+        assert first[0]["output"] == second[0]["output"]
+        assert registry.metrics.snapshot()["tools.cache_hits"] == 1
+
+
+    def test_tools_see_the_callers_context(self):
+        """Test tools running on the pool read the request's context variables"""
+        # Arrange
+        request_id = contextvars.ContextVar("request_id", default=None)
+        registry = ToolRegistry(metrics=MetricsRegistry())
+        registry.register(lambda: request_id.get(), name="whoami")
+        request_id.set("req-42")
+
+        # Act
+        outputs = registry.execute([tool_call("call_1", "whoami")])
+
+        # Assert
+        assert outputs[0]["output"] == "req-42"
+
+
+class TestRequiresAction:
+    """Test suite for answering requires_action runs"""
+
+    def test_wait_for_run_submits_tool_outputs(self):
+        """Test a run waiting on tools gets every output in one submission"""
+        # Arrange
+        registry = ToolRegistry(metrics=MetricsRegistry())
+        registry.register(lambda city: f"Sunny in {city}", name="get_weather")
+        waiting = SimpleNamespace(
+            id="run_1", status="requires_action",
+            required_action=SimpleNamespace(submit_tool_outputs=SimpleNamespace(tool_calls=[
+                tool_call("call_1", "get_weather", city="Oslo"),
+                tool_call("call_2", "get_weather", city="Lima"),
+            ])))
+        agents_client = Mock()
+        agents_client.runs.submit_tool_outputs.return_value = SimpleNamespace(
+            id="run_1", status="completed")
+
+        # Act
+        with patch('function_app.TOOLS', registry):
+            run = function_app.wait_for_run(agents_client, "thread_1", waiting)
+
+        # Assert
+        assert run.status == "completed"
+        kwargs = agents_client.runs.submit_tool_outputs.call_args.kwargs
+        assert [output.output for output in kwargs["tool_outputs"]] == [
+            "Sunny in Oslo", "Sunny in Lima"]
+        agents_client.runs.submit_tool_outputs.assert_called_once()
+
+    def test_unanswerable_tool_calls_cancel_the_run(self):
+        """Test a run asking only for non-function tool calls is cancelled instead of left hanging"""
+        # Arrange
+        waiting = SimpleNamespace(
+            id="run_1", status="requires_action",
+            required_action=SimpleNamespace(submit_tool_outputs=SimpleNamespace(tool_calls=[
+                SimpleNamespace(id="call_1", type="mcp")])))
+        agents_client = Mock()
+
+        # Act
+        with pytest.raises(RuntimeError, match="cannot answer \\(mcp\\)"):
+            function_app.wait_for_run(agents_client, "thread_1", waiting)
+
+        # Assert
+        agents_client.runs.cancel.assert_called_once_with(thread_id="thread_1", run_id="run_1")
+        agents_client.runs.submit_tool_outputs.assert_not_called()
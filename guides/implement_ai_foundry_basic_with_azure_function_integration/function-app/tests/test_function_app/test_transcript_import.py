@@ -0,0 +1,105 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+# Unit tests for bulk transcript import
+
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+import pytest
+
+from metrics import MetricsRegistry
+from transcript_import import TranscriptImporter, parse_transcript
+
+
+def transcript(turns):
+    messages = []
+    for turn in range(turns):
+        messages += [{"role": "user", "content": f"question {turn}"},
+                     {"role": "assistant", "content": f"answer {turn}"}]
+    return parse_transcript(messages, max_messages=1000)
+
+
+def build_importer(batch_size=4):
+    agents_client = Mock()
+    agents_client.threads.create.return_value = SimpleNamespace(id="thread_1")
+    agents_client.runs.create.return_value = SimpleNamespace(id="run_1", thread_id="thread_1")
+    agents_client.create_thread_and_run.return_value = SimpleNamespace(id="run_1", thread_id="thread_2")
+    metrics = MetricsRegistry()
+    importer = TranscriptImporter(agents_client, batch_size=batch_size,
+                                  thread_metadata=lambda: {"owner": "azure-function-app"},
+                                  metrics=metrics)
+    return importer, agents_client, metrics
+
+
+class TestTranscriptImport:
+    """Test suite for parse_transcript and TranscriptImporter"""
+
+    def test_parse_rejects_bad_entries(self):
+        """Test invalid roles, empty content and oversized transcripts are named"""
+        # Act / Assert
+        with pytest.raises(ValueError, match="non-empty list"):
+            parse_transcript([], max_messages=10)
+        with pytest.raises(ValueError, match=r"messages\[1\]\.role"):
+            parse_transcript([{"role": "user", "content": "hi"}, {"role": "system", "content": "x"}], 10)
+        with pytest.raises(ValueError, match=r"messages\[0\]\.content"):
+            parse_transcript([{"role": "user", "content": "  "}], 10)
+        with pytest.raises(ValueError, match="at most 2"):
+            parse_transcript([{"role": "user", "content": "hi"}] * 3, 2)
+
+    def test_short_transcript_is_one_thread_creation(self):
+        """Test a transcript within one batch is seeded by a single call without a run"""
+        # Arrange
+        importer, agents_client, metrics = build_importer()
+
+        # Act
+        result = importer.import_messages(transcript(2))
+
+        # Assert
+        seed = agents_client.threads.create.call_args.kwargs
+        assert [m.content for m in seed["messages"]] == [
+            "question 0", "answer 0", "question 1", "answer 1"]
+        assert seed["metadata"] == {"owner": "azure-function-app"}
+        assert result["run"] is None
+        assert result["upstream_calls"] == 1
+        assert result["imported_turns"] == 2
+        agents_client.messages.create.assert_not_called()
+        agents_client.runs.create.assert_not_called()
+        assert metrics.counter("threads.imported_messages").value == 4
+
+    def test_long_transcript_overflows_into_single_messages(self):
+        """Test messages beyond the first batch are added one call each"""
+        # Arrange
+        importer, agents_client, _ = build_importer(batch_size=4)
+
+        # Act
+        result = importer.import_messages(transcript(4))
+
+        # Assert
+        assert len(agents_client.threads.create.call_args.kwargs["messages"]) == 4
+        assert [c.kwargs["content"] for c in agents_client.messages.create.call_args_list] == [
+            "question 2", "answer 2", "question 3", "answer 3"]
+        assert result["upstream_calls"] == 5
+        assert result["imported_messages"] == 8
+
+    def test_run_carries_the_final_batch(self):
+        """Test a requested run brings the last batch with it, or the whole short transcript"""
+        # Arrange
+        importer, agents_client, _ = build_importer(batch_size=4)
+
+        # Act
+        long_result = importer.import_messages(transcript(5), agent_id="asst_1",
+                                               run_options={"max_prompt_tokens": 2000})
+        short_result = importer.import_messages(transcript(1), agent_id="asst_1")
+
+        # Assert
+        run_call = agents_client.runs.create.call_args.kwargs
+        assert [m.content for m in run_call["additional_messages"]] == [
+            "question 3", "answer 3", "question 4", "answer 4"]
+        assert run_call["max_prompt_tokens"] == 2000
+        assert agents_client.messages.create.call_count == 2
+        assert long_result["upstream_calls"] == 4
+        assert long_result["run"].id == "run_1"
+        assert short_result["thread_id"] == "thread_2"
+        assert short_result["upstream_calls"] == 1
@@ -0,0 +1,93 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+# Unit tests for the memory-mapped local vector index
+
+import pytest
+
+from vector_index import VECTORS_FILE, VectorIndex, parse_vector
+
+
+class TestVectorIndex:
+    """Test suite for VectorIndex"""
+
+    def test_search_returns_nearest_documents(self, tmp_path):
+        """Test top-k search orders documents by cosine similarity"""
+        # Arrange
+        index = VectorIndex(str(tmp_path))
+        index.append(
+            [[1.0, 0.0], [0.0, 1.0], [0.7, 0.7]],
+            [{"id": "x", "text": "x axis"},
+             {"id": "y", "text": "y axis"},
+             {"id": "xy", "text": "diagonal", "metadata": {"source": "test"}}]
+        )
+
+        # Act
+        results = index.search([1.0, 0.1], top_k=2)
+
+        # Assert
+        assert [doc["id"] for doc in results] == ["x", "xy"]
+        assert results[0]["score"] > results[1]["score"]
+        assert results[1]["metadata"] == {"source": "test"}
+
+    def test_append_is_incremental_and_persisted(self, tmp_path):
+        """Test appends accumulate and are visible to a new reader"""
+        # Arrange
+        writer = VectorIndex(str(tmp_path))
+        writer.append([[1.0, 0.0]], [{"text": "first"}])
+
+        # Act
+        reader = VectorIndex(str(tmp_path))
+        writer.append([[0.0, 1.0]], [{"text": "second"}])
+
+        # Assert
+        assert len(reader) == 2
+        assert reader.search([0.0, 1.0], top_k=1)[0]["text"] == "second"
+
+    def test_dimension_mismatch_rejected(self, tmp_path):
+        """Test vectors of a different dimension are rejected"""
+        # Arrange
+        index = VectorIndex(str(tmp_path))
+        index.append([[1.0, 0.0]], [{"text": "first"}])
+
+        # Act & Assert
+        with pytest.raises(ValueError):
+            index.append([[1.0, 0.0, 0.0]], [{"text": "bad"}])
+        with pytest.raises(ValueError):
+            index.search([1.0, 0.0, 0.0])
+
+    def test_search_empty_index(self, tmp_path):
+        """Test searching an empty index returns no results"""
+        # Arrange
+        index = VectorIndex(str(tmp_path))
+
+        # Act & Assert
+        assert index.search([1.0, 0.0]) == []
+
+    def test_append_overwrites_an_unfinished_batch(self, tmp_path):
+        """Test bytes past the manifest's count are cut before the next batch is written"""
+        # Arrange
+        index = VectorIndex(str(tmp_path))
+        index.append([[1.0, 0.0]], [{"id": "first", "text": "first"}])
+        with open(tmp_path / VECTORS_FILE, "ab") as f:
+            f.write(b"\x00" * 12)
+        with open(tmp_path / "documents.jsonl", "ab") as f:
+            f.write(b'{"id": "torn"')
+
+        # Act
+        index.append([[0.0, 1.0]], [{"id": "second", "text": "second"}])
+
+        # Assert
+        assert (tmp_path / VECTORS_FILE).stat().st_size == 2 * 2 * 4
+        assert [doc["id"] for doc in index.search([0.0, 1.0])] == ["second", "first"]
+
+    def test_parse_vector_checks_type_and_dimension(self):
+        """Test request vectors must be finite numbers of the index's dimension"""
+        # Act & Assert
+        assert parse_vector([1, 0.5], 2) == [1.0, 0.5]
+        for bad in ([], "1,0", [True, 1.0], [float("nan"), 1.0], None):
+            with pytest.raises(ValueError):
+                parse_vector(bad)
+        with pytest.raises(ValueError, match="dimension 3"):
+            parse_vector([1.0, 0.0], 3)
@@ -0,0 +1,222 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+"""
+Opt-in compaction for long-lived agent threads.
+
+Every run on a thread resends its whole history, so prompt tokens and
+latency grow with each turn. Once a run's prompt tokens cross the
+threshold, the thread is compacted: the older turns are summarized and a
+new thread is seeded with the summary plus the last N turns verbatim. The
+old thread is tagged with compacted_into metadata, so callers still holding
+its id are redirected to the new thread by resolve_thread().
+
+Summarizing is a whole agent run, so compactions are queued on a
+background worker (CompactionQueue) rather than run inside the request
+that crossed the threshold, and the summary is written on a scratch
+thread, never the user's.
+"""
+
+import time
+import itertools
+import contextvars
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple, Any
+
+from azure.ai.agents.models import ThreadMessageOptions
+from metrics import METRICS, MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+COMPACTED_INTO = "compacted_into"
+COMPACTED_FROM = "compacted_from"
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+MAX_REDIRECTS = 5
+
+
+def message_text(message: Any) -> str:
+    """Concatenate the text parts of an SDK thread message"""
+    content = getattr(message, "content", None)
+    if isinstance(content, str):
+        return content
+    parts = []
+    for item in content or []:
+        text = getattr(item, "text", None)
+        if text is not None:
+            parts.append(getattr(text, "value", None) or "")
+    return "\n".join(parts)
+
+
+def transcript_text(messages: List[Any]) -> str:
+    """Messages as "role: text" lines, for summarizing outside their thread"""
+    return "\n\n".join(f"{message.role}: {message_text(message)}"
+                        for message in messages if message_text(message))
+
+
+def split_turns(messages: List[Any], keep_turns: int) -> Tuple[List[Any], List[Any]]:
+    """
+    Split chronological messages into (older, recent).
+
+    A turn starts at a user message and includes the replies that follow,
+    so recent holds the last keep_turns turns and older everything before.
+    """
+    starts = [index for index, message in enumerate(messages) if message.role == "user"]
+    if keep_turns <= 0:
+        return messages, []
+    if len(starts) <= keep_turns:
+        return [], messages
+    cut = starts[-keep_turns]
+    return messages[:cut], messages[cut:]
+
+
+def resolve_thread(agents_client: Any, thread_id: str) -> str:
+    """Follow compacted_into metadata from a thread id to the live thread"""
+    for _ in range(MAX_REDIRECTS):
+        thread = agents_client.threads.get(thread_id)
+        metadata = getattr(thread, "metadata", None)
+        target = metadata.get(COMPACTED_INTO) if isinstance(metadata, dict) else None
+        if not target:
+            return thread.id
+        logger.info("Thread %s was compacted into %s", thread_id, target)
+        thread_id = target
+    return thread_id
+
+
+class ThreadCompactor:
+    """Summarizes a thread into a new, shorter one once it grows too large"""
+
+    def __init__(
+        self,
+        agents_client: Any,
+        summarize: Callable[[List[Any]], str],
+        prompt_token_threshold: int,
+        keep_turns: int = 4,
+        max_messages: int = 200,
+        thread_metadata: Callable[[], Dict[str, str]] = dict,
+        metrics: MetricsRegistry = METRICS
+    ):
+        self.agents_client = agents_client
+        self.summarize = summarize
+        self.prompt_token_threshold = prompt_token_threshold
+        self.keep_turns = keep_turns
+        self.max_messages = max_messages
+        self.thread_metadata = thread_metadata
+        self.metrics = metrics
+
+    def should_compact(self, prompt_tokens: Optional[int]) -> bool:
+        return self.prompt_token_threshold > 0 and (prompt_tokens or 0) >= self.prompt_token_threshold
+
+    def compact(self, thread_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Replace a thread with a summary plus its most recent turns.
+
+        summarize gets the older messages, oldest first, and returns the
+        summary text; nothing is posted to the thread being compacted.
+
+        Returns the mapping from the old thread to the new one, or None when
+        every message already falls within the turns that would be kept.
+        """
+        started = time.perf_counter()
+
+        # Newest max_messages, back in chronological order
+        messages = list(itertools.islice(self.agents_client.messages.list(
+            thread_id=thread_id, limit=100, order="desc"), self.max_messages))[::-1]
+        older, recent = split_turns(messages, self.keep_turns)
+        if not older:
+            return None
+
+        summary = self.summarize(older)
+        seed = [ThreadMessageOptions(role="user", content=SUMMARY_PREFIX + summary)]
+        seed += [ThreadMessageOptions(role=message.role, content=message_text(message))
+                 for message in recent if message_text(message)]
+
+        new_thread = self.agents_client.threads.create(
+            messages=seed,
+            metadata={**self.thread_metadata(), COMPACTED_FROM: thread_id}
+        )
+
+        # Metadata updates replace the whole map, so keep the owner and lease keys
+        old_metadata = getattr(self.agents_client.threads.get(thread_id), "metadata", None)
+        self.agents_client.threads.update(thread_id, metadata={
+            **(old_metadata if isinstance(old_metadata, dict) else {}),
+            COMPACTED_INTO: new_thread.id,
+        })
+
+        self.metrics.counter("threads.compacted").inc()
+        self.metrics.histogram("threads.compaction_ms").observe(
+            (time.perf_counter() - started) * 1000)
+        logger.info("Compacted thread %s into %s: %s messages summarized, %s kept",
+                    thread_id, new_thread.id, len(older), len(recent))
+
+        return {
+            "previous_thread_id": thread_id,
+            "thread_id": new_thread.id,
+            "summarized_messages": len(older),
+            "kept_messages": len(recent),
+        }
+
+
+class CompactionQueue:
+    """Runs compactions on a background worker, at most one per thread at a time"""
+
+    def __init__(self, max_workers: int = 1, max_redirects: int = 10000,
+                 metrics: MetricsRegistry = METRICS):
+        self.max_workers = max_workers
+        self.max_redirects = max_redirects
+        self.metrics = metrics
+        self._pending: Dict[str, Future] = {}
+        self._redirects: "OrderedDict[str, str]" = OrderedDict()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def schedule(self, thread_id: str,
+                 compact: Callable[[], Optional[Dict[str, Any]]]) -> bool:
+        """Queue compact for thread_id; False when one is already queued or running"""
+        with self._lock:
+            if thread_id in self._pending:
+                return False
+            if not self._executor:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="thread-compaction")
+            # The compaction keeps the scheduling request's context (its
+            # endpoint and correlation id), as tool calls do
+            self._pending[thread_id] = self._executor.submit(
+                contextvars.copy_context().run, self._run, thread_id, compact)
+        self.metrics.counter("threads.compactions_queued").inc()
+        return True
+
+    def redirect(self, thread_id: str) -> Optional[str]:
+        """The thread a compaction in this process moved thread_id to, if any"""
+        with self._lock:
+            return self._redirects.get(thread_id)
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """Block until every queued compaction has finished"""
+        with self._lock:
+            pending = list(self._pending.values())
+        for future in pending:
+            future.exception(timeout=timeout)
+
+    def shutdown(self) -> None:
+        if self._executor:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _run(self, thread_id: str, compact: Callable[[], Optional[Dict[str, Any]]]) -> None:
+        try:
+            compaction = compact()
+            if compaction:
+                with self._lock:
+                    self._redirects[thread_id] = compaction["thread_id"]
+                    while len(self._redirects) > self.max_redirects:
+                        self._redirects.popitem(last=False)
+        except Exception as e:
+            self.metrics.counter("threads.compaction_errors").inc()
+            logger.warning("Failed to compact thread %s: %s", thread_id, e)
+        finally:
+            with self._lock:
+                self._pending.pop(thread_id, None)
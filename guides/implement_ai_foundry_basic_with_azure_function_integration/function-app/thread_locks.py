@@ -0,0 +1,135 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+"""
+Per-thread turn queue for concurrent chats on the same thread.
+
+The agents service rejects a message or run on a thread that already has an
+active run, so two chats on one thread_id would otherwise make the second
+fail and its client retry blindly. Turns on a thread are instead handed out
+one at a time, in arrival order: later requests wait up to a bounded time
+behind a bounded queue and get ThreadBusy when either limit is hit. A
+thread's entry is dropped as soon as nobody holds or waits for it, so memory
+is bounded by the threads in use. The queue lives in one worker process;
+turns served by other workers on the same instance, or by other instances,
+still collide upstream.
+"""
+
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, Iterator, List, Optional
+
+from metrics import METRICS, MetricsRegistry
+
+
+class ThreadBusy(Exception):
+    """Raised when a turn on a thread cannot be had within the queue limits"""
+
+    def __init__(self, thread_id: str, reason: str, retry_after_seconds: float):
+        super().__init__(f"Thread {thread_id} is busy: {reason}")
+        self.thread_id = thread_id
+        self.retry_after_seconds = retry_after_seconds
+
+
+class _ThreadQueue:
+    """The holder flag and FIFO waiters of one thread"""
+
+    __slots__ = ("held", "waiters")
+
+    def __init__(self):
+        self.held = False
+        self.waiters: Deque[threading.Event] = deque()
+
+
+class ThreadLockManager:
+    """Hands out turns on agent threads one at a time, in arrival order"""
+
+    def __init__(self, max_depth: int = 8, wait_seconds: float = 60.0,
+                 metrics: MetricsRegistry = METRICS,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_depth = max_depth
+        self.wait_seconds = wait_seconds
+        self.metrics = metrics
+        self.clock = clock
+        self.turn_seconds = 1.0
+        self._queues: Dict[str, _ThreadQueue] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._queues)
+
+    def depth(self, thread_id: str) -> int:
+        """Requests waiting behind the current turn on a thread"""
+        with self._lock:
+            queue = self._queues.get(thread_id)
+            return len(queue.waiters) if queue else 0
+
+    def _retry_after(self, depth: int) -> float:
+        return max(1.0, self.turn_seconds * (depth + 1))
+
+    @contextmanager
+    def turn(self, thread_id: str, timeout: Optional[float] = None) -> Iterator[float]:
+        """
+        Hold a thread for the enclosed block; yields the seconds spent waiting.
+
+        Waits at most timeout (capped by wait_seconds) for earlier turns.
+        """
+        wait = self.wait_seconds if timeout is None else min(timeout, self.wait_seconds)
+        started = self.clock()
+        with self._lock:
+            queue = self._queues.setdefault(thread_id, _ThreadQueue())
+            if not queue.held:
+                queue.held = True
+                waiter = None
+            elif len(queue.waiters) >= self.max_depth:
+                self.metrics.counter("threads.turns_rejected").inc()
+                raise ThreadBusy(thread_id, f"{len(queue.waiters)} requests already waiting",
+                                 self._retry_after(len(queue.waiters)))
+            else:
+                waiter = threading.Event()
+                queue.waiters.append(waiter)
+                self.metrics.counter("threads.turns_queued").inc()
+                self._record_depth()
+
+        if waiter and not waiter.wait(wait):
+            with self._lock:
+                # The turn may have been handed over just as the wait ran out
+                if not waiter.is_set():
+                    queue.waiters.remove(waiter)
+                    self.metrics.counter("threads.turns_rejected").inc()
+                    raise ThreadBusy(thread_id, f"no turn within {wait:.1f}s",
+                                     self._retry_after(len(queue.waiters)))
+
+        waited = self.clock() - started
+        self.metrics.histogram("threads.turn_wait_ms").observe(waited * 1000)
+        try:
+            yield waited
+        finally:
+            self._release(thread_id, queue, held=self.clock() - started - waited)
+
+    def _release(self, thread_id: str, queue: _ThreadQueue, held: float) -> None:
+        """Pass the turn to the next waiter, or drop the idle thread's entry"""
+        with self._lock:
+            # Moving average of how long a turn is held, for Retry-After hints
+            self.turn_seconds = 0.2 * held + 0.8 * self.turn_seconds
+            if queue.waiters:
+                queue.waiters.popleft().set()
+            else:
+                queue.held = False
+                del self._queues[thread_id]
+            self._record_depth()
+
+    def _record_depth(self) -> None:
+        self.metrics.gauge("threads.max_queue_depth").set(
+            max((len(queue.waiters) for queue in self._queues.values()), default=0))
+
+    def snapshot(self, limit: int = 20) -> List[dict]:
+        """The threads with the deepest queues, for /api/metrics"""
+        with self._lock:
+            depths = [(thread_id, len(queue.waiters)) for thread_id, queue in self._queues.items()]
+        depths.sort(key=lambda item: item[1], reverse=True)
+        return [{"thread_id": thread_id, "queue_depth": depth}
+                for thread_id, depth in depths[:limit]]
@@ -0,0 +1,139 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+"""
+Per-request token budgets for agent runs.
+
+Requests may set max_prompt_tokens, max_completion_tokens and a
+truncation_strategy. Each action has server-side defaults and ceilings read
+from TOKEN_BUDGET_<ACTION>_<FIELD> and TOKEN_BUDGET_<ACTION>_<FIELD>_CEILING,
+for example TOKEN_BUDGET_CHAT_MAX_PROMPT_TOKENS=8000; requested values above
+a ceiling are clamped to it. A run that stops on a budget ends in the
+incomplete status, and record_budget_hit() reports which budget it hit.
+"""
+
+import os
+from typing import Dict, List, Optional, Any
+
+from azure.ai.agents.models import TruncationObject
+from metrics import METRICS, MetricsRegistry
+
+TOKEN_FIELDS = ("max_prompt_tokens", "max_completion_tokens")
+# The service rejects prompt budgets below this
+MIN_PROMPT_TOKENS = 256
+TRUNCATION_TYPES = ("auto", "last_messages")
+
+
+def parse_truncation(value: Any) -> Optional[Dict[str, Any]]:
+    """
+    Validate a truncation strategy.
+
+    Accepts "auto", "last_messages:<n>" or the API's object form
+    {"type": "last_messages", "last_messages": <n>}.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        kind, _, count = value.partition(":")
+        value = {"type": kind.strip()}
+        if count:
+            value["last_messages"] = count.strip()
+    if not isinstance(value, dict) or value.get("type") not in TRUNCATION_TYPES:
+        raise ValueError(f"'truncation_strategy' type must be one of: {', '.join(TRUNCATION_TYPES)}")
+
+    if value["type"] == "auto":
+        return {"type": "auto"}
+    last_messages = _positive_int("truncation_strategy.last_messages", value.get("last_messages"))
+    if last_messages is None:
+        raise ValueError("'truncation_strategy' of type last_messages needs 'last_messages'")
+    return {"type": "last_messages", "last_messages": last_messages}
+
+
+class TokenBudget:
+    """Token limits and truncation strategy applied to one run"""
+
+    def __init__(self, max_prompt_tokens: Optional[int] = None,
+                 max_completion_tokens: Optional[int] = None,
+                 truncation_strategy: Optional[Dict[str, Any]] = None,
+                 clamped: Optional[List[str]] = None):
+        self.max_prompt_tokens = max_prompt_tokens
+        self.max_completion_tokens = max_completion_tokens
+        self.truncation_strategy = truncation_strategy
+        self.clamped = clamped or []
+
+    def run_options(self) -> Dict[str, Any]:
+        """Keyword arguments for runs.create and create_thread_and_run"""
+        options: Dict[str, Any] = {}
+        for field in TOKEN_FIELDS:
+            if getattr(self, field) is not None:
+                options[field] = getattr(self, field)
+        if self.truncation_strategy:
+            options["truncation_strategy"] = TruncationObject(**self.truncation_strategy)
+        return options
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "max_prompt_tokens": self.max_prompt_tokens,
+            "max_completion_tokens": self.max_completion_tokens,
+            "truncation_strategy": self.truncation_strategy,
+            "clamped": self.clamped,
+        }
+
+
+def parse_token_budget(action: str, req_body: Dict[str, Any]) -> TokenBudget:
+    """Build a run budget from request fields and the action's defaults and ceilings"""
+    prefix = f"TOKEN_BUDGET_{action.upper().replace('-', '_')}_"
+    values: Dict[str, Optional[int]] = {}
+    clamped = []
+
+    for field in TOKEN_FIELDS:
+        requested = _positive_int(field, req_body.get(field))
+        default = _positive_int(prefix + field.upper(), os.getenv(prefix + field.upper()))
+        ceiling = _positive_int(prefix + field.upper() + "_CEILING",
+                                os.getenv(prefix + field.upper() + "_CEILING"))
+
+        value = requested if requested is not None else default
+        if ceiling is not None and (value is None or value > ceiling):
+            if requested is not None:
+                clamped.append(field)
+            value = ceiling
+        values[field] = value
+
+    if values["max_prompt_tokens"] is not None and values["max_prompt_tokens"] < MIN_PROMPT_TOKENS:
+        raise ValueError(f"'max_prompt_tokens' must be at least {MIN_PROMPT_TOKENS}")
+
+    truncation = req_body.get("truncation_strategy")
+    if truncation is None:
+        truncation = os.getenv(prefix + "TRUNCATION_STRATEGY")
+
+    return TokenBudget(
+        max_prompt_tokens=values["max_prompt_tokens"],
+        max_completion_tokens=values["max_completion_tokens"],
+        truncation_strategy=parse_truncation(truncation),
+        clamped=clamped
+    )
+
+
+def record_budget_hit(run: Any, metrics: MetricsRegistry = METRICS) -> Optional[str]:
+    """The budget an incomplete run stopped on, counted in runs.budget_hits.<reason>"""
+    if getattr(run, "status", None) != "incomplete":
+        return None
+    details = getattr(run, "incomplete_details", None)
+    reason = getattr(details, "reason", None) if details is not None else None
+    reason = str(reason.value if hasattr(reason, "value") else reason or "unknown")
+
+    metrics.counter(f"runs.budget_hits.{reason}").inc()
+    return reason
+
+
+def _positive_int(name: str, value: Any) -> Optional[int]:
+    if value is None or value == "":
+        return None
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{name}' must be a positive integer")
+    if number < 1 or isinstance(value, bool):
+        raise ValueError(f"'{name}' must be a positive integer")
+    return number
@@ -0,0 +1,229 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+"""
+In-process function tools for agents.
+
+Python callables registered on a ToolRegistry are advertised to agents as
+function tools. When a run stops in requires_action, execute() runs every
+requested call in parallel on a bounded thread pool, enforces a per-tool
+timeout, optionally memoizes results by arguments, and returns the outputs
+ready to submit back in one batch.
+
+    @TOOLS.register(description="Look up an order's shipping status", memoize=True)
+    def get_order_status(order_id: str) -> dict:
+        ...
+
+A timed-out call is reported to the model as an error, but its worker
+thread keeps running until the callable returns; keep tools short.
+"""
+
+import os
+import json
+import time
+import inspect
+import contextvars
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, List, Optional, Any
+
+from metrics import METRICS, MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+JSON_TYPES = {str: "string", int: "integer", float: "number", bool: "boolean",
+              list: "array", dict: "object"}
+
+
+class RegisteredTool:
+    """A callable plus the metadata needed to advertise and run it"""
+
+    def __init__(self, func: Callable, name: str, description: str,
+                 parameters: Dict[str, Any], timeout_seconds: float, memoize: bool):
+        self.func = func
+        self.name = name
+        self.description = description
+        self.parameters = parameters
+        self.timeout_seconds = timeout_seconds
+        self.memoize = memoize
+
+    def definition(self) -> Dict[str, Any]:
+        return {
+            "type": "function",
+            "function": {
+                "name": self.name,
+                "description": self.description,
+                "parameters": self.parameters,
+            },
+        }
+
+
+def schema_from_signature(func: Callable) -> Dict[str, Any]:
+    """Build a JSON schema for a callable's keyword parameters"""
+    properties = {}
+    required = []
+    for name, param in inspect.signature(func).parameters.items():
+        if param.kind in (param.VAR_POSITIONAL, param.VAR_KEYWORD):
+            continue
+        properties[name] = {"type": JSON_TYPES.get(param.annotation, "string")}
+        if param.default is param.empty:
+            required.append(name)
+    return {"type": "object", "properties": properties, "required": required}
+
+
+class ToolRegistry:
+    """Registry and parallel executor for agent function tools"""
+
+    def __init__(self, max_workers: int = 8, default_timeout_seconds: float = 10.0,
+                 memo_size: int = 256, metrics: MetricsRegistry = METRICS):
+        self.max_workers = max_workers
+        self.default_timeout_seconds = default_timeout_seconds
+        self.memo_size = memo_size
+        self.metrics = metrics
+        self._tools: Dict[str, RegisteredTool] = {}
+        self._memo: "OrderedDict[tuple, str]" = OrderedDict()
+        self._memo_lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._tools
+
+    def __len__(self) -> int:
+        return len(self._tools)
+
+    def register(self, func: Optional[Callable] = None, *, name: Optional[str] = None,
+                 description: Optional[str] = None, parameters: Optional[Dict[str, Any]] = None,
+                 timeout_seconds: Optional[float] = None, memoize: bool = False):
+        """Register a callable as a function tool; usable bare or with options"""
+        def decorator(target: Callable) -> Callable:
+            tool = RegisteredTool(
+                func=target,
+                name=name or target.__name__,
+                description=description or inspect.getdoc(target) or "",
+                parameters=parameters or schema_from_signature(target),
+                timeout_seconds=timeout_seconds or self.default_timeout_seconds,
+                memoize=memoize,
+            )
+            self._tools[tool.name] = tool
+            return target
+
+        return decorator(func) if func else decorator
+
+    def definitions(self) -> List[Dict[str, Any]]:
+        """Function tool definitions to attach to an agent"""
+        return [tool.definition() for tool in self._tools.values()]
+
+    def execute(self, tool_calls: List[Any], budget_seconds: Optional[float] = None) -> List[Dict[str, str]]:
+        """
+        Run the requested tool calls in parallel.
+
+        Returns one {"tool_call_id", "output"} dict per call, in request order.
+        Failures, unknown tools and timeouts become error outputs so the run
+        can always continue.
+        """
+        started = time.monotonic()
+        pending = []
+        for call in tool_calls:
+            tool = self._tools.get(call.function.name)
+            if not tool:
+                pending.append((call, None, _error(f"Unknown tool: {call.function.name}")))
+                continue
+
+            try:
+                arguments = json.loads(call.function.arguments or "{}")
+            except ValueError as e:
+                pending.append((call, tool, _error(f"Invalid arguments: {str(e)}")))
+                continue
+
+            cached = self._memo_get(tool, arguments)
+            if cached is not None:
+                self.metrics.counter("tools.cache_hits").inc()
+                pending.append((call, tool, cached))
+                continue
+
+            # A copy of the caller's context per call keeps the request's
+            # deadline and correlation id visible inside the tool
+            pending.append((call, tool, self._get_executor().submit(
+                contextvars.copy_context().run, self._run_tool, tool, arguments)))
+
+        outputs = []
+        for call, tool, result in pending:
+            if not isinstance(result, str):
+                # Timeouts run from submission, since all calls started together
+                limit = tool.timeout_seconds
+                if budget_seconds is not None:
+                    limit = min(limit, budget_seconds)
+                try:
+                    result = result.result(
+                        timeout=max(0.0, limit - (time.monotonic() - started)))
+                except FutureTimeoutError:
+                    self.metrics.counter("tools.timeouts").inc()
+                    logger.warning("Tool %s timed out after %.1fs", tool.name, limit)
+                    result = _error(f"Tool {tool.name} timed out after {limit:.1f}s")
+            outputs.append({"tool_call_id": call.id, "output": result})
+        return outputs
+
+    def shutdown(self) -> None:
+        if self._executor:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _run_tool(self, tool: RegisteredTool, arguments: Dict[str, Any]) -> str:
+        started = time.perf_counter()
+        try:
+            result = tool.func(**arguments)
+            output = result if isinstance(result, str) else json.dumps(result, default=str)
+        except Exception as e:
+            self.metrics.counter("tools.errors").inc()
+            logger.error("Tool %s failed: %s", tool.name, e)
+            return _error(f"Tool {tool.name} failed: {str(e)}")
+        finally:
+            self.metrics.histogram(f"tools.{tool.name}.ms").observe(
+                (time.perf_counter() - started) * 1000)
+
+        if tool.memoize:
+            self._memo_put(tool, arguments, output)
+        return output
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if not self._executor:
+            with self._executor_lock:
+                if not self._executor:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix="agent-tool")
+        return self._executor
+
+    def _memo_key(self, tool: RegisteredTool, arguments: Dict[str, Any]) -> tuple:
+        return tool.name, json.dumps(arguments, sort_keys=True, default=str)
+
+    def _memo_get(self, tool: RegisteredTool, arguments: Dict[str, Any]) -> Optional[str]:
+        if not tool.memoize:
+            return None
+        key = self._memo_key(tool, arguments)
+        with self._memo_lock:
+            output = self._memo.get(key)
+            if output is not None:
+                self._memo.move_to_end(key)
+            return output
+
+    def _memo_put(self, tool: RegisteredTool, arguments: Dict[str, Any], output: str) -> None:
+        key = self._memo_key(tool, arguments)
+        with self._memo_lock:
+            self._memo[key] = output
+            self._memo.move_to_end(key)
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+
+
+def _error(message: str) -> str:
+    return json.dumps({"error": message})
+
+
+TOOLS = ToolRegistry(
+    max_workers=int(os.getenv("TOOL_MAX_WORKERS", "8")),
+    default_timeout_seconds=float(os.getenv("TOOL_TIMEOUT_SECONDS", "10"))
+)
@@ -0,0 +1,131 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+"""
+Bulk import of existing conversations into new agent threads.
+
+Replaying a transcript through the chat action costs a run per turn. An
+import seeds a new thread with the whole transcript instead, in as few
+upstream calls as the API allows:
+
+- the first batch_size messages go into the thread creation call;
+- messages beyond that are added one call each, since there is no bulk
+  message endpoint;
+- when a run is requested, the last batch rides along with it, either in
+  create_thread_and_run (short transcripts, one call in total) or as the
+  run's additional_messages.
+
+No run is started unless asked for, so imported history costs no tokens.
+"""
+
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from azure.ai.agents.models import AgentThreadCreationOptions, ThreadMessageOptions
+from metrics import METRICS, MetricsRegistry
+
+ROLES = ("user", "assistant")
+
+
+def parse_transcript(messages: Any, max_messages: int) -> List[ThreadMessageOptions]:
+    """
+    Validate a transcript of {"role", "content"} entries, oldest first.
+
+    Raises ValueError naming the first entry that is not a user or
+    assistant message with non-empty text content.
+    """
+    if not isinstance(messages, list) or not messages:
+        raise ValueError("'messages' must be a non-empty list of {role, content} objects")
+    if len(messages) > max_messages:
+        raise ValueError(f"A transcript may hold at most {max_messages} messages, got {len(messages)}")
+
+    parsed = []
+    for index, message in enumerate(messages):
+        role = message.get("role") if isinstance(message, dict) else None
+        content = message.get("content") if isinstance(message, dict) else None
+        if role not in ROLES:
+            raise ValueError(f"messages[{index}].role must be one of {', '.join(ROLES)}")
+        if not isinstance(content, str) or not content.strip():
+            raise ValueError(f"messages[{index}].content must be non-empty text")
+        parsed.append(ThreadMessageOptions(role=role, content=content))
+    return parsed
+
+
+def count_turns(messages: List[ThreadMessageOptions]) -> int:
+    """Turns as thread compaction counts them: a user message and the replies after it"""
+    return sum(1 for message in messages if message.role == "user") or 1
+
+
+class TranscriptImporter:
+    """Seeds new threads with transcripts, batching messages into few calls"""
+
+    def __init__(
+        self,
+        agents_client: Any,
+        batch_size: int = 32,
+        thread_metadata: Callable[[], Dict[str, str]] = dict,
+        on_thread_created: Callable[[str], None] = lambda thread_id: None,
+        metrics: MetricsRegistry = METRICS
+    ):
+        self.agents_client = agents_client
+        self.batch_size = max(1, batch_size)
+        self.thread_metadata = thread_metadata
+        self.on_thread_created = on_thread_created
+        self.metrics = metrics
+
+    def import_messages(self, messages: List[ThreadMessageOptions], agent_id: Optional[str] = None,
+                        run_options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Create a thread holding messages, starting a run on it when agent_id is given.
+
+        Returns the thread id, the started run (or None) and the import's
+        message, turn and upstream call counts with its throughput.
+        """
+        started = time.perf_counter()
+        seed, rest = messages[:self.batch_size], messages[self.batch_size:]
+        calls = 1
+
+        if agent_id and not rest:
+            # The whole transcript fits in the call that starts the run
+            run = self.agents_client.create_thread_and_run(
+                agent_id=agent_id,
+                thread=AgentThreadCreationOptions(messages=seed, metadata=self.thread_metadata()),
+                **(run_options or {})
+            )
+            thread_id = run.thread_id
+            self.on_thread_created(thread_id)
+        else:
+            thread_id = self.agents_client.threads.create(
+                messages=seed, metadata=self.thread_metadata()).id
+            self.on_thread_created(thread_id)
+            run = None
+
+            # The run carries the final batch; anything before it goes one message at a time
+            tail = rest[-self.batch_size:] if agent_id else []
+            for message in rest[:len(rest) - len(tail)]:
+                self.agents_client.messages.create(
+                    thread_id=thread_id, role=message.role, content=message.content)
+                calls += 1
+            if agent_id:
+                run = self.agents_client.runs.create(
+                    thread_id=thread_id, agent_id=agent_id, additional_messages=tail,
+                    **(run_options or {})
+                )
+                calls += 1
+
+        elapsed = time.perf_counter() - started
+        turns = count_turns(messages)
+        self.metrics.counter("threads.imported").inc()
+        self.metrics.counter("threads.imported_messages").inc(len(messages))
+        self.metrics.histogram("threads.import_ms").observe(elapsed * 1000)
+
+        return {
+            "thread_id": thread_id,
+            "run": run,
+            "imported_messages": len(messages),
+            "imported_turns": turns,
+            "upstream_calls": calls,
+            "elapsed_ms": round(elapsed * 1000, 2),
+            "turns_per_second": round(turns / elapsed, 2) if elapsed > 0 else None,
+        }
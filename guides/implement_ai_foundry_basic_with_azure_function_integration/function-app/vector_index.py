@@ -0,0 +1,224 @@
+# ---------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. Licensed under the MIT license.
+# ---------------------------------------------------------------------
+
+"""
+In-process cosine-similarity index for small, hot knowledge bases.
+
+Vectors are L2-normalised on append and stored as a flat float32 file that
+is opened with ``numpy.memmap``, so every worker on the instance shares the
+same page cache instead of holding its own copy. Documents are stored as
+JSON lines with a parallel int64 offsets file, so a search result only
+reads the lines it returns.
+
+Layout of an index directory::
+
+    manifest.json     {"dimension": int, "count": int}
+    vectors.f32       count x dimension float32, row-major
+    offsets.i64       count int64 byte offsets into documents.jsonl
+    documents.jsonl   one {"id", "text", "metadata"} object per line
+
+The manifest is written last on every append, so readers never observe a
+partially written batch. Appends hold an advisory lock on ``index.lock``,
+so every worker on the instance may write, and first cut the data files
+back to the manifest's count: a batch that failed halfway is overwritten
+rather than left between the committed rows and the next batch.
+"""
+
+import os
+import json
+import math
+import threading
+import numpy as np
+from typing import List, Dict, Optional, Any, Sequence
+
+from file_lock import file_lock
+
+MANIFEST_FILE = "manifest.json"
+VECTORS_FILE = "vectors.f32"
+OFFSETS_FILE = "offsets.i64"
+DOCUMENTS_FILE = "documents.jsonl"
+LOCK_FILE = "index.lock"
+
+
+def parse_vector(value: Any, dimension: Optional[int] = None) -> List[float]:
+    """
+    Validate a vector from a request body.
+
+    Raises ValueError unless value is a non-empty list of finite numbers,
+    of the given dimension when there is one.
+    """
+    if not isinstance(value, list) or not value or not all(
+            isinstance(x, (int, float)) and not isinstance(x, bool) and math.isfinite(x)
+            for x in value):
+        raise ValueError("A vector must be a non-empty list of finite numbers")
+    if dimension and len(value) != dimension:
+        raise ValueError(f"Expected a vector of dimension {dimension}, got {len(value)}")
+    return [float(x) for x in value]
+
+
+class VectorIndex:
+    """Append-only cosine-similarity index persisted as memory-mapped arrays"""
+
+    def __init__(self, path: str, dimension: Optional[int] = None):
+        self.path = path
+        self.dimension = dimension
+        self.count = 0
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.memmap] = None
+        self._offsets: Optional[np.memmap] = None
+        self._mapped_count = 0
+
+        os.makedirs(path, exist_ok=True)
+        self._load_manifest()
+
+    def __len__(self) -> int:
+        self._load_manifest()
+        return self.count
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _load_manifest(self) -> None:
+        """Pick up appends made by other workers since the last read"""
+        try:
+            with open(self._file(MANIFEST_FILE), "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return
+
+        if self.dimension and manifest["dimension"] != self.dimension:
+            raise ValueError(
+                f"Index at {self.path} has dimension {manifest['dimension']}, expected {self.dimension}")
+        self.dimension = manifest["dimension"]
+        self.count = manifest["count"]
+
+    def _write_manifest(self) -> None:
+        tmp_path = self._file(MANIFEST_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"dimension": self.dimension, "count": self.count}, f)
+        os.replace(tmp_path, self._file(MANIFEST_FILE))
+
+    def _mapped(self) -> Optional[np.memmap]:
+        """Return the vectors memmap, remapping only when the count changed"""
+        self._load_manifest()
+        if self.count == 0:
+            return None
+
+        if self._vectors is None or self._mapped_count != self.count:
+            self._vectors = np.memmap(
+                self._file(VECTORS_FILE), dtype=np.float32, mode="r",
+                shape=(self.count, self.dimension))
+            self._offsets = np.memmap(
+                self._file(OFFSETS_FILE), dtype=np.int64, mode="r",
+                shape=(self.count,))
+            self._mapped_count = self.count
+
+        return self._vectors
+
+    def append(self, vectors: Sequence[Sequence[float]], documents: Sequence[Dict[str, Any]]) -> int:
+        """
+        Append vectors and their documents to the index.
+
+        Each document is a dict with optional "id", "text" and "metadata"
+        keys. Returns the new total number of vectors in the index.
+        """
+        if len(vectors) != len(documents):
+            raise ValueError("vectors and documents must have the same length")
+        if len(vectors) == 0:
+            return len(self)
+
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if matrix.ndim != 2:
+            raise ValueError("vectors must be a two-dimensional array")
+
+        with self._lock, file_lock(self._file(LOCK_FILE)):
+            self._load_manifest()
+            self._truncate()
+            if self.dimension is None:
+                self.dimension = int(matrix.shape[1])
+            if matrix.shape[1] != self.dimension:
+                raise ValueError(
+                    f"Expected vectors of dimension {self.dimension}, got {matrix.shape[1]}")
+
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            matrix = matrix / norms
+
+            with open(self._file(DOCUMENTS_FILE), "ab") as f:
+                position = f.tell()
+                offsets = np.empty(len(documents), dtype=np.int64)
+                for i, doc in enumerate(documents):
+                    offsets[i] = position
+                    line = json.dumps({
+                        "id": doc.get("id") or str(self.count + i),
+                        "text": doc.get("text", ""),
+                        "metadata": doc.get("metadata", {})
+                    }).encode("utf-8") + b"\n"
+                    f.write(line)
+                    position += len(line)
+
+            with open(self._file(VECTORS_FILE), "ab") as f:
+                f.write(matrix.tobytes())
+            with open(self._file(OFFSETS_FILE), "ab") as f:
+                f.write(offsets.tobytes())
+
+            self.count += len(documents)
+            self._write_manifest()
+
+        return self.count
+
+    def _truncate(self) -> None:
+        """Drop bytes past the manifest's count, left by an append that did not finish"""
+        if self.count == 0:
+            committed = {VECTORS_FILE: 0, OFFSETS_FILE: 0, DOCUMENTS_FILE: 0}
+        else:
+            offsets = np.fromfile(self._file(OFFSETS_FILE), dtype=np.int64,
+                                  count=1, offset=(self.count - 1) * 8)
+            with open(self._file(DOCUMENTS_FILE), "rb") as f:
+                f.seek(int(offsets[0]))
+                documents_end = int(offsets[0]) + len(f.readline())
+            committed = {
+                VECTORS_FILE: self.count * self.dimension * 4,
+                OFFSETS_FILE: self.count * 8,
+                DOCUMENTS_FILE: documents_end,
+            }
+        for name, size in committed.items():
+            path = self._file(name)
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                with open(path, "r+b") as f:
+                    f.truncate(size)
+
+    def _read_document(self, row: int) -> Dict[str, Any]:
+        with open(self._file(DOCUMENTS_FILE), "rb") as f:
+            f.seek(int(self._offsets[row]))
+            return json.loads(f.readline())
+
+    def search(self, query: Sequence[float], top_k: int = 5) -> List[Dict[str, Any]]:
+        """Return the top_k documents by cosine similarity to the query vector"""
+        vectors = self._mapped()
+        if vectors is None or top_k <= 0:
+            return []
+
+        q = np.asarray(query, dtype=np.float32)
+        if q.shape != (self.dimension,):
+            raise ValueError(
+                f"Expected a query of dimension {self.dimension}, got {q.shape[0] if q.ndim else 0}")
+        norm = np.linalg.norm(q)
+        if norm == 0:
+            return []
+
+        scores = vectors @ (q / norm)
+        k = min(top_k, len(scores))
+        if k < len(scores):
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+
+        results = []
+        for row in top:
+            doc = self._read_document(row)
+            doc["score"] = float(scores[row])
+            results.append(doc)
+        return results
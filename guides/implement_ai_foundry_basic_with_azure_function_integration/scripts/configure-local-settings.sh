@@ -51,6 +51,8 @@ cat >local.settings.json <<EOF
     "RESOURCE_GROUP": "$RESOURCE_GROUP",
     "AZURE_SUBSCRIPTION_ID": "$AZURE_SUBSCRIPTION_ID",
     "MODEL_DEPLOYMENT_NAME": "gpt-4",
+    "WARMUP_SCHEDULE": "0 */5 * * * *",
+    "PROBE_SCHEDULE": "30 */5 * * * *",
     "FUNCTION_APP_NAME": "$FUNCTION_APP_NAME",
     "FUNCTION_APP_URL": "$FUNCTION_APP_URL"
   },
@@ -83,8 +83,8 @@ resource "azurerm_linux_function_app" "main" {
     type = "SystemAssigned"
   }
 
-  # Application settings
-  app_settings = {
+  # Application settings; failover endpoints are only set when configured
+  app_settings = merge({
     "FUNCTIONS_WORKER_RUNTIME"              = "python"
     "AI_FOUNDRY_ENDPOINT"                   = local.ai_foundry_endpoint
     "AI_FOUNDRY_PROJECT_NAME"               = local.ai_foundry_project_name
@@ -92,7 +92,13 @@ resource "azurerm_linux_function_app" "main" {
     "APPLICATIONINSIGHTS_CONNECTION_STRING" = data.azurerm_application_insights.this.connection_string
     "AzureWebJobsStorage__accountName"      = azurerm_storage_account.function.name
     "AzureWebJobsStorage__credential"       = "managedidentity"
-  }
+    "WARMUP_SCHEDULE"                       = var.warmup_schedule
+    "PROBE_SCHEDULE"                        = var.probe_schedule
+    "PROBE_ENABLED"                         = tostring(var.probe_enabled)
+    "PROBE_PROMPT"                          = var.probe_prompt
+    }, length(var.failover_ai_foundry_endpoints) > 0 ? {
+    "AI_FOUNDRY_ENDPOINTS" = join(",", [for e in var.failover_ai_foundry_endpoints : "${e.name}=${e.endpoint}"])
+  } : {})
 
   tags = var.tags
 
@@ -111,6 +117,17 @@ resource "azurerm_role_assignment" "function_ai_foundry_user" {
   depends_on = [azurerm_linux_function_app.main]
 }
 
+# Role Assignment: Function App -> each failover AI Foundry account
+resource "azurerm_role_assignment" "function_failover_ai_foundry_user" {
+  for_each = { for e in var.failover_ai_foundry_endpoints : e.name => e }
+
+  scope                = each.value.account_id
+  role_definition_name = "Cognitive Services User"
+  principal_id         = azurerm_linux_function_app.main.identity[0].principal_id
+
+  depends_on = [azurerm_linux_function_app.main]
+}
+
 # Diagnostic Settings for Function App
 resource "azurerm_monitor_diagnostic_setting" "function" {
   name                       = "${local.function_app_name}-diagnostics"
@@ -206,6 +206,21 @@ run "test_connectivity" {
     condition     = azurerm_linux_function_app.main.app_settings["AzureWebJobsStorage__credential"] == "managedidentity"
     error_message = "Function App should be configured to use managed identity for storage"
   }
+
+  assert {
+    condition     = azurerm_linux_function_app.main.app_settings["WARMUP_SCHEDULE"] == var.warmup_schedule && azurerm_linux_function_app.main.app_settings["PROBE_SCHEDULE"] == var.probe_schedule
+    error_message = "Function App should always set the timer schedules its functions are indexed with"
+  }
+
+  assert {
+    condition     = azurerm_linux_function_app.main.app_settings["PROBE_ENABLED"] == "false"
+    error_message = "Function App should leave the billable latency probe off by default"
+  }
+
+  assert {
+    condition     = !contains(keys(azurerm_linux_function_app.main.app_settings), "AI_FOUNDRY_ENDPOINTS")
+    error_message = "Function App should not set failover endpoints unless they are configured"
+  }
 }
 
 # Step 4: Test role assignments
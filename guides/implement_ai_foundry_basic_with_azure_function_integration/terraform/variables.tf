@@ -62,6 +62,55 @@ variable "function_sku_size" {
   default     = "B1"
 }
 
+variable "warmup_schedule" {
+  type        = string
+  description = "NCRONTAB schedule of the warm-up timer function"
+  default     = "0 */5 * * * *"
+
+  validation {
+    condition     = length(split(" ", trimspace(var.warmup_schedule))) == 6
+    error_message = "warmup_schedule must be a six-field NCRONTAB expression, e.g. \"0 */5 * * * *\""
+  }
+}
+
+variable "probe_schedule" {
+  type        = string
+  description = "NCRONTAB schedule of the synthetic latency probe timer function (it only runs when probe_enabled)"
+  default     = "30 */5 * * * *"
+
+  validation {
+    condition     = length(split(" ", trimspace(var.probe_schedule))) == 6
+    error_message = "probe_schedule must be a six-field NCRONTAB expression, e.g. \"30 */5 * * * *\""
+  }
+}
+
+variable "probe_enabled" {
+  type        = bool
+  description = "Run the billable synthetic chat probe on probe_schedule to record latency"
+  default     = false
+}
+
+variable "probe_prompt" {
+  type        = string
+  description = "Prompt sent by the synthetic latency probe"
+  default     = "Reply with the single word: pong"
+}
+
+variable "failover_ai_foundry_endpoints" {
+  type = list(object({
+    name       = string
+    endpoint   = string
+    account_id = string
+  }))
+  description = "Additional AI Foundry project endpoints for failover and load balancing; account_id is the Cognitive Services account the function identity is granted access to"
+  default     = []
+
+  validation {
+    condition     = alltrue([for e in var.failover_ai_foundry_endpoints : can(regex("^[A-Za-z0-9-]+$", e.name)) && startswith(e.endpoint, "https://")])
+    error_message = "Each failover endpoint needs an alphanumeric name (dashes allowed) and an https:// endpoint"
+  }
+}
+
 variable "tags" {
   type        = map(string)
   default     = {}